@@ -0,0 +1,32 @@
+"""
+Ferramentas de verificação e benchmark dos serviços Python (backend/src/services).
+
+Os scripts rodam a partir de backend/:
+
+    python -m benchmarks.mock_graph_server --port 8765
+
+A suíte do caminho completo (ficha sintética -> HTML -> corpo -> envio no mock)
+grava um JSON comparável entre rodadas:
+
+    python -m benchmarks.pipeline_benchmark --output resultado.json
+    python -m benchmarks.pipeline_benchmark --compare resultado.json
+"""
+import os
+import sys
+import time
+
+# Os serviços são módulos soltos em src/services (importados pelo nome, como nos scripts chamados pelo Node)
+SERVICES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'services')
+if SERVICES_DIR not in sys.path:
+    sys.path.insert(0, SERVICES_DIR)
+
+
+def best_of(fn, repeat):
+    """Menor tempo (s) de repeat execuções de fn"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
@@ -0,0 +1,127 @@
+"""
+Confere o ClipboardBroker com o FakeClipboardBackend (roda no Linux, sem Windows).
+
+Verifica que wait_for_formats ignora os dados anteriores ao copy() e espera o
+número de sequência mudar, que tenta de novo enquanto o clipboard está aberto
+por outro processo (busy_opens), que desiste com ClipboardTimeoutError, e que
+duas sessões simultâneas (no mesmo broker, entre threads, e em dois brokers com
+o mesmo arquivo de lock, como dois processos) não se sobrepõem e cada uma lê o
+que ela mesma copiou.
+
+    python -m benchmarks.clipboard_broker_check
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+
+from clipboard_broker import ClipboardBroker, ClipboardTimeoutError, FakeClipboardBackend
+
+HTML = "HTML Format"
+
+
+def make_broker(tmp, backend=None, timeout=2):
+    return ClipboardBroker(backend=backend or FakeClipboardBackend(), lock_path=os.path.join(tmp, "clipboard.lock"),
+                           timeout=timeout)
+
+
+def check_waits_for_sequence(tmp):
+    broker = make_broker(tmp)
+    backend = broker.backend
+    backend.publish({HTML: b"antigo"})
+    delay = 0.2
+    with broker.session() as clipboard:
+        since = clipboard.sequence_number()
+        started = time.perf_counter()
+        backend.publish({HTML: b"novo"}, delay=delay)
+        data = clipboard.wait_for_formats([HTML], since=since)
+        waited = time.perf_counter() - started
+    assert data == {HTML: b"novo"}, data
+    assert waited >= delay * 0.9, waited
+    # Sem since, os dados que já estão no clipboard servem
+    with broker.session() as clipboard:
+        assert clipboard.wait_for_formats([HTML]) == {HTML: b"novo"}
+    return {"case": "waits_for_sequence", "waitedSeconds": round(waited, 3)}
+
+
+def check_busy_opens(tmp):
+    broker = make_broker(tmp)
+    backend = broker.backend
+    backend.busy_opens = 3
+    with broker.session() as clipboard:
+        since = clipboard.sequence_number()
+        backend.publish({HTML: b"dados"})
+        data = clipboard.wait_for_formats([HTML], since=since)
+    assert data == {HTML: b"dados"}, data
+    assert backend.busy_opens == 0 and backend.open_calls == 4, backend.open_calls
+    return {"case": "busy_opens", "openCalls": backend.open_calls}
+
+
+def check_timeout(tmp):
+    broker = make_broker(tmp, timeout=0.3)
+    backend = broker.backend
+    backend.publish({HTML: b"antigo"})
+    started = time.perf_counter()
+    with broker.session() as clipboard:
+        since = clipboard.sequence_number()
+        try:
+            clipboard.wait_for_formats([HTML], since=since)
+            raise AssertionError("wait_for_formats deveria ter estourado o timeout")
+        except ClipboardTimeoutError:
+            elapsed = time.perf_counter() - started
+    assert 0.3 <= elapsed < 1.0, elapsed
+
+    # Sequência muda, mas sem o formato pedido: também é timeout
+    with broker.session() as clipboard:
+        since = clipboard.sequence_number()
+        backend.publish({"Outro": b"x"})
+        try:
+            clipboard.wait_for_formats([HTML], since=since)
+            raise AssertionError("formato ausente deveria estourar o timeout")
+        except ClipboardTimeoutError:
+            pass
+    return {"case": "timeout", "elapsedSeconds": round(elapsed, 3)}
+
+
+def run_sessions(brokers, backend):
+    """Uma thread por broker: copia (com atraso, como o Excel) e lê; devolve intervalos e dados lidos"""
+    intervals, read = {}, {}
+
+    def job(name, broker):
+        with broker.session() as clipboard:
+            started = time.perf_counter()
+            since = clipboard.sequence_number()
+            backend.publish({HTML: name.encode()}, delay=0.1)
+            read[name] = clipboard.wait_for_formats([HTML], since=since)[HTML]
+            intervals[name] = (started, time.perf_counter())
+
+    threads = [threading.Thread(target=job, args=(f"job-{i}", broker)) for i, broker in enumerate(brokers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert read == {name: name.encode() for name in intervals}, read
+    (a_start, a_end), (b_start, b_end) = sorted(intervals.values())
+    assert a_end <= b_start, intervals
+    return round(b_end - a_start, 3)
+
+
+def check_serialized(tmp):
+    backend = FakeClipboardBackend()
+    broker = make_broker(tmp, backend)
+    same_broker = run_sessions([broker, broker], backend)
+    # Dois brokers com o mesmo arquivo de lock: só o lock de arquivo separa as sessões
+    two_brokers = run_sessions([broker, make_broker(tmp, backend)], backend)
+    return {"case": "serialized_sessions", "sameBrokerSeconds": same_broker, "twoBrokersSeconds": two_brokers}
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [check_waits_for_sequence(tmp), check_busy_opens(tmp), check_timeout(tmp), check_serialized(tmp)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
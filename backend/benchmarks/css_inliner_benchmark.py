@@ -0,0 +1,119 @@
+"""
+Compara o inliner lxml (css_inliner.inline_css) com o pós-processamento
+anterior em BeautifulSoup, em tabelas de 1k, 10k e 50k células no formato que
+o Excel coloca no clipboard (CSS com classes .xlNN e regras por elemento).
+
+    python -m benchmarks.css_inliner_benchmark
+    python -m benchmarks.css_inliner_benchmark --cells 1000 10000 --repeat 3
+"""
+import re
+import json
+import time
+import random
+import argparse
+
+from bs4 import BeautifulSoup
+
+from css_inliner import inline_css
+
+TABLE_STYLE = 'border-collapse: collapse; font-family: Arial, sans-serif; font-size: 11px; width: 100%; margin: 10px 0;'
+HEADER_STYLE = 'border: 1px solid #666; padding: 8px; text-align: center; background-color: #f0f0f0; font-weight: bold;'
+BODY_STYLE = 'border: 1px solid #ccc; padding: 6px; vertical-align: top;'
+COLUMNS = 12
+
+
+def legacy_process(raw_html):
+    """Pós-processamento anterior de extract_excel_data (BeautifulSoup + regex)"""
+    soup = BeautifulSoup(raw_html, 'html.parser')
+    for img_tag in soup.find_all('img'):
+        img_tag.decompose()
+
+    style_tag = soup.find('style')
+    if style_tag and style_tag.string:
+        css_rules = {m.group(1): m.group(2).strip().replace('"', "'") for m in re.finditer(r'\.([a-zA-Z0-9_-]+)\s*\{([^}]+)\}', style_tag.string)}
+        if css_rules:
+            for tag in soup.find_all(class_=True):
+                s = tag.get('style', '')
+                tag['style'] = s + (';' if s else '') + ';'.join([css_rules[cn] for cn in tag['class'] if cn in css_rules])
+    if style_tag:
+        style_tag.decompose()
+
+    table = soup.find('table')
+    table['style'] = TABLE_STYLE
+    headers = table.find_all(['td', 'th'])[:12] if table.find_all(['td', 'th']) else []
+    for header in headers:
+        current_style = header.get('style', '')
+        header['style'] = current_style + (';' if current_style else '') + HEADER_STYLE
+    rows = table.find_all('tr')[1:] if len(table.find_all('tr')) > 1 else []
+    for row in rows:
+        for cell in row.find_all(['td', 'th']):
+            current_style = cell.get('style', '')
+            cell['style'] = current_style + (';' if current_style else '') + BODY_STYLE
+    return str(table)
+
+
+def new_process(raw_html):
+    return inline_css(raw_html, table_style=TABLE_STYLE, header_style=HEADER_STYLE, body_style=BODY_STYLE,
+                      inline_element_rules=False)["html"]
+
+
+def clipboard_html(cells, classes=40, seed=1):
+    """HTML sintético parecido com o 'HTML Format' do Excel"""
+    rnd = random.Random(seed)
+    css = ['<!--table', '\t{mso-displayed-decimal-separator:"\\,";}', '@page\n\t{margin:.79in .51in .79in .51in;}',
+           'tr\n\t{mso-height-source:auto;}', 'col\n\t{mso-width-source:auto;}',
+           'td\n\t{padding-top:1px;padding-right:1px;padding-left:1px;color:black;font-size:11.0pt;'
+           'font-family:Calibri, sans-serif;vertical-align:bottom;border:none;white-space:nowrap;}']
+    for i in range(classes):
+        css.append(f'.xl{65 + i}\n\t{{mso-style-parent:style0;font-weight:{700 if i % 3 == 0 else 400};'
+                   f'background:#{rnd.randrange(0xFFFFFF):06X};mso-pattern:black none;'
+                   f'border:.5pt solid windowtext;mso-number-format:"\\#\\,\\#\\#0\\.00\\;\\[Red\\]\\#\\,\\#\\#0\\.00";}}')
+    css.append('-->')
+
+    rows = []
+    for r in range(max(1, cells // COLUMNS)):
+        tds = ''.join(
+            f'<td class=xl{65 + rnd.randrange(classes)} style=\'height:15.0pt\'>Valor {r}-{c}</td>'
+            for c in range(COLUMNS)
+        )
+        rows.append(f"<tr height=20 style='height:15.0pt'>{tds}</tr>")
+    return ('<html><head><meta charset=utf-8><style>' + '\n'.join(css) + '</style></head><body>'
+            '<table border=0 cellpadding=0 cellspacing=0 width=900>'
+            + '<img src="file:///C:/x.png">' + '\n'.join(rows) + '</table></body></html>')
+
+
+def best_of(fn, arg, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(arg)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do inliner de CSS (lxml x BeautifulSoup)")
+    parser.add_argument('--cells', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for cells in args.cells:
+        raw_html = clipboard_html(cells)
+        legacy = best_of(legacy_process, raw_html, args.repeat)
+        new = best_of(new_process, raw_html, args.repeat)
+        results.append({
+            "cells": cells,
+            "inputBytes": len(raw_html),
+            "legacySeconds": round(legacy, 4),
+            "lxmlSeconds": round(new, 4),
+            "speedup": round(legacy / new, 1) if new else None,
+            "legacyOutputBytes": len(legacy_process(raw_html)),
+            "lxmlOutputBytes": len(new_process(raw_html))
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
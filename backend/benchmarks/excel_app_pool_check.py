@@ -0,0 +1,199 @@
+"""
+Confere o ExcelAppPool com uma factory falsa (roda no Linux, sem Excel).
+
+Verifica que a instância é reaproveitada e reciclada depois de
+max_jobs_per_app, que os workbooks esquecidos abertos são fechados na
+devolução, que uma instância que falha no health check é descartada (ociosa ou
+depois de um erro no bloco), que com max_size ocupado o borrow espera a
+devolução ou desiste no borrow_timeout, que uma falha na factory libera a vaga
+e que close() encerra as instâncias.
+
+    python -m benchmarks.excel_app_pool_check
+"""
+import json
+import time
+import threading
+
+from excel_app_pool import ExcelAppPool
+
+
+class FakeBook:
+    def __init__(self, books):
+        self._books = books
+
+    def close(self):
+        self._books.remove(self)
+
+
+class FakeBooks(list):
+    def open(self, path):
+        book = FakeBook(self)
+        self.append(book)
+        return book
+
+
+class FakeApp:
+    """Imita o xw.App: books, quit() e um Excel que para de responder (broken)"""
+
+    def __init__(self, number):
+        self.number = number
+        self._books = FakeBooks()
+        self.broken = False
+        self.quit_calls = 0
+
+    @property
+    def books(self):
+        if self.broken:
+            raise RuntimeError("Excel não responde")
+        return self._books
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+class FakeFactory:
+    def __init__(self, fail_first=0):
+        self.apps = []
+        self.fail_first = fail_first
+
+    def __call__(self):
+        if self.fail_first:
+            self.fail_first -= 1
+            raise RuntimeError("Falha simulada ao iniciar o Excel")
+        app = FakeApp(len(self.apps))
+        self.apps.append(app)
+        return app
+
+
+def check_recycle():
+    factory = FakeFactory()
+    pool = ExcelAppPool(app_factory=factory, max_size=1, max_jobs_per_app=2)
+    used = []
+    for _ in range(5):
+        with pool.borrow() as app:
+            used.append(app.number)
+    assert used == [0, 0, 1, 1, 2], used
+    assert [app.quit_calls for app in factory.apps] == [1, 1, 0]
+    assert pool.stats() == {"idle": 1, "total": 1, "maxSize": 1}
+    return {"case": "recycle", "apps": len(factory.apps), "used": used}
+
+
+def check_leftover_books():
+    factory = FakeFactory()
+    pool = ExcelAppPool(app_factory=factory)
+    with pool.borrow() as app:
+        app.books.open("a.xlsx")
+        app.books.open("b.xlsx")
+    assert len(factory.apps[0].books) == 0
+    return {"case": "leftover_books", "openBooks": len(factory.apps[0].books)}
+
+
+def check_health():
+    factory = FakeFactory()
+    pool = ExcelAppPool(app_factory=factory)
+    with pool.borrow():
+        pass
+    # Parou de responder enquanto estava ociosa: o próximo borrow descarta e cria outra
+    factory.apps[0].broken = True
+    with pool.borrow() as app:
+        assert app.number == 1
+    assert factory.apps[0].quit_calls == 1
+
+    # Erro no bloco com a instância travada: ela não volta para o pool
+    try:
+        with pool.borrow() as app:
+            app.broken = True
+            raise ValueError("erro no job")
+    except ValueError:
+        pass
+    assert factory.apps[1].quit_calls == 1
+    assert pool.stats()["total"] == 0
+
+    # Erro no bloco com a instância saudável: ela volta
+    try:
+        with pool.borrow():
+            raise ValueError("erro no job")
+    except ValueError:
+        pass
+    assert pool.stats() == {"idle": 1, "total": 1, "maxSize": 1}
+    return {"case": "health_check", "apps": len(factory.apps)}
+
+
+def check_wait_and_timeout():
+    factory = FakeFactory()
+    pool = ExcelAppPool(app_factory=factory, max_size=1, borrow_timeout=2)
+    holding = threading.Event()
+    hold_seconds = 0.3
+
+    def holder():
+        with pool.borrow():
+            holding.set()
+            time.sleep(hold_seconds)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    holding.wait()
+    started = time.perf_counter()
+    with pool.borrow() as app:
+        waited = time.perf_counter() - started
+        assert app.number == 0
+    thread.join()
+    assert waited >= hold_seconds * 0.8, waited
+    assert len(factory.apps) == 1
+
+    pool.borrow_timeout = 0.2
+    holding.clear()
+    thread = threading.Thread(target=holder)
+    thread.start()
+    holding.wait()
+    started = time.perf_counter()
+    try:
+        with pool.borrow():
+            raise AssertionError("borrow deveria ter estourado o timeout")
+    except TimeoutError:
+        timed_out = time.perf_counter() - started
+    thread.join()
+    assert 0.15 <= timed_out < hold_seconds, timed_out
+    return {"case": "max_size_wait", "waitedSeconds": round(waited, 3), "timeoutSeconds": round(timed_out, 3)}
+
+
+def check_factory_failure():
+    factory = FakeFactory(fail_first=1)
+    pool = ExcelAppPool(app_factory=factory, max_size=1, borrow_timeout=0.5)
+    try:
+        with pool.borrow():
+            pass
+        raise AssertionError("a factory deveria ter falhado")
+    except RuntimeError:
+        pass
+    # A vaga volta: o próximo borrow cria a instância sem esperar o timeout
+    with pool.borrow() as app:
+        assert app.number == 0
+    return {"case": "factory_failure", "total": pool.stats()["total"]}
+
+
+def check_close():
+    factory = FakeFactory()
+    pool = ExcelAppPool(app_factory=factory, max_size=2)
+    with pool.borrow():
+        with pool.borrow():
+            pass
+    pool.close()
+    assert [app.quit_calls for app in factory.apps] == [1, 1]
+    try:
+        with pool.borrow():
+            pass
+        raise AssertionError("borrow depois do close deveria falhar")
+    except RuntimeError:
+        pass
+    return {"case": "close", "quit": [app.quit_calls for app in factory.apps]}
+
+
+def main():
+    results = [check_recycle(), check_leftover_books(), check_health(), check_wait_and_timeout(),
+               check_factory_failure(), check_close()]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Confere o envio em $batch do GraphMailClient contra o mock do Graph.
+
+Envia as mesmas mensagens com sendMail avulso e com $batch, com falhas
+programadas (429 temporário e 400 definitivo), e verifica que os status voltam
+para a mensagem certa, que só os itens com falha temporária são reenviados e
+que nenhum $batch passa de 20 itens.
+
+    python -m benchmarks.graph_batch_check --messages 45 --latency 0.05
+"""
+import json
+import time
+import argparse
+
+from benchmarks.mock_graph_server import MockGraphServer
+from graph_mail import GraphMailClient, build_message
+from graph_token import TokenProvider
+
+
+def run(messages_count, latency, use_batch):
+    failures = {
+        "retry-0@teste.com": [429],
+        "retry-1@teste.com": [503, 429],
+        "bad@teste.com": [400],
+    }
+    addresses = [f"user-{i}@teste.com" for i in range(messages_count - len(failures))] + list(failures)
+    messages = [build_message("Ficha de entrada", "<p>corpo</p>", [address]) for address in addresses]
+
+    with MockGraphServer(latency=latency, failures=failures, retry_after=0.01) as graph:
+        config = {
+            "client_id": "mock", "client_secret": "mock", "sender_email": "remetente@teste.com",
+            "token_url": graph.token_url, "graph_url": graph.graph_url
+        }
+        client = GraphMailClient(config, token_provider=TokenProvider(config), use_batch=use_batch)
+        started = time.perf_counter()
+        results = client.send_many(messages)
+        elapsed = time.perf_counter() - started
+        client.close()
+        stats = graph.stats()
+
+    by_address = dict(zip(addresses, results))
+    assert all(by_address[a]["success"] for a in addresses if a not in failures or a.startswith("retry-"))
+    assert by_address["retry-1@teste.com"]["attempts"] == 3
+    assert not by_address["bad@teste.com"]["success"] and by_address["bad@teste.com"]["status"] == 400
+    assert stats["delivered"] == messages_count - 1
+    if use_batch:
+        assert max(stats["batchSizes"]) <= 20
+        # Reenvios só com os itens que falharam
+        assert sum(stats["batchSizes"]) == messages_count + 3
+
+    return {
+        "mode": "batch" if use_batch else "sendMail",
+        "messages": messages_count,
+        "seconds": round(elapsed, 3),
+        "httpRequests": stats["sendMailRequests"] + stats["batchRequests"],
+        **stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica o envio via $batch contra o mock do Graph")
+    parser.add_argument('--messages', type=int, default=45)
+    parser.add_argument('--latency', type=float, default=0.05, help="latência simulada por requisição (s)")
+    args = parser.parse_args()
+
+    results = [run(args.messages, args.latency, use_batch=False), run(args.messages, args.latency, use_batch=True)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
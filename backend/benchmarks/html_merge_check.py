@@ -0,0 +1,102 @@
+"""
+Confere as células mescladas do openpyxl_html_renderer quando há linhas ou colunas ocultas.
+
+Linhas ocultas não viram <tr> e colunas ocultas não viram <col> nem <td>, então
+rowspan e colspan têm de descontá-las; senão a mescla invade as linhas de baixo
+e as células seguintes caem na coluna errada. Para cada caso a tabela gerada é
+montada numa grade (respeitando rowspan e colspan) e cada valor precisa cair na
+linha e coluna visíveis da planilha.
+
+    python -m benchmarks.html_merge_check
+"""
+import os
+import json
+import tempfile
+
+from lxml import html as lxml_html
+from openpyxl.utils import column_index_from_string, range_boundaries
+
+from benchmarks.synthetic_workbook import build_grid_workbook
+from openpyxl_html_renderer import render_table_html
+
+ROWS = 5
+LAST_COLUMN = 'D'
+
+CASES = {
+    "no_hidden": {"merge": "A1:A3"},
+    # A1:A3 mesclado com a linha do meio oculta
+    "hidden_middle": {"merge": "A1:A3", "hidden_rows": [2]},
+    # Primeira linha da mescla oculta: o valor sai na primeira linha visível
+    "hidden_first": {"merge": "A1:A3", "hidden_rows": [1]},
+    # Mescla inteira oculta: nenhuma célula dela aparece
+    "hidden_all": {"merge": "A1:A3", "hidden_rows": [1, 2, 3]},
+    # Coluna oculta: as células à direita continuam nas suas colunas
+    "hidden_column": {"merge": "C4:D4", "hidden_cols": ["B"]},
+    # Mescla que começa na coluna oculta: sai na primeira coluna visível
+    "hidden_anchor_column": {"merge": "B3:C3", "hidden_cols": ["B"]},
+    # Canto da mescla oculto nas duas direções
+    "hidden_anchor_row_and_column": {"merge": "B1:D3", "hidden_rows": [1], "hidden_cols": ["B"]},
+}
+
+
+def value(row, col):
+    return row * 10 + col
+
+
+def grid(table_html):
+    """Texto de cada posição (linha da <table>, coluna) depois de aplicar rowspan/colspan"""
+    cells = {}
+    for row_pos, tr in enumerate(lxml_html.fromstring(table_html).iter('tr')):
+        col_pos = 0
+        for td in tr.iter('td'):
+            while (row_pos, col_pos) in cells:
+                col_pos += 1
+            rowspan, colspan = int(td.get('rowspan', 1)), int(td.get('colspan', 1))
+            for r in range(row_pos, row_pos + rowspan):
+                for c in range(col_pos, col_pos + colspan):
+                    assert (r, c) not in cells, f"célula sobreposta em {(r, c)}"
+                    cells[(r, c)] = td.text_content() if (r, c) == (row_pos, col_pos) else None
+            col_pos += colspan
+    return cells
+
+
+def expected_grid(merge, hidden_rows, hidden_cols):
+    """Grade esperada: só linhas/colunas visíveis, com a mescla no seu primeiro canto visível"""
+    min_col, min_row, max_col, max_row = range_boundaries(merge)
+    rows = [r for r in range(1, ROWS + 1) if r not in hidden_rows]
+    cols = [c for c in range(1, column_index_from_string(LAST_COLUMN) + 1) if c not in hidden_cols]
+    merged = [(r, c) for r in rows for c in cols if min_row <= r <= max_row and min_col <= c <= max_col]
+    cells = {}
+    for row_pos, r in enumerate(rows):
+        for col_pos, c in enumerate(cols):
+            if (r, c) not in merged:
+                cells[(row_pos, col_pos)] = str(value(r, c))
+            else:
+                cells[(row_pos, col_pos)] = "mescla" if (r, c) == merged[0] else None
+    return cells, len(rows), len(cols)
+
+
+def run(name, merge, tmp, hidden_rows=(), hidden_cols=()):
+    path = os.path.join(tmp, f"{name}.xlsx")
+    build_grid_workbook(path, ROWS, column_index_from_string(LAST_COLUMN), value=value, merged=[merge],
+                        merged_value="mescla", hidden_rows=hidden_rows, hidden_cols=hidden_cols)
+    table_html, _ = render_table_html(path, last_column=LAST_COLUMN)
+
+    hidden_col_indexes = {column_index_from_string(c) for c in hidden_cols}
+    expected, rows, cols = expected_grid(merge, set(hidden_rows), hidden_col_indexes)
+    assert table_html.count('<tr') == rows, (name, table_html)
+    assert table_html.count('<col ') == cols, (name, table_html)
+    cells = grid(table_html)
+    assert cells == expected, (name, sorted(cells.items()), sorted(expected.items()))
+    return {"case": name, "hiddenRows": list(hidden_rows), "hiddenCols": list(hidden_cols),
+            "rows": rows, "cols": cols, "ok": True}
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [run(name, tmp=tmp, **case) for name, case in CASES.items()]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Confere o tempo de inicialização dos scripts chamados pelo Node.
+
+Cada caso roda num interpretador novo com "python -X importtime". Para os
+pontos de entrada mede o tempo de importação do módulo (o menor de algumas
+rodadas) e compara com um limite em milissegundos. Para cada comando (extrair o
+HTML, renderizar a imagem) executa o caminho numa planilha sintética e verifica
+que nenhuma dependência de outro caminho foi carregada: extrair não importa a
+pilha de e-mail (requests, bs4, mail_images), renderizar não importa requests
+nem o CSS inline, e nenhum script importa pandas. O PIL só é proibido na
+importação: o próprio openpyxl o carrega ao ler a planilha.
+
+Sai com código 1 se algum caso passar do limite ou carregar módulo proibido.
+
+    python -m benchmarks.import_time_check
+    python -m benchmarks.import_time_check --runs 10 --budget-scale 2
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+from benchmarks import SERVICES_DIR
+from benchmarks.synthetic_workbook import build_grid_workbook
+
+# Pilha de e-mail: só carregada pelos comandos que enviam
+MAIL_STACK = ("requests", "bs4", "graph_mail", "graph_token", "mail_images")
+# Nunca carregados só por importar um script
+HEAVY_BACKENDS = ("PIL", "openpyxl", "lxml", "numpy", "pandas", "xlwings", "win32clipboard", "dotenv")
+
+# (módulo, limite em ms, módulos proibidos) de cada ponto de entrada
+ENTRY_POINTS = (
+    ("excel_copy_paste_new", 60, MAIL_STACK + HEAVY_BACKENDS),
+    ("enviar_relatorio_completo", 60, MAIL_STACK + HEAVY_BACKENDS),
+    ("excel_to_image_exact", 60, MAIL_STACK + HEAVY_BACKENDS + ("concurrent.futures.process",)),
+)
+
+# (nome, módulo, chamada, módulos proibidos) de cada caminho de comando
+COMMAND_PATHS = (
+    ("extract", "excel_copy_paste_new",
+     "result = excel_copy_paste_new.extract_excel_data(XLSX, method='openpyxl'); assert result['success'], result",
+     MAIL_STACK + ("pandas", "xlwings")),
+    ("formatted-html", "enviar_relatorio_completo",
+     "enviar_relatorio_completo.get_formatted_html_from_excel(XLSX, method='openpyxl')",
+     ("requests", "graph_mail", "graph_token", "mail_images", "pandas", "xlwings")),
+    ("render", "excel_to_image_exact",
+     "assert excel_to_image_exact.ExcelToImageConverter(XLSX).method_5_improved_openpyxl(output_path=PNG)",
+     MAIL_STACK + ("css_inliner", "pandas", "xlwings")),
+)
+
+CASE_CODE = """
+import sys, json, time
+XLSX, PNG = sys.argv[1], sys.argv[2]
+started = time.perf_counter()
+import {module}
+{call}
+print(json.dumps({{"seconds": time.perf_counter() - started, "modules": sorted(sys.modules)}}))
+"""
+
+_IMPORT_TIME_RE = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \| (\S.*)$')
+
+
+def run_case(module, call, xlsx_path="", png_path=""):
+    """Executa o caso num interpretador novo; devolve (ms de importação do módulo, segundos, módulos carregados)"""
+    env = dict(os.environ, HTML_CACHE_ENABLED="0", IMAGE_CACHE_ENABLED="0", IMAGE_METHODS_MEMORY="0",
+               RENDER_INCREMENTAL="0", PYTHONDONTWRITEBYTECODE="1")
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CASE_CODE.format(module=module, call=call), xlsx_path, png_path],
+        cwd=SERVICES_DIR, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{module}: {completed.stderr.strip().splitlines()[-1]}")
+
+    import_ms = None
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_TIME_RE.match(line)
+        if match and match.group(2) == module:
+            import_ms = int(match.group(1)) / 1000
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return import_ms, result["seconds"], set(result["modules"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de importação dos scripts e dependências por comando")
+    parser.add_argument('--runs', type=int, default=5, help="rodadas por ponto de entrada (vale a menor)")
+    parser.add_argument('--budget-scale', type=float, default=1.0, help="multiplica os limites (máquinas lentas)")
+    args = parser.parse_args()
+
+    results = []
+    failed = False
+    for module, budget_ms, forbidden in ENTRY_POINTS:
+        runs = [run_case(module, "pass") for _ in range(args.runs)]
+        import_ms = min(ms for ms, _, _ in runs)
+        loaded = sorted(m for m in forbidden if m in runs[0][2])
+        ok = import_ms <= budget_ms * args.budget_scale and not loaded
+        failed |= not ok
+        results.append({"entryPoint": module, "importMs": round(import_ms, 1),
+                        "budgetMs": budget_ms * args.budget_scale, "forbiddenLoaded": loaded, "ok": ok})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx_path = os.path.join(tmp, 'ficha.xlsx')
+        build_grid_workbook(xlsx_path, 60, 12)
+        for name, module, call, forbidden in COMMAND_PATHS:
+            _, seconds, modules = run_case(module, call, xlsx_path, os.path.join(tmp, 'ficha.png'))
+            loaded = sorted(m for m in forbidden if m in modules)
+            failed |= bool(loaded)
+            results.append({"command": name, "entryPoint": module, "seconds": round(seconds, 3),
+                            "forbiddenLoaded": loaded, "ok": not loaded})
+
+    print(json.dumps(results, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Tempo da re-renderização incremental (incremental_render) contra a renderização
+completa (render_sheet_image) depois de alterar algumas células, e conferência
+de que as duas imagens têm exatamente os mesmos pixels.
+
+    python -m benchmarks.incremental_render_benchmark
+    python -m benchmarks.incremental_render_benchmark --rows 2000 --changes 10
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+import numpy as np
+from PIL import Image
+from openpyxl import load_workbook
+from openpyxl.styles import PatternFill
+
+from incremental_render import render_sheet_image_incremental
+from sheet_raster_renderer import render_sheet_image
+from benchmarks.synthetic_workbook import build_grid_workbook
+
+
+def edit_cells(path, changes, seed=2):
+    """Altera valores (e o preenchimento de algumas) de células aleatórias, como numa ficha atualizada"""
+    rnd = random.Random(seed)
+    wb = load_workbook(path)
+    ws = wb.active
+    for index in range(changes):
+        cell = ws.cell(row=rnd.randint(2, ws.max_row), column=rnd.randint(2, ws.max_column))
+        cell.value = rnd.randint(0, 100000)
+        if index % 3 == 0:
+            cell.fill = PatternFill('solid', start_color='FFFFFF00')
+    wb.save(path)
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da re-renderização incremental")
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--cols', type=int, default=12)
+    parser.add_argument('--changes', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ficha.xlsx')
+        state_dir = os.path.join(tmp, 'state')
+        incremental_path = os.path.join(tmp, 'incremental.png')
+        full_path = os.path.join(tmp, 'full.png')
+        build_grid_workbook(path, args.rows, args.cols)
+
+        # Primeira renderização: guarda o estado
+        _, first_info = render_sheet_image_incremental(path, output_path=incremental_path, state_dir=state_dir)
+        edit_cells(path, args.changes)
+
+        (_, info), incremental_seconds = timed(
+            lambda: render_sheet_image_incremental(path, output_path=incremental_path, state_dir=state_dir), 1)
+        _, full_seconds = timed(lambda: render_sheet_image(path, output_path=full_path), args.repeat)
+
+        with Image.open(incremental_path) as a, Image.open(full_path) as b:
+            identical = np.array_equal(np.asarray(a.convert('RGB')), np.asarray(b.convert('RGB')))
+
+        result = {
+            "rows": args.rows,
+            "changedCells": args.changes,
+            "firstRender": first_info["mode"],
+            "mode": info["mode"],
+            "repaintedSegments": info["segments"],
+            "totalSegments": info["totalSegments"],
+            "fullSeconds": round(full_seconds, 3),
+            "incrementalSeconds": round(incremental_seconds, 3),
+            "speedup": round(full_seconds / incremental_seconds, 1),
+            "identicalPixels": identical
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Envio do relatório com a imagem como data URI no HTML (forma anterior) contra
+anexo inline CID (mail_images), para vários destinatários, no mock do Graph.
+
+Mede o tamanho de cada mensagem, os bytes recebidos pelo mock, o tempo de
+preparo (leitura/codificação da imagem e montagem dos corpos) e o tempo de
+envio. Com --max-bytes, mostra também o efeito do limite de tamanho da imagem.
+O mock recusa mensagens cujo cid: não tenha o anexo inline correspondente.
+
+    python -m benchmarks.inline_image_benchmark
+    python -m benchmarks.inline_image_benchmark --recipients 40 --rows 400 --max-bytes 524288
+"""
+import os
+import json
+import time
+import base64
+import argparse
+import tempfile
+
+from benchmarks.mock_graph_server import MockGraphServer
+from benchmarks.synthetic_workbook import build_grid_workbook
+from enviar_relatorio_completo import build_report_body, format_table_html
+from graph_mail import GraphMailClient, build_message
+from graph_token import TokenProvider
+from mail_images import load_inline_image
+from openpyxl_html_renderer import render_table_html
+from sheet_raster_renderer import render_sheet_image
+
+
+def legacy_image_tag(image_path):
+    """Forma anterior: a imagem inteira em base64 dentro do src"""
+    with open(image_path, 'rb') as f:
+        encoded = base64.b64encode(f.read()).decode('utf-8')
+    return f'<img src="data:image/png;base64,{encoded}" alt="Imagem" style="width:115%; height:auto;" />'
+
+
+def prepare(mode, table_html, image_path, recipients, max_bytes):
+    """Mensagens de todos os destinatários, com a imagem preparada uma vez"""
+    if mode == "data-uri":
+        body = build_report_body(table_html, legacy_image_tag(image_path), "Ficha de entrada")
+        return [build_message("Ficha", body, [address]) for address in recipients], None
+    image = load_inline_image(image_path, max_bytes=max_bytes)
+    body = build_report_body(table_html, image.img_tag(), "Ficha de entrada")
+    attachments = [image.attachment()]
+    return [build_message("Ficha", body, [address], attachments=attachments) for address in recipients], image
+
+
+def run(mode, table_html, image_path, recipients, latency, max_bytes=0):
+    started = time.perf_counter()
+    messages, image = prepare(mode, table_html, image_path, recipients, max_bytes)
+    prepare_seconds = time.perf_counter() - started
+
+    with MockGraphServer(latency=latency) as graph:
+        config = {
+            "client_id": "mock", "client_secret": "mock", "sender_email": "remetente@teste.com",
+            "token_url": graph.token_url, "graph_url": graph.graph_url
+        }
+        client = GraphMailClient(config, token_provider=TokenProvider(config))
+        started = time.perf_counter()
+        results = client.send_many(messages)
+        send_seconds = time.perf_counter() - started
+        client.close()
+        stats = graph.stats()
+
+    assert all(result["success"] for result in results), results[:3]
+    message = messages[0]["message"]
+    result = {
+        "mode": mode if not max_bytes else f"{mode} (limite {max_bytes} bytes)",
+        "recipients": len(recipients),
+        "bodyBytes": len(message["body"]["content"].encode('utf-8')),
+        "messageBytes": len(json.dumps(messages[0], ensure_ascii=False).encode('utf-8')),
+        "mockBytesReceived": stats["bytesReceived"],
+        "batchRequests": stats["batchRequests"],
+        "inlineAttachments": stats["inlineAttachments"],
+        "prepareSeconds": round(prepare_seconds, 3),
+        "sendSeconds": round(send_seconds, 3)
+    }
+    if image is not None:
+        result["imageBytes"] = image.size
+        result["originalImageBytes"] = image.original_bytes
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Imagem do relatório como data URI x anexo inline (CID)")
+    parser.add_argument('--recipients', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=200, help="linhas da planilha sintética (tamanho da imagem)")
+    parser.add_argument('--latency', type=float, default=0.05, help="latência simulada por requisição (s)")
+    parser.add_argument('--max-bytes', type=int, default=512 * 1024, help="limite para a rodada com redução")
+    args = parser.parse_args()
+
+    recipients = [f"user-{i}@teste.com" for i in range(args.recipients)]
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, 'ficha.xlsx')
+        image_path = os.path.join(tmp, 'ficha.png')
+        build_grid_workbook(excel_path, args.rows, 12)
+        render_sheet_image(excel_path, output_path=image_path)
+        table_html = format_table_html(render_table_html(excel_path)[0])
+
+        results = [
+            run("data-uri", table_html, image_path, recipients, args.latency),
+            run("cid", table_html, image_path, recipients, args.latency),
+            run("cid", table_html, image_path, recipients, args.latency, max_bytes=args.max_bytes)
+        ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
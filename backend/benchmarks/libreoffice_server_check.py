@@ -0,0 +1,94 @@
+"""
+Verificação e tempo do LibreOffice persistente (libreoffice_server) contra um
+soffice novo por conversão (método 3 anterior), numa máquina Linux com o
+LibreOffice e o poppler instalados. Sem soffice no PATH, só informa e sai.
+
+Confere também que cada aba pedida vira a sua própria imagem (a primeira e a
+segunda aba do arquivo geram imagens diferentes).
+
+    python -m benchmarks.libreoffice_server_check --conversions 5
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+from openpyxl import load_workbook
+
+from libreoffice_server import LibreOfficeServer, find_soffice
+from benchmarks.synthetic_workbook import build_grid_workbook
+
+
+def build_two_sheets(path, rows):
+    build_grid_workbook(path, rows, 8)
+    wb = load_workbook(path)
+    second = wb.create_sheet("Segunda")
+    for row in range(1, 6):
+        second.cell(row=row, column=1, value=f"Outra aba {row}")
+    wb.save(path)
+
+
+def legacy_convert(soffice, excel_path, out_dir):
+    """Método 3 anterior: um soffice por conversão, perfil padrão compartilhado"""
+    subprocess.run([soffice, "--headless", "--convert-to", "pdf", "--outdir", out_dir, excel_path],
+                   capture_output=True, timeout=180, check=True)
+    return os.path.join(out_dir, os.path.splitext(os.path.basename(excel_path))[0] + ".pdf")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificação do LibreOffice persistente")
+    parser.add_argument('--conversions', type=int, default=5)
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--dpi', type=int, default=150)
+    args = parser.parse_args()
+
+    soffice = find_soffice()
+    if not soffice:
+        print(json.dumps({"skipped": "LibreOffice (soffice) não encontrado"}))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, 'ficha.xlsx')
+        build_two_sheets(excel_path, args.rows)
+
+        started = time.perf_counter()
+        for _ in range(args.conversions):
+            legacy_convert(soffice, excel_path, tmp)
+        legacy_seconds = time.perf_counter() - started
+
+        server = LibreOfficeServer(soffice, dpi=args.dpi)
+        try:
+            started = time.perf_counter()
+            server.start()
+            startup_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for index in range(args.conversions):
+                server.convert_sheet_to_image(excel_path, os.path.join(tmp, f"ficha_{index}.png"))
+            server_seconds = time.perf_counter() - started
+
+            first = server.convert_sheet_to_image(excel_path, os.path.join(tmp, "primeira.png"), "Sheet")
+            second = server.convert_sheet_to_image(excel_path, os.path.join(tmp, "segunda.png"), "Segunda")
+            with open(first, 'rb') as a, open(second, 'rb') as b:
+                distinct_sheets = a.read() != b.read()
+            mode = server.mode
+        finally:
+            server.stop()
+
+        result = {
+            "mode": mode,
+            "conversions": args.conversions,
+            "legacySeconds": round(legacy_seconds, 2),
+            "serverStartupSeconds": round(startup_seconds, 2),
+            "serverSeconds": round(server_seconds, 2),
+            "perConversionLegacy": round(legacy_seconds / args.conversions, 2),
+            "perConversionServer": round(server_seconds / args.conversions, 2),
+            "distinctSheets": distinct_sheets
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Servidor local que imita os endpoints do Microsoft Graph usados no envio de e-mails.
+
+Atende o token (client credentials), /users/{remetente}/sendMail e /$batch, e
+grava tudo o que recebe para conferência: quantos tokens foram pedidos, cada
+sendMail avulso e cada $batch com os ids dos itens. Mensagens com <img
+src="cid:..."> sem o anexo inline correspondente são recusadas (400). Falhas podem ser
+programadas por destinatário (ex.: {"b@teste.com": [429, 202]} responde 429 no
+primeiro envio para b@teste.com e 202 no segundo).
+
+    with MockGraphServer(latency=0.05) as graph:
+        os.environ["GRAPH_TOKEN_URL"] = graph.token_url
+        os.environ["GRAPH_URL"] = graph.graph_url
+        ...
+        print(graph.stats())
+
+Também pode rodar sozinho, para apontar o backend Node/Python para ele:
+
+    python -m benchmarks.mock_graph_server --port 8765 --latency 0.05
+"""
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_CID_RE = re.compile(r'src=["\']cid:([^"\']+)')
+
+
+class MockGraphServer:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, failures=None, retry_after=0.05):
+        self.latency = latency
+        self.failures = {address: list(statuses) for address, statuses in (failures or {}).items()}
+        self.retry_after = retry_after
+
+        self.token_requests = 0
+        self.send_mail_requests = []  # mensagens recebidas em sendMail avulsos
+        self.batches = []             # um item por $batch: lista de ids
+        self.delivered = []           # destinatários com envio aceito (202)
+        self.inline_attachments = 0   # anexos inline (isInline) nas mensagens aceitas
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def token_url(self):
+        return f"{self.base_url}/token"
+
+    @property
+    def graph_url(self):
+        return f"{self.base_url}/v1.0"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tokenRequests": self.token_requests,
+                "sendMailRequests": len(self.send_mail_requests),
+                "batchRequests": len(self.batches),
+                "batchSizes": [len(ids) for ids in self.batches],
+                "delivered": len(self.delivered),
+                "inlineAttachments": self.inline_attachments,
+                "bytesReceived": self.bytes_received
+            }
+
+    def _deliver(self, message):
+        """Status para uma mensagem: próxima falha programada ou 202"""
+        recipients = [r["emailAddress"]["address"] for r in message["message"]["toRecipients"]]
+        inline_ids = {a.get("contentId") for a in message["message"].get("attachments", []) if a.get("isInline")}
+        if not set(_CID_RE.findall(message["message"]["body"]["content"])) <= inline_ids:
+            return 400
+        with self._lock:
+            for address in recipients:
+                planned = self.failures.get(address)
+                if planned:
+                    status = planned.pop(0)
+                    if status >= 300:
+                        return status
+            self.delivered.extend(recipients)
+            self.inline_attachments += len(inline_ids)
+        return 202
+
+    def _error_body(self, status):
+        code = "TooManyRequests" if status == 429 else "ErrorSimulated"
+        return {"error": {"code": code, "message": f"Falha simulada ({status})"}}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with server._lock:
+                    server.bytes_received += len(body)
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if self.path.endswith('/token'):
+                    with server._lock:
+                        server.token_requests += 1
+                    return self._reply(200, {"access_token": "mock-token", "expires_in": 3599})
+
+                if self.headers.get('Authorization') != 'Bearer mock-token':
+                    return self._reply(401, {"error": {"code": "InvalidAuthenticationToken"}})
+
+                if self.path.endswith('/$batch'):
+                    return self._batch(json.loads(body))
+
+                if self.path.endswith('/sendMail'):
+                    message = json.loads(body)
+                    with server._lock:
+                        server.send_mail_requests.append(message)
+                    status = server._deliver(message)
+                    if status == 202:
+                        return self._reply(202, None)
+                    return self._reply(status, server._error_body(status), {'Retry-After': str(server.retry_after)})
+
+                self._reply(404, {"error": {"code": "NotFound"}})
+
+            def _batch(self, payload):
+                requests_ = payload.get("requests", [])
+                if len(requests_) > 20:
+                    return self._reply(400, {"error": {"code": "BadRequest", "message": "Mais de 20 itens no $batch"}})
+                with server._lock:
+                    server.batches.append([item["id"] for item in requests_])
+
+                responses = []
+                for item in requests_:
+                    status = server._deliver(item["body"]) if item["url"].endswith('/sendMail') else 404
+                    response = {"id": item["id"], "status": status, "headers": {}, "body": None}
+                    if status >= 300:
+                        response["headers"] = {"Retry-After": str(server.retry_after)}
+                        response["body"] = server._error_body(status)
+                    responses.append(response)
+                self._reply(200, {"responses": responses})
+
+            def _reply(self, status, payload, headers=None):
+                data = json.dumps(payload).encode('utf-8') if payload is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita o Microsoft Graph (token, sendMail, $batch)")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="atraso por requisição, em segundos")
+    args = parser.parse_args()
+
+    server = MockGraphServer(port=args.port, latency=args.latency).start()
+    print(f"Mock Graph em {server.base_url}")
+    print(f"   GRAPH_TOKEN_URL={server.token_url}")
+    print(f"   GRAPH_URL={server.graph_url}")
+    try:
+        while True:
+            time.sleep(5)
+            print(json.dumps(server.stats()))
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Suíte de benchmark do caminho completo da ficha, do .xlsx ao e-mail enviado.
+
+Para cada tamanho gera uma ficha sintética (synthetic_workbook) e mede, etapa
+por etapa (mediana e mínimo de várias rodadas, depois de uma rodada de
+aquecimento):
+
+    render_html     openpyxl_html_renderer.render_table_html
+    inline_css      pós-processamento do HTML com CSS inline (format_table_html)
+    extract_stream  extract_excel_data pelo openpyxl (render + CSS inline linha a linha)
+    render_image    imagem da planilha (sheet_raster_renderer)
+    load_image      anexo inline da imagem (mail_images)
+    body            corpo do e-mail com a imagem em C3 (build_report_body)
+    payload         mensagens de todos os destinatários, serializadas como no envio
+    send            GraphMailClient.send_many no mock do Graph
+    end_to_end      run_complete_process_batch inteiro, com os spans do stage_metrics
+
+Tudo roda no Linux, sem Excel e sem rede (o Graph é o mock local). Os caches
+de HTML e de imagem e a renderização incremental ficam desligados.
+
+O resultado é um JSON; com --output ele é gravado num arquivo e com --compare
+é comparado com um resultado anterior: uma etapa mais lenta que o limite
+(--threshold) vira regressão e o script sai com código 1.
+
+    python -m benchmarks.pipeline_benchmark --output resultado.json
+    python -m benchmarks.pipeline_benchmark --sizes small medium --compare resultado.json
+    python -m benchmarks.pipeline_benchmark --rows 2000 --styles 5 --merged 30 --images 3
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+
+os.environ.update({"HTML_CACHE_ENABLED": "0", "IMAGE_CACHE_ENABLED": "0", "RENDER_INCREMENTAL": "0",
+                   "EXCEL_HTML_EXTRACTOR": "openpyxl"})
+
+from benchmarks import SERVICES_DIR
+from benchmarks.mock_graph_server import MockGraphServer
+from benchmarks.synthetic_workbook import build_ficha_workbook
+from enviar_relatorio_completo import build_report_body, format_table_html, run_complete_process_batch
+from excel_copy_paste_new import extract_excel_data
+from graph_mail import GraphMailClient, build_message
+from graph_token import TokenProvider
+from mail_images import load_inline_image
+from openpyxl_html_renderer import render_table_html
+from service_env import get_graph_config
+from sheet_raster_renderer import render_sheet_image
+from stage_metrics import job_metrics
+
+# Versão do formato do JSON: incremente se mudar o que é medido, para não comparar coisas diferentes
+RESULT_VERSION = 1
+
+SIZES = {
+    "small": {"rows": 50, "cols": 12, "styles": 3, "merged": 4, "images": 1},
+    "medium": {"rows": 500, "cols": 12, "styles": 4, "merged": 12, "images": 1},
+    "large": {"rows": 3000, "cols": 12, "styles": 5, "merged": 40, "images": 2},
+}
+
+PACKAGES = ("openpyxl", "lxml", "Pillow", "beautifulsoup4", "requests", "numpy")
+
+
+def measure(func, runs):
+    """Executa func uma vez para aquecer e depois runs vezes; devolve (estatísticas, último resultado)"""
+    value = func()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        value = func()
+        samples.append(time.perf_counter() - started)
+    return {"medianSeconds": round(statistics.median(samples), 4), "minSeconds": round(min(samples), 4)}, value
+
+
+def span_totals(metrics):
+    """Tempo somado por nome de span (as threads das etapas podem sobrepor)"""
+    totals = {}
+    for span in metrics["spans"]:
+        totals[span["name"]] = round(totals.get(span["name"], 0) + span["seconds"], 4)
+    return totals
+
+
+def run_case(name, params, args, tmp):
+    """Gera a ficha do caso e mede cada etapa"""
+    excel_path = os.path.join(tmp, f"{name}.xlsx")
+    image_path = os.path.join(tmp, f"{name}.png")
+    workbook = build_ficha_workbook(excel_path, seed=args.seed, **params)
+    recipients = [f"destinatario{i}@teste.com" for i in range(args.recipients)]
+    stages = {}
+
+    stages["render_html"], (raw_html, _) = measure(lambda: render_table_html(excel_path), args.runs)
+    stages["render_html"]["bytes"] = len(raw_html)
+
+    stages["inline_css"], table_html = measure(lambda: format_table_html(raw_html), args.runs)
+    stages["inline_css"]["bytes"] = len(table_html)
+
+    stages["extract_stream"], extraction = measure(lambda: extract_excel_data(excel_path, method="openpyxl"), args.runs)
+    assert extraction["success"], extraction
+    stages["extract_stream"]["bytes"] = len(extraction["clipboardData"])
+
+    stages["render_image"], _ = measure(lambda: render_sheet_image(excel_path, output_path=image_path), args.runs)
+    stages["render_image"]["bytes"] = os.path.getsize(image_path)
+
+    stages["load_image"], image = measure(lambda: load_inline_image(image_path), args.runs)
+    stages["load_image"]["bytes"] = image.size
+
+    stages["body"], body_html = measure(lambda: build_report_body(table_html, image.img_tag(), "Ficha de entrada"),
+                                        args.runs)
+    stages["body"]["bytes"] = len(body_html)
+
+    def build_payloads():
+        messages = [build_message("Ficha de entrada", body_html, [r], attachments=[image.attachment()])
+                    for r in recipients]
+        return messages, sum(len(json.dumps(m, ensure_ascii=False).encode('utf-8')) for m in messages)
+
+    stages["payload"], (messages, payload_bytes) = measure(build_payloads, args.runs)
+    stages["payload"]["bytes"] = payload_bytes
+
+    with MockGraphServer(latency=args.latency) as graph:
+        os.environ.update({
+            "GRAPH_CLIENT_ID": "mock", "GRAPH_CLIENT_SECRET": "mock", "EMAIL_SENDER": "remetente@teste.com",
+            "GRAPH_TOKEN_URL": graph.token_url, "GRAPH_URL": graph.graph_url,
+            "GRAPH_TOKEN_CACHE_FILE": os.path.join(tmp, f"token-{name}.json")
+        })
+        config = get_graph_config()
+
+        def send():
+            client = GraphMailClient(config, token_provider=TokenProvider(config))
+            try:
+                results = client.send_many(messages)
+            finally:
+                client.close()
+            assert all(r["success"] for r in results), results
+            return results
+
+        stages["send"], _ = measure(send, args.runs)
+        stages["send"]["bytes"] = payload_bytes
+
+        jobs = [{"excel_path": excel_path, "image_path": image_path, "recipient": r,
+                 "subject": "Ficha de entrada", "message": "Ficha de entrada"} for r in recipients]
+
+        def end_to_end():
+            with job_metrics("run_complete_process_batch") as metrics:
+                result = run_complete_process_batch(jobs)
+            assert result["success"], result
+            return metrics
+
+        stages["end_to_end"], metrics = measure(end_to_end, args.runs)
+        stages["end_to_end"]["spans"] = span_totals(metrics)
+        mock = graph.stats()
+        mock.pop("batchSizes", None)
+
+    return {"name": name, "workbook": workbook, "recipients": args.recipients, "stages": stages, "mock": mock}
+
+
+def environment():
+    """Versões e máquina, para saber se duas rodadas são comparáveis"""
+    from importlib import metadata
+
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVICES_DIR, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "gitCommit": commit, "packages": versions}
+
+
+def compare(current, baseline, threshold, min_seconds):
+    """Etapas (caso + etapa presentes nos dois resultados) com a mediana de agora comparada à anterior"""
+    previous = {(case["name"], stage): stats for case in baseline.get("cases", [])
+                for stage, stats in case["stages"].items()}
+    comparison = []
+    for case in current["cases"]:
+        for stage, stats in case["stages"].items():
+            before = previous.get((case["name"], stage))
+            if not before:
+                continue
+            seconds, baseline_seconds = stats["medianSeconds"], before["medianSeconds"]
+            ratio = seconds / baseline_seconds if baseline_seconds else None
+            # Etapas muito rápidas oscilam mais que o limite: exige também uma diferença absoluta mínima
+            regression = (ratio is not None and ratio > threshold and seconds - baseline_seconds > min_seconds)
+            comparison.append({"case": case["name"], "stage": stage, "baselineSeconds": baseline_seconds,
+                               "seconds": seconds, "ratio": round(ratio, 3) if ratio else None,
+                               "regression": regression})
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do caminho da ficha (render, HTML, corpo, payload, envio)")
+    parser.add_argument('--sizes', nargs='+', choices=sorted(SIZES), default=["small", "medium"],
+                        help="tamanhos pré-definidos da ficha")
+    parser.add_argument('--rows', type=int, help="ficha personalizada: linhas (substitui --sizes)")
+    parser.add_argument('--cols', type=int, default=12)
+    parser.add_argument('--styles', type=int, default=4, help="ficha personalizada: atributos de estilo por célula (0 a 5)")
+    parser.add_argument('--merged', type=int, default=12, help="ficha personalizada: regiões mescladas")
+    parser.add_argument('--images', type=int, default=1, help="ficha personalizada: imagens na planilha")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--runs', type=int, default=3, help="rodadas por etapa (depois do aquecimento)")
+    parser.add_argument('--recipients', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.02, help="latência simulada do mock por requisição (s)")
+    parser.add_argument('--output', help="grava o JSON neste arquivo")
+    parser.add_argument('--compare', help="JSON de uma rodada anterior para comparar")
+    parser.add_argument('--threshold', type=float, default=1.25, help="razão de tempo considerada regressão")
+    parser.add_argument('--min-seconds', type=float, default=0.005, help="diferença mínima para contar como regressão")
+    args = parser.parse_args()
+
+    if args.rows:
+        cases = {"custom": {"rows": args.rows, "cols": args.cols, "styles": args.styles,
+                            "merged": args.merged, "images": args.images}}
+    else:
+        cases = {name: SIZES[name] for name in args.sizes}
+
+    result = {
+        "suite": "pipeline",
+        "version": RESULT_VERSION,
+        "createdAt": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "environment": environment(),
+        "config": {"runs": args.runs, "recipients": args.recipients, "latency": args.latency, "seed": args.seed},
+        "cases": []
+    }
+    # Os logs dos serviços vão para o stderr; o stdout leva só o JSON
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(sys.stderr):
+        for name, params in cases.items():
+            print(f"INFO: Caso {name}: {params}")
+            result["cases"].append(run_case(name, params, args, tmp))
+
+    failed = False
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("version") != RESULT_VERSION:
+            print(f"WARN: Resultado anterior na versão {baseline.get('version')} (atual {RESULT_VERSION})",
+                  file=sys.stderr)
+        result["comparison"] = compare(result, baseline, args.threshold, args.min_seconds)
+        regressions = [item for item in result["comparison"] if item["regression"]]
+        for item in regressions:
+            print(f"ERRO regressão em {item['case']}/{item['stage']}: {item['baselineSeconds']}s -> "
+                  f"{item['seconds']}s ({item['ratio']}x)", file=sys.stderr)
+        failed = bool(regressions)
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    print(output)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Compara o renderizador vetorizado (sheet_raster_renderer) com o laço célula a
+célula do método 5 original, numa planilha sintética de 200 linhas x 30 colunas
+com preenchimentos, bordas e texto.
+
+    python -m benchmarks.raster_renderer_benchmark
+    python -m benchmarks.raster_renderer_benchmark --rows 500 --cols 30 --repeat 3
+"""
+import os
+import json
+import argparse
+import tempfile
+
+from PIL import Image, ImageDraw, ImageFont
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+import sheet_raster_renderer
+from benchmarks import best_of
+from benchmarks.synthetic_workbook import build_grid_workbook
+
+
+def legacy_render(ws):
+    """Laço do método 5 original: ws.cell duas vezes por célula, um retângulo de grade por célula, fonte por célula"""
+    col_widths = {}
+    for col in range(1, ws.max_column + 1):
+        col_dim = ws.column_dimensions[get_column_letter(col)]
+        col_widths[col] = int(col_dim.width * 7.5) if col_dim.width else 64
+    row_heights = {}
+    for row in range(1, ws.max_row + 1):
+        row_dim = ws.row_dimensions[row]
+        row_heights[row] = int(row_dim.height * 1.33) if row_dim.height else 20
+
+    img = Image.new('RGB', (sum(col_widths.values()), sum(row_heights.values())), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+
+    current_y = 0
+    for row in range(1, ws.max_row + 1):
+        current_x = 0
+        for col in range(1, ws.max_column + 1):
+            draw.rectangle([current_x, current_y, current_x + col_widths[col], current_y + row_heights[row]],
+                           outline=(240, 240, 240), width=1)
+            current_x += col_widths[col]
+        current_y += row_heights[row]
+
+    current_y = 0
+    for row in range(1, ws.max_row + 1):
+        current_x = 0
+        for col in range(1, ws.max_column + 1):
+            cell = ws.cell(row=row, column=col)
+            x1, y1 = current_x, current_y
+            x2, y2 = current_x + col_widths[col], current_y + row_heights[row]
+            if cell.fill and hasattr(cell.fill, 'start_color') and cell.fill.start_color.rgb:
+                draw.rectangle([x1, y1, x2, y2], fill=_hex_to_rgb(cell.fill.start_color.rgb))
+            if cell.border:
+                _draw_precise_border(draw, x1, y1, x2, y2, cell.border)
+            if cell.value is not None:
+                _draw_cell_text(draw, cell, x1, y1, x2, y2)
+            current_x += col_widths[col]
+        current_y += row_heights[row]
+    return img
+
+
+def _hex_to_rgb(hex_color):
+    if isinstance(hex_color, str) and len(hex_color) >= 6:
+        try:
+            return tuple(int(hex_color[-6:][i:i + 2], 16) for i in (0, 2, 4))
+        except ValueError:
+            pass
+    return (255, 255, 255)
+
+
+def _draw_precise_border(draw, x1, y1, x2, y2, border):
+    for side, line in ((border.left, [(x1, y1), (x1, y2)]), (border.right, [(x2, y1), (x2, y2)]),
+                       (border.top, [(x1, y1), (x2, y1)]), (border.bottom, [(x1, y2), (x2, y2)])):
+        if side and side.style:
+            draw.line(line, fill=(0, 0, 0), width=2 if side.style == 'thick' else 1)
+
+
+def _draw_cell_text(draw, cell, x1, y1, x2, y2):
+    text = str(cell.value)
+    font_size = int(cell.font.size) if cell.font.size else 11
+    font = _get_system_font(font_size)
+    bbox = draw.textbbox((0, 0), text, font=font)
+    text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    if cell.alignment and cell.alignment.horizontal == 'center':
+        text_x = x1 + (x2 - x1 - text_width) // 2
+    else:
+        text_x = x1 + 3
+    if cell.alignment and cell.alignment.vertical == 'center':
+        text_y = y1 + (y2 - y1 - text_height) // 2
+    else:
+        text_y = y1 + 2
+    draw.text((text_x, text_y), text, fill=(0, 0, 0), font=font)
+
+
+def _get_system_font(size):
+    font_path = "C:/Windows/Fonts/arial.ttf" if os.name == 'nt' else "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+    if os.path.exists(font_path):
+        return ImageFont.truetype(font_path, size)
+    return ImageFont.load_default()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do renderizador de planilha em imagem")
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--cols', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ficha.xlsx')
+        build_grid_workbook(path, args.rows, args.cols)
+        ws = load_workbook(path).active
+
+        legacy = best_of(lambda: legacy_render(ws), args.repeat)
+        sheet_raster_renderer.get_font.cache_clear()
+        sheet_raster_renderer.text_mask.cache_clear()
+        sheet_raster_renderer.get_glyph_atlas.cache_clear()
+        # Primeira renderização com os caches de fonte/texto vazios (processo novo)
+        cold = best_of(lambda: sheet_raster_renderer.render_sheet(ws), 1)
+        vectorized = best_of(lambda: sheet_raster_renderer.render_sheet(ws), args.repeat)
+
+        image = sheet_raster_renderer.render_sheet(ws)
+        result = {
+            "rows": args.rows,
+            "cols": args.cols,
+            "imageSize": list(image.size),
+            "legacySeconds": round(legacy, 4),
+            "vectorizedColdSeconds": round(cold, 4),
+            "vectorizedSeconds": round(vectorized, 4),
+            "speedupCold": round(legacy / cold, 1),
+            "speedup": round(legacy / vectorized, 1)
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Envio do relatório com as etapas em sequência (extrair a tabela, ler a imagem,
+obter o token, enviar) contra as etapas sobrepostas de run_complete_process
+(send_stages), no mock do Graph.
+
+Cada rodada usa um mock novo e um cache de token vazio, para que o token seja
+de fato pedido; a latência do mock vale para o token e para o envio. O cache de
+HTML fica desligado, então a tabela é extraída (openpyxl) em todas as rodadas.
+
+    python -m benchmarks.send_stages_benchmark
+    python -m benchmarks.send_stages_benchmark --rows 2000 --latency 0.5 --runs 5
+"""
+import os
+import json
+import time
+import argparse
+import statistics
+import tempfile
+
+os.environ["HTML_CACHE_ENABLED"] = "0"
+
+from benchmarks.mock_graph_server import MockGraphServer
+from benchmarks.synthetic_workbook import build_grid_workbook
+from enviar_relatorio_completo import (build_report_body, fetch_token, get_formatted_html_from_excel,
+                                       load_report_image, run_complete_process)
+from graph_mail import GraphMailClient, build_message
+from service_env import get_graph_config
+from sheet_raster_renderer import render_sheet_image
+
+
+def run_sequential(excel_path, image_path, recipient):
+    """Forma anterior: cada etapa espera a anterior terminar"""
+    timings = {}
+    started = time.perf_counter()
+    config = get_graph_config()
+    stages = (
+        ("extract", lambda: get_formatted_html_from_excel(excel_path, method="openpyxl")),
+        ("image", lambda: load_report_image(image_path)),
+        ("token", lambda: fetch_token(config))
+    )
+    values = {}
+    for name, func in stages:
+        stage_started = time.perf_counter()
+        values[name] = func()
+        timings[name] = round(time.perf_counter() - stage_started, 3)
+
+    body_started = time.perf_counter()
+    body_html = build_report_body(values["extract"], values["image"].img_tag(), "Ficha de entrada")
+    timings["body"] = round(time.perf_counter() - body_started, 3)
+    send_started = time.perf_counter()
+    client = GraphMailClient(config, max_workers=1)
+    try:
+        result = client.send_mail(build_message("Ficha", body_html, [recipient],
+                                                attachments=[values["image"].attachment()]))
+    finally:
+        client.close()
+    assert result["success"], result
+    timings["send"] = round(time.perf_counter() - send_started, 3)
+    timings["total"] = round(time.perf_counter() - started, 3)
+    return timings
+
+
+def run_overlapped(excel_path, image_path, recipient):
+    return run_complete_process(excel_path, image_path, recipient, "Ficha", "Ficha de entrada")["timings"]
+
+
+def run(mode, excel_path, image_path, latency, tmp, index):
+    with MockGraphServer(latency=latency) as graph:
+        os.environ.update({
+            "GRAPH_CLIENT_ID": "mock", "GRAPH_CLIENT_SECRET": "mock", "EMAIL_SENDER": "remetente@teste.com",
+            "GRAPH_TOKEN_URL": graph.token_url, "GRAPH_URL": graph.graph_url,
+            "GRAPH_TOKEN_CACHE_FILE": os.path.join(tmp, f"token-{mode}-{index}.json")
+        })
+        func = run_sequential if mode == "sequential" else run_overlapped
+        return func(excel_path, image_path, "destinatario@teste.com")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Etapas do envio em sequência x sobrepostas")
+    parser.add_argument('--rows', type=int, default=500, help="linhas da planilha sintética")
+    parser.add_argument('--latency', type=float, default=0.3, help="latência simulada por requisição (s)")
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ["EXCEL_HTML_EXTRACTOR"] = "openpyxl"
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, 'ficha.xlsx')
+        image_path = os.path.join(tmp, 'ficha.png')
+        build_grid_workbook(excel_path, args.rows, 12)
+        render_sheet_image(excel_path, output_path=image_path)
+
+        for mode in ("sequential", "overlapped"):
+            runs = [run(mode, excel_path, image_path, args.latency, tmp, i) for i in range(args.runs)]
+            totals = [timings["total"] for timings in runs]
+            results.append({
+                "mode": mode,
+                "rows": args.rows,
+                "latency": args.latency,
+                "medianTotalSeconds": statistics.median(totals),
+                "runs": runs
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
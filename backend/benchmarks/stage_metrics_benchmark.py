@@ -0,0 +1,75 @@
+"""
+Custo da instrumentação (stage_metrics) na extração do HTML pelo openpyxl.
+
+Mede extract_excel_data numa planilha sintética fora de um job (spans sem
+efeito), dentro de job_metrics (tempo e tamanho por etapa) e com
+METRICS_MEMORY=1 (pico de memória por etapa via tracemalloc). O cache de HTML
+fica desligado para que a planilha seja extraída em todas as rodadas.
+
+    python -m benchmarks.stage_metrics_benchmark
+    python -m benchmarks.stage_metrics_benchmark --rows 2000 --runs 7
+"""
+import os
+import json
+import time
+import argparse
+import statistics
+import tempfile
+
+os.environ["HTML_CACHE_ENABLED"] = "0"
+
+from benchmarks.synthetic_workbook import build_grid_workbook
+from excel_copy_paste_new import extract_excel_data
+from stage_metrics import job_metrics
+
+MODES = ("off", "spans", "memory")
+
+
+def run(mode, excel_path):
+    os.environ["METRICS_MEMORY"] = "1" if mode == "memory" else "0"
+    started = time.perf_counter()
+    if mode == "off":
+        result, metrics = extract_excel_data(excel_path, method="openpyxl"), None
+    else:
+        with job_metrics("extract") as metrics:
+            result = extract_excel_data(excel_path, method="openpyxl")
+    assert result["success"], result
+    return time.perf_counter() - started, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo dos spans e do tracemalloc na extração")
+    parser.add_argument('--rows', type=int, default=500, help="linhas da planilha sintética")
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, 'ficha.xlsx')
+        build_grid_workbook(excel_path, args.rows, 12)
+        run("off", excel_path)  # aquece imports e cache de fontes
+
+        # Modos intercalados a cada rodada, para que a variação da máquina afete todos igual
+        runs = {mode: [] for mode in MODES}
+        for _ in range(args.runs):
+            for mode in MODES:
+                runs[mode].append(run(mode, excel_path))
+
+        baseline = None
+        for mode in MODES:
+            median = statistics.median(seconds for seconds, _ in runs[mode])
+            baseline = baseline or median
+            metrics = runs[mode][-1][1]
+            results.append({
+                "mode": mode,
+                "rows": args.rows,
+                "medianSeconds": round(median, 4),
+                "overheadPercent": round((median / baseline - 1) * 100, 1),
+                "spans": [{key: span[key] for key in ("name", "seconds", "peakBytes") if key in span}
+                          for span in metrics["spans"]] if metrics else []
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
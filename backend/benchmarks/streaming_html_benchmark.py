@@ -0,0 +1,122 @@
+"""
+Pico de memória da extração de HTML montando a tabela inteira (render_table_html
++ inline_css) contra a versão em streaming (iter_table_html + iter_inline_table),
+para ranges de A1:L100 a A1:L100000.
+
+Cada caso roda num processo novo e mede o pico do tracemalloc (objetos Python)
+e o pico de RSS do processo (inclui a árvore do lxml, que o tracemalloc não vê).
+Também confere que as duas formas geram exatamente o mesmo HTML.
+
+    python -m benchmarks.streaming_html_benchmark
+    python -m benchmarks.streaming_html_benchmark --rows 100 10000 100000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import resource
+import subprocess
+import tracemalloc
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Border, Font, PatternFill, Side
+
+from css_inliner import inline_css, iter_inline_table
+from openpyxl_html_renderer import iter_table_html, render_table_html
+
+# Os mesmos estilos de excel_copy_paste_new.TABLE_STYLES
+TABLE_STYLES = {
+    "table_style": 'border-collapse: collapse; font-family: Arial, sans-serif; font-size: 11px; width: 100%; margin: 10px 0;',
+    "header_style": 'border: 1px solid #666; padding: 8px; text-align: center; background-color: #f0f0f0; font-weight: bold;',
+    "body_style": 'border: 1px solid #ccc; padding: 6px; vertical-align: top;'
+}
+
+
+def build_large_workbook(path, rows, cols=12, seed=1):
+    """Planilha grande gravada em modo write_only (montá-la em memória seria o gargalo)"""
+    rnd = random.Random(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Ficha")
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    bold = Font(name='Calibri', size=11, bold=True)
+    zebra = PatternFill('solid', start_color='FFF2F2F2')
+    for row in range(1, rows + 1):
+        cells = []
+        for col in range(1, cols + 1):
+            if row == 1:
+                cell = WriteOnlyCell(ws, value=f"Campo {col}")
+                cell.font = bold
+            else:
+                cell = WriteOnlyCell(ws, value=rnd.choice([rnd.randint(0, 100000), "Sim", "Não", f"Item {row}"]))
+                if row % 2 == 0:
+                    cell.fill = zebra
+            cell.border = border
+            cells.append(cell)
+        ws.append(cells)
+    wb.save(path)
+
+
+def run_case(mode, path, output_path):
+    """Executa um caso no processo atual e devolve as medidas"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = 0
+    with open(output_path, 'w', encoding='utf-8') as out:
+        if mode == "materialized":
+            raw_html, _ = render_table_html(path)
+            html = inline_css(raw_html, inline_element_rules=False, **TABLE_STYLES)["html"]
+            out.write(html)
+            size = len(html)
+        else:
+            for chunk in iter_inline_table(iter_table_html(path), **TABLE_STYLES):
+                out.write(chunk)
+                size += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": round(elapsed, 2),
+        "htmlChars": size,
+        "tracemallocPeakMB": round(peak / 1024 / 1024, 1),
+        # ru_maxrss em KB no Linux
+        "peakRssMB": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pico de memória da extração de HTML em streaming")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 10000, 100000])
+    parser.add_argument('--case', nargs=3, metavar=('MODO', 'PLANILHA', 'SAIDA'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(*args.case)))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f"ficha_{rows}.xlsx")
+            build_large_workbook(path, rows)
+            result = {"range": f"A1:L{rows}"}
+            outputs = {}
+            for mode in ("materialized", "streaming"):
+                outputs[mode] = os.path.join(tmp, f"{mode}_{rows}.html")
+                completed = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.streaming_html_benchmark', '--case', mode, path, outputs[mode]],
+                    capture_output=True, text=True, check=True)
+                result[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+            with open(outputs["materialized"], 'rb') as a, open(outputs["streaming"], 'rb') as b:
+                result["identicalHtml"] = a.read() == b.read()
+            results.append(result)
+            print(json.dumps(result), file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
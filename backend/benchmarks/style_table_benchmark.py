@@ -0,0 +1,63 @@
+"""
+Memória por célula do modelo colunar com estilos internados (workbook_loader +
+style_table) contra as células do openpyxl em modo completo, e quantos estilos
+distintos sobram depois da deduplicação.
+
+    python -m benchmarks.style_table_benchmark
+    python -m benchmarks.style_table_benchmark --rows 5000 --cols 20
+"""
+import os
+import gc
+import json
+import argparse
+import tempfile
+import tracemalloc
+
+from openpyxl import load_workbook
+
+from workbook_loader import load_sheet
+from benchmarks.synthetic_workbook import build_grid_workbook
+
+
+def retained_bytes(fn):
+    """Memória que continua alocada enquanto o resultado de fn está vivo"""
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da tabela de estilos e do modelo colunar")
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--cols', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ficha.xlsx')
+        build_grid_workbook(path, args.rows, args.cols)
+
+        wb, workbook_bytes = retained_bytes(lambda: load_workbook(path))
+        cells = len(wb.active._cells)
+        del wb
+
+        sheet, sheet_bytes = retained_bytes(lambda: load_sheet(path))
+        # Os valores são os mesmos objetos nos dois modelos; o que muda é o que fica em volta deles
+        result = {
+            "cells": cells,
+            "storedCells": len(sheet),
+            "distinctStyles": len(sheet.styles),
+            "openpyxlBytesPerCell": round(workbook_bytes / cells, 1),
+            "columnarBytesPerCell": round(sheet_bytes / max(len(sheet), 1), 1),
+            "openpyxlMB": round(workbook_bytes / 1024 / 1024, 1),
+            "columnarMB": round(sheet_bytes / 1024 / 1024, 1),
+            "reduction": round(workbook_bytes / sheet_bytes, 1)
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Gerador de planilhas sintéticas no formato da ficha de entrada do cliente.
+
+A ficha real tem um título mesclado no topo, blocos de "campo: valor" separados
+por faixas de seção mescladas em toda a largura, a logo ancorada perto de C3 e
+células com bordas, fontes, preenchimentos e formatos variados. Aqui cada um
+desses itens é configurável, para medir como o render e o envio escalam com o
+tamanho e a complexidade da planilha (sem usar fichas de clientes reais).
+
+    build_ficha_workbook("ficha.xlsx", rows=500, cols=12, styles=5, merged=20, images=2)
+
+    python -m benchmarks.synthetic_workbook ficha.xlsx --rows 500 --styles 5 --merged 20 --images 2
+
+Parâmetros:
+    rows     linhas da ficha (incluindo título e seções)
+    cols     colunas (a extração de HTML usa até a coluna L)
+    styles   atributos de estilo por célula de dado, de 0 a 5, nesta ordem:
+             borda, fonte, preenchimento, alinhamento e formato de número
+    merged   regiões mescladas: o título e as faixas de seção, distribuídas pela ficha
+    images   imagens PNG ancoradas na planilha (a primeira em C3, como a logo)
+
+Para os benchmarks dos renderizadores há também uma grade mais simples
+(build_grid_workbook): cabeçalho e primeira coluna preenchidos, bordas, linhas
+zebradas e, por padrão, algumas mesclas e uma linha e uma coluna ocultas.
+
+    build_grid_workbook("grade.xlsx", rows=500, cols=12)
+    build_grid_workbook("grade.xlsx", 5, 4, merged=["B3:C3"], hidden_cols=["B"], value=lambda r, c: r * 10 + c)
+"""
+import io
+import os
+import random
+import argparse
+from datetime import date, timedelta
+
+from openpyxl import Workbook
+from openpyxl.drawing.image import Image as OpenpyxlImage
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from PIL import Image, ImageDraw
+
+# Ordem em que os atributos são ligados pelo parâmetro styles
+STYLE_ATTRIBUTES = ("border", "font", "fill", "alignment", "number_format")
+
+FONT_COLORS = ("FF000000", "FF1F4E79", "FF7F6000", "FF375623", "FFC00000", "FF404040")
+FILL_COLORS = ("FFF2F2F2", "FFDDEBF7", "FFFFF2CC", "FFE2EFDA", "FFFCE4D6")
+NUMBER_FORMATS = ("General", "#,##0", "#,##0.00", "0%", "dd/mm/yyyy", '"R$" #,##0.00')
+FIELD_NAMES = ("Razão social", "CNPJ", "Grupo", "Responsável", "E-mail", "Telefone", "Regime tributário",
+               "Início do contrato", "Honorários", "Filiais", "Sistema contábil", "Observações")
+
+
+def _logo_png(width, height, seed):
+    """PNG pequeno parecido com uma logo (faixas coloridas e um texto)"""
+    rnd = random.Random(seed)
+    image = Image.new('RGB', (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for i in range(6):
+        color = tuple(rnd.randint(0, 255) for _ in range(3))
+        x = i * width // 6
+        draw.rectangle([x, 0, x + width // 6, height // 2], fill=color)
+    draw.text((8, height // 2 + 4), "FluxoCliente", fill=(31, 78, 121))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    buffer.seek(0)
+    return buffer
+
+
+def _section_rows(rows, merged):
+    """Linhas das faixas mescladas: o título na linha 1 e as seções espalhadas pela ficha"""
+    if merged <= 0:
+        return []
+    if merged == 1 or rows < 3:
+        return [1]
+    step = (rows - 2) / (merged - 1)
+    section_rows = {1}
+    for i in range(1, merged):
+        section_rows.add(min(rows, 2 + int(round(i * step))))
+    return sorted(section_rows)
+
+
+def _data_value(rnd, col, row, number_format):
+    """Valor coerente com o formato da célula (datas em células de data, etc.)"""
+    if number_format == "dd/mm/yyyy":
+        return date(2024, 1, 1) + timedelta(days=rnd.randint(0, 700))
+    if number_format == "0%":
+        return round(rnd.random(), 2)
+    if number_format != "General":
+        return round(rnd.random() * 100000, 2)
+    return rnd.choice([
+        rnd.randint(0, 100000),
+        f"Valor {row}-{col}",
+        "Sim",
+        "Não",
+        None,
+        "Texto mais longo que ocupa a célula inteira e\nquebra em duas linhas"
+    ])
+
+
+def _grid_merges(rows, cols, count):
+    """Mesclas de 2 linhas x 3 colunas (B:D) espalhadas pela grade, sem sobreposição"""
+    if cols < 4 or rows < 4:
+        return []
+    step = max(3, (rows - 1) // (count + 1))
+    return [f"B{row}:D{row + 1}" for row in range(1 + step, rows, step)[:count] if row + 1 <= rows]
+
+
+def _spread(total, count, first=2):
+    """count posições espalhadas entre first e total (nunca o cabeçalho)"""
+    if total < first or count <= 0:
+        return []
+    step = max(1, (total - first + 1) // (count + 1))
+    return sorted({min(total, first + step * (i + 1) - 1) for i in range(count)})
+
+
+def build_grid_workbook(path, rows, cols, seed=1, merged=4, hidden_rows=1, hidden_cols=1, value=None,
+                        merged_value=None):
+    """
+    Grava uma grade parecida com uma ficha em path.
+
+    Args:
+        merged: Endereços das mesclas ("B3:C4"...) ou quantas mesclas 2x3 espalhar pela grade
+        hidden_rows: Números das linhas ocultas ou quantas ocultar (nunca a linha 1)
+        hidden_cols: Letras das colunas ocultas ou quantas ocultar (nunca a coluna A)
+        value: Função (linha, coluna) -> valor; sem ela, rótulos no cabeçalho e valores aleatórios
+        merged_value: Valor gravado no canto de cada mescla
+    """
+    rnd = random.Random(seed)
+    if isinstance(merged, int):
+        merged = _grid_merges(rows, cols, merged)
+    if isinstance(hidden_rows, int):
+        hidden_rows = _spread(rows, hidden_rows)
+    if isinstance(hidden_cols, int):
+        hidden_cols = [get_column_letter(col) for col in _spread(cols, hidden_cols, first=3)]
+
+    wb = Workbook()
+    ws = wb.active
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    header_fill = PatternFill('solid', start_color='FFADDBDC')
+    zebra_fill = PatternFill('solid', start_color='FFF2F2F2')
+    for col in range(1, cols + 1):
+        ws.column_dimensions[get_column_letter(col)].width = rnd.choice([8, 10, 12, 18])
+    for row in range(1, rows + 1):
+        ws.row_dimensions[row].height = 15
+        for col in range(1, cols + 1):
+            cell = ws.cell(row=row, column=col)
+            if value is not None:
+                cell.value = value(row, col)
+            elif row == 1 or col == 1:
+                cell.value = f"Campo {row}-{col}"
+            else:
+                cell.value = rnd.choice([rnd.randint(0, 100000), round(rnd.random() * 1000, 2), "Sim", "Não", None])
+            if row == 1 or col == 1:
+                cell.fill = header_fill
+                cell.font = Font(name='Calibri', size=11, bold=True)
+                cell.alignment = Alignment(horizontal='center', vertical='center')
+            else:
+                cell.font = Font(name='Calibri', size=rnd.choice([10, 11]))
+                if row % 2 == 0:
+                    cell.fill = zebra_fill
+            cell.border = border
+
+    for ref in merged:
+        if merged_value is not None:
+            ws[ref.split(':')[0]] = merged_value
+        ws.merge_cells(ref)
+    for row in hidden_rows:
+        ws.row_dimensions[row].hidden = True
+    for letter in hidden_cols:
+        ws.column_dimensions[letter].hidden = True
+    wb.save(path)
+    return {"rows": rows, "cols": cols, "merged": list(merged), "hiddenRows": list(hidden_rows),
+            "hiddenCols": list(hidden_cols), "bytes": os.path.getsize(path)}
+
+
+def build_ficha_workbook(path, rows=200, cols=12, styles=4, merged=8, images=1, seed=1):
+    """
+    Grava uma ficha sintética em path.
+
+    Returns:
+        Dict com os parâmetros usados e o tamanho do arquivo ("bytes")
+    """
+    rnd = random.Random(seed)
+    styles = max(0, min(styles, len(STYLE_ATTRIBUTES)))
+    enabled = set(STYLE_ATTRIBUTES[:styles])
+    last_col = get_column_letter(cols)
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Ficha"
+    thin = Side(style='thin', color='FF808080')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    label_font = Font(name='Calibri', size=11, bold=True)
+    label_fill = PatternFill('solid', start_color='FFADDBDC')
+
+    for col in range(1, cols + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 24 if col == 1 else rnd.choice([10, 12, 14, 18])
+
+    section_rows = _section_rows(rows, merged)
+    for row in section_rows:
+        cell = ws.cell(row=row, column=1, value="FICHA DE ENTRADA DO CLIENTE" if row == 1 else f"Seção {row}")
+        cell.font = Font(name='Calibri', size=14 if row == 1 else 12, bold=True, color='FFFFFFFF')
+        cell.fill = PatternFill('solid', start_color='FF1F4E79')
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+        ws.row_dimensions[row].height = 24 if row == 1 else 18
+        if cols > 1:
+            ws.merge_cells(f"A{row}:{last_col}{row}")
+    section_rows = set(section_rows)
+
+    for row in range(1, rows + 1):
+        if row in section_rows:
+            continue
+        ws.row_dimensions[row].height = 15
+        # Primeira coluna: nome do campo, como na ficha
+        label = ws.cell(row=row, column=1, value=FIELD_NAMES[row % len(FIELD_NAMES)])
+        label.font = label_font
+        label.fill = label_fill
+        label.border = border
+        for col in range(2, cols + 1):
+            number_format = rnd.choice(NUMBER_FORMATS) if "number_format" in enabled else "General"
+            cell = ws.cell(row=row, column=col, value=_data_value(rnd, col, row, number_format))
+            if "border" in enabled:
+                cell.border = border
+            if "font" in enabled:
+                cell.font = Font(name='Calibri', size=rnd.choice([10, 11]), bold=rnd.random() < 0.1,
+                                 color=rnd.choice(FONT_COLORS))
+            if "fill" in enabled and rnd.random() < 0.4:
+                cell.fill = PatternFill('solid', start_color=rnd.choice(FILL_COLORS))
+            if "alignment" in enabled:
+                cell.alignment = Alignment(horizontal=rnd.choice(['left', 'center', 'right']), vertical='center',
+                                           wrap_text=isinstance(cell.value, str) and '\n' in cell.value)
+            if number_format != "General":
+                cell.number_format = number_format
+
+    for index in range(images):
+        image = OpenpyxlImage(_logo_png(160, 60, seed + index))
+        anchor_row = 3 + index * max(1, rows // max(images, 1))
+        ws.add_image(image, f"C{min(anchor_row, max(rows, 3))}")
+
+    wb.save(path)
+    return {"rows": rows, "cols": cols, "styles": styles, "merged": len(section_rows), "images": images,
+            "seed": seed, "bytes": os.path.getsize(path)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera uma ficha sintética (.xlsx)")
+    parser.add_argument('output', help="arquivo .xlsx de saída")
+    parser.add_argument('--rows', type=int, default=200)
+    parser.add_argument('--cols', type=int, default=12)
+    parser.add_argument('--styles', type=int, default=4, help="atributos de estilo por célula (0 a 5)")
+    parser.add_argument('--merged', type=int, default=8, help="regiões mescladas (título + seções)")
+    parser.add_argument('--images', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    info = build_ficha_workbook(args.output, args.rows, args.cols, args.styles, args.merged, args.images, args.seed)
+    print(f"INFO: Ficha sintética gravada em {args.output}: {info}")
+
+
+if __name__ == "__main__":
+    main()
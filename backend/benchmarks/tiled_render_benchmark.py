@@ -0,0 +1,87 @@
+"""
+Pico de memória e tempo da renderização em faixas (sheet_raster_renderer) numa
+planilha alta, comparando com a pintura da imagem inteira de uma vez.
+
+Confere também que o PNG gravado em streaming é idêntico, pixel a pixel, à
+imagem inteira.
+
+    python -m benchmarks.tiled_render_benchmark --rows 5000 --tile-height 1024
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+from openpyxl import load_workbook
+
+import sheet_raster_renderer
+from benchmarks.synthetic_workbook import build_grid_workbook
+
+# A imagem inteira é relida só para comparar com a gravada em faixas
+Image.MAX_IMAGE_PIXELS = None
+
+
+def measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da renderização em faixas")
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--cols', type=int, default=20)
+    parser.add_argument('--tile-height', type=int, default=1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ficha.xlsx')
+        build_grid_workbook(path, args.rows, args.cols)
+        ws = load_workbook(path).active
+
+        # Fora da medição: a leitura da planilha é igual nos dois modos
+        grid = sheet_raster_renderer.load_sheet_grid(ws)
+        sheet_raster_renderer.paint_grid(grid, 0, min(50, args.rows))  # aquece o cache de fontes
+
+        full_path = os.path.join(tmp, 'inteira.png')
+        _, full_seconds, full_peak = measure(lambda: sheet_raster_renderer.paint_grid(grid).save(full_path, 'PNG'))
+
+        tiled_path = os.path.join(tmp, 'faixas.png')
+
+        def tiled():
+            bands = grid.band_ranges(args.tile_height)
+            with sheet_raster_renderer.PngStreamWriter(tiled_path, grid.width, grid.height, dpi=300) as png:
+                for row_start, row_end in bands:
+                    png.write_rows(np.asarray(sheet_raster_renderer.paint_grid(grid, row_start, row_end)))
+            return len(bands)
+
+        bands, tiled_seconds, tiled_peak = measure(tiled)
+
+        with Image.open(full_path) as full, Image.open(tiled_path) as streamed:
+            identical = full.size == streamed.size and np.array_equal(np.asarray(full), np.asarray(streamed))
+
+        result = {
+            "rows": args.rows,
+            "imageSize": [grid.width, grid.height],
+            "bands": bands,
+            "fullSeconds": round(full_seconds, 3),
+            "fullPeakMB": round(full_peak / 1024 / 1024, 1),
+            "tiledSeconds": round(tiled_seconds, 3),
+            "tiledPeakMB": round(tiled_peak / 1024 / 1024, 1),
+            "fullPngBytes": os.path.getsize(full_path),
+            "tiledPngBytes": os.path.getsize(tiled_path),
+            "identical": identical
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
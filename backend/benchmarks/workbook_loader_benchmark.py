@@ -0,0 +1,96 @@
+"""
+Tempo e pico de memória da leitura da planilha para o renderizador: load_workbook
+em modo completo + iter_rows (antes) contra o workbook_loader em read_only, que
+percorre só a planilha alvo e guarda as células em colunas (depois).
+
+A planilha sintética tem abas extras, como os arquivos reais: o modo completo
+monta todas, o loader só a que vai ser renderizada.
+
+    python -m benchmarks.workbook_loader_benchmark
+    python -m benchmarks.workbook_loader_benchmark --rows 20000 --cols 20 --extra-sheets 2
+"""
+import os
+import json
+import argparse
+import tempfile
+import tracemalloc
+
+from openpyxl import load_workbook
+
+import sheet_raster_renderer
+from workbook_loader import load_sheet
+from benchmarks import best_of
+from benchmarks.synthetic_workbook import build_grid_workbook
+
+
+def legacy_load(path):
+    wb = load_workbook(path, data_only=False)
+    return sheet_raster_renderer.load_sheet_grid(wb.active)
+
+
+def streaming_load(path):
+    return sheet_raster_renderer.sheet_data_grid(load_sheet(path))
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def add_extra_sheets(path, count):
+    """Cópias da aba principal, que o renderizador não usa"""
+    if not count:
+        return
+    wb = load_workbook(path)
+    for _ in range(count):
+        wb.copy_worksheet(wb.active)
+    wb.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da leitura da planilha (modo completo x read_only)")
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--cols', type=int, default=20)
+    parser.add_argument('--extra-sheets', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ficha.xlsx')
+        build_grid_workbook(path, args.rows, args.cols)
+        add_extra_sheets(path, args.extra_sheets)
+
+        legacy_grid, streaming_grid = legacy_load(path), streaming_load(path)
+        same_model = (legacy_grid.width == streaming_grid.width and legacy_grid.height == streaming_grid.height
+                      and (legacy_grid.fill == streaming_grid.fill).all()
+                      and (legacy_grid.h_borders == streaming_grid.h_borders).all()
+                      and (legacy_grid.v_borders == streaming_grid.v_borders).all()
+                      and [t[:3] for t in legacy_grid.texts] == [t[:3] for t in streaming_grid.texts])
+        del legacy_grid, streaming_grid
+
+        legacy_seconds = best_of(lambda: legacy_load(path), args.repeat)
+        streaming_seconds = best_of(lambda: streaming_load(path), args.repeat)
+        legacy_peak = peak_memory(lambda: legacy_load(path))
+        streaming_peak = peak_memory(lambda: streaming_load(path))
+
+        result = {
+            "rows": args.rows,
+            "cols": args.cols,
+            "sheets": 1 + args.extra_sheets,
+            "fileBytes": os.path.getsize(path),
+            "legacySeconds": round(legacy_seconds, 3),
+            "streamingSeconds": round(streaming_seconds, 3),
+            "speedup": round(legacy_seconds / streaming_seconds, 1),
+            "legacyPeakMB": round(legacy_peak / 1024 / 1024, 1),
+            "streamingPeakMB": round(streaming_peak / 1024 / 1024, 1),
+            "memoryReduction": round(legacy_peak / streaming_peak, 1),
+            "sameModel": bool(same_model)
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 const express = require('express');
 const router = express.Router();
 const db = require('../database/connection');
+const pythonMetrics = require('../utils/python-metrics');
 
 // Health check simples
 router.get('/', async (req, res) => {
@@ -72,4 +73,12 @@ router.get('/detailed', async (req, res) => {
     }
 });
 
+// Tempo por etapa dos jobs Python (extração, imagem, token, envio) desde o início do servidor
+router.get('/python-metrics', (req, res) => {
+    res.json({
+        timestamp: new Date().toISOString(),
+        ...pythonMetrics.summary()
+    });
+});
+
 module.exports = router;
@@ -0,0 +1,285 @@
+"""
+Acesso serializado ao clipboard do Windows.
+
+O clipboard é global na máquina: dois jobs copiando ao mesmo tempo sobrescrevem
+os dados um do outro. O broker segura um lock global (thread + arquivo, para
+valer entre processos) durante todo o ciclo copiar/ler, e em vez de esperar um
+tempo fixo depois do copy() ele acompanha o número de sequência do clipboard e
+a disponibilidade dos formatos, continuando assim que os dados chegam.
+
+    broker = get_clipboard_broker()
+    with broker.session() as clipboard:
+        since = clipboard.sequence_number()
+        target_range.copy()
+        data = clipboard.wait_for_formats(["HTML Format"], since=since)
+
+Há um backend falso (FakeClipboardBackend) para testar o fluxo no Linux.
+
+Variáveis de ambiente:
+    CLIPBOARD_TIMEOUT     segundos aguardando os dados (padrão 15)
+    CLIPBOARD_LOCK_FILE   arquivo usado como lock global
+"""
+import os
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from file_lock import FileLock
+from stage_metrics import span
+
+CF_TEXT = 1
+CF_DIB = 8
+CF_UNICODETEXT = 13
+
+ERROR_ACCESS_DENIED = 5
+
+
+class ClipboardBusyError(RuntimeError):
+    """Outro processo está com o clipboard aberto"""
+
+
+class ClipboardTimeoutError(RuntimeError):
+    """Os dados esperados não apareceram no clipboard dentro do timeout"""
+
+
+def decode_clipboard_bytes(data):
+    """Decodifica dados do clipboard: utf-8, depois cp1252 (Windows-1252), depois latin-1"""
+    if not isinstance(data, bytes):
+        return str(data)
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        try:
+            return data.decode('cp1252')
+        except UnicodeDecodeError:
+            return data.decode('latin-1', errors='ignore')
+
+
+class Win32ClipboardBackend:
+    """Backend real, via pywin32"""
+
+    def __init__(self):
+        import win32clipboard
+        import pywintypes
+
+        self._clipboard = win32clipboard
+        self._error = pywintypes.error
+
+    def sequence_number(self):
+        return self._clipboard.GetClipboardSequenceNumber()
+
+    def register_format(self, name):
+        return self._clipboard.RegisterClipboardFormat(name)
+
+    def open(self):
+        try:
+            self._clipboard.OpenClipboard()
+        except self._error as e:
+            # Código do Windows em vez da mensagem, que muda com o idioma ("Acesso negado")
+            if e.winerror == ERROR_ACCESS_DENIED:
+                raise ClipboardBusyError(str(e))
+            raise
+
+    def close(self):
+        self._clipboard.CloseClipboard()
+
+    def empty(self):
+        self._clipboard.EmptyClipboard()
+
+    def is_format_available(self, fmt):
+        return bool(self._clipboard.IsClipboardFormatAvailable(fmt))
+
+    def get_data(self, fmt):
+        return self._clipboard.GetClipboardData(fmt)
+
+
+class FakeClipboardBackend:
+    """
+    Clipboard em memória para testes fora do Windows.
+
+    publish() grava dados (opcionalmente depois de um atraso, simulando o Excel)
+    e busy_opens faz as próximas aberturas falharem como se outro processo
+    estivesse com o clipboard.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._formats = {}
+        self._registered = {}
+        self._sequence = 0
+        self._is_open = False
+        self.busy_opens = 0
+        self.open_calls = 0
+
+    def publish(self, formats, delay=0):
+        """Substitui o conteúdo do clipboard por {formato: dados}"""
+        resolved = {self._resolve(fmt): data for fmt, data in formats.items()}
+
+        def _set():
+            with self._lock:
+                self._formats = resolved
+                self._sequence += 1
+
+        if delay:
+            threading.Timer(delay, _set).start()
+        else:
+            _set()
+
+    def _resolve(self, fmt):
+        return self.register_format(fmt) if isinstance(fmt, str) else fmt
+
+    def sequence_number(self):
+        with self._lock:
+            return self._sequence
+
+    def register_format(self, name):
+        with self._lock:
+            return self._registered.setdefault(name, 0xC000 + len(self._registered))
+
+    def open(self):
+        with self._lock:
+            self.open_calls += 1
+            if self.busy_opens > 0:
+                self.busy_opens -= 1
+                raise ClipboardBusyError("Clipboard em uso por outro processo")
+            if self._is_open:
+                raise ClipboardBusyError("Clipboard já está aberto")
+            self._is_open = True
+
+    def close(self):
+        with self._lock:
+            self._is_open = False
+
+    def empty(self):
+        with self._lock:
+            self._formats = {}
+            self._sequence += 1
+
+    def is_format_available(self, fmt):
+        with self._lock:
+            return fmt in self._formats
+
+    def get_data(self, fmt):
+        with self._lock:
+            return self._formats[fmt]
+
+
+class ClipboardSession:
+    """Operações no clipboard feitas enquanto o lock global está em posse do job"""
+
+    def __init__(self, broker):
+        self._broker = broker
+        self._backend = broker.backend
+
+    def sequence_number(self):
+        return self._backend.sequence_number()
+
+    def empty(self):
+        with self._opened():
+            self._backend.empty()
+
+    def wait_for_formats(self, formats, since=None, timeout=None):
+        """
+        Aguarda até que algum dos formatos esteja disponível e retorna os dados.
+
+        Args:
+            formats: Lista de formatos em ordem de prioridade (nome registrado ou código CF_*)
+            since: Número de sequência lido antes do copy(); dados anteriores são ignorados
+            timeout: Segundos até desistir (padrão do broker)
+
+        Returns:
+            Dict {formato: dados} com todos os formatos pedidos que estavam disponíveis
+        """
+        timeout = self._broker.timeout if timeout is None else timeout
+        codes = [(fmt, self._backend.register_format(fmt) if isinstance(fmt, str) else fmt) for fmt in formats]
+
+        with span("clipboard.wait") as wait_span:
+            data = self._poll_formats(codes, formats, since, timeout)
+            wait_span.set(bytes=sum(len(value) for value in data.values()))
+        return data
+
+    def _poll_formats(self, codes, formats, since, timeout):
+        deadline = time.monotonic() + timeout
+        delay = self._broker.initial_delay
+        while True:
+            if since is None or self._backend.sequence_number() != since:
+                try:
+                    with self._opened():
+                        available = [(fmt, code) for fmt, code in codes if self._backend.is_format_available(code)]
+                        if available:
+                            return {fmt: self._backend.get_data(code) for fmt, code in available}
+                except ClipboardBusyError:
+                    pass
+
+            if time.monotonic() >= deadline:
+                raise ClipboardTimeoutError(f"Formatos {list(formats)} não encontrados no clipboard após {timeout}s")
+
+            # Backoff adaptativo: verifica rápido no começo e espaça se demorar
+            time.sleep(min(delay, max(0, deadline - time.monotonic())))
+            delay = min(delay * 1.5, self._broker.max_delay)
+
+    @contextmanager
+    def _opened(self):
+        """Abre o clipboard, tentando de novo enquanto outro processo estiver com ele"""
+        deadline = time.monotonic() + self._broker.timeout
+        delay = self._broker.initial_delay
+        while True:
+            try:
+                self._backend.open()
+                break
+            except ClipboardBusyError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(delay)
+                delay = min(delay * 1.5, self._broker.max_delay)
+        try:
+            yield
+        finally:
+            self._backend.close()
+
+
+class ClipboardBroker:
+    def __init__(self, backend=None, lock_path=None, timeout=15, initial_delay=0.02, max_delay=0.5):
+        self.backend = backend or Win32ClipboardBackend()
+        self.lock_path = lock_path or os.path.join(tempfile.gettempdir(), "fluxocliente-clipboard.lock")
+        self.timeout = timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def session(self, lock_timeout=None):
+        """Segura o clipboard com exclusividade (entre threads e processos) durante o bloco"""
+        lock_timeout = 120 if lock_timeout is None else lock_timeout
+        file_lock = FileLock(self.lock_path, timeout=lock_timeout)
+        # Tempo esperando outro job (ou outro processo) liberar o clipboard
+        with span("clipboard.lock"):
+            if not self._thread_lock.acquire(timeout=lock_timeout):
+                raise ClipboardTimeoutError("Timeout aguardando a vez de usar o clipboard")
+            try:
+                file_lock.acquire()
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        try:
+            yield ClipboardSession(self)
+        finally:
+            file_lock.release()
+            self._thread_lock.release()
+
+
+_default_broker = None
+_default_broker_lock = threading.Lock()
+
+
+def get_clipboard_broker():
+    """Broker padrão do processo, usando o clipboard real do Windows"""
+    global _default_broker
+    with _default_broker_lock:
+        if _default_broker is None:
+            _default_broker = ClipboardBroker(
+                lock_path=os.getenv("CLIPBOARD_LOCK_FILE"),
+                timeout=float(os.getenv("CLIPBOARD_TIMEOUT", "15"))
+            )
+        return _default_broker
@@ -0,0 +1,515 @@
+"""
+Aplica o CSS do <style> como estilo inline, numa única passada pela árvore (lxml).
+
+O HTML que o Excel coloca no clipboard (e o do renderizador nativo) traz a
+formatação em classes (.xl65 { ... }) e em regras por elemento (td { ... }).
+Clientes de e-mail ignoram o <style>, então cada célula precisa receber o
+estilo inline. Este módulo:
+
+- interpreta seletores de classe (.xl65), de elemento (td) e compostos
+  (td.xl65, .a.b), inclusive listas separadas por vírgula; os demais
+  (descendentes, pseudo-classes, @page...) são ignorados;
+- combina as regras na ordem da cascata (especificidade, depois ordem no CSS,
+  depois o style já existente no elemento) e remove declarações repetidas,
+  mantendo só a última de cada propriedade;
+- no mesmo percurso remove <img> e <style> e aplica os estilos extras da
+  tabela (tabela, primeiras células como cabeçalho, linhas de dados).
+
+iter_inline_css e iter_inline_table fazem o mesmo em streaming, entregando a
+tabela linha a linha para ranges grandes.
+
+O estilo resultante é calculado uma vez por combinação (tag, classes, style)
+e reaproveitado, o que em planilhas grandes evita refazer o mesmo trabalho
+para milhares de células iguais.
+
+    result = inline_css(raw_html, table_style="border-collapse: collapse")
+    html = result["html"]
+"""
+import re
+import html
+
+from lxml import etree
+
+_COMMENT_RE = re.compile(r'/\*.*?\*/|<!--|-->', re.S)
+_AT_RULE_RE = re.compile(r'@[^{;]+(?:;|\{[^{}]*\})')
+_RULE_RE = re.compile(r'([^{}]+)\{([^{}]*)\}')
+# Declarações separadas por ';', sem quebrar valores entre aspas (ex.: mso-number-format:"0\;0")
+_DECLARATION_RE = re.compile(r'(?:[^;"\']|"[^"]*"|\'[^\']*\')+')
+_SIMPLE_SELECTOR_RE = re.compile(r'^([a-zA-Z][a-zA-Z0-9]*)?((?:\.[a-zA-Z0-9_-]+)*)$')
+
+CELL_TAGS = ('td', 'th')
+TABLE_SECTIONS = ('thead', 'tbody', 'tfoot', 'colgroup')
+# Tamanho dos pedaços em que um HTML já completo é passado ao parser incremental
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_declarations(text):
+    """Lista de (propriedade, valor) de um bloco de declarações CSS"""
+    declarations = []
+    for match in _DECLARATION_RE.finditer(text or ''):
+        prop, sep, value = match.group(0).partition(':')
+        prop = prop.strip().lower()
+        value = value.strip().replace('"', "'")
+        if sep and prop and value:
+            declarations.append((prop, value))
+    return declarations
+
+
+def parse_css(css_text):
+    """
+    Converte o texto do <style> em regras aplicáveis inline.
+
+    Returns:
+        Lista de (tag ou None, frozenset de classes, especificidade, ordem, declarações)
+    """
+    css_text = _AT_RULE_RE.sub('', _COMMENT_RE.sub('', css_text or ''))
+    rules = []
+    for match in _RULE_RE.finditer(css_text):
+        declarations = parse_declarations(match.group(2))
+        if not declarations:
+            continue
+        for selector in match.group(1).split(','):
+            parsed = _SIMPLE_SELECTOR_RE.match(selector.strip())
+            if not parsed or not selector.strip():
+                continue
+            tag = parsed.group(1).lower() if parsed.group(1) else None
+            classes = frozenset(c for c in parsed.group(2).split('.') if c)
+            specificity = (len(classes), 1 if tag else 0)
+            rules.append((tag, classes, specificity, len(rules), declarations))
+    return rules
+
+
+# Shorthands que redefinem todas as propriedades "<shorthand>-*" anteriores
+SHORTHANDS = ('border', 'border-top', 'border-right', 'border-bottom', 'border-left',
+              'padding', 'margin', 'background', 'font')
+# Propriedades com prefixo "border-" que o shorthand border não redefine
+_NOT_RESET_BY_BORDER = ('border-collapse', 'border-spacing', 'border-radius',
+                        'border-top-left-radius', 'border-top-right-radius',
+                        'border-bottom-left-radius', 'border-bottom-right-radius')
+
+
+def merge_declarations(*groups):
+    """
+    Junta grupos de declarações; cada propriedade fica só com a última ocorrência.
+
+    Um shorthand (ex.: padding) também descarta os longhands anteriores que ele
+    redefine (padding-top...), que não teriam efeito no estilo final.
+    """
+    merged = {}
+    for group in groups:
+        for prop, value in group:
+            # Remove e reinsere para manter a ordem da última ocorrência (shorthands x longhands)
+            merged.pop(prop, None)
+            if prop in SHORTHANDS and merged:
+                prefix = prop + '-'
+                for covered in [p for p in merged if p.startswith(prefix) and p not in _NOT_RESET_BY_BORDER]:
+                    del merged[covered]
+            merged[prop] = value
+    return merged
+
+
+def format_declarations(merged):
+    return ';'.join(f"{prop}:{value}" for prop, value in merged.items())
+
+
+class CssInliner:
+    def __init__(self, css_text, inline_element_rules=True):
+        self.rules = parse_css(css_text)
+        self._by_tag = {}
+        self._by_class = {}
+        for rule in self.rules:
+            tag, classes = rule[0], rule[1]
+            if classes:
+                # Indexa pela primeira classe; as demais são conferidas no match
+                self._by_class.setdefault(min(classes), []).append(rule)
+            elif inline_element_rules:
+                self._by_tag.setdefault(tag, []).append(rule)
+        self._matched = {}
+        self._styles = {}
+        self._parsed_inline = {}
+
+    def matching_declarations(self, tag, class_attr):
+        """Declarações das regras que se aplicam ao elemento, na ordem da cascata"""
+        key = (tag, class_attr)
+        cached = self._matched.get(key)
+        if cached is not None:
+            return cached
+
+        classes = frozenset(class_attr.split()) if class_attr else frozenset()
+        candidates = list(self._by_tag.get(tag, ()))
+        for name in classes:
+            for rule in self._by_class.get(name, ()):
+                if rule[1] <= classes and (rule[0] is None or rule[0] == tag):
+                    candidates.append(rule)
+        candidates.sort(key=lambda rule: (rule[2], rule[3]))
+        declarations = [decl for rule in candidates for decl in rule[4]]
+        self._matched[key] = declarations
+        return declarations
+
+    def style_for(self, tag, class_attr, inline_style, extras=()):
+        """Estilo inline final do elemento (cacheado por combinação)"""
+        key = (tag, class_attr, inline_style, extras)
+        style = self._styles.get(key)
+        if style is None:
+            groups = [self.matching_declarations(tag, class_attr), self._parse_inline(inline_style)]
+            groups.extend(self._parse_inline(extra) for extra in extras)
+            style = format_declarations(merge_declarations(*groups))
+            self._styles[key] = style
+        return style
+
+    def has_element_rules(self, tag):
+        return tag in self._by_tag
+
+    def _parse_inline(self, text):
+        if not text:
+            return ()
+        parsed = self._parsed_inline.get(text)
+        if parsed is None:
+            parsed = self._parsed_inline[text] = parse_declarations(text)
+        return parsed
+
+
+def _drop(element):
+    """Remove o elemento mantendo o texto que vem depois dele"""
+    parent = element.getparent()
+    if parent is None:
+        return
+    if element.tail:
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or '') + element.tail
+        else:
+            parent.text = (parent.text or '') + element.tail
+    parent.remove(element)
+
+
+def _apply_style(inliner, element, extras):
+    class_attr = element.get('class')
+    inline_style = element.get('style')
+    if class_attr or extras or inliner.has_element_rules(element.tag):
+        style = inliner.style_for(element.tag, class_attr, inline_style, extras)
+        if style:
+            element.set('style', style)
+        elif inline_style is not None:
+            del element.attrib['style']
+
+
+class _TableExtras:
+    """Estilos extras das células da primeira tabela: cabeçalho (primeiras células) e corpo (a partir da 2ª linha)"""
+
+    def __init__(self, header_style, body_style, header_cells):
+        self.header = (header_style,) if header_style else ()
+        self.body = (body_style,) if body_style else ()
+        self.both = self.header + self.body
+        self.header_cells = header_cells
+        self.row_index = -1
+        self.cell_index = 0
+
+    def start_row(self):
+        self.row_index += 1
+
+    def cell(self):
+        is_header = self.cell_index < self.header_cells
+        is_body = self.row_index >= 1
+        self.cell_index += 1
+        return self.both if is_header and is_body else self.header if is_header else self.body if is_body else ()
+
+
+def inline_css(raw_html, table_style=None, header_style=None, body_style=None, header_cells=12,
+               remove_images=True, inline_element_rules=True):
+    """
+    Aplica o CSS inline e os estilos da tabela numa única passada.
+
+    Args:
+        raw_html: HTML completo (clipboard do Excel ou renderizador nativo)
+        table_style: Estilo que substitui o da primeira <table>
+        header_style: Estilo acrescentado às primeiras `header_cells` células da tabela
+        body_style: Estilo acrescentado às células a partir da segunda linha
+        remove_images: Remove as <img> (o Excel exporta referências quebradas)
+        inline_element_rules: Também aplica regras por elemento (td { ... })
+
+    Returns:
+        Dict {"html" (primeira tabela, ou documento inteiro se não houver), "tableFound", "imagesRemoved"}
+    """
+    root = etree.fromstring(raw_html, etree.HTMLParser()) if raw_html and raw_html.strip() else None
+    if root is None:
+        return {"html": raw_html or '', "tableFound": False, "imagesRemoved": 0}
+
+    css_text = '\n'.join(style.text or '' for style in root.iter('style'))
+    inliner = CssInliner(css_text, inline_element_rules=inline_element_rules)
+
+    cells = _TableExtras(header_style, body_style, header_cells)
+
+    to_remove = []
+    table = None
+    table_depth = 0   # > 0 enquanto o percurso está dentro da primeira tabela
+
+    for event, element in etree.iterwalk(root, events=('start', 'end')):
+        tag = element.tag
+        if not isinstance(tag, str):
+            continue  # comentários e instruções de processamento
+
+        if event == 'end':
+            if table_depth and tag == 'table':
+                table_depth -= 1
+            continue
+
+        if tag == 'style' or (remove_images and tag == 'img'):
+            to_remove.append(element)
+            continue
+
+        if tag == 'table':
+            if table is None:
+                table = element
+                table_depth = 1
+            elif table_depth:
+                table_depth += 1
+        elif table_depth and tag == 'tr':
+            cells.start_row()
+
+        extras = cells.cell() if table_depth and tag in CELL_TAGS else ()
+
+        _apply_style(inliner, element, extras)
+
+    images_removed = sum(1 for element in to_remove if element.tag == 'img')
+    for element in to_remove:
+        _drop(element)
+
+    if table is not None and table_style:
+        table.set('style', format_declarations(merge_declarations(parse_declarations(table_style))))
+
+    target = table if table is not None else root
+    html = etree.tostring(target, method='html', encoding='unicode', with_tail=False)
+    return {"html": html, "tableFound": table is not None, "imagesRemoved": images_removed}
+
+
+def _open_tag(element):
+    """Tag de abertura do elemento, serializada como o lxml faria (sem filhos)"""
+    shell = etree.tostring(etree.Element(element.tag, dict(element.attrib)), method='html', encoding='unicode')
+    return shell[:-len(f"</{element.tag}>")]
+
+
+def _escape_text(text):
+    return html.escape(text, quote=False) if text else ''
+
+
+def iter_inline_css(raw_html, table_style=None, header_style=None, body_style=None, header_cells=12,
+                    remove_images=True, inline_element_rules=True, stats=None, chunk_size=CHUNK_SIZE):
+    """
+    Versão em streaming de inline_css: entrega a primeira <table> em pedaços.
+
+    O HTML é interpretado aos poucos (HTMLPullParser) e cada linha da tabela
+    (<tr>, ou <col>, ou as linhas de um <tbody>/<thead>) sai com os estilos já
+    aplicados assim que termina, e é descartada da árvore em seguida: a
+    árvore não cresce com a quantidade de linhas (o buffer do parser ainda
+    guarda a entrada lida; para tabelas geradas em pedaços, iter_inline_table).
+    Juntos, os pedaços formam a mesma tabela de inline_css (o CSS precisa vir
+    antes da tabela, como no HTML do Excel).
+
+    Args:
+        raw_html: HTML completo (str) ou iterável de pedaços de HTML (ex.: lido de um arquivo em blocos)
+        stats: Dict opcional; ao terminar recebe "tableFound" e "imagesRemoved"
+        Demais argumentos: como em inline_css
+    """
+    if isinstance(raw_html, str):
+        chunks = (raw_html[i:i + chunk_size] for i in range(0, len(raw_html), chunk_size))
+    else:
+        chunks = iter(raw_html)
+
+    cells = _TableExtras(header_style, body_style, header_cells)
+
+    parser = etree.HTMLPullParser(events=('start', 'end'))
+    css_parts = []
+    inliner = None
+    table = None
+    table_depth = 0
+    images_removed = 0
+    to_remove = []       # <img>/<style> dentro da tabela, removidos quando a linha termina
+    text_sent = set()    # contêineres (tabela, tbody...) cujo texto inicial já saiu
+    previous = {}        # contêiner -> último filho já entregue (sai da árvore quando o tail estiver completo)
+    root = None
+    fed = False
+    done = False
+
+    def flush(container):
+        """Entrega o texto pendente do contêiner (o inicial ou o tail do último filho entregue)"""
+        if container not in text_sent:
+            text_sent.add(container)
+            yield _escape_text(container.text)
+        sent = previous.pop(container, None)
+        if sent is not None:
+            yield _escape_text(sent.tail)
+            container.remove(sent)
+
+    def is_section(element):
+        return element.tag in TABLE_SECTIONS and element.getparent() is table
+
+    def is_unit(element):
+        """Filho direto da tabela ou de uma seção dela: é entregue inteiro quando termina"""
+        parent = element.getparent()
+        return parent is not None and (parent is table or is_section(parent))
+
+    def events():
+        nonlocal root, fed
+        try:
+            for chunk in chunks:
+                if chunk:
+                    fed = True
+                    parser.feed(chunk)
+                    yield from parser.read_events()
+            if fed:
+                root = parser.close()
+                yield from parser.read_events()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    event_stream = events()
+    for event, element in event_stream:
+        tag = element.tag
+        if not isinstance(tag, str):
+            continue
+
+        if event == 'end':
+            if tag == 'style':
+                css_parts.append(element.text or '')
+                inliner = None
+                if table_depth:
+                    to_remove.append(element)
+                continue
+            elif tag == 'img' and remove_images:
+                continue
+            elif table_depth and tag == 'table' and element is not table:
+                table_depth -= 1
+
+            if element is table:
+                yield from flush(table)
+                yield '</table>'
+                done = True
+                break
+            if table_depth and is_section(element):
+                yield from flush(element)
+                yield f'</{tag}>'
+                previous[table] = element
+            elif table_depth and is_unit(element):
+                yield from flush(element.getparent())
+                # Removidos só agora: o texto depois deles já está completo dentro da linha
+                for removed in to_remove:
+                    _drop(removed)
+                to_remove.clear()
+                yield etree.tostring(element, method='html', encoding='unicode', with_tail=False)
+                previous[element.getparent()] = element
+            continue
+
+        if tag == 'style':
+            continue
+        if remove_images and tag == 'img':
+            images_removed += 1
+            if table_depth:
+                to_remove.append(element)
+            continue
+
+        if inliner is None:
+            inliner = CssInliner('\n'.join(css_parts), inline_element_rules=inline_element_rules)
+
+        if tag == 'table':
+            if table is None:
+                table = element
+                table_depth = 1
+            elif table_depth:
+                table_depth += 1
+        elif table_depth and tag == 'tr':
+            cells.start_row()
+
+        extras = cells.cell() if table_depth and tag in CELL_TAGS else ()
+
+        _apply_style(inliner, element, extras)
+
+        if element is table:
+            if table_style:
+                table.set('style', format_declarations(merge_declarations(parse_declarations(table_style))))
+            yield _open_tag(table)
+        elif table_depth and is_section(element):
+            yield from flush(table)
+            yield _open_tag(element)
+
+    event_stream.close()
+
+    if not done and table is None and root is not None:
+        # Sem tabela: o documento inteiro, como em inline_css
+        for element in list(root.iter('style', 'img' if remove_images else 'style')):
+            _drop(element)
+        yield etree.tostring(root, method='html', encoding='unicode', with_tail=False)
+
+    if stats is not None:
+        stats["tableFound"] = table is not None
+        stats["imagesRemoved"] = images_removed
+
+
+def iter_inline_table(table_chunks, table_style=None, header_style=None, body_style=None, header_cells=12,
+                      remove_images=True, stats=None):
+    """
+    Aplica os estilos da tabela a uma <table> gerada em pedaços, um pedaço por vez.
+
+    Para tabelas sem <style> (só estilos inline), como a de iter_table_html: o
+    primeiro pedaço abre a tabela, cada pedaço traz só elementos completos
+    (<col>, <tr>...) e o último termina com </table>. Cada pedaço é
+    interpretado sozinho, então nem a árvore nem o buffer do parser crescem
+    com a tabela (o parser incremental do libxml2 guarda toda a entrada já
+    lida, o que em iter_inline_css só é aceitável porque o HTML do clipboard
+    já está inteiro na memória). O resultado é o mesmo de inline_css.
+
+    Args:
+        table_chunks: Iterável de pedaços da tabela
+        stats: Dict opcional; ao terminar recebe "tableFound" e "imagesRemoved"
+        Demais argumentos: como em inline_css (sem CSS, as regras por elemento não se aplicam)
+    """
+    inliner = CssInliner('')
+    cells = _TableExtras(header_style, body_style, header_cells)
+    parser = etree.HTMLParser()
+    images_removed = 0
+    opened = False
+
+    for chunk in table_chunks:
+        if not chunk:
+            continue
+        fragment = chunk.rstrip()
+        if fragment.endswith('</table>'):
+            fragment = fragment[:-len('</table>')]
+        root = etree.fromstring((fragment if not opened else '<table>' + fragment) + '</table>', parser)
+        table = next(root.iter('table'))
+
+        if not opened:
+            _apply_style(inliner, table, ())
+            if table_style:
+                table.set('style', format_declarations(merge_declarations(parse_declarations(table_style))))
+            yield _open_tag(table)
+            opened = True
+        yield _escape_text(table.text)
+
+        for child in table:
+            if not isinstance(child.tag, str) or (remove_images and child.tag == 'img'):
+                images_removed += child.tag == 'img'
+                yield _escape_text(child.tail)
+                continue
+            for element in child.iter():
+                tag = element.tag
+                if not isinstance(tag, str):
+                    continue
+                if remove_images and tag == 'img':
+                    images_removed += 1
+                    continue
+                if tag == 'tr':
+                    cells.start_row()
+                _apply_style(inliner, element, cells.cell() if tag in CELL_TAGS else ())
+            if remove_images:
+                for image in list(child.iter('img')):
+                    _drop(image)
+            yield etree.tostring(child, method='html', encoding='unicode', with_tail=True)
+
+    if opened:
+        yield '</table>'
+    if stats is not None:
+        stats["tableFound"] = opened
+        stats["imagesRemoved"] = images_removed
@@ -1,128 +1,141 @@
 import sys
-import requests
 import json
 from datetime import datetime
-import xlwings as xw
 import os
-import re
-import base64
+import time
 import traceback
-import dotenv
-import time  # RE-ADICIONADO: Para a lógica de repetição
-
-dotenv.load_dotenv()  # Carrega variáveis de ambiente do arquivo .env
 
 # É necessário instalar as bibliotecas:
 # pip install beautifulsoup4 pywin32 xlwings requests python-dotenv
-from bs4 import BeautifulSoup
-import win32clipboard  # RE-ADICIONADO: Para usar a área de transferência
-
-# Configurar encoding UTF-8 para garantir a compatibilidade de caracteres
-sys.stdout.reconfigure(encoding='utf-8')
-sys.stderr.reconfigure(encoding='utf-8')
+#
+# bs4, requests (graph_mail), PIL (mail_images), openpyxl e lxml são importados
+# nas funções que os usam: extrair o HTML não carrega a pilha de e-mail.
+from excel_copy_paste_new import get_extraction_method
+from excel_app_pool import get_excel_pool
+from clipboard_broker import get_clipboard_broker, ClipboardTimeoutError
+from html_cache import get_html_cache
+from service_env import load_env, get_graph_config
+from send_stages import run_stages, format_timings
+from result_protocol import enable_framed_output, emit_result
+from stage_metrics import span, job_metrics
 
-# Configurações do Microsoft Graph
-CONFIG = {
-    "client_id": os.getenv("GRAPH_CLIENT_ID"),
-    "client_secret": os.getenv("GRAPH_CLIENT_SECRET"),
-    "tenant_id": os.getenv("GRAPH_TENANT_ID"),
-    "sender_email": os.getenv("EMAIL_SENDER"),
-    "token_url": f"https://login.microsoftonline.com/{os.getenv('GRAPH_TENANT_ID')}/oauth2/v2.0/token",
-    "graph_url": "https://graph.microsoft.com/v1.0"
-}
+# Incrementar quando o pós-processamento do HTML mudar, para invalidar o cache
+HTML_EXTRACTOR_VERSION = 2
 
 
-def get_formatted_html_from_excel(excel_path):
+def get_formatted_html_from_excel(excel_path, method=None):
     """
     ALTERADO: Extrai e formata o HTML da planilha usando a área de transferência,
-    com lógica de repetição para maior estabilidade.
+    com lógica de repetição para maior estabilidade. Com method='openpyxl' (ou sem
+    Excel disponível) a tabela é gerada pelo renderizador nativo.
     """
-    app, wb = None, None
-    try:
-        print("INFO: Iniciando extração do Excel via clipboard...")
-        if not os.path.exists(excel_path):
-            raise FileNotFoundError(f"Arquivo Excel não encontrado: {excel_path}")
-
-        app = xw.App(visible=False, add_book=False)
-        app.display_alerts = False
-        wb = app.books.open(excel_path)
-        sheet = wb.sheets[0]
-        last_row = sheet.used_range.last_cell.row
-        target_range = sheet.range(f'A1:L{last_row}')
-        target_range.copy()
-        
-        # NOVO: Tenta abrir o clipboard várias vezes para evitar erro de "Acesso Negado"
-        retries = 5
-        delay = 0.5  # 500ms
-        for i in range(retries):
-            try:
-                win32clipboard.OpenClipboard()
-                break  # Se funcionou, sai do loop
-            except Exception as e:
-                # Verifica se o erro é de acesso negado e se ainda há tentativas
-                if "Acesso negado" in str(e) and i < retries - 1:
-                    print(f"WARN: Acesso ao clipboard negado. Tentando novamente em {delay}s... ({i+1}/{retries})", file=sys.stderr)
-                    time.sleep(delay)
-                else:
-                    raise e  # Se não for o erro esperado ou se for a última tentativa, levanta a exceção
+    if not os.path.exists(excel_path):
+        raise FileNotFoundError(f"Arquivo Excel não encontrado: {excel_path}")
+
+    method = get_extraction_method(method)
+
+    # Mesma planilha (mesmo conteúdo) já extraída antes: não precisa abrir o Excel
+    cache = get_html_cache()
+    with span("html_cache.get") as cache_span:
+        cache_key = cache.make_key(excel_path, sheet=0, cell_range="A1:L{last_row}",
+                                   extractor=f"get_formatted_html_from_excel/{method}", version=HTML_EXTRACTOR_VERSION)
+        cached_html = cache.get(cache_key)
+        cache_span.set(hit=cached_html is not None)
+    if cached_html is not None:
+        print("INFO: HTML obtido do cache (planilha sem alterações).")
+        return cached_html
+
+    with span("extract.html", method=method) as html_span:
+        table_html = _extract_table_html(excel_path, method)
+        html_span.set(bytes=len(table_html))
+    with span("html_cache.set"):
+        cache.set(cache_key, table_html)
+    return table_html
+
 
+def _extract_table_html(excel_path, method):
+    """Extrai a tabela pelo método escolhido (renderizador nativo ou Excel + clipboard)"""
+    if method == "openpyxl":
+        from openpyxl_html_renderer import render_table_html
+
+        print("INFO: Iniciando extração nativa com openpyxl...")
+        with span("openpyxl.render") as render_span:
+            raw_html, _ = render_table_html(excel_path)
+            render_span.set(bytes=len(raw_html))
+        return format_table_html(raw_html)
+
+    wb = None
+    with get_excel_pool().borrow() as app:
         try:
-            CF_HTML = win32clipboard.RegisterClipboardFormat("HTML Format")
-            if not win32clipboard.IsClipboardFormatAvailable(CF_HTML):
-                raise RuntimeError("Formato HTML não encontrado no clipboard.")
-            raw_html = win32clipboard.GetClipboardData(CF_HTML).decode('utf-8', errors='ignore')
+            print("INFO: Iniciando extração do Excel via clipboard...")
+            with span("excel.open"):
+                wb = app.books.open(excel_path)
+            sheet = wb.sheets[0]
+            last_row = sheet.used_range.last_cell.row
+            target_range = sheet.range(f'A1:L{last_row}')
+
+            # O broker serializa o clipboard entre jobs e aguarda o HTML ficar disponível
+            # (com backoff e timeout), substituindo as tentativas fixas de OpenClipboard
+            with get_clipboard_broker().session() as clipboard:
+                since = clipboard.sequence_number()
+                with span("excel.copy", rows=last_row):
+                    target_range.copy()
+                try:
+                    data = clipboard.wait_for_formats(["HTML Format"], since=since)
+                except ClipboardTimeoutError:
+                    raise RuntimeError("Formato HTML não encontrado no clipboard.")
+            raw_html = data["HTML Format"].decode('utf-8', errors='ignore')
+
+            return format_table_html(raw_html)
+
         finally:
-            win32clipboard.CloseClipboard()
-
-        soup = BeautifulSoup(raw_html, 'html.parser')
-        
-        # NOVO: Injeta o CSS das classes como estilo inline para manter a formatação
-        style_tag = soup.find('style')
-        if style_tag and style_tag.string:
-            # Extrai as regras de CSS do <style> tag
-            css_rules = {m.group(1): m.group(2).strip() for m in re.finditer(r'\.([a-zA-Z0-9_-]+)\s*\{([^}]+)\}', style_tag.string)}
-            if css_rules:
-                # Aplica as regras de CSS em cada tag que tem uma classe
-                for tag in soup.find_all(class_=True):
-                    s = tag.get('style', '')
-                    inline_style = ';'.join([css_rules[cn] for cn in tag['class'] if cn in css_rules])
-                    if inline_style:
-                         tag['style'] = s + (';' if s else '') + inline_style
-
-        # Remove tags de imagem desnecessárias que o Excel pode exportar
-        for img_tag in soup.find_all('img'):
-            img_tag.decompose()
-
-        table = soup.find('table')
-        if not table:
-            raise ValueError("Nenhuma tabela foi encontrada no HTML copiado do Excel.")
-
-        print("INFO: Extração e formatação do HTML concluídas.")
-        return str(table)
+            # Fecha só o workbook; a instância do Excel volta para o pool
+            if wb:
+                with span("excel.close"):
+                    wb.close()
 
-    finally:
-        if wb: wb.close()
-        if app: app.quit()
 
+def format_table_html(raw_html):
+    """Aplica o CSS das classes como estilo inline, remove imagens e retorna a <table>"""
+    from css_inliner import inline_css
 
-def run_complete_process(excel_path, image_path, recipient, subject, message):
-    """
-    Função principal que executa todo o fluxo: extrai, formata, injeta a imagem e envia.
-    """
-    # 1. Extrair e formatar a tabela do Excel
-    table_html = get_formatted_html_from_excel(excel_path)
+    # Injeta o CSS (classes e elementos) como estilo inline para manter a formatação,
+    # removendo as imagens desnecessárias que o Excel pode exportar
+    with span("html.inline", inBytes=len(raw_html)) as inline_span:
+        processed = inline_css(raw_html)
+        inline_span.set(outBytes=len(processed["html"]), tableFound=processed["tableFound"])
+    if not processed["tableFound"]:
+        raise ValueError("Nenhuma tabela foi encontrada no HTML copiado do Excel.")
+
+    print("INFO: Extração e formatação do HTML concluídas.")
+    return processed["html"]
+
+
+def load_report_image(image_path):
+    """Lê a imagem local e prepara o anexo inline (cid:) que vai na célula C3"""
+    from mail_images import load_inline_image
 
-    # 2. Carregar e codificar a imagem local
     print(f"INFO: Carregando imagem local: '{image_path}'...")
-    if not os.path.exists(image_path):
-        raise FileNotFoundError(f"Arquivo de imagem não encontrado: {image_path}")
-    with open(image_path, "rb") as image_file:
-        encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-    image_html_tag = f'<img src="data:image/png;base64,{encoded_string}" alt="Imagem" style="width:115%; height:auto;" />'
+    with span("image.load") as image_span:
+        image = load_inline_image(image_path)
+        image_span.set(bytes=image.size, originalBytes=image.original_bytes)
+    return image
+
+
+def fetch_token(config):
+    """Obtém (ou reaproveita do cache) o token do Graph; o cliente de envio usa o mesmo provider"""
+    from graph_token import get_token_provider
+
+    return get_token_provider(config).get_token()
+
+
+def build_report_body(table_html, image_html_tag, message):
+    """Injeta a imagem na célula C3 da tabela e monta o corpo HTML do e-mail"""
+    from bs4 import BeautifulSoup
 
-    # 3. Injetar a imagem na célula C3
     print("INFO: Injetando imagem na célula C3...")
-    soup = BeautifulSoup(table_html, 'html.parser')
+    with span("body.parse", bytes=len(table_html)):
+        soup = BeautifulSoup(table_html, 'html.parser')
     table = soup
     if table:
         rows = table.find_all('tr')
@@ -132,17 +145,11 @@ def run_complete_process(excel_path, image_path, recipient, subject, message):
                 cells[2].clear()
                 cells[2].append(BeautifulSoup(image_html_tag, 'html.parser'))
 
-    final_html = str(soup)
-
-    # 4. Obter token de acesso
-    print("INFO: Obtendo token de acesso...")
-    data = {'client_id': CONFIG['client_id'], 'client_secret': CONFIG['client_secret'], 'scope': 'https://graph.microsoft.com/.default', 'grant_type': 'client_credentials'}
-    response = requests.post(CONFIG['token_url'], data=data)
-    response.raise_for_status()
-    token = response.json()['access_token']
+    with span("body.serialize") as serialize_span:
+        final_html = str(soup)
+        serialize_span.set(bytes=len(final_html))
 
-    # 5. Montar o corpo do e-mail
-    body_html = f"""
+    return f"""
     <html><body>
         <p style="font-family: Arial, sans-serif;">{message}</p><br>
         {final_html}
@@ -151,42 +158,184 @@ def run_complete_process(excel_path, image_path, recipient, subject, message):
     </body></html>
     """
 
-    email_data = {
-        "message": {
-            "subject": subject,
-            "body": {"contentType": "HTML", "content": body_html},
-            "toRecipients": [{"emailAddress": {"address": recipient}}]
-        }
-    }
 
-    # 6. Enviar o e-mail
+def run_complete_process(excel_path, image_path, recipient, subject, message):
+    """
+    Função principal que executa todo o fluxo: extrai, formata, injeta a imagem e envia.
+
+    Returns:
+        Dict com "success" e "timings" (segundos de cada etapa)
+    """
+    started = time.perf_counter()
+    config = get_graph_config()
+
+    # 1. Extrair e formatar a tabela do Excel (nesta thread), enquanto a imagem
+    #    local é carregada e o token do Graph é obtido em paralelo
+    stages, timings = run_stages({
+        "extract": lambda: get_formatted_html_from_excel(excel_path),
+        "image": lambda: load_report_image(image_path),
+        "token": lambda: fetch_token(config)
+    }, on_caller="extract")
+    image = stages["image"]
+
+    # 2. Referenciar a imagem (cid:) na célula C3 e montar o corpo do e-mail
+    from graph_mail import GraphMailClient, build_message
+
+    body_started = time.perf_counter()
+    with span("body") as body_span:
+        body_html = build_report_body(stages["extract"], image.img_tag(), message)
+        body_span.set(bytes=len(body_html))
+    timings["body"] = round(time.perf_counter() - body_started, 3)
+
+    # 3. Enviar o e-mail (token reaproveitado entre envios enquanto for válido)
     print(f"INFO: Enviando e-mail para {recipient}...")
-    send_url = f"{CONFIG['graph_url']}/users/{CONFIG['sender_email']}/sendMail"
-    response = requests.post(
-        send_url,
-        headers={'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'},
-        json=email_data
-    )
-    response.raise_for_status()
+    send_started = time.perf_counter()
+    client = GraphMailClient(config, max_workers=1)
+    try:
+        result = client.send_mail(build_message(subject, body_html, [recipient], attachments=[image.attachment()]))
+    finally:
+        client.close()
+    timings["send"] = round(time.perf_counter() - send_started, 3)
+    timings["total"] = round(time.perf_counter() - started, 3)
+    print(f"INFO: Etapas: {format_timings(timings)}")
+    if not result["success"]:
+        raise RuntimeError(f"Falha no envio do e-mail: {result['error']}")
+    return {"success": True, "timings": timings}
+
+
+def run_complete_process_batch(jobs):
+    """
+    Envia vários relatórios de uma vez.
+
+    Cada planilha e cada imagem são processadas uma única vez (a imagem vai como
+    o mesmo anexo inline em todas as mensagens), e os e-mails saem agrupados em
+    requisições $batch do Graph (até 20 por requisição). As planilhas são
+    extraídas enquanto as imagens são carregadas e o token é obtido em paralelo.
+
+    Args:
+        jobs: Lista de dicts {"excel_path", "image_path", "recipient", "subject", "message"}
+
+    Returns:
+        Dict com "success", "results" (um item por job, na mesma ordem) e "timings" (segundos por etapa)
+    """
+    from graph_mail import GraphMailClient, build_message
+
+    bodies = {}
+    results = []
+    pending = []
+    started = time.perf_counter()
+    config = get_graph_config()
+
+    # Um erro numa planilha ou imagem vira o erro só dos jobs que a usam
+    def extract_tables():
+        tables = {}
+        for excel_path in dict.fromkeys(job["excel_path"] for job in jobs):
+            try:
+                tables[excel_path] = get_formatted_html_from_excel(excel_path)
+            except Exception as e:
+                tables[excel_path] = e
+        return tables
+
+    def load_images():
+        images = {}
+        for image_path in dict.fromkeys(job["image_path"] for job in jobs):
+            try:
+                image = load_report_image(image_path)
+                images[image_path] = (image.img_tag(), [image.attachment()])
+            except Exception as e:
+                images[image_path] = e
+        return images
+
+    def prefetch_token():
+        # Sem token aqui, o envio tenta de novo e o erro aparece em cada mensagem
+        try:
+            return fetch_token(config)
+        except Exception as e:
+            print(f"WARN: Falha ao obter o token antecipadamente: {e}", file=sys.stderr)
+            return None
+
+    # Planilhas nesta thread (Excel/clipboard); imagens e token em paralelo
+    stages, timings = run_stages({"extract": extract_tables, "image": load_images, "token": prefetch_token},
+                                 on_caller="extract")
+
+    for job in jobs:
+        result = {"recipient": job["recipient"], "excel_path": job["excel_path"]}
+        results.append(result)
+        try:
+            table_html = stages["extract"][job["excel_path"]]
+            if isinstance(table_html, Exception):
+                raise table_html
+            image = stages["image"][job["image_path"]]
+            if isinstance(image, Exception):
+                raise image
+            image_tag, attachments = image
+            body_key = (job["excel_path"], job["image_path"], job["message"])
+            if body_key not in bodies:
+                with span("body") as body_span:
+                    bodies[body_key] = build_report_body(table_html, image_tag, job["message"])
+                    body_span.set(bytes=len(bodies[body_key]))
+        except Exception as e:
+            print(f"ERROR: Falha ao preparar o relatório para {job['recipient']}: {e}", file=sys.stderr)
+            result.update({"success": False, "error": str(e)})
+            continue
+        pending.append((result, build_message(job["subject"], bodies[body_key], [job["recipient"]], attachments=attachments)))
+
+    if pending:
+        print(f"INFO: Enviando {len(pending)} e-mail(s)...")
+        send_started = time.perf_counter()
+        client = GraphMailClient(config)
+        try:
+            send_results = client.send_many([message for _, message in pending])
+        finally:
+            client.close()
+        timings["send"] = round(time.perf_counter() - send_started, 3)
+        for (result, _), send_result in zip(pending, send_results):
+            result.update(send_result)
+    timings["total"] = round(time.perf_counter() - started, 3)
+    print(f"INFO: Etapas: {format_timings(timings)}")
+
+    sent = sum(1 for r in results if r.get("success"))
+    return {"success": sent == len(results), "sent": sent, "failed": len(results) - sent, "results": results,
+            "timings": timings}
 
 if __name__ == "__main__":
+    # Configurar encoding UTF-8 para garantir a compatibilidade de caracteres
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+    # Com --framed, os logs vão para o stderr e o resultado sai como frame no stdout
+    enable_framed_output()
+    load_env()
+
+    # Preenchido pelo job_metrics mesmo quando o job falha (mostra em que etapa parou)
+    metrics = None
     try:
+        if len(sys.argv) == 3 and sys.argv[1] == "--batch":
+            # Manifesto JSON com a lista de jobs
+            with open(sys.argv[2], 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            with job_metrics("run_complete_process_batch") as metrics:
+                result = run_complete_process_batch(manifest["jobs"] if isinstance(manifest, dict) else manifest)
+            if not emit_result({**result, "metrics": metrics}):
+                print(f"SUCCESS_BATCH:{json.dumps(result)}")
+            sys.exit(0)
+
         if len(sys.argv) != 6:
             raise ValueError(f"Número incorreto de argumentos. Esperado 5, recebido {len(sys.argv) - 1}.")
 
-        run_complete_process(
-            excel_path=sys.argv[1],
-            image_path=sys.argv[2],
-            recipient=sys.argv[3],
-            subject=sys.argv[4],
-            message=sys.argv[5]
-        )
-        
-        print("SUCCESS:E-mail enviado com sucesso.")
+        with job_metrics("run_complete_process") as metrics:
+            result = run_complete_process(
+                excel_path=sys.argv[1],
+                image_path=sys.argv[2],
+                recipient=sys.argv[3],
+                subject=sys.argv[4],
+                message=sys.argv[5]
+            )
+
+        if not emit_result({**result, "message": "E-mail enviado com sucesso.", "metrics": metrics}):
+            print("SUCCESS:E-mail enviado com sucesso.")
 
     except Exception as e:
+        emit_result({"success": False, "error": str(e), "metrics": metrics})
         print(f"ERROR: {str(e)}", file=sys.stderr)
         traceback.print_exc(file=sys.stderr)
         sys.exit(1)
-
-
@@ -1,13 +1,67 @@
 // Nome do arquivo: excel-clipboard.service.js
 
 const { spawn } = require('child_process');
+const { PassThrough } = require('stream');
 const path = require('path');
 const fs = require('fs');
+const pythonWorkerPool = require('./python-worker-pool.service');
+const { runFramedScript } = require('../utils/python-frames');
 
 class ExcelClipboardService {
     constructor() {
         // Garante que o nome do script Python aqui seja o mesmo que você salvou
         this.pythonScript = path.join(__dirname, 'enviar_relatorio_completo.py');
+        this.extractScript = path.join(__dirname, 'excel_copy_paste_new.py');
+    }
+
+    /**
+     * Gera o HTML da tabela da planilha (ou o corpo do e-mail inteiro) em streaming.
+     * O Python escreve cada linha da tabela no stdout assim que ela é gerada,
+     * então o HTML pode ser repassado (ex.: res.pipe) sem esperar o range inteiro.
+     * @param {string} excelFilePath Caminho para o arquivo Excel
+     * @param {Object} [options]
+     * @param {string} [options.grupo] Se informado, gera o corpo do e-mail com a tabela
+     * @param {string} [options.additionalMessage] Mensagem do corpo do e-mail
+     * @returns {import('stream').Readable} Stream de texto (utf8); emite 'error' se o Python falhar
+     */
+    streamExcelHtml(excelFilePath, options = {}) {
+        const args = [this.extractScript, excelFilePath, 'stream'];
+        if (options.grupo) {
+            args.push(options.grupo);
+            if (options.additionalMessage) {
+                args.push(options.additionalMessage);
+            }
+        }
+
+        const pythonProcess = spawn(process.env.PYTHON_BIN || 'python', args, {
+            cwd: __dirname,
+            env: { ...process.env, PYTHONIOENCODING: 'utf-8' }
+        });
+        // Só termina depois do código de saída: um erro no meio não pode parecer um HTML completo
+        const output = new PassThrough({ encoding: 'utf8' });
+        pythonProcess.stdout.pipe(output, { end: false });
+
+        // Os logs do Python vão para o stderr; o stdout leva só o HTML
+        let stderrData = '';
+        pythonProcess.stderr.on('data', (data) => {
+            const text = data.toString('utf8');
+            stderrData += text;
+            console.log(`[Python]: ${text.trim()}`);
+        });
+
+        pythonProcess.on('error', (error) => {
+            output.destroy(new Error(`Falha ao iniciar o script Python: ${error.message}`));
+        });
+        pythonProcess.on('close', (code) => {
+            if (code !== 0) {
+                const errorLine = stderrData.split('\n').find(line => line.startsWith('ERROR:'));
+                output.destroy(new Error(errorLine ? errorLine.slice(6) : `Script Python falhou com código de saída ${code}`));
+                return;
+            }
+            output.end();
+        });
+
+        return output;
     }
 
     /**
@@ -155,59 +209,28 @@ if __name__ == "__main__":
      * @returns {Promise<string>} Uma promessa que resolve com a mensagem de sucesso ou rejeita com o erro.
      */
     async sendReportViaPython(excelPath, imagePath, recipient, subject, message) {
-        return new Promise((resolve, reject) => {
-            
-            const scriptArgs = [
-                this.pythonScript,
-                excelPath,
-                imagePath,
+        if (pythonWorkerPool.isEnabled()) {
+            console.log("▶️  Enviando job para o worker Python...");
+            await pythonWorkerPool.run('run_complete_process', {
+                excel_path: excelPath,
+                image_path: imagePath,
                 recipient,
                 subject,
                 message
-            ];
-
-            console.log("▶️  Disparando script Python com 5 argumentos...");
-
-            const pythonProcess = spawn('python', scriptArgs, {
-                cwd: __dirname, // Garante que o script execute no diretório correto
-                env: { ...process.env, PYTHONIOENCODING: 'utf-8' }
-            });
-
-            let stdout_data = '';
-            let stderr_data = '';
-
-            // Captura as saídas para fornecer um log claro
-            pythonProcess.stdout.on('data', (data) => {
-                const output = data.toString('utf8').trim();
-                console.log(`[Python]: ${output}`);
-                stdout_data += output;
-            });
-
-            pythonProcess.stderr.on('data', (data) => {
-                const errorOutput = data.toString('utf8').trim();
-                console.error(`[Python ERRO]: ${errorOutput}`);
-                stderr_data += errorOutput;
             });
+            return "Processo de envio de e-mail concluído com sucesso pelo Python.";
+        }
 
-            // Processa o resultado quando o script Python terminar
-            pythonProcess.on('close', (code) => {
-                if (code !== 0) {
-                    const error = new Error(stderr_data || `Script Python falhou com código de saída ${code}`);
-                    reject(error);
-                    return;
-                }
-                if (stdout_data.includes('SUCCESS:')) {
-                    resolve("Processo de envio de e-mail concluído com sucesso pelo Python.");
-                } else {
-                    reject(new Error("Script Python finalizado sem uma mensagem de sucesso clara."));
-                }
-            });
+        console.log("▶️  Disparando script Python com 5 argumentos...");
 
-            pythonProcess.on('error', (error) => {
-                console.error('❌ Erro crítico ao tentar executar o processo Python:', error);
-                reject(new Error(`Falha ao iniciar o script Python: ${error.message}`));
-            });
+        // Logs do Python no stderr (repassados linha a linha); o resultado vem num frame no stdout
+        const { result } = await runFramedScript(this.pythonScript, [excelPath, imagePath, recipient, subject, message], {
+            cwd: __dirname // Garante que o script execute no diretório correto
         });
+        if (!result.success) {
+            throw new Error(result.error || 'Script Python finalizado sem sucesso.');
+        }
+        return "Processo de envio de e-mail concluído com sucesso pelo Python.";
     }
 }
 
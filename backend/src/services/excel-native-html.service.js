@@ -1,4 +1,4 @@
-const { exec } = require('child_process');
+const { runFramedScript } = require('../utils/python-frames');
 const fs = require('fs');
 const path = require('path');
 const logger = require('../utils/logger');
@@ -16,11 +16,8 @@ class ExcelNativeHtmlService {
                 throw new Error(`Arquivo Excel não encontrado: ${excelFilePath}`);
             }
 
-            // Caminho do script Python para HTML nativo
+            // Caminho do script Python para HTML nativo (versionado ao lado deste serviço)
             const pythonScriptPath = path.join(__dirname, 'excel_native_html.py');
-            
-            // Criar script Python se não existir
-            await this.createNativeHtmlScript(pythonScriptPath);
 
             // Executar script Python
             const result = await this.executeNativeHtmlScript(pythonScriptPath, excelFilePath);
@@ -50,186 +47,34 @@ class ExcelNativeHtmlService {
         }
     }
 
-    async createNativeHtmlScript(scriptPath) {
-        const pythonScript = `
-import sys
-import xlwings as xw
-import win32clipboard
-import time
-
-def get_excel_native_html(excel_file_path):
-    try:
-        print("Abrindo Excel para HTML NATIVO...")
-        
-        # Abrir Excel (invisível mas com alertas desabilitados)
-        app = xw.App(visible=False, add_book=False)
-        app.display_alerts = False
-        app.screen_updating = False
-        
-        try:
-            # Abrir arquivo
-            wb = app.books.open(excel_file_path)
-            
-            # Selecionar primeira planilha
-            ws = wb.sheets[0]
-            
-            # Encontrar intervalo usado
-            used_range = ws.used_range
-            
-            if used_range is None:
-                return {"success": False, "error": "Planilha vazia"}
-            
-            print(f"Copiando intervalo NATIVO: {used_range.address}")
-            
-            # Limpar clipboard primeiro
-            try:
-                win32clipboard.OpenClipboard()
-                win32clipboard.EmptyClipboard()
-                win32clipboard.CloseClipboard()
-            except:
-                pass
-            
-            # Selecionar e copiar TUDO
-            used_range.select()
-            used_range.copy()
-            
-            # Aguardar copy
-            print("Aguardando cópia para clipboard...")
-            time.sleep(5)
-            
-                # Obter HTML EXATO do clipboard
-            win32clipboard.OpenClipboard()
-            try:
-                native_html = None
-                
-                # Formato HTML do Excel
-                try:
-                    html_format = win32clipboard.RegisterClipboardFormat("HTML Format")
-                    if win32clipboard.IsClipboardFormatAvailable(html_format):
-                        html_data = win32clipboard.GetClipboardData(html_format)
-                        if html_data:
-                            if isinstance(html_data, bytes):
-                                # Tentar decodificar em utf-8, senão usar cp1252 (Windows-1252) como fallback
-                                try:
-                                    native_html = html_data.decode('utf-8')
-                                except Exception:
-                                    try:
-                                        native_html = html_data.decode('cp1252')
-                                    except Exception:
-                                        native_html = html_data.decode('latin-1', errors='ignore')
-                            else:
-                                native_html = str(html_data)
-                            print(f"HTML Format obtido: {len(native_html)} caracteres")
-                                
-                except Exception as e:
-                    print(f"Erro HTML Format: {e}")
-                
-                # Se não conseguiu HTML, tentar outros formatos (Unicode Text)
-                if not native_html:
-                    try:
-                        CF_UNICODETEXT = 13
-                        if win32clipboard.IsClipboardFormatAvailable(CF_UNICODETEXT):
-                            text_data = win32clipboard.GetClipboardData(CF_UNICODETEXT)
-                            if text_data:
-                                if isinstance(text_data, bytes):
-                                    try:
-                                        native_html = text_data.decode('utf-8')
-                                    except Exception:
-                                        native_html = text_data.decode('cp1252', errors='ignore')
-                                else:
-                                    native_html = str(text_data)
-                                print(f"Unicode Text obtido: {len(native_html)} caracteres")
-                    except Exception as e:
-                        print(f"Erro Unicode Text: {e}")
-                
-                if native_html:
-                    return {
-                        "success": True, 
-                        "nativeHtml": native_html
-                    }
-                else:
-                    return {"success": False, "error": "Nenhum formato encontrado no clipboard"}
-                    
-            finally:
-                win32clipboard.CloseClipboard()
-                
-        finally:
-            # Fechar arquivo e Excel
-            wb.close()
-            app.quit()
-            
-    except Exception as e:
-        print(f"ERRO: {str(e)}")
-        return {"success": False, "error": str(e)}
+    async executeNativeHtmlScript(scriptPath, excelPath) {
+        // Normalizar caminhos para Windows
+        const normalizedExcelPath = path.resolve(excelPath);
+        const normalizedScriptPath = path.resolve(scriptPath);
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("ERRO: Uso correto: python excel_native_html.py <caminho_arquivo>")
-        sys.exit(1)
-    
-    excel_file = sys.argv[1]
-    result = get_excel_native_html(excel_file)
-    
-    if result["success"]:
-        print(f"SUCCESS:{result['nativeHtml']}")
-    else:
-        print(f"ERROR:{result['error']}")
-`;
+        logger.info('🔧 Executando script HTML NATIVO', {
+            script: normalizedScriptPath
+        });
 
-        fs.writeFileSync(scriptPath, pythonScript, 'utf8');
-        logger.info('📝 Script Python HTML NATIVO criado');
-    }
+        // Logs no stderr; o HTML (grande) chega por um arquivo temporário referenciado no frame de resultado
+        const { result } = await runFramedScript(normalizedScriptPath, [normalizedExcelPath], {
+            timeout: 90000, // 1.5 minutos timeout
+            cwd: path.dirname(normalizedScriptPath),
+            onLog: (line) => logger.debug(`[Python HTML NATIVO]: ${line}`)
+        });
 
-    async executeNativeHtmlScript(scriptPath, excelPath) {
-        return new Promise((resolve, reject) => {
-            // Normalizar caminhos para Windows
-            const normalizedExcelPath = path.resolve(excelPath);
-            const normalizedScriptPath = path.resolve(scriptPath);
-            
-            // Comando Python
-            const command = `python "${normalizedScriptPath}" "${normalizedExcelPath}"`;
-            
-            logger.info('🔧 Executando script HTML NATIVO', { 
-                comando: command
-            });
-            
-            exec(command, { 
-                timeout: 90000, // 1.5 minutos timeout
-                cwd: path.dirname(normalizedScriptPath),
-                encoding: 'utf8',
-                maxBuffer: 10 * 1024 * 1024 // 10MB buffer para HTML grande
-            }, (error, stdout, stderr) => {
-                
-                logger.info('📝 Saída do HTML NATIVO', { 
-                    temStdout: !!stdout,
-                    tamanhoStdout: stdout?.length || 0,
-                    temStderr: !!stderr,
-                    temError: !!error
-                });
-                
-                if (error) {
-                    reject(new Error(`Erro execução HTML NATIVO: ${error.message}`));
-                    return;
-                }
-                
-                if (stderr && !stdout.includes('SUCCESS')) {
-                    reject(new Error(`Erro HTML NATIVO stderr: ${stderr}`));
-                    return;
-                }
-                
-                // Verificar se foi bem-sucedido
-                if (stdout.includes('SUCCESS:')) {
-                    const nativeHtml = stdout.split('SUCCESS:')[1];
-                    
-                    resolve({
-                        success: true,
-                        nativeHtml: nativeHtml
-                    });
-                } else {
-                    reject(new Error(`HTML NATIVO falhou: ${stdout || stderr || 'Erro desconhecido'}`));
-                }
-            });
+        logger.info('📝 Saída do HTML NATIVO', {
+            sucesso: result.success,
+            tamanhoHtml: result.nativeHtml?.length || 0
         });
+
+        if (!result.success) {
+            throw new Error(`HTML NATIVO falhou: ${result.error || 'Erro desconhecido'}`);
+        }
+        return {
+            success: true,
+            nativeHtml: result.nativeHtml
+        };
     }
 
     // Método para usar o HTML EXATAMENTE como o Excel gerou
@@ -0,0 +1,185 @@
+"""
+Pool de instâncias do Excel (xlwings) já iniciadas.
+
+Abrir o Excel com xw.App() custa alguns segundos; com o pool cada chamada
+pega uma instância quente emprestada, abre e fecha apenas o workbook e devolve
+a instância para a próxima chamada.
+
+    with get_excel_pool().borrow() as app:
+        wb = app.books.open(caminho)
+        try:
+            ...
+        finally:
+            wb.close()
+
+O pool faz health check ao emprestar, recicla a instância depois de N jobs e
+limita a quantidade de instâncias abertas. A criação da instância é feita por
+uma factory injetável, o que permite usar um backend falso nos testes no Linux.
+
+Observação: objetos COM ficam presos à thread que os criou; use o pool a partir
+de uma única thread por processo (como o python_worker.py faz).
+
+Variáveis de ambiente:
+    EXCEL_POOL_MAX_SIZE   quantidade máxima de instâncias (padrão 1)
+    EXCEL_POOL_MAX_JOBS   jobs por instância antes de reciclar (padrão 50)
+"""
+import os
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+from stage_metrics import span
+
+
+def default_app_factory():
+    """Inicia uma instância invisível do Excel via xlwings"""
+    import xlwings as xw
+
+    app = xw.App(visible=False, add_book=False)
+    app.display_alerts = False
+    app.screen_updating = False
+    return app
+
+
+class _PooledApp:
+    """Instância do Excel controlada pelo pool"""
+    __slots__ = ("app", "jobs", "created_at")
+
+    def __init__(self, app):
+        self.app = app
+        self.jobs = 0
+        self.created_at = time.time()
+
+
+class ExcelAppPool:
+    def __init__(self, app_factory=None, max_size=1, max_jobs_per_app=50, borrow_timeout=120):
+        self.app_factory = app_factory or default_app_factory
+        self.max_size = max(1, max_size)
+        self.max_jobs_per_app = max_jobs_per_app
+        self.borrow_timeout = borrow_timeout
+
+        self._idle = []
+        self._total = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def borrow(self):
+        """Empresta uma instância do Excel; ela volta para o pool ao sair do bloco"""
+        # Inclui a espera por uma instância livre e, sem instância ociosa, a partida do Excel
+        with span("excel.borrow") as borrow_span:
+            pooled = self._acquire()
+            borrow_span.set(appJobs=pooled.jobs)
+        healthy = True
+        try:
+            yield pooled.app
+        except Exception:
+            # Depois de um erro a instância só volta se ainda responder
+            healthy = self.is_healthy(pooled.app)
+            raise
+        finally:
+            self._release(pooled, healthy)
+
+    def is_healthy(self, app):
+        """Verifica se a instância ainda responde (um Excel travado ou fechado levanta erro)"""
+        try:
+            len(app.books)
+            return True
+        except Exception:
+            return False
+
+    def stats(self):
+        with self._condition:
+            return {"idle": len(self._idle), "total": self._total, "maxSize": self.max_size}
+
+    def close(self):
+        """Fecha todas as instâncias ociosas; as emprestadas são fechadas ao voltar"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._condition.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.borrow_timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Pool do Excel já foi fechado")
+
+                while self._idle:
+                    pooled = self._idle.pop()
+                    if self.is_healthy(pooled.app):
+                        return pooled
+                    print("WARN: Instância do Excel não respondeu ao health check; descartando")
+                    self._total -= 1
+                    self._quit(pooled)
+
+                if self._total < self.max_size:
+                    self._total += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Nenhuma instância do Excel livre após {self.borrow_timeout}s")
+                self._condition.wait(remaining)
+
+        # A criação (lenta) acontece fora do lock
+        try:
+            with span("excel.start"):
+                return _PooledApp(self.app_factory())
+        except Exception:
+            with self._condition:
+                self._total -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, pooled, healthy):
+        pooled.jobs += 1
+        if healthy:
+            self._close_leftover_books(pooled.app)
+
+        recycle = not healthy or pooled.jobs >= self.max_jobs_per_app
+        with self._condition:
+            if recycle or self._closed:
+                self._total -= 1
+            else:
+                self._idle.append(pooled)
+            self._condition.notify()
+
+        if recycle or self._closed:
+            self._quit(pooled)
+
+    def _close_leftover_books(self, app):
+        """Fecha workbooks que o chamador esqueceu abertos, sem salvar"""
+        try:
+            for book in list(app.books):
+                book.close()
+        except Exception as e:
+            print(f"WARN: Falha ao fechar workbooks pendentes: {e}")
+
+    def _quit(self, pooled):
+        try:
+            pooled.app.quit()
+        except Exception as e:
+            print(f"WARN: Falha ao encerrar instância do Excel: {e}")
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_excel_pool():
+    """Pool padrão do processo, configurado pelas variáveis de ambiente"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ExcelAppPool(
+                max_size=int(os.getenv("EXCEL_POOL_MAX_SIZE", "1")),
+                max_jobs_per_app=int(os.getenv("EXCEL_POOL_MAX_JOBS", "50"))
+            )
+            atexit.register(_default_pool.close)
+        return _default_pool
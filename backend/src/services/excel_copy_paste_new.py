@@ -1,57 +1,180 @@
 import sys
-import requests
 import json
 from datetime import datetime
-import xlwings as xw
 import os
-import tempfile
-import base64
-import re
-import dotenv
-
-dotenv.load_dotenv()  # Carrega variáveis de ambiente do arquivo .env
-
-# É necessário instalar a biblioteca BeautifulSoup4: pip install beautifulsoup4
-from bs4 import BeautifulSoup
-
-# É necessário instalar a biblioteca pywin32: pip install pywin32
-import win32clipboard
-
-# Configurar encoding UTF-8 para saída
-sys.stdout.reconfigure(encoding='utf-8')
-sys.stderr.reconfigure(encoding='utf-8')
-
-# Configurações do Microsoft Graph (mesmas do sistema atual)
-CONFIG = {
-    "client_id": "de286ff7-cc71-4a79-90c3-c04b61e3b948",
-    "client_secret": os.getenv("GRAPH_CLIENT_SECRET"),
-    "tenant_id": os.getenv("GRAPH_TENANT_ID"),
-    "sender_email": os.getenv("EMAIL_SENDER"),
-    "authority": f"https://login.microsoftonline.com/{os.getenv('GRAPH_TENANT_ID')}",
-    "token_url": f"https://login.microsoftonline.com/{os.getenv('GRAPH_TENANT_ID')}/oauth2/v2.0/token",
-    "graph_url": "https://graph.microsoft.com/v1.0"
+import time
+import contextlib
+import importlib.util
+
+# Só o que todos os comandos usam é importado aqui. O resto (openpyxl, lxml,
+# requests, xlwings...) é importado no caminho que o usa, para que um "extract"
+# não pague pelo envio de e-mail nem o envio pague pelo Excel
+from excel_app_pool import get_excel_pool
+from clipboard_broker import get_clipboard_broker, ClipboardTimeoutError
+from html_cache import get_html_cache
+from service_env import load_env, get_graph_config
+from send_stages import run_stages, format_timings
+from result_protocol import enable_framed_output, emit_result, emit_bytes, spill_large
+from stage_metrics import span, job_metrics
+
+# Client ID do Microsoft Graph (mesmo do sistema atual); o restante da
+# configuração vem do .env, montada só quando um e-mail vai ser enviado
+GRAPH_CLIENT_ID = "de286ff7-cc71-4a79-90c3-c04b61e3b948"
+
+
+def get_config():
+    """Configuração do Microsoft Graph"""
+    return get_graph_config(client_id=GRAPH_CLIENT_ID)
+
+# Incrementar quando o pós-processamento do HTML mudar, para invalidar o cache
+HTML_EXTRACTOR_VERSION = 3
+
+# Estilos aplicados à tabela extraída (tabela, células de cabeçalho e linhas de dados)
+TABLE_STYLES = {
+    "table_style": 'border-collapse: collapse; font-family: Arial, sans-serif; font-size: 11px; width: 100%; margin: 10px 0;',
+    "header_style": 'border: 1px solid #666; padding: 8px; text-align: center; background-color: #f0f0f0; font-weight: bold;',
+    "body_style": 'border: 1px solid #ccc; padding: 6px; vertical-align: top;'
 }
 
 
 def get_access_token(config):
-    """Obtém o token de acesso da API Microsoft Graph"""
-    data = {
-        'client_id': config['client_id'],
-        'client_secret': config['client_secret'],
-        'scope': 'https://graph.microsoft.com/.default',
-        'grant_type': 'client_credentials'
-    }
+    """Obtém o token de acesso da API Microsoft Graph (reaproveitado enquanto for válido)"""
+    from graph_token import get_token_provider
     try:
-        response = requests.post(config['token_url'], data=data)
-        response.raise_for_status()
+        token = get_token_provider(config).get_token()
         print("   -> Token obtido com sucesso.")
-        return response.json()['access_token']
+        return token
     except Exception as e:
         print(f"❌ Erro ao obter token: {e}")
         return None
 
 
-def extract_excel_data(excel_file_path):
+def get_extraction_method(method=None):
+    """
+    Define o extrator de HTML: 'clipboard' (Excel + win32clipboard) ou 'openpyxl'
+    (renderizador nativo). Pode ser forçado pela variável EXCEL_HTML_EXTRACTOR.
+    """
+    method = method or os.getenv("EXCEL_HTML_EXTRACTOR")
+    if method:
+        return method
+    return "clipboard" if clipboard_available() else "openpyxl"
+
+
+def clipboard_available():
+    """
+    xlwings e pywin32 só existem no Windows com Excel instalado; sem eles a
+    extração usa o renderizador nativo (openpyxl_html_renderer). Só verifica se
+    estão instalados, sem importá-los.
+    """
+    return all(importlib.util.find_spec(name) is not None for name in ("xlwings", "win32clipboard"))
+
+
+def copy_range_html_via_clipboard(excel_file_path):
+    """Abre a planilha no Excel, copia A1:L{last_row} e lê o "HTML Format" do clipboard"""
+    print("   -> Arquivo encontrado, abrindo com xlwings...")
+
+    # Pegar uma instância do Excel já aberta no pool
+    with get_excel_pool().borrow() as app:
+        print("   -> Aplicação Excel obtida do pool")
+
+        with span("excel.open"):
+            wb = app.books.open(excel_file_path)
+        try:
+            sheet = wb.sheets[0]
+
+            print("   -> Planilha aberta")
+
+            # Determinar o último linha usada
+            last_row = sheet.used_range.last_cell.row
+            target_range = sheet.range(f'A1:L{last_row}')
+
+            # O broker serializa o uso do clipboard e espera os dados chegarem, sem sleep fixo
+            with get_clipboard_broker().session() as clipboard:
+                since = clipboard.sequence_number()
+
+                print(f"   -> Copiando o range da tabela: A1:L{last_row}")
+                with span("excel.copy", rows=last_row):
+                    target_range.copy()
+
+                print("   -> Range copiado, aguardando HTML no clipboard...")
+                try:
+                    data = clipboard.wait_for_formats(["HTML Format"], since=since)
+                except ClipboardTimeoutError:
+                    print("   -> ERRO: Formato HTML não encontrado no clipboard")
+                    raise RuntimeError("Formato HTML não encontrado no clipboard.")
+
+            raw_html_from_excel = data["HTML Format"].decode('utf-8', errors='ignore')
+            print(f"   -> HTML obtido do clipboard, tamanho: {len(raw_html_from_excel)} caracteres")
+        finally:
+            # Fecha só o workbook; a instância do Excel volta para o pool
+            with span("excel.close"):
+                wb.close()
+            print("   -> Workbook fechado.")
+
+    return raw_html_from_excel, f"A1:L{last_row}"
+
+
+def _html_cache_key(cache, excel_file_path, method):
+    return cache.make_key(excel_file_path, sheet=0, cell_range="A1:L{last_row}",
+                          extractor=f"extract_excel_data/{method}", version=HTML_EXTRACTOR_VERSION)
+
+
+def iter_excel_html(excel_file_path, method, info=None):
+    """
+    Gera a tabela da planilha já com o CSS inline, em pedaços (uma linha por vez).
+
+    Pelo openpyxl a planilha é lida e convertida linha a linha, sem montar o HTML
+    inteiro; pelo clipboard o HTML chega inteiro do Excel, mas é interpretado e
+    entregue aos poucos (sem montar a árvore do documento inteiro).
+
+    Args:
+        info: Dict opcional; ao terminar recebe "range", "tableFound" e "imagesRemoved"
+    """
+    from css_inliner import iter_inline_css, iter_inline_table
+
+    info = {} if info is None else info
+    if method == "openpyxl":
+        from openpyxl_html_renderer import iter_table_html
+
+        print("   -> Renderizando tabela com openpyxl (sem Excel/clipboard)...")
+        # A tabela nativa já vem com estilos inline: só recebe os estilos da tabela, linha a linha
+        yield from iter_inline_table(iter_table_html(excel_file_path, info=info), stats=info, **TABLE_STYLES)
+        return
+
+    with span("extract.clipboard"):
+        raw_html, info["range"] = copy_range_html_via_clipboard(excel_file_path)
+
+    # CSS inline, remoção de imagens quebradas e estilos da tabela numa única passada.
+    # As regras por elemento (td { ... }) do Excel ficam de fora: a tabela recebe fonte e bordas próprias
+    print("   -> Processando HTML...")
+    yield from iter_inline_css(raw_html, inline_element_rules=False, stats=info, **TABLE_STYLES)
+
+
+def stream_excel_html(excel_file_path, method=None, info=None):
+    """
+    Como extract_excel_data, mas entrega o HTML em pedaços para quem consome em streaming.
+
+    Se a planilha já estiver no cache, o HTML guardado sai de uma vez; senão é
+    gerado linha a linha e não é guardado (guardar exigiria montá-lo inteiro).
+    """
+    info = {} if info is None else info
+    if not os.path.exists(excel_file_path):
+        raise FileNotFoundError(f"Arquivo não encontrado: {excel_file_path}")
+
+    method = get_extraction_method(method)
+    cache = get_html_cache()
+    cache_key = _html_cache_key(cache, excel_file_path, method)
+    cached_result = cache.get(cache_key)
+    if cached_result is not None:
+        print("   -> HTML obtido do cache (planilha sem alterações)")
+        info["range"] = cached_result["range"]
+        yield cached_result["clipboardData"]
+        return
+
+    yield from iter_excel_html(excel_file_path, method, info)
+
+
+def extract_excel_data(excel_file_path, method=None):
     """Extrai dados da planilha Excel e retorna HTML formatado"""
     try:
         print("📊 Extraindo dados da planilha Excel...")
@@ -63,109 +186,40 @@ def extract_excel_data(excel_file_path):
             print(f"   -> ERRO: Arquivo não encontrado: {excel_file_path}")
             return {"success": False, "error": f"Arquivo não encontrado: {excel_file_path}"}
 
-        print("   -> Arquivo encontrado, abrindo com xlwings...")
-
-        # Abrir Excel com xlwings
-        app = xw.App(visible=False, add_book=False)
-        app.display_alerts = False
+        method = get_extraction_method(method)
 
-        print("   -> Aplicação Excel iniciada")
+        # Mesma planilha (mesmo conteúdo) já extraída antes: não precisa abrir o Excel
+        cache = get_html_cache()
+        with span("html_cache.get") as cache_span:
+            cache_key = _html_cache_key(cache, excel_file_path, method)
+            cached_result = cache.get(cache_key)
+            cache_span.set(hit=cached_result is not None)
+        if cached_result is not None:
+            print("   -> HTML obtido do cache (planilha sem alterações)")
+            return cached_result
 
-        wb = app.books.open(excel_file_path)
-        sheet = wb.sheets[0]
+        info = {}
+        # Extração e pós-processamento (CSS inline) acontecem na mesma passada, linha a linha
+        with span("extract.html", method=method) as html_span:
+            final_html = ''.join(iter_excel_html(excel_file_path, method, info))
+            html_span.set(bytes=len(final_html), imagesRemoved=info["imagesRemoved"])
+        range_ref = info["range"]
 
-        print("   -> Planilha aberta")
-
-        # Determinar o último linha usada
-        last_row = sheet.used_range.last_cell.row
-        target_range = sheet.range(f'A1:L{last_row}')
-
-        print(f"   -> Copiando o range da tabela: A1:L{last_row}")
-        target_range.copy()
-
-        print("   -> Range copiado para clipboard")
-
-        # Obter dados do clipboard
-        print("   -> Abrindo clipboard...")
-        win32clipboard.OpenClipboard()
-        try:
-            CF_HTML = win32clipboard.RegisterClipboardFormat("HTML Format")
-            print(f"   -> Formato HTML registrado: {CF_HTML}")
-
-            if win32clipboard.IsClipboardFormatAvailable(CF_HTML):
-                print("   -> Formato HTML disponível no clipboard")
-                raw_html_from_excel = win32clipboard.GetClipboardData(CF_HTML).decode('utf-8', errors='ignore')
-                print(f"   -> HTML obtido do clipboard, tamanho: {len(raw_html_from_excel)} caracteres")
-            else:
-                print("   -> ERRO: Formato HTML não encontrado no clipboard")
-                raise RuntimeError("Formato HTML não encontrado no clipboard.")
-        finally:
-            win32clipboard.CloseClipboard()
-            print("   -> Clipboard fechado")
-
-        # Fechar Excel
-        wb.close()
-        app.quit()
-        print("   -> Instância do Excel fechada.")
-
-        # Processar HTML
-        print("   -> Processando HTML...")
-        soup = BeautifulSoup(raw_html_from_excel, 'html.parser')
-
-        # Remover imagens quebradas
-        broken_images_found = 0
-        for img_tag in soup.find_all('img'):
-            img_tag.decompose()
-            broken_images_found += 1
-
-        if broken_images_found > 0:
-            print(f"   -> {broken_images_found} referência(s) de imagem quebrada removida(s).")
-
-        # Processar CSS inline
-        style_tag = soup.find('style')
-        if style_tag and style_tag.string:
-            css_rules = {m.group(1): m.group(2).strip().replace('"', "'") for m in re.finditer(r'\.([a-zA-Z0-9_-]+)\s*\{([^}]+)\}', style_tag.string)}
-            if css_rules:
-                for tag in soup.find_all(class_=True):
-                    s = tag.get('style', '')
-                    tag['style'] = s + (';' if s else '') + ';'.join([css_rules[cn] for cn in tag['class'] if cn in css_rules])
-
-        # Remover tag style após processar
-        if style_tag:
-            style_tag.decompose()
-
-        # Encontrar e formatar tabela
-        table = soup.find('table')
-        if table:
-            table['style'] = 'border-collapse: collapse; font-family: Arial, sans-serif; font-size: 11px; width: 100%; margin: 10px 0;'
-
-            # Estilizar cabeçalhos
-            headers = table.find_all(['td', 'th'])[:12] if table.find_all(['td', 'th']) else []
-            for header in headers:
-                current_style = header.get('style', '')
-                header['style'] = current_style + (';' if current_style else '') + 'border: 1px solid #666; padding: 8px; text-align: center; background-color: #f0f0f0; font-weight: bold;'
-
-            # Estilizar células de dados
-            rows = table.find_all('tr')[1:] if len(table.find_all('tr')) > 1 else []
-            for row in rows:
-                cells = row.find_all(['td', 'th'])
-                for cell in cells:
-                    current_style = cell.get('style', '')
-                    cell['style'] = current_style + (';' if current_style else '') + 'border: 1px solid #ccc; padding: 6px; vertical-align: top;'
-
-            final_html = str(table)
-        else:
-            final_html = str(soup)
+        if info["imagesRemoved"] > 0:
+            print(f"   -> {info['imagesRemoved']} referência(s) de imagem quebrada removida(s).")
 
         print(f"   -> HTML processado, tamanho final: {len(final_html)} caracteres")
 
-        return {
+        result = {
             "success": True,
             "clipboardData": final_html,
-            "range": f"A1:L{last_row}",
+            "range": range_ref,
             "format": "html",
-            "method": "xlwings_win32clipboard"
+            "method": "openpyxl_native" if method == "openpyxl" else "xlwings_win32clipboard"
         }
+        with span("html_cache.set"):
+            cache.set(cache_key, result)
+        return result
 
     except Exception as e:
         import traceback
@@ -175,99 +229,186 @@ def extract_excel_data(excel_file_path):
         return {"success": False, "error": str(e)}
 
 
+def iter_email_body(grupo, table_chunks, additional_message=None):
+    """Monta o corpo HTML do e-mail em pedaços, repassando a tabela à medida que é gerada"""
+    if additional_message is None:
+        additional_message = f"""
+        <p style="color: #374151; line-height: 1.6; margin: 0 0 15px 0;">
+            Equipe, boa tarde!
+        </p>
+        <p style="color: #374151; line-height: 1.6; margin: 0 0 25px 0;">
+            Encaminho abaixo as informações da ficha de entrada do cliente <strong>{grupo}</strong> para ciência e acompanhamento:
+        </p>
+        """
+
+    yield f"""
+    <html>
+    <body style="font-family: 'Segoe UI', Arial, sans-serif; max-width: 1000px; margin: 0 auto;">
+        <div style="background: white; padding: 20px; border-radius: 8px;">
+            {additional_message}
+            <div style="margin: 25px 0; overflow-x: auto;">
+                """
+    yield from table_chunks
+    yield f"""
+            </div>
+            <p style="color: #6b7280; font-size: 12px; margin: 20px 0 0 0; font-style: italic;">
+                * Dados copiados diretamente da planilha Excel
+            </p>
+            <p style="color: #9ca3af; font-size: 10px; margin: 10px 0 0 0;">
+                E-mail gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}
+            </p>
+        </div>
+    </body>
+    </html>
+    """
+
+
+def build_email_body(grupo, table_html, additional_message=None):
+    """Monta o corpo HTML do e-mail com a tabela extraída da planilha"""
+    return ''.join(iter_email_body(grupo, [table_html], additional_message))
+
+
 def send_email(to_email, subject, grupo, excel_file_path, additional_message=None):
     """Envia email com dados da planilha extraídos"""
     try:
         print(f"📧 Preparando envio de email para {to_email}...")
-
-        # Extrair dados da planilha
-        extraction_result = extract_excel_data(excel_file_path)
+        started = time.perf_counter()
+        config = get_config()
+
+        # Extrair dados da planilha (nesta thread) enquanto o token de acesso é obtido em paralelo
+        print("🔑 Obtendo token de acesso em paralelo à extração...")
+        stages, timings = run_stages({
+            "extract": lambda: extract_excel_data(excel_file_path),
+            "token": lambda: get_access_token(config)
+        }, on_caller="extract")
+        extraction_result = stages["extract"]
         if not extraction_result["success"]:
             return {"success": False, "error": extraction_result["error"]}
-
-        # Obter token de acesso
-        print("🔑 Obtendo token de acesso...")
-        token = get_access_token(CONFIG)
-        if not token:
+        if not stages["token"]:
             return {"success": False, "error": "Falha ao obter token de acesso"}
 
-        # Preparar corpo do email
-        if additional_message is None:
-            additional_message = f"""
-            <p style="color: #374151; line-height: 1.6; margin: 0 0 15px 0;">
-                Equipe, boa tarde!
-            </p>
-            <p style="color: #374151; line-height: 1.6; margin: 0 0 25px 0;">
-                Encaminho abaixo as informações da ficha de entrada do cliente <strong>{grupo}</strong> para ciência e acompanhamento:
-            </p>
-            """
-
-        body_html = f"""
-        <html>
-        <body style="font-family: 'Segoe UI', Arial, sans-serif; max-width: 1000px; margin: 0 auto;">
-            <div style="background: white; padding: 20px; border-radius: 8px;">
-                {additional_message}
-                <div style="margin: 25px 0; overflow-x: auto;">
-                    {extraction_result["clipboardData"]}
-                </div>
-                <p style="color: #6b7280; font-size: 12px; margin: 20px 0 0 0; font-style: italic;">
-                    * Dados copiados diretamente da planilha Excel
-                </p>
-                <p style="color: #9ca3af; font-size: 10px; margin: 10px 0 0 0;">
-                    E-mail gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-
-        # Preparar dados do email
-        email_data = {{
-            "message": {{
-                "subject": subject,
-                "body": {{
-                    "contentType": "HTML",
-                    "content": body_html
-                }},
-                "toRecipients": [{{
-                    "emailAddress": {{
-                        "address": to_email
-                    }}
-                }}]
-            }}
-        }}
-
-        # Enviar email
-        send_url = f"{CONFIG['graph_url']}/users/{CONFIG['sender_email']}/sendMail"
-        print(f"✉️ Enviando email para {to_email}...")
+        from graph_mail import GraphMailClient, build_message
 
-        response = requests.post(
-            send_url,
-            headers={{
-                'Authorization': f'Bearer {token}',
-                'Content-Type': 'application/json'
-            }},
-            json=email_data
-        )
+        # Preparar corpo e dados do email
+        with span("body") as body_span:
+            body_html = build_email_body(grupo, extraction_result["clipboardData"], additional_message)
+            email_data = build_message(subject, body_html, [to_email])
+            body_span.set(bytes=len(body_html))
 
-        response.raise_for_status()
+        # Enviar email (o token obtido acima fica no cache do provider)
+        print(f"✉️ Enviando email para {to_email}...")
+        send_started = time.perf_counter()
+        client = GraphMailClient(config, max_workers=1)
+        try:
+            send_result = client.send_mail(email_data)
+        finally:
+            client.close()
+        timings["send"] = round(time.perf_counter() - send_started, 3)
+        timings["total"] = round(time.perf_counter() - started, 3)
+        print(f"⏱️ Etapas: {format_timings(timings)}")
+        if not send_result["success"]:
+            raise RuntimeError(send_result["error"])
         print("✅ Email enviado com sucesso!")
 
-        return {{
+        return {
             "success": True,
             "message": "Email enviado com sucesso",
             "recipient": to_email,
             "subject": subject,
-            "dataExtracted": len(extraction_result["clipboardData"])
-        }}
+            "dataExtracted": len(extraction_result["clipboardData"]),
+            "timings": timings
+        }
 
     except Exception as e:
         print(f"❌ Erro no envio do email: {e}")
         return {"success": False, "error": str(e)}
 
 
+def send_email_batch(jobs, max_concurrency=None):
+    """
+    Envia fichas para vários destinatários de uma vez.
+
+    Cada planilha é extraída uma única vez e cada corpo de e-mail é montado uma
+    única vez, enquanto o token do Graph é obtido em paralelo; os envios (um por
+    destinatário) saem em paralelo por uma sessão HTTP compartilhada,
+    respeitando o Retry-After do Graph.
+
+    Args:
+        jobs: Lista de dicts {"excel_file_path", "recipients", "subject", "grupo", "additional_message"?}
+        max_concurrency: Envios simultâneos (padrão MAIL_MAX_CONCURRENCY)
+
+    Returns:
+        Dict com "success", "results" (um item por destinatário) e "timings" (segundos por etapa)
+    """
+    from graph_mail import GraphMailClient, build_message
+
+    results = []
+    pending = []  # (resultado parcial, payload) de cada destinatário
+    extractions = {}
+    bodies = {}
+    started = time.perf_counter()
+    config = get_config()
+
+    def prepare():
+        for job in jobs:
+            excel_path = job["excel_file_path"]
+            recipients = job["recipients"]
+            if isinstance(recipients, str):
+                recipients = [r.strip() for r in recipients.split(',') if r.strip()]
+
+            if excel_path not in extractions:
+                extractions[excel_path] = extract_excel_data(excel_path)
+            extraction = extractions[excel_path]
+
+            if not extraction["success"]:
+                for recipient in recipients:
+                    results.append({"recipient": recipient, "excel_file_path": excel_path,
+                                    "success": False, "error": extraction["error"]})
+                continue
+
+            body_key = (excel_path, job["grupo"], job.get("additional_message"))
+            if body_key not in bodies:
+                with span("body") as body_span:
+                    bodies[body_key] = build_email_body(job["grupo"], extraction["clipboardData"], job.get("additional_message"))
+                    body_span.set(bytes=len(bodies[body_key]))
+
+            for recipient in recipients:
+                result = {"recipient": recipient, "excel_file_path": excel_path, "subject": job["subject"]}
+                results.append(result)
+                pending.append((result, build_message(job["subject"], bodies[body_key], [recipient])))
+
+    # Extrai as planilhas e monta os corpos (nesta thread) enquanto o token é obtido em paralelo
+    _, timings = run_stages({"prepare": prepare, "token": lambda: get_access_token(config)}, on_caller="prepare")
+
+    if pending:
+        print(f"✉️ Enviando {len(pending)} email(s) de {len(extractions)} planilha(s)...")
+        send_started = time.perf_counter()
+        client = GraphMailClient(config, max_workers=max_concurrency)
+        try:
+            send_results = client.send_many([message for _, message in pending])
+        finally:
+            client.close()
+        timings["send"] = round(time.perf_counter() - send_started, 3)
+        for (result, _), send_result in zip(pending, send_results):
+            result.update(send_result)
+    timings["total"] = round(time.perf_counter() - started, 3)
+    print(f"⏱️ Etapas: {format_timings(timings)}")
+
+    sent = sum(1 for r in results if r.get("success"))
+    print(f"✅ {sent}/{len(results)} email(s) enviados")
+    return {"success": sent == len(results), "sent": sent, "failed": len(results) - sent, "results": results,
+            "timings": timings}
+
+
 def main():
     """Função principal que pode ser chamada de diferentes formas"""
+    # Configurar encoding UTF-8 para saída
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+    # Com --framed, os logs vão para o stderr e o resultado sai como frame no stdout
+    enable_framed_output()
+    load_env()
+
     if len(sys.argv) < 2:
         print("❌ Uso incorreto. Use:")
         print("   python excel_copy_paste.py <caminho_planilha> [modo] [parametros...]")
@@ -275,22 +416,62 @@ def main():
         print("Modos disponíveis:")
         print("   extract    - Apenas extrair dados da planilha")
         print("   send       - Extrair dados e enviar email")
+        print("   send-many  - Extrair uma vez e enviar para vários emails (separados por vírgula)")
+        print("   batch      - Enviar vários jobs descritos em um manifesto JSON")
+        print("   stream     - Escrever a tabela (ou o corpo do e-mail, com o grupo) no stdout à medida que é gerada")
+        print("")
+        print("Com --framed, os logs vão para o stderr e o resultado sai no stdout como frame")
+        print("(tipo + tamanho + JSON, com o tempo de cada etapa em \"metrics\"); o HTML grande")
+        print("vai para um arquivo temporário.")
         print("")
         print("Exemplos:")
         print("   python excel_copy_paste.py planilha.xlsx extract")
         print("   python excel_copy_paste.py planilha.xlsx send email@exemplo.com 'Assunto' 'Grupo'")
+        print("   python excel_copy_paste.py planilha.xlsx send-many a@exemplo.com,b@exemplo.com 'Assunto' 'Grupo'")
+        print("   python excel_copy_paste.py jobs.json batch")
+        print("   python excel_copy_paste.py planilha.xlsx stream 'Grupo'")
+        emit_result({"success": False, "error": "Uso incorreto"})
         sys.exit(1)
 
     excel_path = sys.argv[1]
 
     if len(sys.argv) == 2 or (len(sys.argv) >= 3 and sys.argv[2] == "extract"):
         # Modo: apenas extrair dados
-        result = extract_excel_data(excel_path)
+        with job_metrics("extract") as metrics:
+            result = extract_excel_data(excel_path)
+        framed = {**result, "clipboardData": spill_large(result["clipboardData"])} if result["success"] else result
+        if emit_result({**framed, "metrics": metrics}):
+            sys.exit(0 if result["success"] else 1)
         if result["success"]:
             print(f"SUCCESS:{result['clipboardData']}")
         else:
             print(f"ERROR:{result['error']}")
 
+    elif len(sys.argv) >= 3 and sys.argv[2] == "stream":
+        # Modo: HTML em streaming. O stdout leva só o HTML; os logs vão para o stderr.
+        # Com --framed, cada pedaço vai num frame binário e o fim num frame JSON com o range
+        out = sys.stdout
+        info = {}
+        try:
+            with contextlib.redirect_stdout(sys.stderr), job_metrics("stream") as metrics:
+                chunks = stream_excel_html(excel_path, info=info)
+                if len(sys.argv) > 3:
+                    chunks = iter_email_body(sys.argv[3], chunks, sys.argv[4] if len(sys.argv) > 4 else None)
+                with span("stream.html") as write_span:
+                    written = 0
+                    for chunk in chunks:
+                        data = chunk.encode('utf-8')
+                        written += len(data)
+                        if not emit_bytes(data):
+                            out.write(chunk)
+                            out.flush()
+                    write_span.set(bytes=written)
+            emit_result({"success": True, "range": info.get("range"), "metrics": metrics})
+        except Exception as e:
+            emit_result({"success": False, "error": str(e)})
+            print(f"ERROR:{e}", file=sys.stderr)
+            sys.exit(1)
+
     elif len(sys.argv) >= 6 and sys.argv[2] == "send":
         # Modo: extrair e enviar email
         to_email = sys.argv[3]
@@ -298,15 +479,42 @@ def main():
         grupo = sys.argv[5]
         additional_message = sys.argv[6] if len(sys.argv) > 6 else None
 
-        result = send_email(to_email, subject, grupo, excel_path, additional_message)
+        with job_metrics("send") as metrics:
+            result = send_email(to_email, subject, grupo, excel_path, additional_message)
 
+        if emit_result({**result, "metrics": metrics}):
+            sys.exit(0 if result["success"] else 1)
         if result["success"]:
             print(f"SUCCESS_EMAIL:{json.dumps(result)}")
         else:
             print(f"ERROR_EMAIL:{result['error']}")
 
+    elif len(sys.argv) >= 6 and sys.argv[2] == "send-many":
+        # Modo: uma planilha, vários destinatários
+        with job_metrics("send-many") as metrics:
+            result = send_email_batch([{
+                "excel_file_path": excel_path,
+                "recipients": sys.argv[3],
+                "subject": sys.argv[4],
+                "grupo": sys.argv[5],
+                "additional_message": sys.argv[6] if len(sys.argv) > 6 else None
+            }])
+        if not emit_result({**result, "metrics": metrics}):
+            print(f"SUCCESS_BATCH:{json.dumps(result)}")
+
+    elif len(sys.argv) >= 3 and sys.argv[2] == "batch":
+        # Modo: manifesto JSON com uma lista de jobs (planilha + destinatários)
+        with open(excel_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        jobs = manifest["jobs"] if isinstance(manifest, dict) else manifest
+        with job_metrics("batch") as metrics:
+            result = send_email_batch(jobs)
+        if not emit_result({**result, "metrics": metrics}):
+            print(f"SUCCESS_BATCH:{json.dumps(result)}")
+
     else:
         print("❌ Modo não reconhecido ou parâmetros insuficientes")
+        emit_result({"success": False, "error": "Modo não reconhecido ou parâmetros insuficientes"})
         sys.exit(1)
 
 
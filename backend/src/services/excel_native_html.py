@@ -1,93 +1,64 @@
 
 import sys
-import xlwings as xw
-import win32clipboard
-import time
+from excel_app_pool import get_excel_pool
+from clipboard_broker import get_clipboard_broker, decode_clipboard_bytes, ClipboardTimeoutError, CF_UNICODETEXT
+from result_protocol import enable_framed_output, emit_result, spill_large
+from stage_metrics import span, job_metrics
 
 def get_excel_native_html(excel_file_path):
     try:
         print("Abrindo Excel para HTML NATIVO...")
         
-        # Abrir Excel (invisível mas com alertas desabilitados)
-        app = xw.App(visible=False, add_book=False)
-        app.display_alerts = False
-        app.screen_updating = False
-        
-        try:
+        # Pegar instância do Excel do pool (invisível, alertas e atualização de tela desabilitados)
+        with get_excel_pool().borrow() as app:
             # Abrir arquivo
-            wb = app.books.open(excel_file_path)
-            
-            # Selecionar primeira planilha
-            ws = wb.sheets[0]
-            
-            # Encontrar intervalo usado
-            used_range = ws.used_range
-            
-            if used_range is None:
-                return {"success": False, "error": "Planilha vazia"}
-            
-            print(f"Copiando intervalo NATIVO: {used_range.address}")
+            with span("excel.open"):
+                wb = app.books.open(excel_file_path)
             
-            # Limpar clipboard primeiro
             try:
-                win32clipboard.OpenClipboard()
-                win32clipboard.EmptyClipboard()
-                win32clipboard.CloseClipboard()
-            except:
-                pass
+                # Selecionar primeira planilha
+                ws = wb.sheets[0]
             
-            # Selecionar e copiar TUDO
-            used_range.select()
-            used_range.copy()
+                # Encontrar intervalo usado
+                used_range = ws.used_range
             
-            # Aguardar copy
-            print("Aguardando cópia para clipboard...")
-            time.sleep(5)
+                if used_range is None:
+                    return {"success": False, "error": "Planilha vazia"}
             
-                # Obter HTML EXATO do clipboard
-            win32clipboard.OpenClipboard()
-            try:
-                native_html = None
+                print(f"Copiando intervalo NATIVO: {used_range.address}")
+            
+                # O broker segura o clipboard só para este job e espera os dados chegarem
+                with get_clipboard_broker().session() as clipboard:
+                    # Limpar clipboard primeiro
+                    try:
+                        clipboard.empty()
+                    except Exception:
+                        pass
+                    since = clipboard.sequence_number()
                 
-                # Formato HTML do Excel
-                try:
-                    html_format = win32clipboard.RegisterClipboardFormat("HTML Format")
-                    if win32clipboard.IsClipboardFormatAvailable(html_format):
-                        html_data = win32clipboard.GetClipboardData(html_format)
-                        if html_data:
-                            if isinstance(html_data, bytes):
-                                # Tentar decodificar em utf-8, senão usar cp1252 (Windows-1252) como fallback
-                                try:
-                                    native_html = html_data.decode('utf-8')
-                                except Exception:
-                                    try:
-                                        native_html = html_data.decode('cp1252')
-                                    except Exception:
-                                        native_html = html_data.decode('latin-1', errors='ignore')
-                            else:
-                                native_html = str(html_data)
-                            print(f"HTML Format obtido: {len(native_html)} caracteres")
-                                
-                except Exception as e:
-                    print(f"Erro HTML Format: {e}")
+                    # Selecionar e copiar TUDO
+                    with span("excel.copy"):
+                        used_range.select()
+                        used_range.copy()
                 
-                # Se não conseguiu HTML, tentar outros formatos (Unicode Text)
-                if not native_html:
+                    # Aguardar copy (continua assim que o HTML ou o texto estiver disponível)
+                    print("Aguardando cópia para clipboard...")
                     try:
-                        CF_UNICODETEXT = 13
-                        if win32clipboard.IsClipboardFormatAvailable(CF_UNICODETEXT):
-                            text_data = win32clipboard.GetClipboardData(CF_UNICODETEXT)
-                            if text_data:
-                                if isinstance(text_data, bytes):
-                                    try:
-                                        native_html = text_data.decode('utf-8')
-                                    except Exception:
-                                        native_html = text_data.decode('cp1252', errors='ignore')
-                                else:
-                                    native_html = str(text_data)
-                                print(f"Unicode Text obtido: {len(native_html)} caracteres")
-                    except Exception as e:
-                        print(f"Erro Unicode Text: {e}")
+                        formats = clipboard.wait_for_formats(["HTML Format", CF_UNICODETEXT], since=since)
+                    except ClipboardTimeoutError:
+                        return {"success": False, "error": "Nenhum formato encontrado no clipboard"}
+                
+                native_html = None
+                
+                # Formato HTML do Excel (utf-8, com cp1252/latin-1 como fallback)
+                if formats.get("HTML Format"):
+                    native_html = decode_clipboard_bytes(formats["HTML Format"])
+                    print(f"HTML Format obtido: {len(native_html)} caracteres")
+                
+                # Se não conseguiu HTML, usar Unicode Text
+                if not native_html and formats.get(CF_UNICODETEXT):
+                    native_html = decode_clipboard_bytes(formats[CF_UNICODETEXT])
+                    print(f"Unicode Text obtido: {len(native_html)} caracteres")
                 
                 if native_html:
                     return {
@@ -96,27 +67,32 @@ def get_excel_native_html(excel_file_path):
                     }
                 else:
                     return {"success": False, "error": "Nenhum formato encontrado no clipboard"}
-                    
-            finally:
-                win32clipboard.CloseClipboard()
                 
-        finally:
-            # Fechar arquivo e Excel
-            wb.close()
-            app.quit()
+            finally:
+                # Fecha só o arquivo; a instância do Excel volta para o pool
+                with span("excel.close"):
+                    wb.close()
             
     except Exception as e:
         print(f"ERRO: {str(e)}")
         return {"success": False, "error": str(e)}
 
 if __name__ == "__main__":
+    # Com --framed, os logs vão para o stderr e o resultado sai como frame no stdout (HTML grande em arquivo)
+    enable_framed_output()
+
     if len(sys.argv) != 2:
-        print("ERRO: Uso correto: python excel_native_html.py <caminho_arquivo>")
+        print("ERRO: Uso correto: python excel_native_html.py <caminho_arquivo> [--framed]")
+        emit_result({"success": False, "error": "Uso incorreto"})
         sys.exit(1)
     
     excel_file = sys.argv[1]
-    result = get_excel_native_html(excel_file)
-    
+    with job_metrics("native_html") as metrics:
+        result = get_excel_native_html(excel_file)
+
+    framed = {**result, "nativeHtml": spill_large(result["nativeHtml"])} if result["success"] else result
+    if emit_result({**framed, "metrics": metrics}):
+        sys.exit(0 if result["success"] else 1)
     if result["success"]:
         print(f"SUCCESS:{result['nativeHtml']}")
     else:
@@ -1,85 +1,53 @@
 
 import sys
-import xlwings as xw
-import win32clipboard
-import time
+from excel_app_pool import get_excel_pool
+from clipboard_broker import get_clipboard_broker, ClipboardTimeoutError, CF_TEXT, CF_UNICODETEXT
 
 def get_raw_excel_content(excel_file_path):
     try:
         print("Abrindo Excel para copy RAW...")
         
-        # Abrir Excel (invisível)
-        app = xw.App(visible=False)
-        
-        try:
+        # Pegar instância do Excel (invisível) do pool
+        with get_excel_pool().borrow() as app:
             # Abrir arquivo
             wb = app.books.open(excel_file_path)
             
-            # Selecionar primeira planilha
-            ws = wb.sheets[0]
+            try:
+                # Selecionar primeira planilha
+                ws = wb.sheets[0]
             
-            # Encontrar intervalo usado
-            used_range = ws.used_range
+                # Encontrar intervalo usado
+                used_range = ws.used_range
             
-            if used_range is None:
-                return {"success": False, "error": "Planilha vazia"}
+                if used_range is None:
+                    return {"success": False, "error": "Planilha vazia"}
             
-            print(f"Copiando intervalo: {used_range.address}")
+                print(f"Copiando intervalo: {used_range.address}")
             
-            # Selecionar e copiar o intervalo COMPLETO
-            used_range.select()
-            used_range.copy()
+                # Nomes usados no resultado para cada formato de clipboard
+                format_names = [
+                    ("HTML", "HTML Format"),
+                    ("RTF", "Rich Text Format"),
+                    ("TEXT", CF_UNICODETEXT),
+                    ("ANSI", CF_TEXT),
+                ]
             
-            # Aguardar para garantir que foi copiado
-            time.sleep(2)
+                # O broker segura o clipboard só para este job e continua assim que os dados chegam
+                with get_clipboard_broker().session() as clipboard:
+                    since = clipboard.sequence_number()
             
-            # Obter conteúdo RAW da área de transferência
-            win32clipboard.OpenClipboard()
-            try:
-                # Constantes para formatos de clipboard
-                CF_TEXT = 1
-                CF_UNICODETEXT = 13
-                
-                formats = []
-                
-                # Formato HTML (registrar primeiro)
-                try:
-                    html_format = win32clipboard.RegisterClipboardFormat("HTML Format")
-                    if win32clipboard.IsClipboardFormatAvailable(html_format):
-                        html_data = win32clipboard.GetClipboardData(html_format)
-                        if html_data:
-                            formats.append(("HTML", str(html_data)))
-                except Exception as e:
-                    print(f"Erro ao obter HTML: {e}")
-                
-                # Formato RTF
-                try:
-                    rtf_format = win32clipboard.RegisterClipboardFormat("Rich Text Format")
-                    if win32clipboard.IsClipboardFormatAvailable(rtf_format):
-                        rtf_data = win32clipboard.GetClipboardData(rtf_format)
-                        if rtf_data:
-                            formats.append(("RTF", str(rtf_data)))
-                except Exception as e:
-                    print(f"Erro ao obter RTF: {e}")
-                
-                # Formato texto Unicode
-                try:
-                    if win32clipboard.IsClipboardFormatAvailable(CF_UNICODETEXT):
-                        text_data = win32clipboard.GetClipboardData(CF_UNICODETEXT)
-                        if text_data:
-                            formats.append(("TEXT", str(text_data)))
-                except Exception as e:
-                    print(f"Erro ao obter TEXT: {e}")
-                
-                # Formato texto simples
-                try:
-                    if win32clipboard.IsClipboardFormatAvailable(CF_TEXT):
-                        text_data = win32clipboard.GetClipboardData(CF_TEXT)
-                        if text_data:
-                            formats.append(("ANSI", str(text_data)))
-                except Exception as e:
-                    print(f"Erro ao obter ANSI: {e}")
-                
+                    # Selecionar e copiar o intervalo COMPLETO
+                    used_range.select()
+                    used_range.copy()
+            
+                    # Obter conteúdo RAW da área de transferência
+                    try:
+                        raw_formats = clipboard.wait_for_formats([fmt for _, fmt in format_names], since=since)
+                    except ClipboardTimeoutError:
+                        raw_formats = {}
+            
+                formats = [(name, str(raw_formats[fmt])) for name, fmt in format_names if raw_formats.get(fmt)]
+
                 if formats:
                     # Priorizar HTML se disponível, senão texto
                     best_format = formats[0]
@@ -89,10 +57,10 @@ def get_raw_excel_content(excel_file_path):
                             break
                         elif fmt_name == "TEXT" and best_format[0] not in ["HTML"]:
                             best_format = (fmt_name, fmt_data)
-                    
+                
                     print(f"Formato escolhido: {best_format[0]}")
                     print(f"Tamanho dos dados: {len(best_format[1])}")
-                    
+                
                     return {
                         "success": True, 
                         "rawContent": best_format[1],
@@ -101,14 +69,10 @@ def get_raw_excel_content(excel_file_path):
                     }
                 else:
                     return {"success": False, "error": "Nenhum formato válido na área de transferência"}
-                    
+
             finally:
-                win32clipboard.CloseClipboard()
-                
-        finally:
-            # Fechar arquivo e Excel
-            wb.close()
-            app.quit()
+                # Fecha só o arquivo; a instância do Excel volta para o pool
+                wb.close()
             
     except Exception as e:
         print(f"ERRO: {str(e)}")
@@ -1,49 +1,98 @@
 import os
 import sys
-import pandas as pd
-from PIL import Image, ImageDraw, ImageFont
-import openpyxl
-from openpyxl.drawing.image import Image as OpenpyxlImage
-import tempfile
-import subprocess
+import json
+import time
+
+# Cada método importa o próprio backend (xlwings, win32com, LibreOffice, aspose,
+# renderizador openpyxl) só quando é tentado
+from method_registry import get_method_registry
+from image_cache import get_image_cache
+from result_protocol import enable_framed_output, emit_result
+from stage_metrics import span, job_metrics
+
+# Versão da saída de cada método: incremente quando a imagem gerada mudar,
+# para que o cache de imagens (image_cache) não devolva a versão antiga
+METHOD_VERSIONS = {
+    "xlwings": 1,
+    "com": 1,
+    "aspose": 1,
+    "libreoffice": 2,
+    "openpyxl": 3
+}
+
+
+def _copy_picture_image(copy_picture):
+    """
+    Copia o range como bitmap (copy_picture) e lê a imagem do clipboard.
+
+    O clipboard é da máquina inteira: com conversões em paralelo (convert_many),
+    outro job poderia trocar a imagem entre a cópia e a leitura. O broker segura
+    o clipboard durante o ciclo e espera o CF_DIB novo, sem sleep fixo.
+    """
+    import io
+    from PIL import BmpImagePlugin
+    from clipboard_broker import get_clipboard_broker, CF_DIB
+
+    with get_clipboard_broker().session() as clipboard:
+        since = clipboard.sequence_number()
+        with span("excel.copy_picture"):
+            copy_picture()
+        with span("image.grab"):
+            data = clipboard.wait_for_formats([CF_DIB], since=since)[CF_DIB]
+    # Mesma leitura que o ImageGrab.grabclipboard faz com o CF_DIB
+    img = BmpImagePlugin.DibImageFile(io.BytesIO(data))
+    img.load()
+    return img
+
+
+def _method_dpi(method_key):
+    """Resolução da imagem gerada pelo método (faz parte da chave do cache)"""
+    if method_key == "libreoffice":
+        return int(os.getenv("LIBREOFFICE_DPI", "300"))
+    return 300
+
 
 class ExcelToImageConverter:
-    def __init__(self, excel_file_path):
+    def __init__(self, excel_file_path, max_tile_height=None, split_pages=False):
         self.excel_file_path = excel_file_path
+        self.max_tile_height = max_tile_height  # Altura máxima de cada faixa/página (padrão RENDER_MAX_TILE_HEIGHT)
+        self.split_pages = split_pages          # Gera uma imagem por página em vez de uma imagem única
+        self.last_method = None  # Nome do método que gerou a última imagem
+        self.last_pages = None   # Páginas geradas na última conversão (split_pages)
+        self.last_method_key = None
+        self.last_cached = False # Última imagem veio do cache (image_cache)
         
     def method_1_xlwings(self, sheet_name=None, output_path=None):
         """Método 1: Usando xlwings (Windows com Excel instalado)"""
         try:
             import xlwings as xw
+            from excel_app_pool import get_excel_pool
             
-            # Abre o Excel
-            app = xw.App(visible=False)
-            wb = app.books.open(self.excel_file_path)
-            
-            if sheet_name:
-                ws = wb.sheets[sheet_name]
-            else:
-                ws = wb.sheets[0]
-            
-            # Encontra a área usada
-            used_range = ws.used_range
-            
-            if not output_path:
-                output_path = f"{sheet_name or 'planilha'}.png"
-            
-            # Copia como imagem
-            used_range.api.CopyPicture(Format=2)  # xlBitmap
-            
-            # Salva a imagem usando PIL
-            from PIL import ImageGrab
-            img = ImageGrab.grabclipboard()
-            if img:
-                img.save(output_path, 'PNG', dpi=(300, 300))
-                print(f"SUCESSO Método xlwings: Imagem salva como {output_path}")
-                
-            # Fecha o Excel
-            wb.close()
-            app.quit()
+            # Pega uma instância do Excel já aberta no pool
+            with get_excel_pool().borrow() as app:
+                with span("excel.open"):
+                    wb = app.books.open(self.excel_file_path)
+                try:
+                    if sheet_name:
+                        ws = wb.sheets[sheet_name]
+                    else:
+                        ws = wb.sheets[0]
+                    
+                    # Encontra a área usada
+                    used_range = ws.used_range
+                    
+                    if not output_path:
+                        output_path = f"{sheet_name or 'planilha'}.png"
+                    
+                    # Copia como imagem (xlBitmap) e lê do clipboard pelo broker
+                    img = _copy_picture_image(lambda: used_range.api.CopyPicture(Format=2))
+                    with span("image.save", width=img.width, height=img.height):
+                        img.save(output_path, 'PNG', dpi=(300, 300))
+                    print(f"SUCESSO Método xlwings: Imagem salva como {output_path}")
+                finally:
+                    # Fecha só o workbook; o Excel volta para o pool
+                    with span("excel.close"):
+                        wb.close()
             
             return output_path
             
@@ -58,16 +107,16 @@ class ExcelToImageConverter:
         """Método 2: Usando COM automation (Windows)"""
         try:
             import win32com.client as win32
-            from PIL import ImageGrab
-            import time
             
             # Inicia Excel
-            excel = win32.gencache.EnsureDispatch('Excel.Application')
-            excel.Visible = False
-            excel.DisplayAlerts = False
+            with span("excel.start"):
+                excel = win32.gencache.EnsureDispatch('Excel.Application')
+                excel.Visible = False
+                excel.DisplayAlerts = False
             
             # Abre workbook
-            wb = excel.Workbooks.Open(os.path.abspath(self.excel_file_path))
+            with span("excel.open"):
+                wb = excel.Workbooks.Open(os.path.abspath(self.excel_file_path))
             
             if sheet_name:
                 ws = wb.Worksheets(sheet_name)
@@ -80,22 +129,19 @@ class ExcelToImageConverter:
             used_range = ws.UsedRange
             used_range.Select()
             
-            # Copia como imagem
-            used_range.CopyPicture(Format=2)  # xlBitmap
-            
             if not output_path:
                 output_path = f"{sheet_name or 'planilha'}.png"
             
-            # Captura da área de transferência
-            time.sleep(1)  # Aguarda um pouco
-            img = ImageGrab.grabclipboard()
-            if img:
+            # Copia como imagem (xlBitmap) e lê do clipboard pelo broker, sem espera fixa
+            img = _copy_picture_image(lambda: used_range.CopyPicture(Format=2))
+            with span("image.save", width=img.width, height=img.height):
                 img.save(output_path, 'PNG', dpi=(300, 300))
-                print(f"SUCESSO Método COM: Imagem salva como {output_path}")
+            print(f"SUCESSO Método COM: Imagem salva como {output_path}")
             
             # Fecha Excel
-            wb.Close(SaveChanges=False)
-            excel.Quit()
+            with span("excel.close"):
+                wb.Close(SaveChanges=False)
+                excel.Quit()
             
             return output_path
             
@@ -107,40 +153,22 @@ class ExcelToImageConverter:
             return None
     
     def method_3_libreoffice(self, sheet_name=None, output_path=None):
-        """Método 3: Usando LibreOffice via linha de comando"""
+        """Método 3: LibreOffice headless persistente (um soffice por worker, ver libreoffice_server)"""
         try:
+            from libreoffice_server import get_libreoffice_server
+
             if not output_path:
                 output_path = f"{sheet_name or 'planilha'}.png"
-            
-            # Converte para PDF primeiro, depois para imagem
-            temp_dir = tempfile.mkdtemp()
-            pdf_path = os.path.join(temp_dir, "temp.pdf")
-            
-            # Comando LibreOffice
-            cmd = [
-                "libreoffice",
-                "--headless",
-                "--convert-to", "pdf",
-                "--outdir", temp_dir,
-                self.excel_file_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                # Converte PDF para imagem usando PIL
-                try:
-                    from pdf2image import convert_from_path
-                    images = convert_from_path(pdf_path, dpi=300)
-                    if images:
-                        images[0].save(output_path, 'PNG')
-                        print(f"SUCESSO Método LibreOffice: Imagem salva como {output_path}")
-                        return output_path
-                except ImportError:
-                    print("ERRO pdf2image não instalado")
-            
+
+            # Só a aba pedida é exportada e rasterizada, na resolução LIBREOFFICE_DPI
+            with span("libreoffice.convert"):
+                get_libreoffice_server().convert_sheet_to_image(self.excel_file_path, output_path, sheet_name)
+            print(f"SUCESSO Método LibreOffice: Imagem salva como {output_path}")
+            return output_path
+
+        except ImportError:
+            print("ERRO pdf2image não instalado")
             return None
-            
         except Exception as e:
             print(f"ERRO no método LibreOffice: {e}")
             return None
@@ -151,7 +179,8 @@ class ExcelToImageConverter:
             from aspose.cells import Workbook, ImageType, ImageOrPrintOptions
             
             # Carrega workbook
-            workbook = Workbook(self.excel_file_path)
+            with span("aspose.load"):
+                workbook = Workbook(self.excel_file_path)
             
             if sheet_name:
                 worksheet = workbook.getWorksheets().get(sheet_name)
@@ -168,7 +197,8 @@ class ExcelToImageConverter:
             options.setResolution(300)
             
             # Converte para imagem
-            worksheet.toImage(output_path, options)
+            with span("aspose.render"):
+                worksheet.toImage(output_path, options)
             print(f"SUCESSO Método Aspose: Imagem salva como {output_path}")
             
             return output_path
@@ -181,225 +211,153 @@ class ExcelToImageConverter:
             return None
     
     def method_5_improved_openpyxl(self, sheet_name=None, output_path=None):
-        """Método 5: OpenPyXL melhorado com renderização mais precisa"""
+        """Método 5: OpenPyXL melhorado com renderização mais precisa (vetorizada, ver sheet_raster_renderer)"""
         try:
-            from openpyxl import load_workbook
-            from openpyxl.utils import get_column_letter
-            from PIL import Image, ImageDraw, ImageFont
-            import math
-            
-            wb = load_workbook(self.excel_file_path, data_only=False)
-            
-            if sheet_name:
-                ws = wb[sheet_name]
-            else:
-                ws = wb.active
-            
+            from sheet_raster_renderer import render_sheet_image, render_sheet_pages
+            from incremental_render import incremental_enabled, render_sheet_image_incremental
+
             if not output_path:
                 output_path = f"{sheet_name or 'planilha'}.png"
-            
-            # Calcula dimensões reais baseado no Excel
-            EXCEL_POINT_TO_PIXEL = 1.33  # Conversão mais precisa
-            DEFAULT_COL_WIDTH = 64  # Largura padrão em pixels
-            DEFAULT_ROW_HEIGHT = 20  # Altura padrão em pixels
-            
-            # Dimensões das colunas
-            col_widths = {}
-            for col in range(1, ws.max_column + 1):
-                col_letter = get_column_letter(col)
-                col_dim = ws.column_dimensions[col_letter]
-                if col_dim.width:
-                    # Conversão mais precisa da largura
-                    col_widths[col] = int(col_dim.width * 7.5)  # Fator de conversão do Excel
-                else:
-                    col_widths[col] = DEFAULT_COL_WIDTH
-            
-            # Dimensões das linhas
-            row_heights = {}
-            for row in range(1, ws.max_row + 1):
-                row_dim = ws.row_dimensions[row]
-                if row_dim.height:
-                    row_heights[row] = int(row_dim.height * EXCEL_POINT_TO_PIXEL)
-                else:
-                    row_heights[row] = DEFAULT_ROW_HEIGHT
-            
-            # Calcula tamanho total
-            total_width = sum(col_widths.values())
-            total_height = sum(row_heights.values())
-            
-            # Cria imagem com fundo branco
-            img = Image.new('RGB', (total_width, total_height), (255, 255, 255))
-            draw = ImageDraw.Draw(img)
-            
-            # Desenha grade de fundo (opcional)
-            current_y = 0
-            for row in range(1, ws.max_row + 1):
-                current_x = 0
-                for col in range(1, ws.max_column + 1):
-                    x1, y1 = current_x, current_y
-                    x2, y2 = current_x + col_widths[col], current_y + row_heights[row]
-                    
-                    # Desenha borda de célula muito sutil
-                    draw.rectangle([x1, y1, x2, y2], outline=(240, 240, 240), width=1)
-                    
-                    current_x += col_widths[col]
-                current_y += row_heights[row]
-            
-            # Desenha conteúdo das células
-            current_y = 0
-            for row in range(1, ws.max_row + 1):
-                current_x = 0
-                
-                for col in range(1, ws.max_column + 1):
-                    cell = ws.cell(row=row, column=col)
-                    
-                    x1, y1 = current_x, current_y
-                    x2, y2 = current_x + col_widths[col], current_y + row_heights[row]
-                    
-                    # Cor de fundo da célula
-                    if cell.fill and hasattr(cell.fill, 'start_color') and cell.fill.start_color.rgb:
-                        bg_color = self._hex_to_rgb(cell.fill.start_color.rgb)
-                        draw.rectangle([x1, y1, x2, y2], fill=bg_color)
-                    
-                    # Bordas da célula
-                    if cell.border:
-                        self._draw_precise_border(draw, x1, y1, x2, y2, cell.border)
-                    
-                    # Texto da célula
-                    if cell.value is not None:
-                        self._draw_cell_text(draw, cell, x1, y1, x2, y2)
-                    
-                    current_x += col_widths[col]
-                
-                current_y += row_heights[row]
-            
-            # Salva imagem em alta resolução
-            img.save(output_path, 'PNG', dpi=(300, 300), optimize=True)
+
+            if self.split_pages:
+                # Cada faixa vira uma página; a primeira representa o resultado
+                with span("raster.render", mode="pages") as render_span:
+                    self.last_pages = render_sheet_pages(self.excel_file_path, sheet_name, output_path, self.max_tile_height)
+                    render_span.set(pages=len(self.last_pages))
+                output_path = self.last_pages[0]
+            elif incremental_enabled():
+                # Repinta só os trechos alterados desde a última imagem desta aba
+                with span("raster.render") as render_span:
+                    _, info = render_sheet_image_incremental(self.excel_file_path, sheet_name, output_path)
+                    render_span.set(mode=info['mode'], segments=info['segments'], totalSegments=info['totalSegments'])
+                print(f"INFO: Renderização {info['mode']}: {info['segments']}/{info['totalSegments']} segmento(s) repintado(s)")
+            else:
+                with span("raster.render", mode="full"):
+                    render_sheet_image(self.excel_file_path, sheet_name, output_path, self.max_tile_height)
             print(f"SUCESSO Método OpenPyXL melhorado: Imagem salva como {output_path}")
-            
+
             return output_path
-            
+
         except Exception as e:
             print(f"ERRO no método OpenPyXL melhorado: {e}")
             return None
-    
-    def _hex_to_rgb(self, hex_color):
-        """Converte cor hex para RGB"""
-        if isinstance(hex_color, str) and len(hex_color) >= 6:
-            hex_color = hex_color[-6:]  # Pega os últimos 6 caracteres
-            try:
-                return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-            except:
-                pass
-        return (255, 255, 255)
-    
-    def _draw_precise_border(self, draw, x1, y1, x2, y2, border):
-        """Desenha bordas com mais precisão"""
-        border_color = (0, 0, 0)  # Preto
-        
-        if border.left and border.left.style:
-            width = 2 if border.left.style == 'thick' else 1
-            draw.line([(x1, y1), (x1, y2)], fill=border_color, width=width)
-        
-        if border.right and border.right.style:
-            width = 2 if border.right.style == 'thick' else 1
-            draw.line([(x2, y1), (x2, y2)], fill=border_color, width=width)
-        
-        if border.top and border.top.style:
-            width = 2 if border.top.style == 'thick' else 1
-            draw.line([(x1, y1), (x2, y1)], fill=border_color, width=width)
-        
-        if border.bottom and border.bottom.style:
-            width = 2 if border.bottom.style == 'thick' else 1
-            draw.line([(x1, y2), (x2, y2)], fill=border_color, width=width)
-    
-    def _draw_cell_text(self, draw, cell, x1, y1, x2, y2):
-        """Desenha texto da célula com formatação precisa"""
-        text = str(cell.value)
-        
-        # Fonte
-        try:
-            font_size = int(cell.font.size) if cell.font.size else 11
-            font = self._get_system_font(font_size, cell.font.bold if cell.font else False)
-        except:
-            font = ImageFont.load_default()
-        
-        # Cor do texto
-        if cell.font and cell.font.color and hasattr(cell.font.color, 'rgb'):
-            text_color = self._hex_to_rgb(cell.font.color.rgb)
-        else:
-            text_color = (0, 0, 0)
-        
-        # Calcula posição do texto
-        try:
-            bbox = draw.textbbox((0, 0), text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-        except:
-            text_width = len(text) * 8
-            text_height = 14
-        
-        # Alinhamento horizontal
-        cell_width = x2 - x1
-        if cell.alignment and cell.alignment.horizontal == 'center':
-            text_x = x1 + (cell_width - text_width) // 2
-        elif cell.alignment and cell.alignment.horizontal == 'right':
-            text_x = x2 - text_width - 3
-        else:
-            text_x = x1 + 3
-        
-        # Alinhamento vertical
-        cell_height = y2 - y1
-        if cell.alignment and cell.alignment.vertical == 'center':
-            text_y = y1 + (cell_height - text_height) // 2
-        elif cell.alignment and cell.alignment.vertical == 'bottom':
-            text_y = y2 - text_height - 2
-        else:
-            text_y = y1 + 2
-        
-        # Desenha o texto
-        draw.text((text_x, text_y), text, fill=text_color, font=font)
-    
-    def _get_system_font(self, size, bold=False):
-        """Obtém fonte do sistema"""
-        try:
-            if os.name == 'nt':  # Windows
-                font_name = "arial.ttf"
-                font_path = f"C:/Windows/Fonts/{font_name}"
-            else:  # Linux/Mac
-                font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
-            
-            if os.path.exists(font_path):
-                return ImageFont.truetype(font_path, size)
-        except:
-            pass
-        
-        return ImageFont.load_default()
-    
+
     def convert_to_image(self, sheet_name=None, output_path=None):
-        """Tenta diferentes métodos em ordem de precisão"""
+        """
+        Tenta diferentes métodos em ordem de precisão.
+
+        O registro de métodos (method_registry) pula os que não funcionam nesta
+        máquina e, por padrão, tenta primeiro o mais rápido entre os que funcionam.
+        Imagens já geradas para o mesmo conteúdo/aba/método vêm do cache
+        (image_cache); conversões simultâneas da mesma aba geram a imagem uma vez só.
+        """
         print("Tentando conversao com layout exato...")
+        self.last_pages = None
+        self.last_cached = False
+        output_path = output_path or f"{sheet_name or 'planilha'}.png"
         
         methods = [
-            ("xlwings (Excel + Windows)", self.method_1_xlwings),
-            ("COM Automation (Windows)", self.method_2_excel_com),
-            ("Aspose.Cells (Comercial)", self.method_4_aspose),
-            ("LibreOffice", self.method_3_libreoffice),
-            ("OpenPyXL Melhorado", self.method_5_improved_openpyxl)
+            ("xlwings", "xlwings (Excel + Windows)", self.method_1_xlwings),
+            ("com", "COM Automation (Windows)", self.method_2_excel_com),
+            ("aspose", "Aspose.Cells (Comercial)", self.method_4_aspose),
+            ("libreoffice", "LibreOffice", self.method_3_libreoffice),
+            ("openpyxl", "OpenPyXL Melhorado", self.method_5_improved_openpyxl)
         ]
-        
-        for method_name, method_func in methods:
+        registry = get_method_registry()
+        methods = registry.order(methods)
+
+        cache = get_image_cache()
+        if not cache.enabled:
+            return self._try_methods(methods, sheet_name, output_path)
+
+        # A paginação muda os arquivos gerados; a altura das páginas só importa com split_pages
+        options = f"pages:{self.max_tile_height or os.getenv('RENDER_MAX_TILE_HEIGHT', '')}" if self.split_pages else "single"
+        try:
+            # Inclui o hash do conteúdo da planilha
+            with span("image_cache.key"):
+                keys = [cache.make_key(self.excel_file_path, sheet_name, _method_dpi(key), key, METHOD_VERSIONS[key], options)
+                        for key, _, _ in methods]
+                job_key = cache.make_key(self.excel_file_path, sheet_name, '', 'job', '', options)
+        except OSError as e:
+            # Arquivo ilegível: os métodos relatam o erro, sem cache
+            print(f"WARN: Cache de imagens ignorado: {e}")
+            return self._try_methods(methods, sheet_name, output_path)
+
+        result = self._from_cache(cache, keys, methods, output_path)
+        if result:
+            return result
+
+        with cache.single_flight(job_key):
+            # Outro worker pode ter gerado a mesma imagem enquanto este esperava o lock
+            result = self._from_cache(cache, keys, methods, output_path, record_miss=False)
+            if result:
+                cache.record_collapsed()
+                return result
+
+            result = self._try_methods(methods, sheet_name, output_path)
+            if result:
+                key = keys[[method[0] for method in methods].index(self.last_method_key)]
+                with span("image_cache.put"):
+                    cache.put(key, self.last_pages or [result], self.last_method_key)
+            return result
+
+    def _from_cache(self, cache, keys, methods, output_path, record_miss=True):
+        if self.split_pages:
+            from sheet_raster_renderer import page_paths
+            paths_for = lambda count: page_paths(output_path, count)
+        else:
+            paths_for = lambda count: [output_path]
+
+        with span("image_cache.get") as cache_span:
+            hit = cache.get(keys, paths_for, record_miss=record_miss)
+            cache_span.set(hit=bool(hit))
+        if not hit:
+            return None
+
+        labels = {key: name for key, name, _ in methods}
+        self.last_method_key = hit["method"]
+        self.last_method = labels.get(hit["method"], hit["method"])
+        self.last_cached = True
+        if self.split_pages:
+            self.last_pages = hit["pages"]
+        print(f"SUCESSO imagem do cache: {hit['pages'][0]} ({self.last_method})")
+        return hit["pages"][0]
+
+    def _try_methods(self, methods, sheet_name, output_path):
+        registry = get_method_registry()
+        for method_key, method_name, method_func in methods:
             print(f"TENTANDO método: {method_name}")
-            result = method_func(sheet_name, output_path)
+            started = time.perf_counter()
+            with span("image.method", method=method_key) as method_span:
+                result = method_func(sheet_name, output_path)
+                method_span.set(ok=bool(result), bytes=_file_size(result))
+            elapsed = time.perf_counter() - started
             if result:
-                print(f"SUCESSO com método: {method_name}")
+                registry.record_success(method_key, elapsed)
+                print(f"SUCESSO com método: {method_name} ({elapsed:.2f}s)")
+                self.last_method = method_name
+                self.last_method_key = method_key
+                if self.split_pages and self.last_pages is None:
+                    # Métodos que geram uma imagem única: divide depois em páginas
+                    from sheet_raster_renderer import split_image_pages
+                    self.last_pages = split_image_pages(result, self.max_tile_height)
+                    result = self.last_pages[0]
                 return result
+            registry.record_failure(method_key, elapsed)
         
         print("ERRO Nenhum método funcionou")
         return None
 
+def _file_size(path):
+    """Tamanho da imagem gerada (None se o método falhou)"""
+    try:
+        return os.path.getsize(path) if path else None
+    except OSError:
+        return None
+
+
 # Função simplificada para uso
-def xlsx_to_image_exact(excel_file_path, output_path=None, sheet_name=None):
+def xlsx_to_image_exact(excel_file_path, output_path=None, sheet_name=None, max_tile_height=None, split_pages=False):
     """
     Converte arquivo XLSX para imagem mantendo layout EXATO
     
@@ -407,27 +365,142 @@ def xlsx_to_image_exact(excel_file_path, output_path=None, sheet_name=None):
         excel_file_path: Caminho para o arquivo Excel
         output_path: Caminho de saída da imagem
         sheet_name: Nome da planilha específica
+        max_tile_height: Altura máxima (px) de cada faixa renderizada / página
+        split_pages: Gera uma imagem por página (arquivo_p001.png, arquivo_p002.png...)
     
     Returns:
-        Caminho do arquivo de imagem criado
+        Caminho do arquivo de imagem criado (ou lista das páginas, com split_pages)
+    """
+    converter = ExcelToImageConverter(excel_file_path, max_tile_height=max_tile_height, split_pages=split_pages)
+    result = converter.convert_to_image(sheet_name, output_path)
+    if result and split_pages:
+        return converter.last_pages
+    return result
+
+
+def _max_workers(max_workers=None):
+    """Processos do lote: parâmetro, RENDER_MAX_WORKERS ou um por CPU"""
+    return max_workers or int(os.getenv("RENDER_MAX_WORKERS") or 0) or os.cpu_count() or 1
+
+
+def _init_convert_worker():
+    """Inicializador de cada processo do lote: aquece o cache de fontes uma única vez"""
+    from sheet_raster_renderer import warm_font_cache
+    warm_font_cache()
+
+
+def _convert_job(job):
+    """
+    Converte um job isolado; um erro vira o resultado do job, sem derrubar o lote.
+    O resultado leva as métricas das etapas do job em "metrics" (stage_metrics).
+    """
+    result = {
+        "excel_file_path": job.get("excel_file_path"),
+        "sheet_name": job.get("sheet_name"),
+        "output_path": job.get("output_path")
+    }
+    started = time.perf_counter()
+    with job_metrics("xlsx_to_image") as metrics:
+        try:
+            if not job.get("excel_file_path") or not os.path.exists(job["excel_file_path"]):
+                raise FileNotFoundError(f"Arquivo Excel não encontrado: {job.get('excel_file_path')}")
+            converter = ExcelToImageConverter(
+                job["excel_file_path"],
+                max_tile_height=job.get("max_tile_height"),
+                split_pages=bool(job.get("split_pages"))
+            )
+            image_path = converter.convert_to_image(job.get("sheet_name"), job.get("output_path"))
+            if image_path:
+                result.update({"success": True, "imagePath": image_path, "method": converter.last_method,
+                               "cached": converter.last_cached})
+                if converter.last_pages:
+                    result["pages"] = converter.last_pages
+            else:
+                result.update({"success": False, "error": "Conversão falhou"})
+        except Exception as e:
+            result.update({"success": False, "error": str(e)})
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    result["metrics"] = metrics
+    return result
+
+
+def convert_many(jobs, max_workers=None):
+    """
+    Converte vários (planilha, aba, saída) em paralelo, um job por processo.
+
+    Args:
+        jobs: Lista de dicts {"excel_file_path", "output_path", "sheet_name"?,
+              "max_tile_height"?, "split_pages"?}
+        max_workers: Quantidade de processos (padrão: RENDER_MAX_WORKERS ou número de CPUs)
+
+    Returns:
+        Dict com success, converted, failed e results (um por job, na mesma ordem)
     """
-    converter = ExcelToImageConverter(excel_file_path)
-    return converter.convert_to_image(sheet_name, output_path)
+    workers = min(_max_workers(max_workers), len(jobs))
+    print(f"INFO: Convertendo {len(jobs)} imagem(ns) com {max(workers, 1)} processo(s)")
+
+    if workers <= 1:
+        results = [_convert_job(job) for job in jobs]
+    else:
+        # Aquecido antes de criar os processos: com fork eles herdam o cache do pai
+        from concurrent.futures import ProcessPoolExecutor
+
+        _init_convert_worker()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_convert_worker) as executor:
+            results = list(executor.map(_convert_job, jobs))
+
+    converted = sum(1 for r in results if r["success"])
+    return {"success": converted == len(results), "converted": converted, "failed": len(results) - converted, "results": results}
 
 
 # Execução via linha de comando
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Uso: python excel_to_image.py <arquivo_excel> <saida_imagem>")
+    # Com --framed, os logs vão para o stderr e o resultado sai como frame no stdout
+    framed = enable_framed_output()
+
+    if len(sys.argv) >= 3 and sys.argv[1] == "--batch":
+        # Manifesto JSON: {"jobs": [...], "max_workers": N} ou só a lista de jobs
+        with open(sys.argv[2], 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        jobs = manifest["jobs"] if isinstance(manifest, dict) else manifest
+        max_workers = manifest.get("max_workers") if isinstance(manifest, dict) else None
+        for arg in sys.argv[3:]:
+            if arg.startswith('--workers='):
+                max_workers = int(arg.split('=', 1)[1])
+        with job_metrics("xlsx_to_image_batch") as metrics:
+            result = convert_many(jobs, max_workers)
+        if not emit_result({**result, "metrics": metrics}):
+            print(f"SUCCESS_BATCH:{json.dumps(result, ensure_ascii=False)}")
+        sys.exit(0 if result["success"] else 1)
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) < 2:
+        print("Uso: python excel_to_image.py <arquivo_excel> <saida_imagem> [--max-tile-height=2048] [--split-pages] [--framed]")
+        print("     python excel_to_image.py --batch <manifesto.json> [--workers=N] [--framed]")
+        emit_result({"success": False, "error": "Argumentos insuficientes"})
         sys.exit(1)
     
-    excel_path = sys.argv[1]
-    output_path = sys.argv[2]
-    
-    result = xlsx_to_image_exact(excel_path, output_path)
+    excel_path = args[0]
+    output_path = args[1]
+    max_tile_height = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--max-tile-height='):
+            max_tile_height = int(arg.split('=', 1)[1])
+    split_pages = '--split-pages' in sys.argv[1:]
+
+    if framed:
+        # O resultado leva também o método usado e se veio do cache (como o job do worker)
+        result = _convert_job({"excel_file_path": excel_path, "output_path": output_path,
+                               "max_tile_height": max_tile_height, "split_pages": split_pages})
+        emit_result(result)
+        sys.exit(0 if result["success"] else 1)
+
+    result = xlsx_to_image_exact(excel_path, output_path, max_tile_height=max_tile_height, split_pages=split_pages)
     
-    if result:
+    if result and split_pages:
+        print(f"SUCCESS_PAGES:{json.dumps(result)}")
+    elif result:
         print(f"SUCCESS:{result}")
     else:
         print("ERROR:Conversão falhou")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,74 @@
+"""
+Lock entre processos baseado em arquivo (msvcrt no Windows, fcntl no Linux/Mac).
+
+    with FileLock(caminho, timeout=30):
+        ...
+
+Usado para serializar recursos globais da máquina (clipboard) e arquivos de
+cache compartilhados entre workers.
+"""
+import os
+import time
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLockTimeout(TimeoutError):
+    pass
+
+
+class FileLock:
+    def __init__(self, path, timeout=None, poll_interval=0.05):
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        delay = self.poll_interval
+        while True:
+            try:
+                self._try_lock(fd)
+                self._fd = fd
+                return self
+            except OSError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise FileLockTimeout(f"Timeout aguardando lock {self.path}")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            self._unlock(self._fd)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def _try_lock(self, fd):
+        if os.name == 'nt':
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock(self, fd):
+        if os.name == 'nt':
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,326 @@
+"""
+Envio de e-mails pelo Microsoft Graph (sendMail).
+
+Usa uma requests.Session com pool de conexões e envia várias mensagens em
+paralelo com concorrência limitada. Respostas 429/503 respeitam o Retry-After
+do Graph; um 401 descarta o token em cache e tenta de novo uma vez.
+
+Com várias mensagens, send_many() agrupa os sendMail em requisições JSON
+$batch de até 20 itens (uma ida ao Graph por grupo). O status de cada item é
+devolvido para a mensagem correspondente e só os itens que falharam com erro
+temporário são reenviados.
+
+    client = GraphMailClient(get_graph_config())
+    results = client.send_many([build_message(assunto, corpo, [email]) for email in emails])
+
+Variáveis de ambiente:
+    MAIL_MAX_CONCURRENCY  envios simultâneos (padrão 4)
+    MAIL_MAX_RETRIES      novas tentativas em 429/5xx (padrão 3)
+    MAIL_USE_BATCH        0 desativa o $batch e envia um sendMail por mensagem (padrão 1)
+    MAIL_BATCH_MAX_BYTES  tamanho máximo de cada $batch (padrão 4 MB, limite do Graph)
+"""
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from graph_token import get_token_provider
+from stage_metrics import span, in_current_context
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+# Limites do JSON batching do Graph
+MAX_BATCH_ITEMS = 20
+MAX_BATCH_BYTES = 4 * 1024 * 1024
+
+
+def build_message(subject, body_html, recipients, attachments=None):
+    """
+    Monta o payload de sendMail para uma lista de destinatários.
+
+    attachments: fileAttachments do Graph (ex.: InlineImage.attachment() do mail_images);
+    a mesma lista pode ser usada em várias mensagens.
+    """
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    message = {
+        "subject": subject,
+        "body": {
+            "contentType": "HTML",
+            "content": body_html
+        },
+        "toRecipients": [{"emailAddress": {"address": address}} for address in recipients]
+    }
+    if attachments:
+        message["attachments"] = attachments
+    return {"message": message}
+
+
+def retry_after_seconds(response, attempt):
+    """Tempo de espera pedido pelo Graph (Retry-After) ou backoff exponencial"""
+    if response is None:
+        value = None
+    elif isinstance(response, dict):
+        # Item de uma resposta $batch: cabeçalhos vêm no próprio JSON
+        value = (response.get('headers') or {}).get('Retry-After')
+    else:
+        value = response.headers.get('Retry-After')
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return min(2 ** attempt, 30)
+
+
+class GraphMailClient:
+    def __init__(self, config, token_provider=None, max_workers=None, max_retries=None, timeout=60,
+                 use_batch=None, max_batch_bytes=None):
+        self.config = config
+        self.token_provider = token_provider or get_token_provider(config)
+        self.max_workers = max_workers or int(os.getenv("MAIL_MAX_CONCURRENCY", "4"))
+        self.max_retries = int(os.getenv("MAIL_MAX_RETRIES", "3")) if max_retries is None else max_retries
+        self.timeout = timeout
+        self.use_batch = os.getenv("MAIL_USE_BATCH", "1") != "0" if use_batch is None else use_batch
+        self.max_batch_bytes = max_batch_bytes or int(os.getenv("MAIL_BATCH_MAX_BYTES", str(MAX_BATCH_BYTES)))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(self.max_workers, 1))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @property
+    def send_path(self):
+        return f"/users/{self.config['sender_email']}/sendMail"
+
+    @property
+    def send_url(self):
+        return f"{self.config['graph_url']}{self.send_path}"
+
+    @property
+    def batch_url(self):
+        return f"{self.config['graph_url']}/$batch"
+
+    def send_mail(self, message):
+        """
+        Envia uma mensagem (payload de sendMail).
+
+        Returns:
+            Dict {"success", "status", "attempts", "error"?}
+        """
+        attempt = 0
+        refreshed_token = False
+        # Serializado uma vez (e não a cada tentativa), como no $batch
+        data = json.dumps(message, ensure_ascii=False).encode('utf-8')
+        while True:
+            try:
+                token = self.token_provider.get_token()
+                with span("graph.send", bytes=len(data), attempt=attempt + 1) as send_span:
+                    response = self.session.post(
+                        self.send_url,
+                        headers={
+                            'Authorization': f'Bearer {token}',
+                            'Content-Type': 'application/json'
+                        },
+                        data=data,
+                        timeout=self.timeout
+                    )
+                    send_span.set(status=response.status_code)
+            except requests.RequestException as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    return {"success": False, "status": None, "attempts": attempt, "error": str(e)}
+                time.sleep(retry_after_seconds(None, attempt))
+                continue
+
+            if response.status_code == 401 and not refreshed_token:
+                # Token revogado/expirado antes da hora: pede outro e repete a mesma tentativa
+                refreshed_token = True
+                self.token_provider.invalidate()
+                continue
+
+            attempt += 1
+            if response.status_code < 300:
+                return {"success": True, "status": response.status_code, "attempts": attempt}
+
+            if response.status_code in RETRYABLE_STATUS and attempt <= self.max_retries:
+                wait = retry_after_seconds(response, attempt)
+                print(f"WARN: Graph respondeu {response.status_code}; nova tentativa em {wait}s ({attempt}/{self.max_retries})")
+                time.sleep(wait)
+                continue
+
+            return {
+                "success": False,
+                "status": response.status_code,
+                "attempts": attempt,
+                "error": f"{response.status_code} {response.text[:500]}"
+            }
+
+    def send_many(self, messages):
+        """Envia várias mensagens; resultados na mesma ordem das mensagens"""
+        if len(messages) <= 1:
+            return [self.send_mail(message) for message in messages]
+        if self.use_batch:
+            return self.send_batched(messages)
+        if self.max_workers <= 1:
+            return [self.send_mail(message) for message in messages]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(in_current_context(self.send_mail), messages))
+
+    def send_batched(self, messages):
+        """
+        Envia as mensagens em requisições $batch de até 20 itens.
+
+        Os grupos vão em paralelo (até max_workers); dentro de cada grupo, só os
+        itens com erro temporário (429/5xx) são reenviados, depois de esperar o
+        maior Retry-After pedido pelo Graph.
+        """
+        groups = self._batch_groups([json.dumps(message, ensure_ascii=False) for message in messages])
+        results = [None] * len(messages)
+
+        def run_group(group):
+            for index, result in self._send_group(group).items():
+                results[index] = result
+
+        if len(groups) <= 1 or self.max_workers <= 1:
+            for group in groups:
+                run_group(group)
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                list(executor.map(in_current_context(run_group), groups))
+        return results
+
+    def _batch_groups(self, encoded_messages):
+        """Divide as mensagens em grupos respeitando quantidade e tamanho do $batch"""
+        groups = []
+        current, current_bytes = [], 0
+        for index, encoded in enumerate(encoded_messages):
+            size = len(encoded.encode('utf-8')) + 200  # envelope do item (id, url, headers)
+            if current and (len(current) >= MAX_BATCH_ITEMS or current_bytes + size > self.max_batch_bytes):
+                groups.append(current)
+                current, current_bytes = [], 0
+            current.append((index, encoded))
+            current_bytes += size
+        if current:
+            groups.append(current)
+        return groups
+
+    def _send_group(self, group):
+        """Envia um grupo pelo $batch, reenviando só os itens que falharam"""
+        pending = dict(group)
+        results = {}
+        attempts = {index: 0 for index in pending}
+        refreshed_token = False
+        attempt = 0
+        last_error = "Sem resposta do Graph para o item"
+
+        def count_attempt():
+            nonlocal attempt
+            attempt += 1
+            for index in pending:
+                attempts[index] += 1
+
+        while pending:
+            # O corpo é montado como texto para não reserializar cada mensagem a cada tentativa
+            items = ','.join(
+                '{"id":"%d","method":"POST","url":%s,"headers":{"Content-Type":"application/json"},"body":%s}'
+                % (index, json.dumps(self.send_path), encoded)
+                for index, encoded in pending.items()
+            )
+            data = ('{"requests":[%s]}' % items).encode('utf-8')
+            try:
+                token = self.token_provider.get_token()
+                with span("graph.batch", items=len(pending), bytes=len(data), attempt=attempt + 1) as batch_span:
+                    response = self.session.post(
+                        self.batch_url,
+                        headers={
+                            'Authorization': f'Bearer {token}',
+                            'Content-Type': 'application/json'
+                        },
+                        data=data,
+                        timeout=self.timeout
+                    )
+                    batch_span.set(status=response.status_code)
+            except requests.RequestException as e:
+                count_attempt()
+                last_error = str(e)
+                if attempt > self.max_retries:
+                    break
+                time.sleep(retry_after_seconds(None, attempt))
+                continue
+
+            if response.status_code == 401 and not refreshed_token:
+                # Repete a mesma tentativa com um token novo
+                refreshed_token = True
+                self.token_provider.invalidate()
+                continue
+
+            count_attempt()
+
+            if response.status_code >= 300:
+                # A requisição $batch inteira falhou: todos os itens ficam pendentes
+                if response.status_code in RETRYABLE_STATUS and attempt <= self.max_retries:
+                    time.sleep(retry_after_seconds(response, attempt))
+                    continue
+                for index in pending:
+                    results[index] = {
+                        "success": False,
+                        "status": response.status_code,
+                        "attempts": attempts[index],
+                        "error": f"{response.status_code} {response.text[:500]}"
+                    }
+                return results
+
+            try:
+                body = response.json()
+                if not isinstance(body, dict):
+                    raise ValueError("o corpo não é um objeto JSON")
+            except ValueError as e:
+                # 2xx com corpo ilegível (ex.: cortado): o status de cada item é desconhecido,
+                # então o grupo inteiro fica pendente, como num erro de transporte
+                last_error = f"Resposta inválida do $batch: {e}"
+                if attempt > self.max_retries:
+                    break
+                time.sleep(retry_after_seconds(None, attempt))
+                continue
+
+            wait = 0
+            for item in body.get("responses", []):
+                index = int(item["id"])
+                if index not in pending:
+                    continue
+                status = int(item.get("status", 0))
+                if status < 300:
+                    results[index] = {"success": True, "status": status, "attempts": attempts[index]}
+                    del pending[index]
+                elif status in RETRYABLE_STATUS and attempt <= self.max_retries:
+                    wait = max(wait, retry_after_seconds(item, attempt))
+                else:
+                    body = item.get("body")
+                    error = body.get("error", {}) if isinstance(body, dict) else {}
+                    results[index] = {
+                        "success": False,
+                        "status": status,
+                        "attempts": attempts[index],
+                        "error": f"{status} {error.get('message') or error.get('code') or ''}".strip()
+                    }
+                    del pending[index]
+
+            if pending and attempt > self.max_retries:
+                break
+            if pending:
+                print(f"WARN: {len(pending)} item(ns) do $batch com erro temporário; nova tentativa em {wait}s ({attempt}/{self.max_retries})")
+                time.sleep(wait)
+
+        for index in pending:
+            results[index] = {
+                "success": False,
+                "status": None,
+                "attempts": attempts[index],
+                "error": last_error
+            }
+        return results
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,142 @@
+"""
+Token de acesso do Microsoft Graph (client credentials) com cache.
+
+Os tokens valem cerca de uma hora; em vez de pedir um novo a cada e-mail, o
+provider guarda o token e o expires_in, renova um pouco antes de expirar e
+garante que só uma renovação aconteça por vez, mesmo com vários envios
+chegando juntos. O token também é salvo num arquivo local protegido por lock,
+para ser reaproveitado pelos outros workers/processos.
+
+    token = get_token_provider(get_graph_config()).get_token()
+
+Variáveis de ambiente:
+    GRAPH_TOKEN_CACHE_FILE     arquivo do cache compartilhado
+    GRAPH_TOKEN_REFRESH_MARGIN segundos de antecedência para renovar (padrão 300)
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+import requests
+
+from file_lock import FileLock
+from stage_metrics import span
+
+GRAPH_SCOPE = 'https://graph.microsoft.com/.default'
+
+
+class TokenProvider:
+    def __init__(self, config, cache_file=None, refresh_margin=300, session=None, timeout=30):
+        self.config = config
+        self.cache_file = cache_file
+        self.refresh_margin = refresh_margin
+        self.session = session or requests
+        self.timeout = timeout
+
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+        # Identifica o app no arquivo compartilhado (sem gravar o segredo)
+        self._cache_id = hashlib.sha256(
+            f"{config['token_url']}|{config['client_id']}|{GRAPH_SCOPE}".encode('utf-8')
+        ).hexdigest()
+
+    def get_token(self):
+        """Retorna um token válido, renovando se estiver perto de expirar"""
+        if self._is_fresh(self._token, self._expires_at):
+            return self._token
+
+        # Só uma thread renova; as outras esperam e usam o token novo
+        with self._lock:
+            if self._is_fresh(self._token, self._expires_at):
+                return self._token
+
+            if not self.cache_file:
+                self._token, self._expires_at = self._request_token()
+                return self._token
+
+            # O lock do arquivo evita que vários processos renovem ao mesmo tempo
+            with FileLock(f"{self.cache_file}.lock", timeout=self.timeout + 5):
+                token, expires_at = self._read_cache_file()
+                if not self._is_fresh(token, expires_at):
+                    token, expires_at = self._request_token()
+                    self._write_cache_file(token, expires_at)
+                self._token, self._expires_at = token, expires_at
+                return token
+
+    def invalidate(self):
+        """Descarta o token atual (ex.: depois de um 401)"""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0
+            if self.cache_file:
+                with FileLock(f"{self.cache_file}.lock", timeout=self.timeout + 5):
+                    cache = self._load_cache_file()
+                    if cache.pop(self._cache_id, None) is not None:
+                        self._save_cache_file(cache)
+
+    def _is_fresh(self, token, expires_at):
+        return bool(token) and time.time() < expires_at - self.refresh_margin
+
+    def _request_token(self):
+        data = {
+            'client_id': self.config['client_id'],
+            'client_secret': self.config['client_secret'],
+            'scope': GRAPH_SCOPE,
+            'grant_type': 'client_credentials'
+        }
+        with span("graph.token") as token_span:
+            response = self.session.post(self.config['token_url'], data=data, timeout=self.timeout)
+            token_span.set(status=response.status_code)
+        response.raise_for_status()
+        payload = response.json()
+        expires_in = int(payload.get('expires_in', 3599))
+        return payload['access_token'], time.time() + expires_in
+
+    def _read_cache_file(self):
+        entry = self._load_cache_file().get(self._cache_id)
+        if not entry:
+            return None, 0
+        return entry.get('access_token'), entry.get('expires_at', 0)
+
+    def _write_cache_file(self, token, expires_at):
+        cache = self._load_cache_file()
+        # Aproveita para limpar tokens vencidos de outros apps
+        now = time.time()
+        cache = {key: entry for key, entry in cache.items() if entry.get('expires_at', 0) > now}
+        cache[self._cache_id] = {'access_token': token, 'expires_at': expires_at}
+        self._save_cache_file(cache)
+
+    def _load_cache_file(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache_file(self, cache):
+        tmp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, self.cache_file)
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_token_provider(config):
+    """Provider compartilhado no processo para a configuração informada"""
+    key = (config['token_url'], config['client_id'])
+    with _providers_lock:
+        if key not in _providers:
+            _providers[key] = TokenProvider(
+                config,
+                cache_file=os.getenv("GRAPH_TOKEN_CACHE_FILE") or os.path.join(tempfile.gettempdir(), "fluxocliente-graph-token.json"),
+                refresh_margin=int(os.getenv("GRAPH_TOKEN_REFRESH_MARGIN", "300"))
+            )
+        return _providers[key]
@@ -0,0 +1,210 @@
+"""
+Cache das tabelas HTML extraídas das planilhas.
+
+A chave é o hash do conteúdo do workbook + planilha + range + extrator e sua
+versão, então reenviar a mesma ficha sem alterações não abre o Excel de novo.
+Há dois níveis: memória (LRU por quantidade de entradas, útil no
+python_worker.py) e disco (LRU por tamanho total, compartilhado entre
+processos), ambos com TTL.
+
+Variáveis de ambiente:
+    HTML_CACHE_ENABLED      0 desativa o cache (padrão 1)
+    HTML_CACHE_DIR          diretório do cache em disco
+    HTML_CACHE_MAX_ENTRIES  entradas em memória (padrão 128)
+    HTML_CACHE_MAX_BYTES    tamanho máximo em disco (padrão 200 MB)
+    HTML_CACHE_TTL          validade das entradas em segundos (padrão 7 dias)
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Hash por (caminho, tamanho, mtime) para não reler arquivos que não mudaram
+_digest_memo = {}
+_digest_lock = threading.Lock()
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 do conteúdo do arquivo"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _digest_lock:
+        if memo_key in _digest_memo:
+            return _digest_memo[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    result = digest.hexdigest()
+
+    with _digest_lock:
+        if len(_digest_memo) > 1024:
+            _digest_memo.clear()
+        _digest_memo[memo_key] = result
+    return result
+
+
+class HtmlCache:
+    def __init__(self, cache_dir=None, max_entries=128, max_bytes=200 * 1024 * 1024, ttl=7 * 24 * 3600, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memoryHits": 0, "diskHits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, excel_path, sheet, cell_range, extractor, version):
+        """Monta a chave a partir do conteúdo do workbook e dos parâmetros da extração"""
+        parts = [file_digest(excel_path), str(sheet), cell_range, extractor, str(version)]
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Retorna o valor armazenado ou None"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._stats["memoryHits"] += 1
+                    return value
+                del self._memory[key]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["diskHits"] += 1
+            self._remember(key, entry)
+        return entry[1]
+
+    def set(self, key, value):
+        """Armazena o valor (precisa ser serializável em JSON)"""
+        if not self.enabled:
+            return
+        entry = (time.time(), value)
+        with self._lock:
+            self._remember(key, entry)
+            self._stats["writes"] += 1
+        self._write_disk(key, entry)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memoryEntries"] = len(self._memory)
+        lookups = stats["memoryHits"] + stats["diskHits"] + stats["misses"]
+        stats["hitRate"] = round((stats["memoryHits"] + stats["diskHits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key, now):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if now - data["created"] > self.ttl:
+            self._remove(path)
+            return None
+
+        # Atualiza o mtime: a limpeza por tamanho remove os menos usados primeiro
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data["created"], data["value"]
+
+    def _write_disk(self, key, entry):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"created": entry[0], "value": entry[1]}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"WARN: Falha ao gravar cache HTML: {e}")
+            self._remove(tmp_path)
+            return
+        self._enforce_disk_limit()
+
+    def _enforce_disk_limit(self):
+        """Remove as entradas menos usadas até caber em max_bytes"""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for item in it:
+                if not item.name.endswith('.json'):
+                    continue
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            with self._lock:
+                self._stats["evictions"] += 1
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_html_cache():
+    """Cache padrão do processo, configurado pelas variáveis de ambiente"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = HtmlCache(
+                cache_dir=os.getenv("HTML_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "fluxocliente-html-cache"),
+                max_entries=int(os.getenv("HTML_CACHE_MAX_ENTRIES", "128")),
+                max_bytes=int(os.getenv("HTML_CACHE_MAX_BYTES", str(200 * 1024 * 1024))),
+                ttl=int(os.getenv("HTML_CACHE_TTL", str(7 * 24 * 3600))),
+                enabled=os.getenv("HTML_CACHE_ENABLED", "1") != "0"
+            )
+        return _default_cache
@@ -0,0 +1,252 @@
+"""
+Cache das imagens geradas das planilhas, endereçado pelo conteúdo.
+
+A chave é o hash do conteúdo do workbook + aba + DPI + método de conversão e
+sua versão (+ paginação), então pedir de novo a imagem da mesma ficha sem
+alterações devolve o PNG já gerado, sem renderizar a planilha outra vez.
+
+Cada entrada é um diretório com as páginas (1.png, 2.png...) e um meta.json.
+A limpeza é LRU pelo tamanho total em disco (o meta.json é "tocado" a cada
+acerto). Pedidos simultâneos do mesmo job que não estão no cache são
+colapsados num único render: o primeiro pega um lock de arquivo (vale entre
+threads e entre processos/workers), os outros esperam e encontram a imagem
+pronta.
+
+    cache = get_image_cache()
+    key = cache.make_key("ficha.xlsx", sheet="Resumo", dpi=300, method="openpyxl", version=3)
+    hit = cache.get([key], lambda count: ["saida.png"])   # None se não estiver no cache
+    cache.put(key, ["gerada.png"], method="openpyxl")
+
+Uso (diagnóstico):
+    python image_cache.py stats
+    python image_cache.py clear
+
+Variáveis de ambiente:
+    IMAGE_CACHE_ENABLED       0 desativa o cache (padrão 1)
+    IMAGE_CACHE_DIR           diretório do cache
+    IMAGE_CACHE_MAX_BYTES     tamanho máximo em disco (padrão 1 GB)
+    IMAGE_CACHE_LOCK_TIMEOUT  espera máxima por um render em andamento, em segundos (padrão 300)
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from file_lock import FileLock
+from html_cache import file_digest
+from stage_metrics import span
+
+META_FILE = "meta.json"
+
+
+class ImageCache:
+    def __init__(self, cache_dir, max_bytes=1024 * 1024 * 1024, enabled=True, lock_timeout=300):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.lock_timeout = lock_timeout
+
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "collapsed": 0}
+
+        if self.enabled:
+            os.makedirs(os.path.join(self.cache_dir, "locks"), exist_ok=True)
+
+    def make_key(self, excel_path, sheet, dpi, method, version, options=''):
+        """Chave do resultado: conteúdo do workbook + parâmetros que mudam a imagem"""
+        parts = [file_digest(excel_path), str(sheet), str(dpi), method, str(version), options]
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, keys, paths_for, record_miss=True):
+        """
+        Procura as chaves na ordem e copia as páginas da primeira encontrada.
+
+        Args:
+            keys: Chaves candidatas (ex.: uma por método de conversão), em ordem de preferência
+            paths_for: Função que recebe o número de páginas e devolve os caminhos de saída
+            record_miss: Conta a falta nas estatísticas (False ao consultar de novo o mesmo pedido)
+
+        Returns:
+            Dict {"key", "method", "pages": [caminhos]} ou None se não estiver no cache
+        """
+        if not self.enabled:
+            return None
+        for key in keys:
+            meta = self._read_meta(key)
+            if meta is None:
+                continue
+            entry_dir = self._entry_dir(key)
+            paths = paths_for(meta["pages"])
+            try:
+                for index, path in enumerate(paths, start=1):
+                    shutil.copyfile(os.path.join(entry_dir, f"{index}.png"), path)
+                # Atualiza o mtime: a limpeza por tamanho remove os menos usados primeiro
+                os.utime(os.path.join(entry_dir, META_FILE))
+            except OSError:
+                # Entrada removida pela limpeza de outro processo no meio da cópia
+                continue
+            with self._lock:
+                self._stats["hits"] += 1
+            return {"key": key, "method": meta["method"], "pages": paths}
+
+        if record_miss:
+            with self._lock:
+                self._stats["misses"] += 1
+        return None
+
+    def contains(self, key):
+        return self.enabled and self._read_meta(key) is not None
+
+    def put(self, key, page_paths, method):
+        """Guarda as páginas geradas (uma única vez por chave)"""
+        if not self.enabled or not page_paths:
+            return
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(tmp_dir, exist_ok=True)
+            total = 0
+            for index, path in enumerate(page_paths, start=1):
+                target = os.path.join(tmp_dir, f"{index}.png")
+                shutil.copyfile(path, target)
+                total += os.path.getsize(target)
+            with open(os.path.join(tmp_dir, META_FILE), 'w', encoding='utf-8') as f:
+                json.dump({"method": method, "pages": len(page_paths), "bytes": total, "created": time.time()}, f)
+            if os.path.exists(entry_dir):
+                # Outro processo gravou a mesma chave: o conteúdo é o mesmo
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return
+            os.replace(tmp_dir, entry_dir)
+        except OSError as e:
+            print(f"WARN: Falha ao gravar cache de imagem: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+
+        with self._lock:
+            self._stats["writes"] += 1
+        self._enforce_disk_limit()
+
+    @contextmanager
+    def single_flight(self, job_key):
+        """
+        Serializa os renders do mesmo job (entre threads e processos).
+
+        Quem esperou o lock deve consultar o cache de novo antes de renderizar.
+        """
+        if not self.enabled:
+            yield
+            return
+        lock = FileLock(os.path.join(self.cache_dir, "locks", f"{job_key}.lock"), timeout=self.lock_timeout)
+        # Tempo esperando outro worker terminar o mesmo render
+        with span("image_cache.wait"):
+            lock.acquire()
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def record_collapsed(self):
+        """Um pedido que esperou o render de outro e recebeu a imagem do cache"""
+        with self._lock:
+            self._stats["collapsed"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hitRate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        entries = self._disk_entries() if self.enabled else []
+        stats["diskEntries"] = len(entries)
+        stats["diskBytes"] = sum(size for _, size, _ in entries)
+        stats["maxBytes"] = self.max_bytes
+        stats["cacheDir"] = self.cache_dir
+        stats["enabled"] = self.enabled
+        return stats
+
+    def clear(self):
+        removed = 0
+        for _, _, entry_dir in self._disk_entries():
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            removed += 1
+        return removed
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _read_meta(self, key):
+        try:
+            with open(os.path.join(self._entry_dir(key), META_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _disk_entries(self):
+        """(mtime do meta, bytes, diretório) de cada entrada completa"""
+        entries = []
+        try:
+            items = list(os.scandir(self.cache_dir))
+        except OSError:
+            return entries
+        for item in items:
+            if not item.is_dir() or item.name == "locks" or item.name.endswith('.tmp'):
+                continue
+            meta_path = os.path.join(item.path, META_FILE)
+            try:
+                mtime = os.stat(meta_path).st_mtime
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    size = json.load(f).get("bytes", 0)
+            except (OSError, ValueError):
+                continue
+            entries.append((mtime, size, item.path))
+        return entries
+
+    def _enforce_disk_limit(self):
+        """Remove as entradas menos usadas até caber em max_bytes"""
+        entries = self._disk_entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, entry_dir in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            with self._lock:
+                self._stats["evictions"] += 1
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_image_cache():
+    """Cache padrão do processo, configurado pelas variáveis de ambiente"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ImageCache(
+                cache_dir=os.getenv("IMAGE_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "fluxocliente-image-cache"),
+                max_bytes=int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024))),
+                enabled=os.getenv("IMAGE_CACHE_ENABLED", "1") != "0",
+                lock_timeout=int(os.getenv("IMAGE_CACHE_LOCK_TIMEOUT", "300"))
+            )
+        return _default_cache
+
+
+if __name__ == "__main__":
+    sys.stdout.reconfigure(encoding='utf-8')
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "stats":
+        print(json.dumps(get_image_cache().stats(), indent=2))
+    elif command == "clear":
+        print(json.dumps({"removed": get_image_cache().clear()}))
+    else:
+        print("Uso: python image_cache.py [stats|clear]")
+        sys.exit(1)
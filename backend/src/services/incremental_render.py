@@ -0,0 +1,204 @@
+"""
+Re-renderização incremental da imagem de uma planilha (método 5).
+
+Fichas e painéis costumam ser gerados de novo várias vezes por dia com poucas
+células alteradas. Em vez de pintar e comprimir a planilha inteira a cada vez,
+guardamos da renderização anterior (por arquivo + aba):
+
+- a impressão digital de cada célula (hash do valor + hash do estilo);
+- a geometria (larguras das colunas e alturas das linhas em pixels);
+- a imagem já comprimida, em segmentos de SEGMENT_ROWS linhas da planilha,
+  cada um comprimido de forma independente (png_stream.compress_segment).
+
+Na renderização seguinte, as impressões digitais são comparadas em lote
+(NumPy); só os segmentos com alguma linha suja são pintados e comprimidos de
+novo, e o PNG é montado juntando os segmentos (write_png_segments). Uma linha
+alterada suja também as vizinhas (a grade e a borda do topo dependem da célula
+de cima; texto mais alto que a linha invade a de cima). Cada segmento é
+pintado com uma linha de margem acima e abaixo, descartada, para que bordas e
+textos que cruzam a divisa saiam iguais aos de uma renderização completa.
+
+Volta para a renderização completa (de todos os segmentos) quando não há
+estado anterior ou quando alguma largura de coluna ou altura de linha mudou.
+
+    path, info = render_sheet_image_incremental("ficha.xlsx", "Resumo", "ficha.png")
+    # info = {"mode": "incremental", "segments": 2, "totalSegments": 10, "rows": 300}
+
+Variáveis de ambiente:
+    RENDER_INCREMENTAL              1 ativa o modo incremental no método 5 (padrão 0)
+    RENDER_INCREMENTAL_DIR          diretório do estado (padrão: tmp/fluxocliente-render-state)
+    RENDER_INCREMENTAL_MAX_ENTRIES  abas com estado guardado (padrão 64)
+"""
+import os
+import hashlib
+import tempfile
+
+import numpy as np
+
+from file_lock import FileLock
+from png_stream import compress_segment, write_png_segments
+from sheet_raster_renderer import OUTPUT_DPI, paint_grid, sheet_data_grid, write_grid_image
+from workbook_loader import load_sheet
+
+STATE_VERSION = 1
+SEGMENT_ROWS = 32
+
+# Multiplicador para misturar o hash do valor com o do estilo (constante de Fibonacci, 64 bits)
+VALUE_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def incremental_enabled():
+    return os.getenv("RENDER_INCREMENTAL", "0") == "1"
+
+
+def _digest64(text):
+    """Hash estável entre processos (o hash() do Python muda a cada execução)"""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def sheet_fingerprint(sheet, rows, cols):
+    """
+    Impressão digital de cada célula: array (linhas, colunas) de uint64.
+
+    Células vazias e sem estilo ficam com 0. O estilo entra pelo conteúdo (não
+    pelo id, que depende da ordem de leitura), calculado uma vez por estilo.
+    """
+    fingerprint = np.zeros((rows, cols), dtype=np.uint64)
+    if not len(sheet):
+        return fingerprint
+
+    r = np.frombuffer(sheet.cell_rows, dtype=np.uintc).astype(np.intp) - 1
+    c = np.frombuffer(sheet.cell_cols, dtype=np.ushort).astype(np.intp) - 1
+    style_ids = np.frombuffer(sheet.style_ids, dtype=np.ushort)
+
+    style_hashes = np.array([_digest64(repr(style._key)) for style in sheet.styles.records], dtype=np.uint64)
+    value_hashes = np.fromiter((_digest64(repr(value)) for value in sheet.values), dtype=np.uint64, count=len(sheet))
+    fingerprint[r, c] = (value_hashes * VALUE_MIX) ^ style_hashes[style_ids]
+    return fingerprint
+
+
+def dirty_rows(previous, current):
+    """Máscara das linhas a repintar: as alteradas e as vizinhas de cima e de baixo"""
+    changed = (previous != current).any(axis=1)
+    dirty = changed.copy()
+    dirty[1:] |= changed[:-1]
+    dirty[:-1] |= changed[1:]
+    return dirty
+
+
+def paint_segment(grid, row_start, row_end):
+    """Pixels das linhas [row_start, row_end), pintadas com uma linha de margem de cada lado"""
+    band_start, band_end = max(row_start - 1, 0), min(row_end + 1, len(grid.row_heights))
+    band = np.asarray(paint_grid(grid, band_start, band_end))
+    band_top = int(grid.y_offsets[band_start])
+    return band[int(grid.y_offsets[row_start]) - band_top:int(grid.y_offsets[row_end]) - band_top]
+
+
+class RenderState:
+    """Estado guardado da última renderização de uma aba (impressões digitais + segmentos comprimidos)"""
+
+    def __init__(self, state_dir, excel_path, sheet_name):
+        key = hashlib.sha256(f"{os.path.abspath(excel_path)}\x1f{sheet_name}".encode('utf-8')).hexdigest()
+        self.data_path = os.path.join(state_dir, f"{key}.npz")
+        self.lock_path = os.path.join(state_dir, f"{key}.lock")
+
+    def load(self):
+        """Dict com fingerprint, col_widths, row_heights e segments, ou None"""
+        try:
+            with np.load(self.data_path) as data:
+                if int(data["version"]) != STATE_VERSION:
+                    return None
+                blob = data["segment_data"].tobytes()
+                offsets = data["segment_offsets"].tolist()
+                segments = [(blob[offsets[i]:offsets[i + 1]], adler, length) for i, (adler, length)
+                            in enumerate(zip(data["segment_adlers"].tolist(), data["segment_lengths"].tolist()))]
+                return {
+                    "fingerprint": data["fingerprint"],
+                    "col_widths": data["col_widths"],
+                    "row_heights": data["row_heights"],
+                    "segments": segments
+                }
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, fingerprint, grid, segments):
+        offsets = np.cumsum([0] + [len(data) for data, _, _ in segments], dtype=np.int64)
+        tmp_path = f"{self.data_path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, version=STATE_VERSION, fingerprint=fingerprint,
+                 col_widths=grid.col_widths, row_heights=grid.row_heights,
+                 segment_data=np.frombuffer(b''.join(data for data, _, _ in segments), dtype=np.uint8),
+                 segment_offsets=offsets,
+                 segment_adlers=np.array([adler for _, adler, _ in segments], dtype=np.int64),
+                 segment_lengths=np.array([length for _, _, length in segments], dtype=np.int64))
+        os.replace(tmp_path, self.data_path)
+
+
+def _enforce_max_entries(state_dir, max_entries):
+    """Remove o estado das abas renderizadas há mais tempo"""
+    entries = []
+    for item in os.scandir(state_dir):
+        if item.name.endswith('.npz') and '.tmp' not in item.name:
+            try:
+                entries.append((item.stat().st_mtime, item.path[:-4]))
+            except OSError:
+                continue
+    if len(entries) <= max_entries:
+        return
+    entries.sort()
+    for _, root in entries[:len(entries) - max_entries]:
+        for suffix in ('.npz', '.lock'):
+            try:
+                os.remove(root + suffix)
+            except OSError:
+                pass
+
+
+def render_sheet_image_incremental(excel_path, sheet_name=None, output_path=None, state_dir=None):
+    """
+    Renderiza a aba em PNG, repintando só os segmentos alterados desde a última vez.
+
+    Returns:
+        (caminho da imagem, {"mode": "full"|"incremental", "segments", "totalSegments", "rows"})
+    """
+    state_dir = state_dir or os.getenv("RENDER_INCREMENTAL_DIR") or os.path.join(tempfile.gettempdir(), "fluxocliente-render-state")
+    output_path = output_path or f"{sheet_name or 'planilha'}.png"
+    os.makedirs(state_dir, exist_ok=True)
+
+    sheet = load_sheet(excel_path, sheet_name)
+    grid = sheet_data_grid(sheet)
+    rows, cols = grid.has_fill.shape
+    if grid.width == 0 or grid.height == 0:
+        return write_grid_image(grid, output_path), {"mode": "full", "segments": 0, "totalSegments": 0, "rows": rows}
+
+    fingerprint = sheet_fingerprint(sheet, rows, cols)
+    bounds = [(start, min(start + SEGMENT_ROWS, rows)) for start in range(0, rows, SEGMENT_ROWS)]
+
+    state = RenderState(state_dir, excel_path, sheet_name)
+    with FileLock(state.lock_path, timeout=120):
+        previous = state.load()
+        if (previous is not None
+                and np.array_equal(previous["col_widths"], grid.col_widths)
+                and np.array_equal(previous["row_heights"], grid.row_heights)):
+            mode = "incremental"
+            dirty = dirty_rows(previous["fingerprint"], fingerprint)
+            segments = previous["segments"]
+        else:
+            # Sem estado ou geometria diferente: todos os segmentos são pintados
+            mode = "full"
+            dirty = np.ones(rows, dtype=bool)
+            segments = [None] * len(bounds)
+
+        repainted = 0
+        for index, (row_start, row_end) in enumerate(bounds):
+            if dirty[row_start:row_end].any():
+                segments[index] = compress_segment(paint_segment(grid, row_start, row_end))
+                repainted += 1
+
+        write_png_segments(output_path, grid.width, grid.height, segments, dpi=OUTPUT_DPI)
+        if repainted:
+            state.save(fingerprint, grid, segments)
+        else:
+            os.utime(state.data_path)
+
+    _enforce_max_entries(state_dir, int(os.getenv("RENDER_INCREMENTAL_MAX_ENTRIES", "64")))
+    return output_path, {"mode": mode, "segments": repainted, "totalSegments": len(bounds), "rows": rows}
@@ -0,0 +1,371 @@
+"""
+LibreOffice headless persistente para converter planilhas em PDF/imagem.
+
+Rodar "libreoffice --headless --convert-to pdf" a cada conversão paga a
+inicialização do soffice (vários segundos), e duas conversões simultâneas
+disputam o mesmo perfil de usuário. Aqui cada processo (worker) mantém o seu
+próprio soffice escutando num socket UNO, com um perfil isolado num diretório
+temporário, e as conversões são enfileiradas para ele (uma por vez por
+servidor; paralelismo = um servidor por worker).
+
+A conversão por UNO abre a planilha oculta, remove as outras abas da cópia em
+memória e exporta para um PDF com o nome escolhido por nós (nada de adivinhar
+o nome que o LibreOffice dá ao arquivo). Com SinglePageSheets a aba inteira
+vira uma única página, e só ela é rasterizada, na resolução configurada.
+
+O cliente UNO precisa de um Python com o módulo "uno" (python3-uno no Linux,
+o python que vem com o LibreOffice no Windows). Se o Python atual não tiver,
+este mesmo arquivo é executado como cliente pelo Python que tiver
+(LIBREOFFICE_PYTHON ou detectado). Sem nenhum, cai para o modo "cli": um
+soffice por conversão, ainda com perfil isolado e com o PDF localizado pelo
+nome correto, e a aba escolhida pela página (requer LibreOffice 7.4+).
+
+    image = get_libreoffice_server().convert_sheet_to_image("ficha.xlsx", "ficha.png", sheet_name="Resumo")
+
+Variáveis de ambiente:
+    LIBREOFFICE_BIN          executável do soffice (padrão: soffice/libreoffice do PATH)
+    LIBREOFFICE_PYTHON       Python com o módulo uno, se não for o atual
+    LIBREOFFICE_MODE         auto (padrão), uno ou cli
+    LIBREOFFICE_DPI          resolução da imagem (padrão 300)
+    LIBREOFFICE_TIMEOUT      timeout de cada conversão em segundos (padrão 120)
+    LIBREOFFICE_SINGLE_PAGE  0 exporta a aba em várias páginas e usa a primeira (padrão 1)
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+import importlib.util
+
+DEFAULT_DPI = 300
+STARTUP_TIMEOUT = 60
+
+
+def find_soffice():
+    """Executável do LibreOffice: LIBREOFFICE_BIN, PATH ou o local padrão no Windows"""
+    configured = os.getenv("LIBREOFFICE_BIN")
+    if configured:
+        return configured
+    for name in ("soffice", "libreoffice"):
+        path = shutil.which(name)
+        if path:
+            return path
+    if os.name == 'nt':
+        for base in (os.getenv("PROGRAMFILES", r"C:\Program Files"), os.getenv("PROGRAMFILES(X86)", r"C:\Program Files (x86)")):
+            path = os.path.join(base, "LibreOffice", "program", "soffice.exe")
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def _python_has_uno(python):
+    try:
+        result = subprocess.run([python, "-c", "import uno"], capture_output=True, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return result.returncode == 0
+
+
+def find_uno_python(soffice=None):
+    """
+    Python capaz de importar uno.
+
+    Returns:
+        None se for o próprio interpretador atual, o caminho de outro Python,
+        ou False se nenhum foi encontrado
+    """
+    if importlib.util.find_spec("uno") is not None:
+        return None
+
+    candidates = [os.getenv("LIBREOFFICE_PYTHON")]
+    if soffice:
+        program_dir = os.path.dirname(os.path.realpath(soffice))
+        candidates += [os.path.join(program_dir, "python.exe"), os.path.join(program_dir, "python")]
+    if os.name != 'nt':
+        candidates.append("/usr/bin/python3")
+
+    for candidate in candidates:
+        if candidate and os.path.exists(candidate) and _python_has_uno(candidate):
+            return candidate
+    return False
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _profile_url(profile_dir):
+    path = os.path.abspath(profile_dir).replace("\\", "/")
+    return "file:///" + path.lstrip("/")
+
+
+def visible_sheet_index(excel_path, sheet_name=None):
+    """Posição da aba entre as visíveis (as ocultas não vão para o PDF); aba ativa se sheet_name for None"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(excel_path, read_only=True)
+    try:
+        target = wb[sheet_name] if sheet_name else wb.active
+        visible = [ws for ws in wb.worksheets if ws.sheet_state == 'visible']
+        return visible.index(target) if target in visible else 0
+    finally:
+        wb.close()
+
+
+def uno_export_pdf(port, excel_path, pdf_path, sheet_name=None, single_page=True):
+    """
+    Exporta uma aba para PDF pelo soffice que escuta em 127.0.0.1:port.
+
+    Roda no Python que tem o módulo uno (no processo atual ou como cliente).
+    """
+    import uno
+    from com.sun.star.beans import PropertyValue
+
+    def props(**values):
+        result = []
+        for name, value in values.items():
+            prop = PropertyValue()
+            prop.Name = name
+            prop.Value = value
+            result.append(prop)
+        return tuple(result)
+
+    local = uno.getComponentContext()
+    resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+    context = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+    desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+
+    doc = desktop.loadComponentFromURL(uno.systemPathToFileUrl(os.path.abspath(excel_path)), "_blank", 0,
+                                       props(Hidden=True))
+    if doc is None:
+        raise RuntimeError(f"LibreOffice não abriu o arquivo: {excel_path}")
+    try:
+        sheets = doc.getSheets()
+        if sheet_name is None:
+            sheet_name = doc.getCurrentController().getActiveSheet().getName()
+        if not sheets.hasByName(sheet_name):
+            raise ValueError(f"Aba não encontrada: {sheet_name}")
+        # Só a cópia em memória é alterada; o arquivo original não é salvo
+        for name in sheets.getElementNames():
+            if name != sheet_name:
+                sheets.removeByName(name)
+
+        filter_data = uno.Any("[]com.sun.star.beans.PropertyValue", props(SinglePageSheets=bool(single_page)))
+        doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(pdf_path)),
+                       props(FilterName="calc_pdf_Export", FilterData=filter_data))
+    finally:
+        doc.close(True)
+    return pdf_path
+
+
+class LibreOfficeServer:
+    def __init__(self, soffice=None, mode='auto', dpi=DEFAULT_DPI, timeout=120, single_page=True):
+        self.soffice = soffice or find_soffice()
+        self.dpi = dpi
+        self.timeout = timeout
+        self.single_page = single_page
+
+        self.uno_python = None
+        self.mode = mode
+        if mode in ('auto', 'uno'):
+            found = find_uno_python(self.soffice)
+            if found is False:
+                if mode == 'uno':
+                    raise RuntimeError("Nenhum Python com o módulo uno encontrado (defina LIBREOFFICE_PYTHON)")
+                print("WARN: módulo uno indisponível; LibreOffice em modo cli (um soffice por conversão)")
+                self.mode = 'cli'
+            else:
+                self.uno_python = found
+                self.mode = 'uno'
+
+        self.port = None
+        self.process = None
+        self.profile_dir = None
+        self.conversions = 0
+        # Fila: um soffice atende uma conversão por vez
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Sobe o soffice escutando no socket UNO, com um perfil só deste servidor"""
+        if not self.soffice:
+            raise RuntimeError("LibreOffice (soffice) não encontrado")
+        if self.mode != 'uno' or self.running:
+            return self
+
+        self._ensure_profile()
+        self.port = _free_port()
+        cmd = [
+            self.soffice,
+            f"-env:UserInstallation={_profile_url(self.profile_dir)}",
+            "--headless", "--invisible", "--nologo", "--nodefault", "--norestore", "--nolockcheck",
+            f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+        ]
+        started = time.perf_counter()
+        self.process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"soffice terminou ao iniciar (código {self.process.returncode})")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=1):
+                    print(f"INFO: LibreOffice pronto na porta {self.port} em {time.perf_counter() - started:.1f}s")
+                    return self
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise TimeoutError(f"soffice não respondeu em {STARTUP_TIMEOUT}s")
+
+    def stop(self):
+        """Encerra o soffice e apaga o perfil temporário"""
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+            self.process = None
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+    def export_pdf(self, excel_path, pdf_path, sheet_name=None):
+        """
+        Exporta a aba (padrão: ativa) para pdf_path.
+
+        Returns:
+            Tupla (caminho_do_pdf, página_da_aba) — a página é 1 no modo uno,
+            em que o PDF só tem a aba pedida
+        """
+        with self._lock:
+            if self.mode == 'cli':
+                return self._export_pdf_cli(excel_path, pdf_path, sheet_name)
+
+            for attempt in range(2):
+                self.start()
+                try:
+                    self._export_pdf_uno(excel_path, pdf_path, sheet_name)
+                    self.conversions += 1
+                    return pdf_path, 1
+                except Exception as e:
+                    if attempt or self.running:
+                        raise
+                    # O soffice caiu no meio: sobe outro e tenta de novo
+                    print(f"WARN: LibreOffice caiu durante a conversão ({e}); reiniciando")
+                    self.stop()
+
+    def convert_sheet_to_image(self, excel_path, output_path, sheet_name=None, dpi=None):
+        """Converte só a aba pedida em PNG, na resolução configurada"""
+        from pdf2image import convert_from_path
+
+        dpi = dpi or self.dpi
+        work_dir = tempfile.mkdtemp(prefix="fluxocliente-lo-pdf-")
+        try:
+            pdf_path = os.path.join(work_dir, os.path.splitext(os.path.basename(excel_path))[0] + ".pdf")
+            pdf_path, page = self.export_pdf(excel_path, pdf_path, sheet_name)
+            images = convert_from_path(pdf_path, dpi=dpi, first_page=page, last_page=page)
+            if not images:
+                raise RuntimeError(f"PDF sem a página {page}: {pdf_path}")
+            images[0].save(output_path, 'PNG', dpi=(dpi, dpi))
+            return output_path
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _ensure_profile(self):
+        if not self.profile_dir:
+            self.profile_dir = tempfile.mkdtemp(prefix=f"fluxocliente-lo-profile-{os.getpid()}-")
+
+    def _export_pdf_uno(self, excel_path, pdf_path, sheet_name):
+        if self.uno_python is None:
+            uno_export_pdf(self.port, excel_path, pdf_path, sheet_name, self.single_page)
+            return
+
+        cmd = [self.uno_python, os.path.abspath(__file__), "--uno-export", str(self.port),
+               os.path.abspath(excel_path), os.path.abspath(pdf_path), json.dumps(sheet_name),
+               "1" if self.single_page else "0"]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=self.timeout)
+        if result.returncode != 0 or not os.path.exists(pdf_path):
+            raise RuntimeError(f"Cliente UNO falhou: {(result.stdout + result.stderr).strip()}")
+
+    def _export_pdf_cli(self, excel_path, pdf_path, sheet_name):
+        self._ensure_profile()
+        out_dir = os.path.dirname(os.path.abspath(pdf_path))
+        target = "pdf"
+        if self.single_page:
+            target = 'pdf:calc_pdf_Export:{"SinglePageSheets":{"type":"boolean","value":"true"}}'
+        cmd = [self.soffice, f"-env:UserInstallation={_profile_url(self.profile_dir)}", "--headless",
+               "--convert-to", target, "--outdir", out_dir, os.path.abspath(excel_path)]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=self.timeout)
+
+        # O LibreOffice dá ao PDF o nome do arquivo de entrada
+        produced = os.path.join(out_dir, os.path.splitext(os.path.basename(excel_path))[0] + ".pdf")
+        if result.returncode != 0 or not os.path.exists(produced):
+            raise RuntimeError(f"soffice --convert-to falhou: {(result.stdout + result.stderr).strip()}")
+        if produced != os.path.abspath(pdf_path):
+            os.replace(produced, pdf_path)
+        self.conversions += 1
+
+        # Uma página por aba visível só com SinglePageSheets; sem ele, a primeira página
+        page = visible_sheet_index(excel_path, sheet_name) + 1 if self.single_page else 1
+        return pdf_path, page
+
+
+_default_server = None
+_default_server_lock = threading.Lock()
+
+
+def get_libreoffice_server():
+    """Servidor do processo (um soffice e um perfil por worker), configurado pelas variáveis de ambiente"""
+    global _default_server
+    with _default_server_lock:
+        if _default_server is None:
+            _default_server = LibreOfficeServer(
+                mode=os.getenv("LIBREOFFICE_MODE", "auto"),
+                dpi=int(os.getenv("LIBREOFFICE_DPI", str(DEFAULT_DPI))),
+                timeout=int(os.getenv("LIBREOFFICE_TIMEOUT", "120")),
+                single_page=os.getenv("LIBREOFFICE_SINGLE_PAGE", "1") != "0"
+            )
+            atexit.register(_default_server.stop)
+        return _default_server
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 7 and sys.argv[1] == "--uno-export":
+        # Modo cliente: chamado pelo servidor com um Python que tem o módulo uno
+        try:
+            uno_export_pdf(int(sys.argv[2]), sys.argv[3], sys.argv[4], json.loads(sys.argv[5]), sys.argv[6] == "1")
+            print("SUCCESS")
+        except Exception as e:
+            print(f"ERROR:{e}")
+            sys.exit(1)
+        sys.exit(0)
+
+    if len(sys.argv) < 3:
+        print("Uso: python libreoffice_server.py <arquivo_excel> <saida_imagem> [aba] [--dpi=300]")
+        sys.exit(1)
+
+    dpi = None
+    args = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('--dpi='):
+            dpi = int(arg.split('=', 1)[1])
+        else:
+            args.append(arg)
+    try:
+        server = get_libreoffice_server()
+        print(f"SUCCESS:{server.convert_sheet_to_image(args[0], args[1], args[2] if len(args) > 2 else None, dpi)}")
+    except Exception as e:
+        print(f"ERROR:{e}")
+        sys.exit(1)
@@ -0,0 +1,172 @@
+"""
+Imagens do corpo do e-mail como anexos inline (CID) do Microsoft Graph.
+
+Em vez de embutir o PNG no HTML como data URI (base64 dentro do <img>, cerca
+de 33% maior e removido por vários clientes de e-mail), a imagem vai como um
+fileAttachment com isInline/contentId e o <img> aponta para "cid:<contentId>".
+
+A imagem é lida, ajustada ao limite de tamanho e codificada em base64 uma
+única vez; o mesmo anexo (o mesmo dict) é reaproveitado na mensagem de cada
+destinatário. O contentId é derivado do conteúdo, então a mesma imagem tem
+sempre o mesmo cid.
+
+Se o PNG passar do limite (MAIL_IMAGE_MAX_BYTES), ele é convertido para
+paleta (planilhas têm poucas cores) e, se ainda não couber, reduzido aos poucos
+até caber ou até a largura mínima (MAIL_IMAGE_MIN_WIDTH). O formato continua
+PNG: a imagem é de planilha e texto em JPEG fica borrado.
+
+    image = load_inline_image("ficha.png")
+    body = f"<p>Segue a ficha</p>{image.img_tag()}"
+    message = build_message(assunto, body, [email], attachments=[image.attachment()])
+
+Variáveis de ambiente:
+    MAIL_IMAGE_MAX_BYTES  tamanho máximo de cada imagem, em bytes (padrão 3 MB, limite do
+                          Graph para anexos no sendMail; 0 desativa)
+    MAIL_IMAGE_MIN_WIDTH  largura mínima ao reduzir a imagem, em pixels (padrão 800)
+"""
+import io
+import os
+import math
+import base64
+import hashlib
+
+from PIL import Image
+
+DEFAULT_MAX_BYTES = 3 * 1024 * 1024
+DEFAULT_MIN_WIDTH = 800
+# Tentativas de redução; cada uma mira um pouco abaixo do limite
+MAX_RESIZE_STEPS = 6
+RESIZE_MARGIN = 0.9
+
+CONTENT_TYPES = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.gif': 'image/gif'}
+
+
+class InlineImage:
+    """Imagem pronta para ir como anexo inline: bytes finais, base64 e contentId"""
+
+    def __init__(self, data, name, content_type, original_bytes=None, width=None, height=None):
+        self.data = data
+        self.name = name
+        self.content_type = content_type
+        self.original_bytes = original_bytes or len(data)
+        self.width = width
+        self.height = height
+        self.content_id = f"{hashlib.sha256(data).hexdigest()[:16]}@fluxocliente"
+        # Codificado uma vez: o mesmo texto vai em todas as mensagens
+        self.content_bytes = base64.b64encode(data).decode('ascii')
+        self._attachment = None
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    @property
+    def resized(self):
+        return self.size != self.original_bytes
+
+    def attachment(self):
+        """fileAttachment do Graph (sempre o mesmo dict, para não duplicar o base64 entre mensagens)"""
+        if self._attachment is None:
+            self._attachment = {
+                "@odata.type": "#microsoft.graph.fileAttachment",
+                "name": self.name,
+                "contentType": self.content_type,
+                "contentBytes": self.content_bytes,
+                "contentId": self.content_id,
+                "isInline": True
+            }
+        return self._attachment
+
+    def img_tag(self, alt="Imagem", style="width:115%; height:auto;"):
+        return f'<img src="cid:{self.content_id}" alt="{alt}" style="{style}" />'
+
+
+def _save_png(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def _to_palette(image):
+    """
+    PNG com paleta (até 256 cores), bem menor para imagens de planilha.
+
+    Sem perda se a imagem já tiver até 256 cores; senão (texto suavizado, imagem
+    reduzida) as cores são aproximadas, sem pontilhado.
+    """
+    if image.mode == 'P':
+        return image
+    rgb = image.convert('RGB')
+    if rgb.getcolors(256) is not None:
+        return rgb.convert('P', palette=Image.ADAPTIVE, colors=256)
+    return rgb.quantize(colors=256, dither=Image.Dither.NONE)
+
+
+def fit_png_to_budget(data, max_bytes, min_width=DEFAULT_MIN_WIDTH):
+    """
+    Recomprime e, se preciso, reduz um PNG até caber em max_bytes.
+
+    Primeiro tenta só a paleta (sem reduzir); depois reduz as dimensões aos
+    poucos. Nunca devolve algo maior que o original.
+
+    Returns:
+        (bytes, largura, altura). Se nem na largura mínima couber, devolve a menor versão gerada.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        source.load()
+        image = source.convert('RGBA') if 'A' in source.getbands() else source.convert('RGB')
+    width, height = image.size
+
+    best, best_size = data, (width, height)
+    candidate, candidate_size = _save_png(_to_palette(image)), (width, height)
+    for _ in range(MAX_RESIZE_STEPS):
+        if len(candidate) < len(best):
+            best, best_size = candidate, candidate_size
+        if len(best) <= max_bytes or candidate_size[0] <= min_width:
+            break
+        # O tamanho do PNG cresce mais ou menos com a área: reduz as duas dimensões pela raiz
+        scale = math.sqrt(max_bytes / len(candidate)) * RESIZE_MARGIN
+        new_width = max(min_width, int(candidate_size[0] * scale))
+        new_height = max(1, round(height * new_width / width))
+        candidate = _save_png(_to_palette(image.resize((new_width, new_height), Image.LANCZOS)))
+        candidate_size = (new_width, new_height)
+    else:
+        if len(candidate) < len(best):
+            best, best_size = candidate, candidate_size
+
+    if len(best) > max_bytes:
+        print(f"WARN: Imagem com {len(best)} bytes mesmo reduzida a {best_size[0]}px (limite {max_bytes})")
+    return best, best_size[0], best_size[1]
+
+
+def load_inline_image(image_path, max_bytes=None, min_width=None):
+    """
+    Lê a imagem e prepara o anexo inline, dentro do limite de tamanho.
+
+    Args:
+        image_path: Caminho da imagem (PNG, JPEG ou GIF)
+        max_bytes: Tamanho máximo (padrão MAIL_IMAGE_MAX_BYTES; 0 desativa)
+        min_width: Largura mínima ao reduzir (padrão MAIL_IMAGE_MIN_WIDTH)
+
+    Returns:
+        InlineImage
+    """
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"Arquivo de imagem não encontrado: {image_path}")
+    if max_bytes is None:
+        max_bytes = int(os.getenv("MAIL_IMAGE_MAX_BYTES") or DEFAULT_MAX_BYTES)
+    if min_width is None:
+        min_width = int(os.getenv("MAIL_IMAGE_MIN_WIDTH") or DEFAULT_MIN_WIDTH)
+
+    with open(image_path, 'rb') as f:
+        data = f.read()
+    name = os.path.basename(image_path)
+    content_type = CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), 'image/png')
+
+    width = height = None
+    original_bytes = len(data)
+    if max_bytes and len(data) > max_bytes and content_type == 'image/png':
+        data, width, height = fit_png_to_budget(data, max_bytes, min_width)
+        print(f"INFO: Imagem ajustada de {original_bytes} para {len(data)} bytes ({width}x{height})")
+
+    return InlineImage(data, name, content_type, original_bytes=original_bytes, width=width, height=height)
@@ -0,0 +1,278 @@
+"""
+Memória, por máquina, de quais métodos de conversão em imagem funcionam.
+
+O convert_to_image tenta xlwings, COM, Aspose, LibreOffice e openpyxl em
+sequência. Num servidor Linux os quatro primeiros falham sempre (ImportError,
+binário ausente, PDF que o pdf2image não encontra), e cada tentativa custa
+tempo antes de chegar ao método que funciona. O registro:
+
+- testa a disponibilidade de cada método sem converter nada (módulos
+  instalados, binários no PATH, sistema operacional) e pula os indisponíveis;
+- desativa um método que falhou MAX_CONSECUTIVE_FAILURES vezes seguidas;
+- volta a testar os indisponíveis/desativados depois de reprobe_interval;
+- mede a latência de cada método (média móvel) e ordena os disponíveis do
+  mais rápido para o mais lento (ou mantém a ordem de precisão, se configurado).
+
+O estado fica num arquivo JSON por máquina, protegido por lock, e é
+compartilhado pelos workers e processos de conversão.
+
+    registry = get_method_registry()
+    for key, method in registry.order(methods):   # [(chave, método), ...]
+        ...
+        registry.record_success(key, seconds)
+
+Uso (diagnóstico):
+    python method_registry.py [--probe]
+
+Variáveis de ambiente:
+    IMAGE_METHODS_MEMORY           0 desativa o registro (tenta tudo, na ordem de precisão)
+    IMAGE_METHODS_STATE_FILE       arquivo JSON do estado (padrão: tmp/fluxocliente-image-methods-<host>.json)
+    IMAGE_METHODS_REPROBE_SECONDS  intervalo para re-testar métodos indisponíveis (padrão 86400)
+    IMAGE_METHODS_ORDER            fastest (padrão) ou precision
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import tempfile
+import threading
+import importlib.util
+
+from file_lock import FileLock
+
+MAX_CONSECUTIVE_FAILURES = 2
+LATENCY_SMOOTHING = 0.3
+
+
+def _has_module(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _missing_modules(*names):
+    missing = [name for name in names if not _has_module(name)]
+    return f"módulo(s) ausente(s): {', '.join(missing)}" if missing else None
+
+
+def probe_xlwings():
+    if os.name != 'nt':
+        return "requer Windows com Excel"
+    return _missing_modules('xlwings')
+
+
+def probe_com():
+    if os.name != 'nt':
+        return "requer Windows com Excel"
+    return _missing_modules('win32com')
+
+
+def probe_aspose():
+    return _missing_modules('aspose')
+
+
+def probe_libreoffice():
+    from libreoffice_server import find_soffice
+
+    if not find_soffice():
+        return "LibreOffice (soffice) não encontrado (PATH ou LIBREOFFICE_BIN)"
+    if not shutil.which('pdftoppm'):
+        return "poppler (pdftoppm) não encontrado no PATH"
+    return _missing_modules('pdf2image')
+
+
+def probe_openpyxl():
+    return _missing_modules('openpyxl', 'numpy', 'PIL')
+
+
+# Teste de disponibilidade de cada método: devolve None se disponível ou o motivo
+PROBES = {
+    "xlwings": probe_xlwings,
+    "com": probe_com,
+    "aspose": probe_aspose,
+    "libreoffice": probe_libreoffice,
+    "openpyxl": probe_openpyxl,
+}
+
+
+class MethodRegistry:
+    def __init__(self, state_file=None, reprobe_interval=24 * 3600, prefer='fastest', probes=None, enabled=True):
+        self.state_file = state_file
+        self.reprobe_interval = reprobe_interval
+        self.prefer = prefer
+        self.probes = PROBES if probes is None else probes
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._methods = self._load()
+
+    def order(self, methods):
+        """
+        Filtra e ordena os métodos a tentar.
+
+        Args:
+            methods: Lista de (chave, ...) na ordem de precisão
+
+        Returns:
+            Os mesmos itens, sem os indisponíveis e na ordem em que devem ser tentados
+        """
+        if not self.enabled:
+            return list(methods)
+
+        keys = [method[0] for method in methods]
+        self.probe(keys)
+        now = time.time()
+
+        with self._lock:
+            usable = []
+            for position, method in enumerate(methods):
+                entry = self._methods.get(method[0], {})
+                if entry.get("available") is False and now < entry.get("retryAt", 0):
+                    continue
+                usable.append((position, method))
+
+        if self.prefer == 'fastest':
+            # Métodos ainda sem medição vêm primeiro (na ordem de precisão) para serem medidos
+            def sort_key(item):
+                latency = self._methods.get(item[1][0], {}).get("avgSeconds")
+                return (latency is not None, latency or 0, item[0])
+            usable.sort(key=sort_key)
+
+        # Nunca desiste sem tentar: se tudo estiver marcado como indisponível, tenta na ordem original
+        return [method for _, method in usable] or list(methods)
+
+    def probe(self, keys=None, force=False):
+        """Testa os métodos nunca testados ou cujo teste venceu (todos, com force)"""
+        now = time.time()
+        due = []
+        with self._lock:
+            for key in keys or self.probes:
+                entry = self._methods.get(key, {})
+                if force or now >= entry.get("probedAt", 0) + self.reprobe_interval:
+                    due.append(key)
+        if not due:
+            return
+
+        results = {}
+        for key in due:
+            probe = self.probes.get(key)
+            results[key] = probe() if probe else None
+
+        def apply(methods):
+            for key, reason in results.items():
+                entry = methods.setdefault(key, {})
+                entry["probedAt"] = now
+                entry["available"] = reason is None
+                entry["reason"] = reason
+                entry["retryAt"] = now + self.reprobe_interval if reason else 0
+                if reason is None:
+                    entry["consecutiveFailures"] = 0
+                else:
+                    print(f"INFO: Método de imagem '{key}' indisponível nesta máquina: {reason}")
+
+        self._update(apply)
+
+    def record_success(self, key, seconds):
+        def apply(methods):
+            entry = methods.setdefault(key, {})
+            previous = entry.get("avgSeconds")
+            entry["avgSeconds"] = round(seconds if previous is None else
+                                        previous + LATENCY_SMOOTHING * (seconds - previous), 4)
+            entry["successes"] = entry.get("successes", 0) + 1
+            entry["consecutiveFailures"] = 0
+            entry["available"] = True
+            entry["reason"] = None
+            entry["retryAt"] = 0
+            entry["lastSuccessAt"] = time.time()
+        self._update(apply)
+
+    def record_failure(self, key, seconds, error=None):
+        def apply(methods):
+            entry = methods.setdefault(key, {})
+            entry["failures"] = entry.get("failures", 0) + 1
+            entry["consecutiveFailures"] = entry.get("consecutiveFailures", 0) + 1
+            entry["lastFailureAt"] = time.time()
+            entry["lastFailureSeconds"] = round(seconds, 4)
+            if error:
+                entry["lastError"] = str(error)
+            if entry["consecutiveFailures"] >= MAX_CONSECUTIVE_FAILURES:
+                # Disponível no teste, mas falhando na prática: fica fora até o próximo teste
+                entry["available"] = False
+                entry["reason"] = f"falhou {entry['consecutiveFailures']} vezes seguidas"
+                entry["retryAt"] = time.time() + self.reprobe_interval
+                entry["probedAt"] = time.time()
+        self._update(apply)
+
+    def state(self):
+        with self._lock:
+            return {"host": socket.gethostname(), "stateFile": self.state_file,
+                    "methods": json.loads(json.dumps(self._methods))}
+
+    def _update(self, apply):
+        """Aplica a alteração sobre o estado mais recente do arquivo (outros processos também gravam)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if not self.state_file:
+                apply(self._methods)
+                return
+            try:
+                with FileLock(f"{self.state_file}.lock", timeout=10):
+                    methods = self._read_file()
+                    apply(methods)
+                    self._write_file(methods)
+            except (OSError, TimeoutError) as e:
+                print(f"WARN: Falha ao gravar o registro de métodos de imagem: {e}")
+                methods = self._methods
+                apply(methods)
+            self._methods = methods
+
+    def _load(self):
+        return self._read_file() if self.state_file and self.enabled else {}
+
+    def _read_file(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data.get("methods", {}) if isinstance(data, dict) else {}
+
+    def _write_file(self, methods):
+        tmp_path = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"host": socket.gethostname(), "methods": methods}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_file)
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def _default_state_file():
+    host = ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in socket.gethostname()) or 'host'
+    return os.path.join(tempfile.gettempdir(), f"fluxocliente-image-methods-{host}.json")
+
+
+def get_method_registry():
+    """Registro padrão do processo, configurado pelas variáveis de ambiente"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = MethodRegistry(
+                state_file=os.getenv("IMAGE_METHODS_STATE_FILE") or _default_state_file(),
+                reprobe_interval=int(os.getenv("IMAGE_METHODS_REPROBE_SECONDS", str(24 * 3600))),
+                prefer=os.getenv("IMAGE_METHODS_ORDER", "fastest"),
+                enabled=os.getenv("IMAGE_METHODS_MEMORY", "1") != "0"
+            )
+        return _default_registry
+
+
+if __name__ == "__main__":
+    sys.stdout.reconfigure(encoding='utf-8')
+    registry = get_method_registry()
+    registry.probe(force='--probe' in sys.argv[1:])
+    print(json.dumps(registry.state(), ensure_ascii=False, indent=2))
@@ -0,0 +1,327 @@
+"""
+Renderizador HTML nativo de planilhas usando apenas openpyxl.
+
+Gera a mesma <table> com estilos inline que o Excel coloca no clipboard
+("HTML Format"), mas lendo o arquivo diretamente: preenchimentos, fontes,
+bordas, alinhamento, células mescladas e larguras de coluna. Não depende do
+Excel nem do clipboard, então roda no Linux e vários jobs podem rodar ao mesmo
+tempo (um por núcleo via render_many). A planilha é lida em streaming pelo
+workbook_loader (read_only, só a planilha e as colunas do range), e os estilos
+chegam já deduplicados na StyleTable (style_table). iter_table_html entrega a
+tabela linha a linha, sem guardar a planilha na memória (ranges grandes).
+
+Uso:
+    python openpyxl_html_renderer.py <caminho_planilha> [coluna_final]
+"""
+import sys
+import os
+import html
+from datetime import datetime, date, time as dt_time
+from concurrent.futures import ProcessPoolExecutor
+
+from openpyxl.utils import column_index_from_string
+
+from style_table import BORDER_SIDES
+from workbook_loader import SheetStream
+
+# Conversões aproximadas usadas pelo Excel ao exportar HTML
+DEFAULT_COL_WIDTH_CHARS = 8.43
+DEFAULT_ROW_HEIGHT_PT = 15.0
+PX_TO_PT = 0.75
+
+BORDER_STYLES = {
+    'hair': '.5pt dotted',
+    'dotted': '.5pt dotted',
+    'dashDotDot': '.5pt dashed',
+    'dashDot': '.5pt dashed',
+    'dashed': '.5pt dashed',
+    'thin': '.5pt solid',
+    'mediumDashDotDot': '1.0pt dashed',
+    'slantDashDot': '1.0pt dashed',
+    'mediumDashDot': '1.0pt dashed',
+    'mediumDashed': '1.0pt dashed',
+    'medium': '1.0pt solid',
+    'thick': '1.5pt solid',
+    'double': '2.0pt double',
+}
+
+H_ALIGN = {'center': 'center', 'centerContinuous': 'center', 'right': 'right', 'left': 'left', 'justify': 'justify'}
+V_ALIGN = {'top': 'top', 'center': 'middle', 'bottom': 'bottom', 'justify': 'middle', 'distributed': 'middle'}
+
+
+def rgb_to_hex(rgb):
+    """Tupla RGB da StyleTable para #RRGGBB; None se a cor não foi resolvida"""
+    return '#%02X%02X%02X' % rgb if rgb else None
+
+
+def column_width_px(width):
+    """Converte largura de coluna (em caracteres) para pixels como o Excel faz"""
+    if width is None:
+        width = DEFAULT_COL_WIDTH_CHARS
+    return int(round(width * 7 + 5)) if width > 0 else 0
+
+
+def column_widths_px(sheet, max_col):
+    """Larguras em pixels das colunas 1..max_col de um SheetData (colunas ocultas ficam com 0)"""
+    return [0 if hidden else column_width_px(width or None) for width, hidden in sheet.column_widths(max_col)]
+
+
+def cell_css(style, value):
+    """Monta o estilo inline de uma célula a partir de um CellStyle da StyleTable"""
+    rules = []
+
+    if style.font_name:
+        rules.append(f"font-family:{style.font_name}, sans-serif")
+    if style.font_size:
+        rules.append(f"font-size:{style.font_size:g}pt")
+    rules.append(f"font-weight:{700 if style.bold else 400}")
+    if style.italic:
+        rules.append("font-style:italic")
+    if style.underline:
+        rules.append("text-decoration:underline")
+    elif style.strike:
+        rules.append("text-decoration:line-through")
+    rules.append(f"color:{rgb_to_hex(style.font_rgb) or '#000000'}")
+
+    if style.fill_pattern == 'solid' and style.fill_rgb:
+        rules.append(f"background:{rgb_to_hex(style.fill_rgb)}")
+
+    for side_name, side in zip(BORDER_SIDES, style.borders):
+        if side is not None:
+            side_style, side_rgb = side
+            rules.append(f"border-{side_name}:{BORDER_STYLES.get(side_style, '.5pt solid')} {rgb_to_hex(side_rgb) or '#000000'}")
+
+    if style.h_align in H_ALIGN:
+        rules.append(f"text-align:{H_ALIGN[style.h_align]}")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        rules.append("text-align:right")
+    rules.append(f"vertical-align:{V_ALIGN.get(style.v_align, 'bottom')}")
+    rules.append("white-space:normal" if style.wrap_text else "white-space:nowrap")
+    if style.indent:
+        rules.append(f"padding-left:{style.indent * 9}px")
+
+    return ';'.join(rules)
+
+
+def format_value(value, number_format='General'):
+    """Formata o valor da célula de forma próxima ao texto exibido pelo Excel"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'VERDADEIRO' if value else 'FALSO'
+    if isinstance(value, datetime):
+        if value.time() == dt_time(0, 0):
+            return value.strftime('%d/%m/%Y')
+        return value.strftime('%d/%m/%Y %H:%M')
+    if isinstance(value, date):
+        return value.strftime('%d/%m/%Y')
+    if isinstance(value, (int, float)):
+        number_format = number_format or 'General'
+        if '%' in number_format:
+            decimals = number_format.split('.')[1].count('0') if '.' in number_format else 0
+            return _format_number(value * 100, decimals) + '%'
+        if '0.00' in number_format:
+            text = _format_number(value, 2)
+            return f"R$ {text}" if 'R$' in number_format else text
+        if '#,##0' in number_format:
+            return _format_number(value, 0)
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value).replace('.', ',')
+    return str(value)
+
+
+def _format_number(value, decimals):
+    """Formata número no padrão brasileiro (1.234,56)"""
+    text = f"{value:,.{decimals}f}"
+    return text.replace(',', '_').replace('.', ',').replace('_', '.')
+
+
+def iter_table_html(excel_path, sheet_name=None, last_column='L', last_row=None, info=None):
+    """
+    Gera a <table> do range A1:{last_column}{last_row} em pedaços, linha a linha.
+
+    A planilha é lida com SheetStream: cada <tr> sai assim que a linha é lida
+    do XML, então a memória não cresce com a quantidade de linhas. O primeiro
+    pedaço é a abertura da tabela com as <col>, depois um por linha e por fim
+    o fechamento. Juntos, formam o mesmo HTML de render_table_html.
+
+    Args:
+        info: Dict opcional; ao terminar recebe "range" com o endereço do range gerado
+    """
+    max_col = column_index_from_string(last_column)
+    with SheetStream(excel_path, sheet_name, data_only=True, max_col=max_col) as sheet:
+        # Sem last_row, as mesclas são limitadas pela última linha declarada no <dimension>
+        # (a que o range teria); a última linha de verdade só é conhecida no fim do XML
+        span_limit = last_row or sheet.declared_max_row
+
+        # Colunas ocultas (largura 0) não viram <col> nem <td>
+        col_widths = column_widths_px(sheet, max_col)
+
+        # Células mescladas: a primeira recebe colspan/rowspan, as demais são omitidas.
+        # Linhas e colunas ocultas não entram no rowspan/colspan; se a primeira linha ou
+        # coluna da mescla estiver oculta, a célula sai na primeira linha e coluna visíveis
+        # com o valor e o estilo da célula do canto
+        hidden = sheet.merged_hidden_rows
+        spans = {}
+        covered = set()
+        moved = {}
+        for min_row, min_col, merged_max_row, merged_max_col in sheet.merged:
+            if (span_limit and min_row > span_limit) or min_col > max_col:
+                continue
+            end_row = min(merged_max_row, span_limit or merged_max_row)
+            end_col = min(merged_max_col, max_col)
+            visible_rows = [r for r in range(min_row, end_row + 1) if r not in hidden]
+            visible_cols = [c for c in range(min_col, end_col + 1) if col_widths[c - 1]]
+            if not visible_rows or not visible_cols:
+                continue
+            anchor = (visible_rows[0], visible_cols[0])
+            spans[anchor] = (len(visible_rows), len(visible_cols), end_row)
+            if anchor != (min_row, min_col):
+                moved.setdefault(min_row, []).append((min_col, anchor))
+            for r in range(min_row, end_row + 1):
+                for c in range(min_col, end_col + 1):
+                    if (r, c) != anchor:
+                        covered.add((r, c))
+
+        total_width = sum(col_widths)
+        parts = [
+            f"<table border=0 cellpadding=0 cellspacing=0 width={total_width} "
+            f"style='border-collapse:collapse;table-layout:fixed;width:{total_width * PX_TO_PT:g}pt'>"
+        ]
+        for width in col_widths:
+            if width:
+                parts.append(f"<col width={width} style='width:{width * PX_TO_PT:g}pt'>")
+        yield ''.join(parts)
+
+        # O CSS é montado uma vez por estilo da StyleTable, não por célula
+        css_cache = {}
+        default_height = sheet.default_row_height or DEFAULT_ROW_HEIGHT_PT
+
+        def row_html(row_idx, values, style_ids):
+            height_pt = sheet.row_height(row_idx) or default_height
+            parts = [f"<tr height={int(round(height_pt / PX_TO_PT))} style='height:{height_pt:g}pt'>"]
+
+            for col_idx, (value, style_id) in enumerate(zip(values, style_ids), start=1):
+                if (row_idx, col_idx) in covered or col_widths[col_idx - 1] == 0:
+                    continue
+
+                # O CSS depende só do estilo e de o valor ser numérico (alinhamento à direita)
+                style = sheet.style(style_id)
+                css_key = (style_id, isinstance(value, (int, float)) and not isinstance(value, bool))
+                if css_key not in css_cache:
+                    css_cache[css_key] = cell_css(style, value)
+                css = css_cache[css_key]
+
+                attrs = ''
+                if (row_idx, col_idx) in spans:
+                    rowspan, colspan, _ = spans[(row_idx, col_idx)]
+                    if colspan > 1:
+                        attrs += f" colspan={colspan}"
+                    if rowspan > 1:
+                        attrs += f" rowspan={rowspan}"
+
+                text = html.escape(format_value(value, style.number_format)).replace('\n', '<br>')
+                parts.append(f"<td{attrs} style='{css}'>{text}</td>")
+
+            parts.append("</tr>")
+            return ''.join(parts)
+
+        # Valor e estilo das mesclas com o canto oculto, até a célula visível onde saem
+        carried = {}
+
+        def take_carried(row_idx, values, style_ids):
+            for col_idx in range(1, max_col + 1):
+                if (row_idx, col_idx) in carried:
+                    values[col_idx - 1], style_ids[col_idx - 1] = carried.pop((row_idx, col_idx))
+
+        open_until = 0
+        for row_idx, values, style_ids in sheet.iter_rows(max_row=last_row):
+            for col_idx, anchor in moved.get(row_idx, ()):
+                carried[anchor] = (values[col_idx - 1], style_ids[col_idx - 1])
+                open_until = max(open_until, spans[anchor][2])
+            for col_idx in range(1, max_col + 1):
+                if (row_idx, col_idx) in spans:
+                    open_until = max(open_until, spans[(row_idx, col_idx)][2])
+            if carried:
+                take_carried(row_idx, values, style_ids)
+            if not sheet.row_hidden(row_idx):
+                yield row_html(row_idx, values, style_ids)
+        max_row = sheet.max_row
+
+        # <dimension> ausente ou maior que a última linha com células: completa as linhas
+        # que os rowspans já emitidos prometem, para a tabela não ficar quebrada
+        for row_idx in range(max_row + 1, open_until + 1):
+            if row_idx not in hidden:
+                values, style_ids = [None] * max_col, [0] * max_col
+                take_carried(row_idx, values, style_ids)
+                yield row_html(row_idx, values, style_ids)
+        max_row = max(max_row, open_until)
+
+    # Antes do último pedaço: quem consome pode parar de pedir depois do </table>
+    if info is not None:
+        info["range"] = f"A1:{last_column}{max_row}"
+    yield "</table>"
+
+
+def render_table_html(excel_path, sheet_name=None, last_column='L', last_row=None):
+    """
+    Renderiza o range A1:{last_column}{last_row} como <table> com estilos inline.
+
+    Args:
+        excel_path: Caminho para o arquivo Excel
+        sheet_name: Nome da planilha (padrão: primeira planilha)
+        last_column: Última coluna do range (padrão 'L', como no fluxo via clipboard)
+        last_row: Última linha do range (padrão: última linha usada)
+
+    Returns:
+        Tupla (html_da_tabela, endereco_do_range)
+    """
+    info = {}
+    table_html = ''.join(iter_table_html(excel_path, sheet_name, last_column, last_row, info=info))
+    return table_html, info["range"]
+
+
+def _render_job(job):
+    """Executa um job de renderização isolado (usado pelo ProcessPoolExecutor)"""
+    try:
+        table_html, range_ref = render_table_html(
+            job["excel_path"],
+            sheet_name=job.get("sheet_name"),
+            last_column=job.get("last_column", 'L')
+        )
+        return {"success": True, "excel_path": job["excel_path"], "html": table_html, "range": range_ref}
+    except Exception as e:
+        return {"success": False, "excel_path": job["excel_path"], "error": str(e)}
+
+
+def render_many(jobs, max_workers=None):
+    """
+    Renderiza várias planilhas em paralelo, uma por processo.
+
+    Args:
+        jobs: Lista de dicts {"excel_path", "sheet_name"?, "last_column"?}
+        max_workers: Quantidade de processos (padrão: número de CPUs)
+
+    Returns:
+        Lista de resultados na mesma ordem dos jobs
+    """
+    if len(jobs) <= 1:
+        return [_render_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        return list(executor.map(_render_job, jobs))
+
+
+if __name__ == "__main__":
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    if len(sys.argv) < 2:
+        print("ERRO: Uso correto: python openpyxl_html_renderer.py <caminho_arquivo> [coluna_final]")
+        sys.exit(1)
+
+    try:
+        table_html, _ = render_table_html(sys.argv[1], last_column=sys.argv[2] if len(sys.argv) > 2 else 'L')
+        print(f"SUCCESS:{table_html}")
+    except Exception as e:
+        print(f"ERROR:{e}")
+        sys.exit(1)
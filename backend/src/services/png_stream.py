@@ -0,0 +1,173 @@
+"""
+Escrita de PNG em faixas, sem montar a imagem inteira na memória.
+
+O renderizador entrega as linhas de pixels em blocos (faixas de linhas da
+planilha); cada bloco é filtrado e comprimido com zlib e gravado como chunks
+IDAT à medida que chega. O pico de memória fica no tamanho de uma faixa,
+independente da altura total da imagem.
+
+    with PngStreamWriter("ficha.png", width, height, dpi=300) as png:
+        for band in bands:
+            png.write_rows(band)   # array (linhas, largura, 3) uint8
+
+Para a re-renderização incremental, a imagem também pode ser montada a partir
+de segmentos comprimidos de forma independente (compress_segment): cada faixa
+vira um trecho deflate próprio, e trocar uma faixa não exige comprimir as
+outras de novo (write_png_segments junta os trechos e combina os adler32).
+"""
+import os
+import zlib
+import struct
+
+import numpy as np
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+FILTER_NONE = 0
+FILTER_UP = 2
+ADLER_BASE = 65521
+IDAT_CHUNK_SIZE = 256 * 1024
+INCHES_PER_METER = 39.3701
+
+
+class PngStreamWriter:
+    def __init__(self, path, width, height, dpi=None, compress_level=6):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+
+        self._file = open(path, 'wb')
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = []
+        self._pending_bytes = 0
+        self._previous_row = np.zeros((width * 3,), dtype=np.uint8)
+
+        self._file.write(PNG_SIGNATURE)
+        # Largura, altura, 8 bits por canal, RGB, compressão/filtro padrão, sem entrelaçamento
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        if dpi:
+            pixels_per_meter = int(round(dpi * INCHES_PER_METER))
+            self._chunk(b'pHYs', struct.pack('>IIB', pixels_per_meter, pixels_per_meter, 1))
+
+    def write_rows(self, rows):
+        """Acrescenta um bloco de linhas (array altura x largura x 3, uint8)"""
+        rows = np.ascontiguousarray(rows, dtype=np.uint8).reshape(len(rows), self.width * 3)
+        if self.rows_written + len(rows) > self.height:
+            raise ValueError("Mais linhas do que a altura declarada do PNG")
+        if not len(rows):
+            return
+
+        # Filtro "Up" (diferença para a linha de cima): planilhas têm muitas linhas repetidas
+        filtered = np.empty((len(rows), self.width * 3 + 1), dtype=np.uint8)
+        filtered[:, 0] = FILTER_UP
+        filtered[0, 1:] = rows[0] - self._previous_row
+        filtered[1:, 1:] = rows[1:] - rows[:-1]
+        self._previous_row = rows[-1].copy()
+
+        self._push(self._compressor.compress(filtered.tobytes()))
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"PNG incompleto: {self.rows_written} de {self.height} linhas")
+            self._push(self._compressor.flush(), force=True)
+            self._chunk(b'IEND', b'')
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # Falhou no meio: não deixa um PNG truncado para trás
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            return
+        self.close()
+
+    def _push(self, data, force=False):
+        if data:
+            self._pending.append(data)
+            self._pending_bytes += len(data)
+        if self._pending_bytes >= IDAT_CHUNK_SIZE or (force and self._pending_bytes):
+            self._chunk(b'IDAT', b''.join(self._pending))
+            self._pending = []
+            self._pending_bytes = 0
+
+    def _chunk(self, kind, data):
+        _write_chunk(self._file, kind, data)
+
+
+def _write_chunk(file, kind, data):
+    file.write(struct.pack('>I', len(data)))
+    file.write(kind)
+    file.write(data)
+    file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+
+def adler32_combine(adler1, adler2, length2):
+    """adler32 de A+B a partir do adler32 de A, do de B e do tamanho de B (como o adler32_combine do zlib)"""
+    remainder = length2 % ADLER_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = (remainder * sum1) % ADLER_BASE
+    sum1 += (adler2 & 0xFFFF) + ADLER_BASE - 1
+    sum2 += ((adler1 >> 16) & 0xFFFF) + ((adler2 >> 16) & 0xFFFF) + ADLER_BASE - remainder
+    sum1 %= ADLER_BASE
+    sum2 %= ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+def compress_segment(rows, compress_level=6):
+    """
+    Filtra e comprime um bloco de linhas como um trecho deflate independente.
+
+    A primeira linha usa o filtro None (não depende do bloco anterior) e as
+    demais o filtro Up; o trecho termina alinhado em byte (Z_SYNC_FLUSH), sem
+    bloco final, para poder ser concatenado a outros.
+
+    Returns:
+        (bytes comprimidos, adler32 dos dados filtrados, tamanho dos dados filtrados)
+    """
+    rows = np.ascontiguousarray(rows, dtype=np.uint8).reshape(len(rows), -1)
+    filtered = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+    filtered[0, 0] = FILTER_NONE
+    filtered[0, 1:] = rows[0]
+    filtered[1:, 0] = FILTER_UP
+    filtered[1:, 1:] = rows[1:] - rows[:-1]
+
+    raw = filtered.tobytes()
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -15)
+    data = compressor.compress(raw) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    return data, zlib.adler32(raw), len(raw)
+
+
+def write_png_segments(path, width, height, segments, dpi=None):
+    """
+    Grava o PNG a partir dos segmentos de compress_segment, na ordem das linhas.
+
+    Args:
+        segments: Lista de (bytes comprimidos, adler32, tamanho) cobrindo todas as linhas
+    """
+    checksum = 1
+    for _, adler, length in segments:
+        checksum = adler32_combine(checksum, adler, length)
+
+    # Cabeçalho zlib (deflate, janela de 32 KB, compressão padrão) + trechos + bloco final vazio + adler32
+    stream = [b'\x78\x9c'] + [data for data, _, _ in segments] + [b'\x03\x00', struct.pack('>I', checksum)]
+    with open(path, 'wb') as f:
+        f.write(PNG_SIGNATURE)
+        _write_chunk(f, b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        if dpi:
+            pixels_per_meter = int(round(dpi * INCHES_PER_METER))
+            _write_chunk(f, b'pHYs', struct.pack('>IIB', pixels_per_meter, pixels_per_meter, 1))
+        _write_chunk(f, b'IDAT', b''.join(stream))
+        _write_chunk(f, b'IEND', b'')
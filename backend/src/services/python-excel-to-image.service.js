@@ -1,7 +1,10 @@
-const { exec } = require('child_process');
+const { exec, execFile } = require('child_process');
+const { runFramedScript } = require('../utils/python-frames');
 const fs = require('fs');
+const os = require('os');
 const path = require('path');
 const logger = require('../utils/logger');
+const pythonWorkerPool = require('./python-worker-pool.service');
 
 class PythonExcelToImageService {
     
@@ -24,14 +27,17 @@ class PythonExcelToImageService {
                 throw new Error('Script Python não encontrado');
             }
 
-            // Executar script Python
-            const result = await this.executePythonScript(pythonScriptPath, excelFilePath, outputImagePath);
+            // Executar no worker persistente (ou em um processo novo se o pool estiver desativado)
+            const result = pythonWorkerPool.isEnabled()
+                ? await this.executeInWorker(excelFilePath, outputImagePath)
+                : await this.executePythonScript(pythonScriptPath, excelFilePath, outputImagePath);
             
             if (result.success) {
                 logger.info('✅ Conversão Python EXATA concluída', { 
                     arquivo: outputImagePath,
                     tamanho: fs.statSync(outputImagePath).size + ' bytes',
-                    metodo: result.method
+                    metodo: result.method,
+                    cache: Boolean(result.cached)
                 });
 
                 // Converter para base64 para uso no email
@@ -106,73 +112,149 @@ class PythonExcelToImageService {
         }
     }
 
-    async executePythonScript(scriptPath, excelPath, imagePath) {
-        return new Promise((resolve, reject) => {
-            // Normalizar caminhos para Windows
-            const normalizedExcelPath = path.resolve(excelPath);
-            const normalizedImagePath = path.resolve(imagePath);
-            const normalizedScriptPath = path.resolve(scriptPath);
-            
-            // Comando Python com caminhos absolutos
-            const command = `python "${normalizedScriptPath}" "${normalizedExcelPath}" "${normalizedImagePath}"`;
-            
-            logger.info('🔧 Executando Python com caminhos normalizados', { 
-                comando: command,
-                excelExiste: fs.existsSync(normalizedExcelPath),
-                scriptExiste: fs.existsSync(normalizedScriptPath),
-                diretorioSaida: path.dirname(normalizedImagePath)
+    /**
+     * Converte várias planilhas/abas de uma vez (um relatório inteiro em uma chamada).
+     * O Python distribui os jobs entre processos (um por CPU, ou RENDER_MAX_WORKERS).
+     * @param {Array<{excelFilePath: string, outputImagePath: string, sheetName?: string}>} jobs
+     * @param {Object} options { maxWorkers, timeout }
+     * @returns {Promise<Object>} { success, converted, failed, results: [um por job, na mesma ordem] }
+     */
+    async convertManyExcelToImages(jobs, options = {}) {
+        const manifestJobs = jobs.map(job => ({
+            excel_file_path: path.resolve(job.excelFilePath),
+            output_path: path.resolve(job.outputImagePath),
+            sheet_name: job.sheetName || null
+        }));
+        // Sem timeout explícito: 2 minutos por job, como na conversão individual
+        const timeout = options.timeout || 120000 * Math.max(1, jobs.length);
+
+        logger.info('🐍 Convertendo lote de planilhas para imagem', { jobs: jobs.length });
+
+        const result = pythonWorkerPool.isEnabled()
+            ? await this.executeBatchInWorker(manifestJobs, options.maxWorkers, timeout)
+            : await this.executeBatchScript(manifestJobs, options.maxWorkers, timeout);
+
+        logger.info('✅ Lote de conversões concluído', {
+            convertidas: result.converted,
+            falhas: result.failed
+        });
+        return result;
+    }
+
+    async executeBatchInWorker(jobs, maxWorkers, timeout) {
+        try {
+            return await pythonWorkerPool.run('xlsx_to_image_batch', {
+                jobs,
+                max_workers: maxWorkers || null
+            }, { timeout });
+        } catch (error) {
+            // Falha parcial: o worker devolve o resultado por job junto com o erro
+            if (error.result) {
+                return error.result;
+            }
+            throw error;
+        }
+    }
+
+    async executeBatchScript(jobs, maxWorkers, timeout) {
+        const scriptPath = path.join(__dirname, 'excel_to_image_exact.py');
+        const manifestPath = path.join(os.tmpdir(), `xlsx_to_image_batch_${process.pid}_${Date.now()}.json`);
+        fs.writeFileSync(manifestPath, JSON.stringify({ jobs, max_workers: maxWorkers || null }), 'utf-8');
+
+        try {
+            // Código de saída 1 com resultado = algum job falhou; os detalhes estão no resultado
+            const { result } = await runFramedScript(scriptPath, ['--batch', manifestPath], {
+                timeout,
+                cwd: __dirname,
+                onLog: (line) => logger.debug(`[Python]: ${line}`)
             });
-            
-            exec(command, { 
-                timeout: 120000, // 2 minutos timeout
-                cwd: path.dirname(normalizedScriptPath)
-            }, (error, stdout, stderr) => {
-                
-                logger.info('📝 Saída Python', { 
-                    stdout: stdout,
-                    stderr: stderr,
-                    error: error?.message
-                });
-                
+            return result;
+        } catch (error) {
+            throw new Error(`Conversão em lote falhou: ${error.message}`);
+        } finally {
+            fs.rmSync(manifestPath, { force: true });
+        }
+    }
+
+    async executeInWorker(excelPath, imagePath) {
+        const normalizedImagePath = path.resolve(imagePath);
+
+        const result = await pythonWorkerPool.run('xlsx_to_image_exact', {
+            excel_file_path: path.resolve(excelPath),
+            output_path: normalizedImagePath
+        });
+
+        if (!fs.existsSync(normalizedImagePath)) {
+            throw new Error('Imagem não foi criada apesar do sucesso reportado');
+        }
+
+        return {
+            success: true,
+            imagePath: result.imagePath,
+            method: result.method,
+            cached: Boolean(result.cached)
+        };
+    }
+
+    /**
+     * Estatísticas do cache de imagens do Python (image_cache): acertos, faltas,
+     * renders colapsados, entradas e bytes em disco.
+     * @returns {Promise<Object>}
+     */
+    async getImageCacheStats() {
+        if (pythonWorkerPool.isEnabled()) {
+            return pythonWorkerPool.run('image_cache_stats', {});
+        }
+
+        // Sem o worker, só há as informações do disco (os contadores são por processo)
+        const scriptPath = path.join(__dirname, 'image_cache.py');
+        return new Promise((resolve, reject) => {
+            execFile('python', [scriptPath, 'stats'], { cwd: __dirname, timeout: 30000 }, (error, stdout, stderr) => {
                 if (error) {
-                    reject(new Error(`Erro execução Python: ${error.message}`));
+                    reject(new Error(`Falha ao ler estatísticas do cache de imagens: ${stderr || error.message}`));
                     return;
                 }
-                
-                if (stderr && !stdout.includes('SUCCESS')) {
-                    reject(new Error(`Erro Python stderr: ${stderr}`));
-                    return;
-                }
-                
-                // Verificar se foi bem-sucedido
-                if (stdout.includes('SUCCESS:')) {
-                    const resultPath = stdout.split('SUCCESS:')[1].trim();
-                    
-                    // Verificar se arquivo foi criado
-                    if (fs.existsSync(normalizedImagePath)) {
-                        // Extrair método usado do log
-                        let method = 'Python';
-                        if (stdout.includes('xlwings')) method = 'xlwings (Excel)';
-                        else if (stdout.includes('COM')) method = 'COM Automation';
-                        else if (stdout.includes('Aspose')) method = 'Aspose.Cells';
-                        else if (stdout.includes('LibreOffice')) method = 'LibreOffice';
-                        else if (stdout.includes('OpenPyXL')) method = 'OpenPyXL Melhorado';
-                        
-                        resolve({
-                            success: true,
-                            imagePath: resultPath,
-                            method: method
-                        });
-                    } else {
-                        reject(new Error('Imagem não foi criada apesar do sucesso reportado'));
-                    }
-                } else {
-                    reject(new Error(`Conversão Python falhou: ${stdout || stderr || 'Erro desconhecido'}`));
-                }
+                resolve(JSON.parse(stdout));
             });
         });
     }
 
+    async executePythonScript(scriptPath, excelPath, imagePath) {
+        // Normalizar caminhos para Windows
+        const normalizedExcelPath = path.resolve(excelPath);
+        const normalizedImagePath = path.resolve(imagePath);
+        const normalizedScriptPath = path.resolve(scriptPath);
+
+        logger.info('🔧 Executando Python com caminhos normalizados', {
+            script: normalizedScriptPath,
+            excelExiste: fs.existsSync(normalizedExcelPath),
+            scriptExiste: fs.existsSync(normalizedScriptPath),
+            diretorioSaida: path.dirname(normalizedImagePath)
+        });
+
+        // Logs no stderr; o resultado (caminho, método usado, cache) vem num frame no stdout
+        const { result } = await runFramedScript(normalizedScriptPath, [normalizedExcelPath, normalizedImagePath], {
+            timeout: 120000, // 2 minutos timeout
+            cwd: path.dirname(normalizedScriptPath),
+            onLog: (line) => logger.debug(`[Python]: ${line}`)
+        });
+
+        if (!result.success) {
+            throw new Error(`Conversão Python falhou: ${result.error || 'Erro desconhecido'}`);
+        }
+        // Verificar se arquivo foi criado
+        if (!fs.existsSync(normalizedImagePath)) {
+            throw new Error('Imagem não foi criada apesar do sucesso reportado');
+        }
+
+        return {
+            success: true,
+            imagePath: result.imagePath,
+            method: result.method,
+            cached: Boolean(result.cached)
+        };
+    }
+
     async checkPythonDependencies() {
         try {
             logger.info('🔍 Verificando dependências Python...');
@@ -0,0 +1,198 @@
+const { spawn } = require('child_process');
+const path = require('path');
+const readline = require('readline');
+const logger = require('../utils/logger');
+const pythonMetrics = require('../utils/python-metrics');
+
+/**
+ * Pool de workers Python persistentes (python_worker.py).
+ *
+ * Cada worker carrega os módulos pesados (xlwings, openpyxl, PIL, bs4...) uma
+ * única vez e atende jobs via linhas JSON no stdin/stdout. O pool distribui os
+ * jobs entre os workers livres e enfileira o restante.
+ *
+ * Variáveis de ambiente:
+ *   PYTHON_WORKER_POOL_SIZE   quantidade de workers (0 desativa o pool)
+ *   PYTHON_WORKER_TIMEOUT_MS  timeout padrão por job
+ *   PYTHON_BIN                executável do Python
+ */
+class PythonWorkerPool {
+    constructor() {
+        this.workerScript = path.join(__dirname, 'python_worker.py');
+        this.size = parseInt(process.env.PYTHON_WORKER_POOL_SIZE ?? '2', 10);
+        this.defaultTimeout = parseInt(process.env.PYTHON_WORKER_TIMEOUT_MS ?? '120000', 10);
+        this.pythonBin = process.env.PYTHON_BIN || 'python';
+        this.workers = [];
+        this.queue = [];
+        this.nextJobId = 1;
+    }
+
+    /**
+     * Indica se o pool está habilitado
+     * @returns {boolean}
+     */
+    isEnabled() {
+        return this.size > 0;
+    }
+
+    /**
+     * Executa um job em um worker do pool
+     * @param {string} type Tipo do job (ex.: 'extract_excel_data')
+     * @param {Object} params Parâmetros do job
+     * @param {Object} options { timeout }
+     * @returns {Promise<Object>} Resultado retornado pelo worker
+     */
+    run(type, params = {}, options = {}) {
+        return new Promise((resolve, reject) => {
+            this.queue.push({
+                id: String(this.nextJobId++),
+                type,
+                params,
+                timeout: options.timeout || this.defaultTimeout,
+                resolve,
+                reject
+            });
+            this._ensureWorkers();
+            this._dispatch();
+        });
+    }
+
+    /**
+     * Encerra todos os workers
+     */
+    shutdown() {
+        for (const worker of this.workers) {
+            worker.process.stdin.end();
+            worker.process.kill();
+        }
+        this.workers = [];
+    }
+
+    _ensureWorkers() {
+        while (this.workers.length < this.size) {
+            this.workers.push(this._startWorker());
+        }
+    }
+
+    _startWorker() {
+        const worker = {
+            process: null,
+            ready: false,
+            job: null,
+            timer: null
+        };
+
+        worker.process = spawn(this.pythonBin, [this.workerScript], {
+            cwd: __dirname,
+            env: { ...process.env, PYTHONIOENCODING: 'utf-8' }
+        });
+
+        logger.info('🐍 Worker Python iniciado', { pid: worker.process.pid });
+
+        readline.createInterface({ input: worker.process.stdout }).on('line', (line) => {
+            this._handleMessage(worker, line);
+        });
+
+        worker.process.stderr.on('data', (data) => {
+            logger.debug(`[Python worker ${worker.process.pid}]: ${data.toString('utf8').trim()}`);
+        });
+
+        worker.process.on('exit', (code) => {
+            logger.warn('⚠️ Worker Python finalizado', { pid: worker.process.pid, code });
+            this._removeWorker(worker, new Error(`Worker Python finalizado com código ${code}`));
+        });
+
+        worker.process.on('error', (error) => {
+            logger.error('❌ Falha ao iniciar worker Python', error);
+            this._removeWorker(worker, new Error(`Falha ao iniciar worker Python: ${error.message}`));
+        });
+
+        return worker;
+    }
+
+    _handleMessage(worker, line) {
+        let message;
+        try {
+            message = JSON.parse(line);
+        } catch (parseError) {
+            logger.warn('⚠️ Linha inválida recebida do worker Python', { linha: line });
+            return;
+        }
+
+        if (message.type === 'ready') {
+            worker.ready = true;
+            logger.info('✅ Worker Python pronto', { pid: worker.process.pid, jobs: message.jobTypes });
+            this._dispatch();
+            return;
+        }
+
+        const job = worker.job;
+        if (!job || message.id !== job.id) {
+            return;
+        }
+
+        clearTimeout(worker.timer);
+        worker.job = null;
+        pythonMetrics.record(message.metrics, message.result);
+
+        if (message.success) {
+            job.resolve(message.result);
+        } else {
+            const error = new Error(message.error || 'Erro desconhecido no worker Python');
+            // Jobs em lote devolvem o resultado por item mesmo quando algum falhou
+            error.result = message.result;
+            job.reject(error);
+        }
+
+        this._dispatch();
+    }
+
+    _dispatch() {
+        for (const worker of this.workers) {
+            if (this.queue.length === 0) {
+                return;
+            }
+            if (!worker.ready || worker.job) {
+                continue;
+            }
+
+            const job = this.queue.shift();
+            worker.job = job;
+            worker.timer = setTimeout(() => {
+                // Um job travado (ex.: Excel pendurado) derruba o worker; o pool sobe outro
+                job.reject(new Error(`Timeout de ${job.timeout}ms no job ${job.type}`));
+                worker.job = null;
+                worker.process.kill();
+            }, job.timeout);
+
+            worker.process.stdin.write(JSON.stringify({
+                id: job.id,
+                type: job.type,
+                params: job.params
+            }) + '\n');
+        }
+    }
+
+    _removeWorker(worker, error) {
+        clearTimeout(worker.timer);
+        if (worker.job) {
+            worker.job.reject(error);
+            worker.job = null;
+        }
+
+        this.workers = this.workers.filter(w => w !== worker);
+
+        if (!worker.ready) {
+            // O worker nem chegou a iniciar: não adianta subir outro em loop
+            const pending = this.queue.splice(0);
+            pending.forEach(job => job.reject(error));
+            return;
+        }
+
+        if (this.queue.length > 0) {
+            this._ensureWorkers();
+        }
+    }
+}
+
+module.exports = new PythonWorkerPool();
@@ -0,0 +1,198 @@
+"""
+Worker persistente para os serviços Python de Excel.
+
+Em vez de abrir um interpretador novo a cada requisição (e pagar de novo a
+importação de bs4, requests, xlwings, openpyxl, PIL...), o worker carrega os
+módulos uma única vez e fica atendendo jobs recebidos pelo stdin.
+
+Protocolo (uma linha JSON por mensagem):
+    entrada: {"id": "1", "type": "extract_excel_data", "params": {...}}
+    saída:   {"id": "1", "success": true, "result": {...}, "metrics": {...}}
+             {"id": "1", "success": false, "error": "...", "metrics": {...}}
+
+"metrics" traz o tempo, o tamanho e (com METRICS_MEMORY=1) o pico de memória de
+cada etapa do job (ver stage_metrics.py); com PROFILE_DIR, cada job grava também
+um perfil cProfile.
+
+Ao iniciar, o worker envia {"type": "ready", "jobTypes": [...]} com os tipos de
+job disponíveis nesta máquina. Todos os print() dos serviços são redirecionados
+para o stderr, de forma que o stdout carrega apenas as respostas.
+
+Uso:
+    python python_worker.py
+"""
+import sys
+import json
+import traceback
+
+# O stdout real fica reservado para o protocolo; qualquer print vai para o stderr
+PROTOCOL_OUT = sys.stdout
+PROTOCOL_OUT.reconfigure(encoding='utf-8')
+sys.stdout = sys.stderr
+sys.stderr.reconfigure(encoding='utf-8')
+
+from service_env import load_env
+from stage_metrics import job_metrics
+
+load_env()
+
+# Carrega os módulos uma única vez. Um módulo que não pode ser importado
+# nesta máquina (ex.: xlwings/win32clipboard fora do Windows) apenas desabilita
+# os jobs que dependem dele.
+MODULES = {}
+IMPORT_ERRORS = {}
+
+for module_name in ("excel_copy_paste_new", "enviar_relatorio_completo", "excel_to_image_exact"):
+    try:
+        MODULES[module_name] = __import__(module_name)
+    except Exception as e:
+        IMPORT_ERRORS[module_name] = f"{type(e).__name__}: {e}"
+        print(f"WARN: módulo {module_name} indisponível no worker: {IMPORT_ERRORS[module_name]}")
+
+# Os scripts só importam as dependências pesadas no caminho que as usa (para a
+# linha de comando iniciar rápido); o worker vive muito, então as carrega já na
+# partida para que o primeiro job não pague por elas. Falhar aqui não desabilita
+# nada: o job que precisar do módulo mostra o erro.
+PRELOAD_MODULES = ("openpyxl_html_renderer", "css_inliner", "graph_mail", "mail_images", "bs4", "sheet_raster_renderer")
+
+for module_name in PRELOAD_MODULES:
+    try:
+        __import__(module_name)
+    except Exception as e:
+        print(f"WARN: pré-carga de {module_name} falhou: {type(e).__name__}: {e}")
+
+
+def _require(module_name):
+    """Retorna o módulo carregado ou levanta erro explicando por que não está disponível"""
+    module = MODULES.get(module_name)
+    if module is None:
+        raise RuntimeError(f"Módulo {module_name} indisponível: {IMPORT_ERRORS.get(module_name)}")
+    return module
+
+
+def job_extract_excel_data(params):
+    return _require("excel_copy_paste_new").extract_excel_data(params["excel_file_path"])
+
+
+def job_get_formatted_html_from_excel(params):
+    html = _require("enviar_relatorio_completo").get_formatted_html_from_excel(params["excel_path"])
+    return {"success": True, "html": html}
+
+
+def job_xlsx_to_image_exact(params):
+    module = _require("excel_to_image_exact")
+    converter = module.ExcelToImageConverter(
+        params["excel_file_path"],
+        max_tile_height=params.get("max_tile_height"),
+        split_pages=bool(params.get("split_pages"))
+    )
+    image_path = converter.convert_to_image(params.get("sheet_name"), params.get("output_path"))
+    if not image_path:
+        return {"success": False, "error": "Conversão falhou"}
+    result = {"success": True, "imagePath": image_path, "method": converter.last_method,
+              "cached": converter.last_cached}
+    if converter.last_pages:
+        result["pages"] = converter.last_pages
+    return result
+
+
+def job_xlsx_to_image_batch(params):
+    return _require("excel_to_image_exact").convert_many(params["jobs"], params.get("max_workers"))
+
+
+def job_image_cache_stats(params):
+    _require("excel_to_image_exact")
+    from image_cache import get_image_cache
+    return get_image_cache().stats()
+
+
+def job_send_email(params):
+    return _require("excel_copy_paste_new").send_email(
+        params["to_email"],
+        params["subject"],
+        params["grupo"],
+        params["excel_file_path"],
+        params.get("additional_message")
+    )
+
+
+def job_send_email_batch(params):
+    return _require("excel_copy_paste_new").send_email_batch(
+        params["jobs"],
+        params.get("max_concurrency")
+    )
+
+
+def job_run_complete_process(params):
+    result = _require("enviar_relatorio_completo").run_complete_process(
+        excel_path=params["excel_path"],
+        image_path=params["image_path"],
+        recipient=params["recipient"],
+        subject=params["subject"],
+        message=params["message"]
+    )
+    return {"success": True, "message": "E-mail enviado com sucesso.", "timings": result["timings"]}
+
+
+def job_run_complete_process_batch(params):
+    return _require("enviar_relatorio_completo").run_complete_process_batch(params["jobs"])
+
+
+JOB_TYPES = {
+    "extract_excel_data": ("excel_copy_paste_new", job_extract_excel_data),
+    "get_formatted_html_from_excel": ("enviar_relatorio_completo", job_get_formatted_html_from_excel),
+    "xlsx_to_image_exact": ("excel_to_image_exact", job_xlsx_to_image_exact),
+    "xlsx_to_image_batch": ("excel_to_image_exact", job_xlsx_to_image_batch),
+    "image_cache_stats": ("excel_to_image_exact", job_image_cache_stats),
+    "send_email": ("excel_copy_paste_new", job_send_email),
+    "send_email_batch": ("excel_copy_paste_new", job_send_email_batch),
+    "run_complete_process": ("enviar_relatorio_completo", job_run_complete_process),
+    "run_complete_process_batch": ("enviar_relatorio_completo", job_run_complete_process_batch),
+}
+
+
+def send_message(message):
+    """Escreve uma mensagem do protocolo no stdout real"""
+    PROTOCOL_OUT.write(json.dumps(message, ensure_ascii=False) + "\n")
+    PROTOCOL_OUT.flush()
+
+
+def handle_job(job):
+    """Executa um job e monta a resposta correspondente"""
+    job_id = job.get("id")
+    job_type = job.get("type")
+
+    if job_type not in JOB_TYPES:
+        return {"id": job_id, "success": False, "error": f"Tipo de job desconhecido: {job_type}"}
+
+    _, handler = JOB_TYPES[job_type]
+    try:
+        with job_metrics(job_type) as metrics:
+            result = handler(job.get("params") or {})
+    except Exception as e:
+        traceback.print_exc()
+        return {"id": job_id, "success": False, "error": str(e), "metrics": metrics}
+
+    if isinstance(result, dict) and result.get("success") is False:
+        return {"id": job_id, "success": False, "error": result.get("error"), "result": result, "metrics": metrics}
+    return {"id": job_id, "success": True, "result": result, "metrics": metrics}
+
+
+def main():
+    available = [name for name, (module_name, _) in JOB_TYPES.items() if module_name in MODULES]
+    send_message({"type": "ready", "jobTypes": available, "importErrors": IMPORT_ERRORS})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            send_message({"id": None, "success": False, "error": f"JSON inválido: {e}"})
+            continue
+        send_message(handle_job(job))
+
+
+if __name__ == "__main__":
+    main()
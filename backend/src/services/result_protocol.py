@@ -0,0 +1,118 @@
+"""
+Protocolo de resultado entre os scripts Python e os serviços Node (modo --framed).
+
+Sem ele, os scripts devolvem o resultado com print("SUCCESS:<html inteiro>")
+no meio dos logs, e o Node acumula o stdout inteiro (limitado pelo maxBuffer
+do exec) e procura o prefixo com buscas de string. Com --framed:
+
+- todo print (logs) vai para o stderr;
+- o stdout leva só frames: 1 byte de tipo (b'J' JSON, b'B' binário), o tamanho
+  do conteúdo em 4 bytes (uint32 big-endian) e o conteúdo;
+- textos grandes (HTML) vão para um arquivo temporário e o JSON leva só a
+  referência {"$file": caminho, "bytes": n}; quem lê o resultado apaga o arquivo.
+
+Assim o tratamento do resultado não depende do volume de log. O lado Node está
+em src/utils/python-frames.js.
+
+    framed = enable_framed_output()   # remove --framed de sys.argv
+    ...
+    if not emit_result({"success": True, "html": spill_large(html)}):
+        print(f"SUCCESS:{html}")      # formato antigo, sem --framed
+
+Variáveis de ambiente:
+    PYTHON_FRAME_INLINE_MAX  textos maiores que isto (em bytes) vão para arquivo (padrão 256 KB)
+"""
+import os
+import sys
+import json
+import struct
+import tempfile
+import threading
+
+FRAMED_FLAG = "--framed"
+FRAME_JSON = b'J'
+FRAME_BINARY = b'B'
+DEFAULT_INLINE_MAX = 256 * 1024
+
+_writer = None
+
+
+class FrameWriter:
+    """Escreve frames (tipo + tamanho + conteúdo) num stream binário"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write_frame(self, kind, payload):
+        with self._lock:
+            self.stream.write(kind + struct.pack('>I', len(payload)))
+            self.stream.write(payload)
+            self.stream.flush()
+
+    def write_json(self, value):
+        self.write_frame(FRAME_JSON, json.dumps(value, ensure_ascii=False).encode('utf-8'))
+
+    def write_bytes(self, data):
+        self.write_frame(FRAME_BINARY, bytes(data))
+
+
+def enable_framed_output(argv=None):
+    """
+    Liga o modo --framed se o argumento estiver presente (e o remove de argv).
+
+    O stdout real fica reservado aos frames; sys.stdout passa a ser o stderr,
+    então qualquer print dos serviços vira log.
+
+    Returns:
+        True se o modo foi ligado
+    """
+    global _writer
+    argv = sys.argv if argv is None else argv
+    if FRAMED_FLAG not in argv:
+        return _writer is not None
+    while FRAMED_FLAG in argv:
+        argv.remove(FRAMED_FLAG)
+    if _writer is None:
+        sys.stdout.flush()
+        _writer = FrameWriter(sys.stdout.buffer)
+        sys.stdout = sys.stderr
+    return True
+
+
+def is_framed():
+    return _writer is not None
+
+
+def emit_result(value):
+    """Envia o resultado como frame JSON; devolve False (sem escrever nada) fora do modo --framed"""
+    if _writer is None:
+        return False
+    _writer.write_json(value)
+    return True
+
+
+def emit_bytes(data):
+    """Envia dados binários (ex.: um pedaço do HTML em streaming) como frame; False fora do modo --framed"""
+    if _writer is None:
+        return False
+    _writer.write_bytes(data)
+    return True
+
+
+def spill_large(text, max_inline=None):
+    """
+    Texto pequeno fica no JSON; texto grande vai para um arquivo temporário e
+    vira a referência {"$file", "bytes", "encoding"} (só no modo --framed).
+    """
+    if _writer is None or not isinstance(text, str):
+        return text
+    if max_inline is None:
+        max_inline = int(os.getenv("PYTHON_FRAME_INLINE_MAX") or DEFAULT_INLINE_MAX)
+    data = text.encode('utf-8')
+    if len(data) <= max_inline:
+        return text
+    fd, path = tempfile.mkstemp(prefix="fluxocliente-result-", suffix=".txt")
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    return {"$file": path, "bytes": len(data), "encoding": "utf-8"}
@@ -0,0 +1,93 @@
+"""
+Etapas independentes do envio executadas ao mesmo tempo, com o tempo de cada uma.
+
+O envio era todo em sequência: extrair a planilha, pedir o token do Graph,
+ler a imagem e só então enviar. Essas etapas não dependem umas das outras;
+run_stages() roda as de fundo (token, imagem) em threads enquanto a etapa
+principal roda na thread atual, e o envio começa assim que todas terminam.
+
+A extração fica na thread que chamou: o Excel (COM/xlwings) e o clipboard só
+funcionam na thread em que foram abertos, e o pool do Excel é usado por uma
+única thread por processo.
+
+    results, timings = run_stages({
+        "extract": lambda: extract_excel_data(path),
+        "token": lambda: get_access_token(config)
+    }, on_caller="extract")
+    print(f"INFO: Etapas: {format_timings(timings)}")
+
+Os tempos (em segundos) vêm por etapa, mais "parallel" (tempo real das etapas
+juntas) e "saved" (quanto a sobreposição economizou em relação a rodá-las em
+sequência).
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stage_metrics import span, in_current_context
+
+STAGE_LABELS = {
+    "extract": "extração",
+    "token": "token",
+    "image": "imagem",
+    "prepare": "preparo",
+    "body": "corpo",
+    "send": "envio",
+    "parallel": "em paralelo",
+    "saved": "economia",
+    "total": "total",
+}
+
+
+def run_stages(stages, on_caller=None):
+    """
+    Executa funções independentes ao mesmo tempo e mede cada uma.
+
+    Args:
+        stages: Dict nome -> função sem argumentos
+        on_caller: Etapa que roda na thread atual (as demais vão para threads)
+
+    Returns:
+        (resultados, tempos): dicts por nome da etapa. Se alguma etapa falhar, a
+        exceção é levantada depois que todas terminarem (a primeira, na ordem de stages).
+        Cada etapa também vira um span "stage.<nome>" do job atual (stage_metrics).
+    """
+    timings = {}
+
+    def timed(name):
+        started = time.perf_counter()
+        try:
+            with span(f"stage.{name}"):
+                return stages[name]()
+        finally:
+            timings[name] = round(time.perf_counter() - started, 3)
+
+    results, errors = {}, {}
+    started = time.perf_counter()
+    background = [name for name in stages if name != on_caller]
+    with ThreadPoolExecutor(max_workers=max(len(background), 1), thread_name_prefix="send-stage") as executor:
+        # As threads herdam o job e o span atuais, para que os spans das etapas entrem no job
+        futures = {name: executor.submit(in_current_context(timed), name) for name in background}
+        if on_caller in stages:
+            try:
+                results[on_caller] = timed(on_caller)
+            except Exception as e:
+                errors[on_caller] = e
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+    # Na ordem de stages (não na ordem em que terminaram)
+    timings = {name: timings[name] for name in stages}
+    timings["parallel"] = round(time.perf_counter() - started, 3)
+    timings["saved"] = round(max(0.0, sum(timings[name] for name in stages) - timings["parallel"]), 3)
+
+    for name in stages:
+        if name in errors:
+            raise errors[name]
+    return results, timings
+
+
+def format_timings(timings):
+    """Tempos das etapas numa linha, para o log"""
+    return ", ".join(f"{STAGE_LABELS.get(name, name)} {seconds:.2f}s" for name, seconds in timings.items())
@@ -0,0 +1,48 @@
+"""
+Carregamento sob demanda do .env e da configuração do Microsoft Graph.
+
+Os scripts chamados pelo Node carregavam o .env (dotenv) e montavam a
+configuração do Graph já na importação, mesmo nos comandos que não enviam
+e-mail. Agora cada ponto de entrada chama load_env() no início do main (o
+python_worker.py, ao iniciar), e get_graph_config() só é chamado quando algum
+e-mail vai de fato ser enviado.
+
+    load_env()
+    client = GraphMailClient(get_graph_config())
+"""
+import os
+import threading
+
+_env_lock = threading.Lock()
+_env_loaded = False
+
+
+def load_env():
+    """Carrega o .env uma única vez no processo (as variáveis já definidas prevalecem)"""
+    global _env_loaded
+    with _env_lock:
+        if not _env_loaded:
+            import dotenv
+            # Procura o .env a partir desta pasta (src/services) para cima, como antes
+            dotenv.load_dotenv()
+            _env_loaded = True
+
+
+def get_graph_config(client_id=None):
+    """
+    Configuração do Microsoft Graph a partir das variáveis de ambiente.
+
+    Args:
+        client_id: Client ID fixo; sem ele, usa GRAPH_CLIENT_ID
+    """
+    load_env()
+    tenant_id = os.getenv("GRAPH_TENANT_ID")
+    return {
+        "client_id": client_id or os.getenv("GRAPH_CLIENT_ID"),
+        "client_secret": os.getenv("GRAPH_CLIENT_SECRET"),
+        "tenant_id": tenant_id,
+        "sender_email": os.getenv("EMAIL_SENDER"),
+        "authority": f"https://login.microsoftonline.com/{tenant_id}",
+        "token_url": os.getenv("GRAPH_TOKEN_URL") or f"https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token",
+        "graph_url": os.getenv("GRAPH_URL") or "https://graph.microsoft.com/v1.0"
+    }
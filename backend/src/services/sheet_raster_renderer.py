@@ -0,0 +1,541 @@
+"""
+Renderização da planilha em imagem (PNG) com openpyxl + NumPy + Pillow.
+
+Em vez de percorrer a planilha célula a célula desenhando retângulos, o
+renderizador monta primeiro um modelo em arrays (SheetGrid):
+
+- offsets de colunas e linhas por soma acumulada (np.cumsum) das larguras/alturas;
+- cor de fundo de cada célula num array (linhas, colunas, 3);
+- bordas como arrays de espessura por aresta (horizontais e verticais);
+- lista dos textos a desenhar, com a fonte já identificada por (face, tamanho, negrito).
+
+Os estilos vêm da StyleTable (style_table): cada estilo distinto vira um
+CellStyleInfo uma única vez e as células só carregam o id dele.
+
+Depois pinta tudo em lote: os fundos são expandidos para pixels com indexação
+do NumPy, a grade é aplicada por máscara, as bordas viram trechos contínuos
+(uma operação por trecho, não por célula) e só o texto é desenhado pelo Pillow,
+com as fontes em cache.
+
+A leitura do arquivo usa o workbook_loader (read_only, só a planilha alvo);
+render_sheet(ws) continua aceitando um worksheet já aberto em modo completo.
+
+Planilhas muito altas são pintadas em faixas de linhas (no máximo
+max_tile_height pixels cada): as faixas vão direto para um PNG em streaming
+(png_stream) ou viram páginas separadas, e o pico de memória fica no tamanho
+de uma faixa, não da imagem inteira.
+
+    image = render_sheet(ws)
+    render_sheet_image("ficha.xlsx", output_path="ficha.png")
+    render_sheet_pages("ficha.xlsx", output_path="ficha.png", max_tile_height=2000)
+
+Variáveis de ambiente:
+    RENDER_MAX_TILE_HEIGHT  altura máxima de cada faixa em pixels (padrão 2048)
+"""
+import os
+from bisect import bisect_left
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from openpyxl.utils import get_column_letter
+
+from png_stream import PngStreamWriter
+from style_table import StyleTable
+from workbook_loader import load_sheet
+
+# Mesmas conversões usadas pelo método 5 original
+EXCEL_POINT_TO_PIXEL = 1.33
+COLUMN_WIDTH_TO_PIXEL = 7.5
+DEFAULT_COL_WIDTH = 64
+DEFAULT_ROW_HEIGHT = 20
+DEFAULT_FONT_SIZE = 11
+
+DEFAULT_MAX_TILE_HEIGHT = 2048
+OUTPUT_DPI = 300
+
+# Fontes e caracteres pré-carregados por warm_font_cache (planilhas do fluxo usam Calibri/Arial 10-11)
+DEFAULT_WARM_FONTS = tuple((face, size, bold) for face in ('Calibri', 'Arial') for size in (10, 11) for bold in (False, True))
+WARM_CHARS = '0123456789.,-/%$R ' + 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz' + 'ÁÂÃÀÇÉÊÍÓÔÕÚáâãàçéêíóôõú'
+
+GRIDLINE_COLOR = (240, 240, 240)
+BORDER_COLOR = (0, 0, 0)
+BACKGROUND_COLOR = (255, 255, 255)
+
+WINDOWS_FONTS_DIR = "C:/Windows/Fonts"
+WINDOWS_FONT_FILES = {
+    "arial": ("arial.ttf", "arialbd.ttf"),
+    "calibri": ("calibri.ttf", "calibrib.ttf"),
+    "cambria": ("cambria.ttc", "cambriab.ttf"),
+    "segoe ui": ("segoeui.ttf", "segoeuib.ttf"),
+    "tahoma": ("tahoma.ttf", "tahomabd.ttf"),
+    "times new roman": ("times.ttf", "timesbd.ttf"),
+    "verdana": ("verdana.ttf", "verdanab.ttf"),
+}
+LINUX_FONT_FILES = (
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+    ("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf", "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf"),
+)
+
+
+def _font_paths(face, bold):
+    """Arquivos de fonte candidatos para (face, negrito), do mais ao menos fiel"""
+    index = 1 if bold else 0
+    if os.name == 'nt':
+        files = WINDOWS_FONT_FILES.get((face or '').lower())
+        if files:
+            yield os.path.join(WINDOWS_FONTS_DIR, files[index])
+        yield os.path.join(WINDOWS_FONTS_DIR, WINDOWS_FONT_FILES["arial"][index])
+    else:
+        for files in LINUX_FONT_FILES:
+            yield files[index]
+            yield files[0]
+
+
+@lru_cache(maxsize=256)
+def get_font(face, size, bold=False):
+    """Fonte carregada uma única vez por (face, tamanho, negrito)"""
+    for path in _font_paths(face, bold):
+        if os.path.exists(path):
+            try:
+                return ImageFont.truetype(path, size)
+            except OSError:
+                continue
+    return ImageFont.load_default()
+
+
+def _border_width(border):
+    if border is None:
+        return 0
+    return 2 if border[0] == 'thick' else 1
+
+
+class CellStyleInfo:
+    """O que o renderizador precisa de um estilo da StyleTable, calculado uma vez por estilo"""
+    __slots__ = ('fill', 'left', 'right', 'top', 'bottom', 'font_key', 'text_color', 'h_align', 'v_align')
+
+    def __init__(self, style):
+        self.fill = style.fill_rgb if style.fill_pattern else None
+
+        top, right, bottom, left = style.borders
+        self.top = _border_width(top)
+        self.right = _border_width(right)
+        self.bottom = _border_width(bottom)
+        self.left = _border_width(left)
+
+        self.font_key = (style.font_name, int(style.font_size) if style.font_size else DEFAULT_FONT_SIZE, style.bold)
+        self.text_color = style.font_rgb or (0, 0, 0)
+
+        self.h_align = style.h_align
+        self.v_align = style.v_align
+
+
+class SheetGrid:
+    """Modelo da planilha em arrays, pronto para ser pintado"""
+
+    def __init__(self, col_widths, row_heights):
+        self.col_widths = np.asarray(col_widths, dtype=np.int64)
+        self.row_heights = np.asarray(row_heights, dtype=np.int64)
+        self.x_offsets = np.concatenate(([0], np.cumsum(self.col_widths)))
+        self.y_offsets = np.concatenate(([0], np.cumsum(self.row_heights)))
+
+        rows, cols = len(self.row_heights), len(self.col_widths)
+        self.fill = np.empty((rows, cols, 3), dtype=np.uint8)
+        self.fill[:] = BACKGROUND_COLOR
+        self.has_fill = np.zeros((rows, cols), dtype=bool)
+        # Espessura da borda em cada aresta: h_borders[r, c] é a linha acima da linha r
+        self.h_borders = np.zeros((rows + 1, cols), dtype=np.uint8)
+        self.v_borders = np.zeros((rows, cols + 1), dtype=np.uint8)
+        # (linha, coluna, texto, CellStyleInfo) em coordenadas 0-based, em ordem de linha
+        self.texts = []
+        self._text_rows = None
+
+    @property
+    def width(self):
+        return int(self.x_offsets[-1])
+
+    @property
+    def height(self):
+        return int(self.y_offsets[-1])
+
+    def texts_between(self, row_start, row_end):
+        """Textos das linhas [row_start, row_end), sem percorrer a lista inteira a cada faixa"""
+        if self._text_rows is None or len(self._text_rows) != len(self.texts):
+            self._text_rows = [text[0] for text in self.texts]
+        return self.texts[bisect_left(self._text_rows, row_start):bisect_left(self._text_rows, row_end)]
+
+    def band_ranges(self, max_tile_height):
+        """
+        Divide as linhas em faixas [início, fim) de até max_tile_height pixels.
+
+        Uma linha mais alta que o limite fica sozinha na sua faixa.
+        """
+        rows = len(self.row_heights)
+        bands = []
+        start = 0
+        for r in range(rows):
+            if r > start and self.y_offsets[r + 1] - self.y_offsets[start] > max_tile_height:
+                bands.append((start, r))
+                start = r
+        bands.append((start, rows))
+        return bands
+
+
+def column_pixels(width):
+    return int(width * COLUMN_WIDTH_TO_PIXEL) if width else DEFAULT_COL_WIDTH
+
+
+def row_pixels(height):
+    return int(height * EXCEL_POINT_TO_PIXEL) if height else DEFAULT_ROW_HEIGHT
+
+
+def sheet_dimensions(ws):
+    """Larguras das colunas e alturas das linhas em pixels"""
+    col_widths = [column_pixels(ws.column_dimensions[get_column_letter(col)].width)
+                  for col in range(1, ws.max_column + 1)]
+    row_heights = [row_pixels(ws.row_dimensions[row].height) for row in range(1, ws.max_row + 1)]
+    return col_widths, row_heights
+
+
+def load_sheet_grid(ws):
+    """Lê a planilha uma única vez (iter_rows) e monta o SheetGrid"""
+    grid = SheetGrid(*sheet_dimensions(ws))
+    rows, cols = grid.has_fill.shape
+    table = StyleTable()
+    styles = {}
+
+    for r, row in enumerate(ws.iter_rows(min_row=1, max_row=rows, max_col=cols)):
+        for c, cell in enumerate(row):
+            style_key = tuple(cell._style) if cell.has_style else None
+            info = styles.get(style_key)
+            if info is None:
+                style = table[table.add(cell.font, cell.fill, cell.border, cell.alignment, cell.number_format)]
+                info = styles[style_key] = CellStyleInfo(style)
+
+            if info.fill is not None:
+                grid.fill[r, c] = info.fill
+                grid.has_fill[r, c] = True
+
+            # Uma aresta compartilhada fica com a borda mais grossa entre as duas células
+            if info.top and info.top > grid.h_borders[r, c]:
+                grid.h_borders[r, c] = info.top
+            if info.bottom and info.bottom > grid.h_borders[r + 1, c]:
+                grid.h_borders[r + 1, c] = info.bottom
+            if info.left and info.left > grid.v_borders[r, c]:
+                grid.v_borders[r, c] = info.left
+            if info.right and info.right > grid.v_borders[r, c + 1]:
+                grid.v_borders[r, c + 1] = info.right
+
+            if cell.value is not None:
+                text = str(cell.value)
+                if text.strip():
+                    grid.texts.append((r, c, text, info))
+    return grid
+
+
+def sheet_data_grid(sheet):
+    """
+    Monta o SheetGrid a partir do modelo colunar do workbook_loader.
+
+    Cada estilo é resolvido uma vez e aplicado de uma só vez a todas as suas
+    células, por indexação do NumPy.
+    """
+    col_widths = [column_pixels(width) for width, _ in sheet.column_widths()]
+    row_heights = [row_pixels(sheet.row_heights.get(row)) for row in range(1, sheet.max_row + 1)]
+    grid = SheetGrid(col_widths, row_heights)
+    if not len(sheet):
+        return grid
+
+    rows = np.frombuffer(sheet.cell_rows, dtype=np.uintc).astype(np.intp) - 1
+    cols = np.frombuffer(sheet.cell_cols, dtype=np.ushort).astype(np.intp) - 1
+    style_ids = np.frombuffer(sheet.style_ids, dtype=np.ushort)
+
+    infos = [CellStyleInfo(style) for style in sheet.styles.records]
+    for style_id in np.unique(style_ids).tolist():
+        info = infos[style_id]
+        selected = style_ids == style_id
+        r, c = rows[selected], cols[selected]
+
+        if info.fill is not None:
+            grid.fill[r, c] = info.fill
+            grid.has_fill[r, c] = True
+
+        # Uma aresta compartilhada fica com a borda mais grossa entre as duas células
+        if info.top:
+            np.maximum.at(grid.h_borders, (r, c), info.top)
+        if info.bottom:
+            np.maximum.at(grid.h_borders, (r + 1, c), info.bottom)
+        if info.left:
+            np.maximum.at(grid.v_borders, (r, c), info.left)
+        if info.right:
+            np.maximum.at(grid.v_borders, (r, c + 1), info.right)
+
+    for index, value in enumerate(sheet.values):
+        if value is not None:
+            text = str(value)
+            if text.strip():
+                grid.texts.append((int(rows[index]), int(cols[index]), text, infos[sheet.style_ids[index]]))
+    return grid
+
+
+def _runs(values):
+    """Trechos contínuos de valores iguais e não nulos: lista de (início, fim_exclusivo, valor)"""
+    if not len(values):
+        return []
+    change = np.flatnonzero(np.diff(values)) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.concatenate((change, [len(values)]))
+    return [(int(s), int(e), int(values[s])) for s, e in zip(starts, ends) if values[s]]
+
+
+def paint_grid(grid, row_start=0, row_end=None):
+    """
+    Pinta as linhas [row_start, row_end) do grid e devolve a imagem (PIL).
+
+    Fundos, grade e bordas são operações em lote no array de pixels; o texto é
+    desenhado depois pelo Pillow.
+    """
+    row_end = len(grid.row_heights) if row_end is None else row_end
+    top = int(grid.y_offsets[row_start])
+    height = int(grid.y_offsets[row_end]) - top
+    width = grid.width
+    if width == 0 or height == 0:
+        return Image.new('RGB', (max(width, 1), max(height, 1)), BACKGROUND_COLOR)
+
+    xs = grid.x_offsets
+    ys = grid.y_offsets[row_start:row_end + 1] - top
+    cols = len(grid.col_widths)
+
+    # 1. Fundos: expande a cor de cada célula para o tamanho dela em pixels
+    # (colunas primeiro: o array intermediário fica com uma linha por célula, não por pixel)
+    pixels = np.repeat(np.repeat(grid.fill[row_start:row_end], grid.col_widths, axis=1),
+                       grid.row_heights[row_start:row_end], axis=0)
+
+    # 2. Grade sutil, só onde nenhuma das células vizinhas tem preenchimento
+    has_fill = grid.has_fill
+    left_fill = np.zeros_like(has_fill)
+    left_fill[:, 1:] = has_fill[:, :-1]
+    up_fill = np.zeros_like(has_fill)
+    up_fill[1:, :] = has_fill[:-1, :]
+
+    v_visible = ~(has_fill | left_fill)[row_start:row_end]
+    for c in range(cols):
+        x = int(xs[c])
+        if x >= width:
+            continue
+        for start, end, _ in _runs(v_visible[:, c]):
+            pixels[int(ys[start]):int(ys[end]), x] = GRIDLINE_COLOR
+
+    h_visible = ~(has_fill | up_fill)[row_start:row_end]
+    for r in range(row_end - row_start):
+        y = int(ys[r])
+        if y >= height:
+            continue
+        for start, end, _ in _runs(h_visible[r]):
+            pixels[y, int(xs[start]):int(xs[end])] = GRIDLINE_COLOR
+
+    # 3. Bordas agrupadas em trechos contínuos da mesma espessura
+    for r in range(row_start, row_end + 1):
+        y = int(grid.y_offsets[r]) - top
+        if y >= height:
+            continue
+        for start, end, thickness in _runs(grid.h_borders[r]):
+            x1, x2 = int(xs[start]), min(int(xs[end]), width - 1)
+            pixels[max(y, 0):y + thickness, x1:x2 + 1] = BORDER_COLOR
+
+    for c in range(len(grid.col_widths) + 1):
+        x = int(xs[c])
+        if x >= width:
+            continue
+        for start, end, thickness in _runs(grid.v_borders[row_start:row_end, c]):
+            y1, y2 = int(ys[start]), min(int(ys[end]), height - 1)
+            pixels[y1:y2 + 1, x:x + thickness] = BORDER_COLOR
+
+    # 4. Texto: os glifos de cada fonte são renderizados uma vez e compostos em
+    # camadas de cobertura (uma por cor), aplicadas sobre a imagem de uma só vez
+    coverage = {}
+    for r, c, text, info in grid.texts_between(row_start, row_end):
+        layer = coverage.get(info.text_color)
+        if layer is None:
+            layer = coverage[info.text_color] = np.zeros((height, width), dtype=np.uint8)
+        _draw_text(layer, text, info, int(xs[c]), int(ys[r - row_start]), int(xs[c + 1]), int(ys[r - row_start + 1]))
+
+    image = Image.fromarray(pixels, 'RGB')
+    for color, layer in coverage.items():
+        # paste com máscara faz a mistura (anti-aliasing) da cor do texto em C
+        image.paste(color, (0, 0, width, height), Image.fromarray(layer, 'L'))
+    return image
+
+
+class GlyphAtlas:
+    """
+    Glifos de uma fonte renderizados uma única vez, cada um como uma faixa da
+    altura da linha e da largura do seu avanço. Um texto vira a concatenação
+    das faixas dos seus caracteres (sem kerning), numa única operação.
+    """
+
+    def __init__(self, font):
+        self.font = font
+        ascent, descent = font.getmetrics() if hasattr(font, 'getmetrics') else (font.getbbox('Ag')[3], 0)
+        self.line_height = max(1, ascent + descent)
+        self._strips = {}
+
+    def strip(self, char):
+        strip = self._strips.get(char)
+        if strip is None:
+            advance = max(0, int(round(self.font.getlength(char))))
+            canvas = Image.new('L', (advance, self.line_height), 0)
+            if advance:
+                ImageDraw.Draw(canvas).text((0, 0), char, fill=255, font=self.font)
+            strip = self._strips[char] = np.asarray(canvas)
+        return strip
+
+    def render(self, text):
+        """Máscara do texto a partir da origem, e a caixa da tinta (esquerda, topo, largura, altura)"""
+        mask = np.concatenate([self.strip(char) for char in text], axis=1)
+        rows = np.flatnonzero(mask.any(axis=1))
+        if not len(rows):
+            return None, (0, 0, 0, 0)
+        columns = np.flatnonzero(mask.any(axis=0))
+        left, top = int(columns[0]), int(rows[0])
+        return mask, (left, top, int(columns[-1]) + 1 - left, int(rows[-1]) + 1 - top)
+
+
+@lru_cache(maxsize=256)
+def get_glyph_atlas(font_key):
+    return GlyphAtlas(get_font(*font_key))
+
+
+@lru_cache(maxsize=8192)
+def text_mask(font_key, text):
+    """Máscara do texto (valores repetidos, como '0', são renderizados uma vez)"""
+    return get_glyph_atlas(font_key).render(text)
+
+
+def warm_font_cache(font_keys=DEFAULT_WARM_FONTS, chars=WARM_CHARS):
+    """
+    Carrega as fontes e renderiza os glifos mais comuns antes do primeiro job.
+
+    Usado ao iniciar processos de renderização em lote: com fork os workers
+    herdam o cache já aquecido do processo pai; com spawn cada worker aquece o
+    seu uma vez e o reaproveita em todos os jobs que atender.
+    """
+    for font_key in font_keys:
+        atlas = get_glyph_atlas(font_key)
+        for char in chars:
+            atlas.strip(char)
+
+
+def _draw_text(layer, text, info, x1, y1, x2, y2):
+    """Desenha o texto na camada de cobertura, com o mesmo posicionamento do método 5 original"""
+    mask, (_, _, text_width, text_height) = text_mask(info.font_key, text)
+    if mask is None:
+        return
+
+    if info.h_align == 'center':
+        text_x = x1 + (x2 - x1 - text_width) // 2
+    elif info.h_align == 'right':
+        text_x = x2 - text_width - 3
+    else:
+        text_x = x1 + 3
+
+    if info.v_align == 'center':
+        text_y = y1 + (y2 - y1 - text_height) // 2
+    elif info.v_align == 'bottom':
+        text_y = y2 - text_height - 2
+    else:
+        text_y = y1 + 2
+
+    # Recorta nas bordas da imagem (texto que transborda a célula é mantido, como no Excel)
+    height, width = layer.shape
+    mh, mw = mask.shape
+    cx1, cy1 = max(text_x, 0), max(text_y, 0)
+    cx2, cy2 = min(text_x + mw, width), min(text_y + mh, height)
+    if cx1 >= cx2 or cy1 >= cy2:
+        return
+    region = layer[cy1:cy2, cx1:cx2]
+    np.maximum(region, mask[cy1 - text_y:cy2 - text_y, cx1 - text_x:cx2 - text_x], out=region)
+
+
+def render_sheet(ws):
+    """Renderiza a planilha (worksheet do openpyxl) e devolve a imagem"""
+    return paint_grid(load_sheet_grid(ws))
+
+
+def _load_grid(excel_path, sheet_name):
+    # Só a planilha alvo é lida, em streaming (read_only)
+    return sheet_data_grid(load_sheet(excel_path, sheet_name))
+
+
+def _max_tile_height(max_tile_height):
+    return max_tile_height or int(os.getenv("RENDER_MAX_TILE_HEIGHT", str(DEFAULT_MAX_TILE_HEIGHT)))
+
+
+def render_sheet_image(excel_path, sheet_name=None, output_path=None, max_tile_height=None):
+    """
+    Renderiza uma planilha do arquivo em um único PNG.
+
+    Se a imagem passar de max_tile_height, as faixas são pintadas uma a uma e
+    gravadas em streaming, sem montar a imagem inteira na memória.
+
+    Returns:
+        Caminho da imagem gerada
+    """
+    grid = _load_grid(excel_path, sheet_name)
+    output_path = output_path or f"{sheet_name or 'planilha'}.png"
+    return write_grid_image(grid, output_path, max_tile_height)
+
+
+def write_grid_image(grid, output_path, max_tile_height=None):
+    """Pinta o grid inteiro num PNG (em faixas, via streaming, se for mais alto que max_tile_height)"""
+    bands = grid.band_ranges(_max_tile_height(max_tile_height))
+
+    if len(bands) == 1:
+        paint_grid(grid).save(output_path, 'PNG', dpi=(OUTPUT_DPI, OUTPUT_DPI))
+        return output_path
+
+    with PngStreamWriter(output_path, grid.width, grid.height, dpi=OUTPUT_DPI) as png:
+        for row_start, row_end in bands:
+            png.write_rows(np.asarray(paint_grid(grid, row_start, row_end)))
+    return output_path
+
+
+def page_paths(output_path, count):
+    """Nomes das páginas: ficha.png -> ficha_p001.png, ficha_p002.png..."""
+    root, ext = os.path.splitext(output_path)
+    return [f"{root}_p{index:03d}{ext or '.png'}" for index in range(1, count + 1)]
+
+
+def render_sheet_pages(excel_path, sheet_name=None, output_path=None, max_tile_height=None):
+    """
+    Renderiza a planilha em páginas (uma imagem por faixa de até max_tile_height pixels).
+
+    Returns:
+        Lista com os caminhos das páginas, na ordem
+    """
+    grid = _load_grid(excel_path, sheet_name)
+    output_path = output_path or f"{sheet_name or 'planilha'}.png"
+    bands = grid.band_ranges(_max_tile_height(max_tile_height))
+
+    paths = page_paths(output_path, len(bands))
+    for path, (row_start, row_end) in zip(paths, bands):
+        paint_grid(grid, row_start, row_end).save(path, 'PNG', dpi=(OUTPUT_DPI, OUTPUT_DPI))
+    return paths
+
+
+def split_image_pages(image_path, max_tile_height=None):
+    """
+    Divide uma imagem já gerada (por outro método) em páginas de até max_tile_height pixels.
+
+    Returns:
+        Lista com os caminhos das páginas, na ordem
+    """
+    max_tile_height = _max_tile_height(max_tile_height)
+    with Image.open(image_path) as image:
+        width, height = image.size
+        count = max(1, -(-height // max_tile_height))
+        paths = page_paths(image_path, count)
+        for index, path in enumerate(paths):
+            top = index * max_tile_height
+            image.crop((0, top, width, min(top + max_tile_height, height))).save(path, 'PNG', dpi=(OUTPUT_DPI, OUTPUT_DPI))
+    return paths
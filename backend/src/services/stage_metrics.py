@@ -0,0 +1,265 @@
+"""
+Tempo, tamanho e memória de cada etapa dos jobs Python (spans).
+
+Os logs com emoji não dizem se um envio lento veio do Excel iniciando, do
+books.open, da espera do clipboard, do BeautifulSoup, do token ou do sendMail.
+Cada etapa fica dentro de um span; os spans de um job são juntados num dict
+JSON que vai junto do resultado para o Node (ver src/utils/python-metrics.js).
+
+    with job_metrics("extract_excel_data") as metrics:
+        with span("excel.open") as s:
+            wb = app.books.open(caminho)
+        with span("html.inline", inBytes=len(raw_html)) as s:
+            html = inline(raw_html)
+            s.set(outBytes=len(html))
+    emit_result({**result, "metrics": metrics})   # metrics é preenchido ao sair do bloco
+
+Fora de um job_metrics, span() não registra nada (custo de uma consulta a uma
+ContextVar). O span atual e o job são guardados em ContextVars: etapas em
+outras threads só entram no job se forem executadas com in_current_context()
+(como fazem send_stages e graph_mail).
+
+Variáveis de ambiente:
+    METRICS_MEMORY  1 registra o pico de memória (tracemalloc) de cada span; deixa as alocações mais lentas.
+                    O pico do tracemalloc é um só para o processo: só os spans da thread
+                    que abriu o job registram peakBytes (que inclui o que as outras threads
+                    alocaram durante o span); os spans de outras threads ficam sem o campo
+    PROFILE_DIR     pasta onde cada job grava um perfil cProfile (.prof, só da thread que
+                    roda o job) e as linhas com mais memória alocada no fim do job
+                    (.memory.txt); vazio desativa
+"""
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Linhas com mais memória alocada listadas no .memory.txt
+PROFILE_TOP_ALLOCATIONS = 30
+
+_current_job = contextvars.ContextVar("stage_metrics_job", default=None)
+_current_span = contextvars.ContextVar("stage_metrics_span", default=None)
+
+
+class _NullSpan:
+    """Span usado fora de um job: não mede nada"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    def __init__(self, job, name, attrs):
+        self.job = job
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+        self._token = None
+        self._started = 0.0
+        self._track_memory = False
+        self._memory_start = 0
+        self._memory_peak = 0
+
+    def set(self, **attrs):
+        """Acrescenta atributos ao span (tamanhos, método usado, status...)"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self)
+        self._track_memory = self.job.track_memory and threading.get_ident() == self.job.memory_thread
+        if self._track_memory:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            # O pico até aqui pertence ao span pai; o deste começa do zero
+            if self.parent is not None:
+                self.parent._memory_peak = max(self.parent._memory_peak, peak)
+            tracemalloc.reset_peak()
+            self._memory_start = self._memory_peak = current
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ended = time.perf_counter()
+        record = {
+            "name": self.name,
+            "parent": self.parent.name if self.parent is not None else None,
+            "start": round(self._started - self.job.started, 4),
+            "seconds": round(ended - self._started, 4)
+        }
+        if self._track_memory:
+            import tracemalloc
+            peak = max(self._memory_peak, tracemalloc.get_traced_memory()[1])
+            if self.parent is not None:
+                self.parent._memory_peak = max(self.parent._memory_peak, peak)
+            tracemalloc.reset_peak()
+            record["peakBytes"] = peak - self._memory_start
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        if self.attrs:
+            record["attrs"] = self.attrs
+        _current_span.reset(self._token)
+        self.job.add(record)
+        return False
+
+
+class _JobCollector:
+    """Spans de um job (as threads do job escrevem na mesma lista)"""
+
+    def __init__(self, name, track_memory, memory_thread):
+        self.name = name
+        self.track_memory = track_memory
+        # Única thread que lê e zera o pico do tracemalloc (ver METRICS_MEMORY)
+        self.memory_thread = memory_thread
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+
+def span(name, **attrs):
+    """
+    Mede uma etapa do job atual.
+
+    Args:
+        name: Nome da etapa (ex.: "excel.open", "graph.send")
+        **attrs: Atributos iniciais; outros podem ser acrescentados com .set()
+    """
+    job = _current_job.get()
+    if job is None:
+        return _NULL_SPAN
+    return Span(job, name, attrs)
+
+
+def in_current_context(func):
+    """
+    Função que roda no contexto atual (job e span pai) mesmo em outra thread.
+
+    Cada chamada usa uma cópia do contexto, então a mesma função pode ser
+    executada por várias threads ao mesmo tempo (ex.: executor.map).
+    """
+    if _current_job.get() is None:
+        return func
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return run
+
+
+def memory_tracking_enabled():
+    return os.getenv("METRICS_MEMORY", "0") == "1"
+
+
+def _max_rss_bytes():
+    """Maior uso de memória do processo até agora (não existe no Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+@contextmanager
+def job_metrics(name):
+    """
+    Coleta os spans de um job; o dict entregue é preenchido ao sair do bloco com
+    "job", "seconds", "maxRssBytes", "spans" e, com PROFILE_DIR, "profile".
+
+    Um job dentro de outro (ex.: cada conversão de um lote) tem spans próprios
+    e aparece no job de fora como um único span "job.<nome>".
+    """
+    metrics = {}
+    outer = _current_job.get()
+    profile_dir = os.getenv("PROFILE_DIR") if outer is None else None
+    track_memory = memory_tracking_enabled() or bool(profile_dir)
+
+    started_tracing = False
+    if track_memory:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+
+    profiler = None
+    if profile_dir:
+        import cProfile
+        profiler = cProfile.Profile()
+
+    outer_parent = _current_span.get()
+    job = _JobCollector(name, track_memory, outer.memory_thread if outer is not None else threading.get_ident())
+    job_token = _current_job.set(job)
+    span_token = _current_span.set(None)
+    error = None
+    try:
+        if profiler:
+            profiler.enable()
+        yield metrics
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+        seconds = time.perf_counter() - job.started
+        _current_span.reset(span_token)
+        _current_job.reset(job_token)
+
+        metrics.update({
+            "job": name,
+            "seconds": round(seconds, 4),
+            "maxRssBytes": _max_rss_bytes(),
+            "spans": sorted(job.spans, key=lambda record: record["start"])
+        })
+        if error is not None:
+            metrics["error"] = f"{type(error).__name__}: {error}"
+        if profiler:
+            metrics["profile"] = _dump_profile(profile_dir, name, profiler)
+        if started_tracing:
+            import tracemalloc
+            tracemalloc.stop()
+        if outer is not None:
+            outer.add({"name": f"job.{name}", "parent": outer_parent.name if outer_parent is not None else None,
+                       "start": round(job.started - outer.started, 4), "seconds": round(seconds, 4)})
+
+
+def _dump_profile(profile_dir, name, profiler):
+    """Grava o perfil cProfile e o resumo de alocações do job; devolve os caminhos"""
+    import tracemalloc
+
+    os.makedirs(profile_dir, exist_ok=True)
+    safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+    base = os.path.join(profile_dir, f"{safe_name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+    paths = {"stats": f"{base}.prof"}
+    # A foto da memória vem antes do dump, para não contar as estruturas do próprio cProfile
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    )) if tracemalloc.is_tracing() else None
+    try:
+        profiler.dump_stats(paths["stats"])
+        if snapshot is not None:
+            paths["memory"] = f"{base}.memory.txt"
+            with open(paths["memory"], 'w', encoding='utf-8') as f:
+                for stat in snapshot.statistics('lineno')[:PROFILE_TOP_ALLOCATIONS]:
+                    f.write(f"{stat}\n")
+        print(f"INFO: Perfil do job {name} salvo em {paths['stats']}")
+    except OSError as e:
+        print(f"WARN: Falha ao gravar o perfil do job {name}: {e}")
+    return paths
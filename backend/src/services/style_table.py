@@ -0,0 +1,129 @@
+"""
+Tabela de estilos deduplicada, compartilhada pelo renderizador de imagem e pelo
+gerador de HTML.
+
+Uma planilha usa poucos estilos distintos, repetidos em milhares de células.
+Em vez de consultar fill/font/border/alignment do openpyxl (e converter as
+cores) a cada célula, cada combinação é resolvida uma única vez para um
+CellStyle (registro com __slots__ e só tipos simples: cores já em RGB) e
+guardada na StyleTable. As células guardam apenas o id inteiro do estilo
+(array/NumPy), e índices de xf diferentes com o mesmo visual viram o mesmo id.
+
+    table = StyleTable()
+    style_id = table.add(cell.font, cell.fill, cell.border, cell.alignment, cell.number_format)
+    table[style_id].fill_rgb
+"""
+from openpyxl.styles.colors import COLOR_INDEX
+
+BORDER_SIDES = ('top', 'right', 'bottom', 'left')
+
+
+def color_to_rgb(color):
+    """Cor do openpyxl (rgb ou indexada) para tupla RGB; None se não resolvível (ex.: cor de tema)"""
+    if color is None:
+        return None
+    try:
+        if color.type == 'rgb':
+            value = color.rgb
+        elif color.type == 'indexed' and color.indexed is not None and color.indexed < len(COLOR_INDEX):
+            value = COLOR_INDEX[color.indexed]
+        else:
+            return None
+        if not isinstance(value, str) or len(value) < 6:
+            return None
+        return tuple(int(value[-6:][i:i + 2], 16) for i in (0, 2, 4))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class CellStyle:
+    """Um estilo de célula já resolvido; imutável e comparável pelo conteúdo"""
+    __slots__ = ('fill_pattern', 'fill_rgb',
+                 'font_name', 'font_size', 'bold', 'italic', 'underline', 'strike', 'font_rgb',
+                 'borders', 'h_align', 'v_align', 'wrap_text', 'indent', 'number_format', '_key')
+
+    def __init__(self, fill_pattern=None, fill_rgb=None, font_name=None, font_size=None, bold=False,
+                 italic=False, underline=False, strike=False, font_rgb=None, borders=(None, None, None, None),
+                 h_align=None, v_align=None, wrap_text=False, indent=0, number_format='General'):
+        self.fill_pattern = fill_pattern
+        self.fill_rgb = fill_rgb
+        self.font_name = font_name
+        self.font_size = font_size
+        self.bold = bold
+        self.italic = italic
+        self.underline = underline
+        self.strike = strike
+        self.font_rgb = font_rgb
+        # (estilo, rgb) ou None para cada lado, na ordem de BORDER_SIDES
+        self.borders = borders
+        self.h_align = h_align
+        self.v_align = v_align
+        self.wrap_text = wrap_text
+        self.indent = indent
+        self.number_format = number_format
+        self._key = (fill_pattern, fill_rgb, font_name, font_size, bold, italic, underline, strike, font_rgb,
+                     borders, h_align, v_align, wrap_text, indent, number_format)
+
+    def border(self, side):
+        """(estilo, rgb) do lado ('top', 'right', 'bottom', 'left'), ou None"""
+        return self.borders[BORDER_SIDES.index(side)]
+
+    def __eq__(self, other):
+        return isinstance(other, CellStyle) and self._key == other._key
+
+    def __hash__(self):
+        return hash(self._key)
+
+
+def resolve_style(font, fill, border, alignment, number_format):
+    """Converte os objetos de estilo do openpyxl num CellStyle"""
+    fill_pattern = getattr(fill, 'fill_type', None) if fill is not None else None
+    fill_rgb = color_to_rgb(getattr(fill, 'fgColor', None)) if fill_pattern else None
+
+    sides = []
+    for side_name in BORDER_SIDES:
+        side = getattr(border, side_name, None) if border is not None else None
+        sides.append((side.style, color_to_rgb(side.color)) if side is not None and side.style else None)
+
+    return CellStyle(
+        fill_pattern=fill_pattern,
+        fill_rgb=fill_rgb,
+        font_name=font.name if font is not None else None,
+        font_size=float(font.sz) if font is not None and font.sz else None,
+        bold=bool(font is not None and font.b),
+        italic=bool(font is not None and font.i),
+        underline=bool(font is not None and font.u),
+        strike=bool(font is not None and font.strike),
+        font_rgb=color_to_rgb(font.color) if font is not None else None,
+        borders=tuple(sides),
+        h_align=alignment.horizontal if alignment is not None else None,
+        v_align=alignment.vertical if alignment is not None else None,
+        wrap_text=bool(alignment is not None and alignment.wrap_text),
+        indent=int(alignment.indent or 0) if alignment is not None else 0,
+        number_format=number_format or 'General'
+    )
+
+
+class StyleTable:
+    """Estilos distintos, cada um com um id inteiro estável (posição na tabela)"""
+
+    def __init__(self):
+        self.records = []
+        self._ids = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, style_id):
+        return self.records[style_id]
+
+    def intern(self, style):
+        """Id do estilo, acrescentando-o à tabela se ainda não existir"""
+        style_id = self._ids.get(style)
+        if style_id is None:
+            style_id = self._ids[style] = len(self.records)
+            self.records.append(style)
+        return style_id
+
+    def add(self, font, fill, border, alignment, number_format):
+        return self.intern(resolve_style(font, fill, border, alignment, number_format))
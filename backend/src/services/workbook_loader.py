@@ -0,0 +1,384 @@
+"""
+Leitura de uma planilha em modo read_only (streaming), sem montar o Workbook inteiro.
+
+load_workbook em modo completo cria um objeto Cell para cada célula de todas as
+planilhas do arquivo, mesmo quando só uma vai ser renderizada. Aqui o arquivo é
+aberto com read_only=True e só o XML da planilha alvo é percorrido, uma única
+vez, pelo próprio parser do openpyxl. Na mesma passada saem:
+
+- as células, guardadas num modelo colunar compacto (SheetData): arrays de
+  linha, coluna e índice de estilo, e uma lista de valores;
+- as larguras e colunas ocultas (<cols>, respeitando os intervalos min..max);
+- as alturas e linhas ocultas (<row ht hidden>);
+- os intervalos mesclados (<mergeCells>).
+
+O estilo de cada célula fica como um id inteiro na StyleTable da planilha
+(style_table): fonte, preenchimento, borda, alinhamento e formato numérico são
+resolvidos uma vez por índice de xf do arquivo, não uma vez por célula.
+
+    sheet = load_sheet("ficha.xlsx", data_only=True)
+    for row_idx, values, style_ids in sheet.iter_rows(max_col=12):
+        ...
+
+Para ranges muito grandes, SheetStream entrega as linhas à medida que o XML é
+lido, sem guardar as células: a memória fica constante com o tamanho do range.
+As mesclas ficam no fim do XML, depois das linhas; elas são localizadas antes
+por uma varredura rápida dos bytes da planilha (sem interpretar as células),
+junto com as linhas ocultas que caem dentro delas.
+
+    with SheetStream("ficha.xlsx", data_only=True, max_col=12) as sheet:
+        for row_idx, values, style_ids in sheet.iter_rows():
+            ...
+"""
+import re
+import itertools
+from array import array
+
+from openpyxl import load_workbook
+from openpyxl.styles.numbers import BUILTIN_FORMATS, BUILTIN_FORMATS_MAX_SIZE
+from openpyxl.utils import range_boundaries
+from openpyxl.worksheet._reader import WorkSheetParser
+
+from style_table import CellStyle, StyleTable
+
+TRUE_VALUES = ('1', 'true')
+
+# Varredura das mesclas: lê o XML da planilha em blocos, sem interpretar as células
+SCAN_CHUNK_SIZE = 1024 * 1024
+_MERGE_CELL_RE = re.compile(rb'<(?:\w+:)?mergeCell\b[^>]*?\bref="([^"]+)"')
+_HIDDEN_ROW_RE = re.compile(rb'<(?:\w+:)?row\b[^>]*?\bhidden="(?:1|true)"[^>]*>')
+_ROW_NUMBER_RE = re.compile(rb'\br="(\d+)"')
+
+
+class SheetData:
+    """Planilha carregada em colunas: só as células presentes no XML, em ordem de linha"""
+
+    def __init__(self, title, workbook):
+        self.title = title
+        self.max_row = 1
+        self.max_col = 1
+        self.default_col_width = None
+        self.default_row_height = None
+        # (coluna_inicial, coluna_final, largura_em_caracteres, oculta), ordenado pela inicial
+        self.columns = []
+        self.row_heights = {}
+        self.hidden_rows = set()
+        # (min_row, min_col, max_row, max_col) de cada intervalo mesclado
+        self.merged = []
+
+        # Por célula: linha, coluna e id do estilo na StyleTable (10 bytes), mais o valor
+        self.cell_rows = array('I')
+        self.cell_cols = array('H')
+        self.style_ids = array('H')
+        self.values = []
+
+        self.styles = StyleTable()
+        self._workbook = workbook
+        self._xf_styles = {}
+        # Células ausentes usam o id 0: o estilo padrão (xf 0) entra primeiro na tabela
+        self.style_id_for_xf(0)
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, row, col, value, xf_id):
+        self.cell_rows.append(row)
+        self.cell_cols.append(col)
+        self.style_ids.append(self.style_id_for_xf(xf_id))
+        self.values.append(value)
+
+    def style_id_for_xf(self, xf_id):
+        """Id na StyleTable do índice de xf do arquivo, resolvido uma única vez por xf"""
+        style_id = self._xf_styles.get(xf_id)
+        if style_id is None:
+            wb = self._workbook
+            if xf_id >= len(wb._cell_styles):
+                # Índice inválido no XML: o Excel mostra a célula com o estilo padrão
+                return self.style_id_for_xf(0) if xf_id else self.styles.intern(CellStyle())
+            xf = wb._cell_styles[xf_id]
+            if xf.numFmtId < BUILTIN_FORMATS_MAX_SIZE:
+                number_format = BUILTIN_FORMATS.get(xf.numFmtId, 'General')
+            else:
+                number_format = wb._number_formats[xf.numFmtId - BUILTIN_FORMATS_MAX_SIZE]
+            style_id = self._xf_styles[xf_id] = self.styles.add(
+                wb._fonts[xf.fontId], wb._fills[xf.fillId], wb._borders[xf.borderId],
+                wb._alignments[xf.alignmentId], number_format
+            )
+        return style_id
+
+    def style(self, style_id):
+        """CellStyle do id de estilo"""
+        return self.styles[style_id]
+
+    def row_height(self, row_idx):
+        """Altura da linha em pontos, ou None se não foi definida"""
+        return self.row_heights.get(row_idx)
+
+    def row_hidden(self, row_idx):
+        return row_idx in self.hidden_rows
+
+    def column_widths(self, max_col=None):
+        """Lista de (largura_em_caracteres ou None, oculta) das colunas 1..max_col"""
+        max_col = max_col or self.max_col
+        widths = [(self.default_col_width, False)] * max_col
+        for first, last, width, hidden in self.columns:
+            for col in range(first, min(last, max_col) + 1):
+                widths[col - 1] = (width, hidden)
+        return widths
+
+    def iter_rows(self, max_row=None, max_col=None):
+        """
+        Percorre as linhas 1..max_row em ordem, inclusive as vazias.
+
+        Cada item é (linha, valores, índices_de_estilo), com listas de tamanho
+        max_col; células ausentes ficam com valor None e estilo 0 (o padrão).
+        """
+        max_row = max_row or self.max_row
+        max_col = max_col or self.max_col
+        rows, cols = self.cell_rows, self.cell_cols
+        index = 0
+        total = len(self.values)
+        for row_idx in range(1, max_row + 1):
+            values = [None] * max_col
+            style_ids = [0] * max_col
+            while index < total and rows[index] == row_idx:
+                col = cols[index]
+                if col <= max_col:
+                    values[col - 1] = self.values[index]
+                    style_ids[col - 1] = self.style_ids[index]
+                index += 1
+            yield row_idx, values, style_ids
+
+
+def _is_true(value):
+    return str(value).lower() in TRUE_VALUES
+
+
+def _read_layout(sheet, parser):
+    """Larguras padrão e das colunas (<sheetFormatPr> e <cols> vêm antes das linhas no XML)"""
+    sheet_format = getattr(parser, 'sheet_format', None)
+    if sheet_format is not None:
+        sheet.default_col_width = sheet_format.defaultColWidth
+        sheet.default_row_height = sheet_format.defaultRowHeight
+
+    sheet.columns = []
+    for attrs in parser.column_dimensions.values():
+        first = int(attrs['min'])
+        width = float(attrs['width']) if attrs.get('width') else None
+        sheet.columns.append((first, int(attrs.get('max', first)), width, _is_true(attrs.get('hidden'))))
+    sheet.columns.sort()
+
+
+def _read_row_dimensions(sheet, row_idx, attrs):
+    if attrs.get('ht'):
+        sheet.row_heights[row_idx] = float(attrs['ht'])
+    if _is_true(attrs.get('hidden')):
+        sheet.hidden_rows.add(row_idx)
+
+
+def _add_merged(sheet, ref):
+    first_col, first_row, last_col, last_row = range_boundaries(ref)
+    sheet.merged.append((first_row, first_col, last_row, last_col))
+
+
+def scan_merged_refs(source):
+    """
+    Endereços das mesclas (A1:B2...) e números das linhas ocultas do XML da planilha, lido em blocos.
+
+    Returns:
+        (lista de endereços, set de linhas ocultas)
+    """
+    refs = []
+    hidden_rows = set()
+    tail = b''
+    while True:
+        chunk = source.read(SCAN_CHUNK_SIZE)
+        if not chunk:
+            break
+        data = tail + chunk
+        # Quase todos os blocos não têm mescla: a busca simples evita rodar a regex neles
+        if b'mergeCell' in data:
+            refs.extend(match.group(1).decode('ascii', errors='ignore') for match in _MERGE_CELL_RE.finditer(data))
+        if b'hidden="' in data:
+            for match in _HIDDEN_ROW_RE.finditer(data):
+                number = _ROW_NUMBER_RE.search(match.group(0))
+                if number:
+                    hidden_rows.add(int(number.group(1)))
+        # O fim do bloco é relido junto com o próximo, para não perder uma tag cortada ao meio
+        tail = data[-256:]
+    # Cada intervalo aparece uma vez no XML; a releitura do fim do bloco pode repetir algum
+    return list(dict.fromkeys(refs)), hidden_rows
+
+
+def load_sheet(excel_path, sheet_name=None, data_only=False, max_row=None, max_col=None):
+    """
+    Carrega só a planilha alvo, em streaming.
+
+    Args:
+        excel_path: Caminho para o arquivo Excel
+        sheet_name: Nome da planilha (padrão: planilha ativa)
+        data_only: Valores calculados das fórmulas em vez do texto da fórmula
+        max_row: Ignora as linhas abaixo desta
+        max_col: Não guarda células à direita desta coluna (max_col da planilha continua o real)
+
+    Returns:
+        SheetData
+    """
+    wb = load_workbook(excel_path, read_only=True, data_only=data_only)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.active
+        sheet = SheetData(ws.title, wb)
+
+        # O ReadOnlyWorksheet não expõe colunas, alturas nem mesclas; o parser que
+        # ele usa por baixo coleta tudo isso na mesma passada que entrega as linhas
+        with ws._get_source() as source:
+            parser = WorkSheetParser(source, ws._shared_strings, data_only=data_only, epoch=wb.epoch,
+                                     date_formats=wb._date_formats, timedelta_formats=wb._timedelta_formats)
+            last_row = last_col = 0
+            for row_idx, cells in parser.parse():
+                if max_row and row_idx > max_row:
+                    # As mesclas vêm depois das linhas: o XML é lido até o fim, mas sem guardar células
+                    continue
+                if cells:
+                    # Dimensões da planilha inteira, como ws.max_row/ws.max_column
+                    last_row, last_col = row_idx, max(last_col, max(cell['column'] for cell in cells))
+                for cell in cells:
+                    if max_col and cell['column'] > max_col:
+                        continue
+                    if cell['value'] is None and not cell['style_id']:
+                        continue
+                    sheet.append(row_idx, cell['column'], cell['value'], cell['style_id'] or 0)
+
+        sheet.max_row = max(last_row, 1)
+        sheet.max_col = max(last_col, 1)
+
+        _read_layout(sheet, parser)
+        for row_key, attrs in parser.row_dimensions.items():
+            _read_row_dimensions(sheet, int(row_key), attrs)
+
+        if parser.merged_cells is not None:
+            for merged in parser.merged_cells.mergeCell:
+                _add_merged(sheet, merged.ref)
+        # As tabelas de estilo do arquivo não são mais necessárias depois da leitura
+        sheet._workbook = None
+        return sheet
+    finally:
+        wb.close()
+
+
+class SheetStream(SheetData):
+    """
+    Planilha lida linha a linha, sem guardar as células (ver docstring do módulo).
+
+    Colunas, formato padrão, estilos e mesclas ficam disponíveis assim que o
+    stream é aberto; altura e ocultação só das linhas ainda não entregues.
+    As linhas só podem ser percorridas uma vez. declared_max_row é a última
+    linha segundo o <dimension> do XML (None se o arquivo não tiver).
+    merged_hidden_rows são as linhas ocultas dentro de mesclas de mais de uma
+    linha, já conhecidas na abertura (para descontá-las do rowspan).
+    """
+
+    def __init__(self, excel_path, sheet_name=None, data_only=False, max_col=None):
+        self.max_col_limit = max_col
+        self._source = None
+        self._rows = None
+        self._wb = load_workbook(excel_path, read_only=True, data_only=data_only)
+        try:
+            ws = self._wb[sheet_name] if sheet_name else self._wb.active
+            super().__init__(ws.title, self._wb)
+            self.declared_max_row = ws._max_row
+
+            with ws._get_source() as source:
+                refs, hidden_rows = scan_merged_refs(source)
+            for ref in refs:
+                _add_merged(self, ref)
+            self.merged_hidden_rows = {row for row in hidden_rows
+                                       if any(first <= row <= last and first < last
+                                              for first, _, last, _ in self.merged)}
+
+            self._source = ws._get_source()
+            self._parser = WorkSheetParser(self._source, ws._shared_strings, data_only=data_only, epoch=self._wb.epoch,
+                                           date_formats=self._wb._date_formats,
+                                           timedelta_formats=self._wb._timedelta_formats)
+            self._rows = self._parser.parse()
+            # <sheetFormatPr> e <cols> vêm antes das linhas: estão lidos quando a primeira linha chega
+            self._first = next(self._rows, None)
+            _read_layout(self, self._parser)
+        except Exception:
+            self.close()
+            raise
+
+    def iter_rows(self, max_row=None, max_col=None):
+        """
+        Mesmo formato do SheetData.iter_rows, lendo o XML à medida que as linhas são pedidas.
+
+        Sem max_row, vai até a última linha com células (linhas vazias do fim não
+        saem). Ao terminar, max_row fica com a última linha entregue.
+        """
+        max_col = max_col or self.max_col_limit
+        if not max_col:
+            raise ValueError("SheetStream precisa de max_col (a largura da planilha só é conhecida no fim)")
+
+        rows = self._rows
+        first, self._first = self._first, None
+        next_row = 1
+        last_with_cells = 0
+
+        if first is not None:
+            for row_idx, cells in itertools.chain([first], rows):
+                if max_row and row_idx > max_row:
+                    break
+                attrs = self._parser.row_dimensions.pop(str(row_idx), None)
+                if attrs:
+                    _read_row_dimensions(self, row_idx, attrs)
+                if not cells:
+                    # Linha só com altura/ocultação: sai como vazia se aparecer uma linha com células depois
+                    continue
+                last_with_cells = row_idx
+
+                values = [None] * max_col
+                style_ids = [0] * max_col
+                for cell in cells:
+                    col = cell['column']
+                    if col <= max_col and (cell['value'] is not None or cell['style_id']):
+                        values[col - 1] = cell['value']
+                        style_ids[col - 1] = self.style_id_for_xf(cell['style_id'] or 0)
+
+                while next_row < row_idx:
+                    yield next_row, [None] * max_col, [0] * max_col
+                    self._forget(next_row)
+                    next_row += 1
+                yield row_idx, values, style_ids
+                self._forget(row_idx)
+                next_row = row_idx + 1
+
+        last_row = max_row or max(last_with_cells, 1)
+        while next_row <= last_row:
+            yield next_row, [None] * max_col, [0] * max_col
+            self._forget(next_row)
+            next_row += 1
+        self.max_row = last_row
+        self.row_heights.clear()
+        self.hidden_rows.clear()
+
+    def _forget(self, row_idx):
+        self.row_heights.pop(row_idx, None)
+        self.hidden_rows.discard(row_idx)
+
+    def close(self):
+        if self._rows is not None:
+            self._rows.close()
+            self._rows = None
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+        if self._wb is not None:
+            self._wb.close()
+            self._wb = None
+        self._workbook = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,231 @@
+const { spawn } = require('child_process');
+const fs = require('fs');
+const pythonMetrics = require('./python-metrics');
+
+/**
+ * Lado Node do protocolo --framed dos scripts Python (result_protocol.py).
+ *
+ * Com --framed, o Python escreve os logs no stderr e, no stdout, só frames:
+ * 1 byte de tipo ('J' JSON, 'B' binário), o tamanho do conteúdo em 4 bytes
+ * (uint32 big-endian) e o conteúdo. Textos grandes (HTML) chegam como
+ * referência {"$file": caminho}: o arquivo é lido e apagado aqui. Todo arquivo
+ * referenciado em algum frame é apagado quando o processo termina, mesmo que o
+ * frame tenha sido substituído por outro ou a execução tenha falhado.
+ *
+ * O resultado não passa mais pelo maxBuffer do exec nem por buscas de
+ * "SUCCESS:" no meio dos logs; o stderr é repassado linha a linha sem ser acumulado.
+ */
+
+const HEADER_SIZE = 5;
+const FRAME_JSON = 0x4a; // 'J'
+const FRAME_BINARY = 0x42; // 'B'
+// Linhas finais do stderr guardadas para a mensagem de erro
+const STDERR_TAIL_LINES = 20;
+
+class FrameParser {
+    /**
+     * @param {(frame: Object|Buffer) => void} onFrame Chamado a cada frame completo
+     *   (objeto para frames JSON, Buffer para frames binários)
+     */
+    constructor(onFrame) {
+        this.onFrame = onFrame;
+        this.pending = Buffer.alloc(0);
+    }
+
+    /**
+     * Recebe um pedaço do stdout; os frames podem chegar quebrados em vários pedaços
+     * @param {Buffer} chunk
+     */
+    push(chunk) {
+        this.pending = this.pending.length ? Buffer.concat([this.pending, chunk]) : chunk;
+
+        while (this.pending.length >= HEADER_SIZE) {
+            const kind = this.pending[0];
+            if (kind !== FRAME_JSON && kind !== FRAME_BINARY) {
+                throw new Error(`Saída fora do protocolo no stdout do Python (byte ${kind})`);
+            }
+            const length = this.pending.readUInt32BE(1);
+            if (this.pending.length < HEADER_SIZE + length) {
+                return;
+            }
+            const payload = this.pending.subarray(HEADER_SIZE, HEADER_SIZE + length);
+            this.pending = this.pending.subarray(HEADER_SIZE + length);
+            this.onFrame(kind === FRAME_JSON ? JSON.parse(payload.toString('utf8')) : Buffer.from(payload));
+        }
+    }
+
+    /**
+     * Indica se sobrou um frame incompleto (o processo terminou no meio da escrita)
+     * @returns {boolean}
+     */
+    hasPartialFrame() {
+        return this.pending.length > 0;
+    }
+}
+
+/**
+ * Substitui as referências {"$file": caminho} pelo conteúdo do arquivo (que é apagado)
+ * @param {*} value Resultado recebido do Python
+ * @returns {Promise<*>}
+ */
+async function resolveFileRefs(value) {
+    if (Array.isArray(value)) {
+        return Promise.all(value.map(resolveFileRefs));
+    }
+    if (!value || typeof value !== 'object') {
+        return value;
+    }
+    if (typeof value.$file === 'string') {
+        try {
+            return await fs.promises.readFile(value.$file, value.encoding || 'utf8');
+        } finally {
+            await fs.promises.rm(value.$file, { force: true });
+        }
+    }
+    const resolved = {};
+    for (const [key, item] of Object.entries(value)) {
+        resolved[key] = await resolveFileRefs(item);
+    }
+    return resolved;
+}
+
+/**
+ * Acumula em files os caminhos das referências {"$file": caminho} de um resultado
+ * @param {*} value Frame JSON recebido do Python
+ * @param {Set<string>} files
+ */
+function collectFileRefs(value, files) {
+    if (Array.isArray(value)) {
+        value.forEach(item => collectFileRefs(item, files));
+    } else if (value && typeof value === 'object') {
+        if (typeof value.$file === 'string') {
+            files.add(value.$file);
+            return;
+        }
+        Object.values(value).forEach(item => collectFileRefs(item, files));
+    }
+}
+
+/**
+ * Acumula em files as referências {"$file": caminho} de bytes que não formam um frame
+ * completo (processo interrompido ou saída fora do protocolo), procurando pelo texto
+ * @param {Buffer} data
+ * @param {Set<string>} files
+ */
+function collectPartialFileRefs(data, files) {
+    const pattern = /"\$file"\s*:\s*("(?:[^"\\]|\\.)*")/g;
+    for (const match of data.toString('utf8').matchAll(pattern)) {
+        try {
+            files.add(JSON.parse(match[1]));
+        } catch (error) {
+            // Caminho cortado no meio: não há como saber qual era
+        }
+    }
+}
+
+/**
+ * Executa um script Python em modo --framed e devolve o último frame JSON
+ * @param {string} scriptPath Caminho do script
+ * @param {string[]} args Argumentos (o --framed é acrescentado aqui)
+ * @param {Object} [options]
+ * @param {string} [options.cwd] Diretório de execução
+ * @param {number} [options.timeout] Timeout em ms
+ * @param {string} [options.pythonBin] Executável do Python (padrão PYTHON_BIN ou 'python')
+ * @param {(line: string) => void} [options.onLog] Recebe cada linha do stderr (padrão: console.log)
+ * @param {(data: Buffer) => void} [options.onData] Recebe os frames binários (ex.: HTML em streaming)
+ * @returns {Promise<{result: Object, code: number}>} Rejeita se o script não devolver nenhum resultado
+ */
+function runFramedScript(scriptPath, args = [], options = {}) {
+    const onLog = options.onLog || ((line) => console.log(`[Python]: ${line}`));
+
+    return new Promise((resolve, reject) => {
+        const pythonProcess = spawn(options.pythonBin || process.env.PYTHON_BIN || 'python', [scriptPath, ...args, '--framed'], {
+            cwd: options.cwd,
+            timeout: options.timeout,
+            env: { ...process.env, PYTHONIOENCODING: 'utf-8' }
+        });
+
+        let result = null;
+        let protocolError = null;
+        // Arquivos de todos os frames JSON recebidos, apagados no fim em qualquer caso
+        const spillFiles = new Set();
+        const parser = new FrameParser((frame) => {
+            if (Buffer.isBuffer(frame)) {
+                if (options.onData) options.onData(frame);
+            } else {
+                collectFileRefs(frame, spillFiles);
+                result = frame;
+            }
+        });
+
+        // Depois de um erro de protocolo o stdout não é mais interpretado, só procurado por $file
+        const unparsed = [];
+        pythonProcess.stdout.on('data', (chunk) => {
+            if (protocolError) {
+                unparsed.push(chunk);
+                return;
+            }
+            try {
+                parser.push(chunk);
+            } catch (error) {
+                protocolError = error;
+            }
+        });
+
+        // Logs repassados linha a linha; só as últimas ficam guardadas para a mensagem de erro
+        const stderrTail = [];
+        let partialLine = '';
+        pythonProcess.stderr.on('data', (data) => {
+            const lines = (partialLine + data.toString('utf8')).split(/\r?\n/);
+            partialLine = lines.pop();
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                onLog(line);
+                stderrTail.push(line);
+                if (stderrTail.length > STDERR_TAIL_LINES) stderrTail.shift();
+            }
+        });
+
+        pythonProcess.on('error', (error) => {
+            reject(new Error(`Falha ao iniciar o script Python: ${error.message}`));
+        });
+
+        pythonProcess.on('close', async (code, signal) => {
+            if (partialLine.trim()) {
+                onLog(partialLine);
+                stderrTail.push(partialLine);
+            }
+
+            let outcome;
+            if (protocolError || parser.hasPartialFrame()) {
+                collectPartialFileRefs(Buffer.concat([parser.pending, ...unparsed]), spillFiles);
+                outcome = { error: protocolError || new Error('Resultado do Python incompleto (processo terminou no meio do frame)') };
+            } else if (!result) {
+                const errorLine = stderrTail.slice().reverse().find(line => /^ERRO/.test(line));
+                outcome = { error: new Error(errorLine || `Script Python terminou sem resultado (código ${code}${signal ? `, sinal ${signal}` : ''})`) };
+            } else {
+                // Tempo das etapas do job (stage_metrics.py), acumulado para GET /health/python-metrics
+                pythonMetrics.record(result.metrics, result);
+                try {
+                    outcome = { value: { result: await resolveFileRefs(result), code } };
+                } catch (error) {
+                    outcome = { error: new Error(`Falha ao ler o resultado do Python: ${error.message}`) };
+                }
+            }
+
+            // Só responde depois de apagar os arquivos, qualquer que seja o resultado
+            await Promise.all([...spillFiles].map(file => fs.promises.rm(file, { force: true }).catch(() => {})));
+            if (outcome.error) {
+                reject(outcome.error);
+            } else {
+                resolve(outcome.value);
+            }
+        });
+    });
+}
+
+module.exports = {
+    FrameParser,
+    resolveFileRefs,
+    runFramedScript
+};
@@ -0,0 +1,140 @@
+/**
+ * Agregação das métricas dos jobs Python (stage_metrics.py).
+ *
+ * Cada job Python devolve "metrics": {job, seconds, maxRssBytes, spans: [{name,
+ * parent, start, seconds, peakBytes?, error?, attrs?}]}, tanto pelo worker
+ * persistente quanto pelos scripts em modo --framed. Aqui os tempos são
+ * acumulados por job e por etapa (últimas amostras para p50/p95), para
+ * responder onde um envio lento gastou o tempo: Excel, books.open, clipboard,
+ * BeautifulSoup, token ou sendMail.
+ *
+ *     pythonMetrics.record(message.metrics, message.result);
+ *     pythonMetrics.summary();  // exposto em GET /health/python-metrics
+ */
+
+// Amostras guardadas por job/etapa para os percentis
+const MAX_SAMPLES = 200;
+
+class SeriesStats {
+    constructor() {
+        this.count = 0;
+        this.errors = 0;
+        this.totalSeconds = 0;
+        this.maxSeconds = 0;
+        this.maxPeakBytes = null;
+        this.totalBytes = 0;
+        this.bytesCount = 0;
+        this.samples = [];
+    }
+
+    add(seconds, { error, peakBytes, bytes } = {}) {
+        this.count += 1;
+        if (error) this.errors += 1;
+        this.totalSeconds += seconds;
+        this.maxSeconds = Math.max(this.maxSeconds, seconds);
+        if (typeof peakBytes === 'number') {
+            this.maxPeakBytes = Math.max(this.maxPeakBytes || 0, peakBytes);
+        }
+        if (typeof bytes === 'number') {
+            this.totalBytes += bytes;
+            this.bytesCount += 1;
+        }
+        this.samples.push(seconds);
+        if (this.samples.length > MAX_SAMPLES) this.samples.shift();
+    }
+
+    toJSON() {
+        const sorted = this.samples.slice().sort((a, b) => a - b);
+        const percentile = (p) => sorted.length ? sorted[Math.min(sorted.length - 1, Math.floor(p * sorted.length))] : 0;
+        return {
+            count: this.count,
+            errors: this.errors,
+            totalSeconds: round(this.totalSeconds),
+            meanSeconds: round(this.totalSeconds / this.count),
+            p50Seconds: round(percentile(0.5)),
+            p95Seconds: round(percentile(0.95)),
+            maxSeconds: round(this.maxSeconds),
+            ...(this.bytesCount && { meanBytes: Math.round(this.totalBytes / this.bytesCount) }),
+            ...(this.maxPeakBytes !== null && { maxPeakBytes: this.maxPeakBytes })
+        };
+    }
+}
+
+function round(value) {
+    return Math.round(value * 10000) / 10000;
+}
+
+class PythonMetrics {
+    constructor() {
+        this.reset();
+    }
+
+    /**
+     * Acumula as métricas de um job
+     * @param {Object} metrics Campo "metrics" devolvido pelo Python
+     * @param {Object} [result] Resultado do job: itens de lote com "metrics" próprias também são acumulados
+     */
+    record(metrics, result) {
+        if (metrics && typeof metrics.job === 'string' && Array.isArray(metrics.spans)) {
+            this._series(this.jobs, metrics.job).add(metrics.seconds || 0, { error: metrics.error });
+            if (typeof metrics.maxRssBytes === 'number') {
+                this.maxRssBytes = Math.max(this.maxRssBytes || 0, metrics.maxRssBytes);
+            }
+
+            const spans = this.spans.get(metrics.job) || new Map();
+            this.spans.set(metrics.job, spans);
+            for (const span of metrics.spans) {
+                const attrs = span.attrs || {};
+                this._series(spans, span.name).add(span.seconds || 0, {
+                    error: span.error,
+                    peakBytes: span.peakBytes,
+                    bytes: attrs.bytes
+                });
+            }
+        }
+
+        if (result && Array.isArray(result.results)) {
+            for (const item of result.results) {
+                if (item && item.metrics) this.record(item.metrics);
+            }
+        }
+    }
+
+    /**
+     * Estatísticas por job e por etapa desde o início (ou o último reset)
+     * @returns {Object}
+     */
+    summary() {
+        const jobs = {};
+        for (const [job, stats] of this.jobs) {
+            const spans = {};
+            for (const [name, spanStats] of this.spans.get(job) || []) {
+                spans[name] = spanStats.toJSON();
+            }
+            jobs[job] = { ...stats.toJSON(), spans };
+        }
+        return {
+            since: this.since,
+            maxRssBytes: this.maxRssBytes,
+            jobs
+        };
+    }
+
+    reset() {
+        this.jobs = new Map();
+        this.spans = new Map();
+        this.maxRssBytes = null;
+        this.since = new Date().toISOString();
+    }
+
+    _series(map, name) {
+        let stats = map.get(name);
+        if (!stats) {
+            stats = new SeriesStats();
+            map.set(name, stats);
+        }
+        return stats;
+    }
+}
+
+module.exports = new PythonMetrics();